@@ -0,0 +1,103 @@
+import csv
+import io
+import re
+from collections import Counter
+
+from functions.reference_data_cache import get_reference_data
+
+
+class DemoMap:
+    """
+    DemoMap is the class to read the Demo Mapping CSV file.
+    The rows are indexed by Numeric Identifier and SMD Code, so the lookups don't scan the CSV rows.
+    The CSV read from S3 is parsed once per warm container (see reference_data_cache), the rows are shared by the
+    instances and must not be modified.
+    """
+
+    def __init__(self, demo_path: str = None, demo_csv: str = None):
+        """
+        Create a new instance of DemoMap.
+        :param str demo_path: The CSV file path for the Demo Mapping CSV file. The format must be "s3://bucket-name/path/to/filename".
+        :param str demo_csv: The Demo Mapping CSV file content as a single string.
+
+        One of demo_path, demo_csv must be provided, demo_csv will be considered first if that is provided.
+        """
+        self._demo_path = demo_path
+        self._demo_csv = demo_csv
+
+        if not self._demo_csv and not self._demo_path:
+            raise ValueError("demo_path or demo_csv must be provided.")
+
+        if self._demo_csv:
+            self.__content_to_dict()
+        else:
+            self.__get_file_content_by_path()
+
+    @property
+    def data(self):
+        return self._data
+
+    @property
+    def fieldnames(self):
+        return self._fieldnames
+
+    def get_by_numeric_identifier(self, numeric_identifier: str) -> dict:
+        """
+        The Demo row of a Numeric Identifier, None if it is not mapped. The last row wins when there are several.
+        """
+        return self._by_numeric_identifier.get(numeric_identifier)
+
+    def get_by_smd_code(self, smd_code: str) -> dict:
+        """
+        The Demo row of an SMD Code, None if it is not mapped. The last row wins when there are several.
+        """
+        return self._by_smd_code.get(smd_code)
+
+    def lookup(self, demo_code: str) -> dict:
+        """
+        The Demo row of a BRQ demographic code, a numeric code is a Numeric Identifier, otherwise an SMD Code.
+        """
+        if demo_code and demo_code.isdigit():
+            return self.get_by_numeric_identifier(demo_code)
+        return self.get_by_smd_code(demo_code)
+
+    @staticmethod
+    def most_frequent(demo_codes) -> str:
+        """
+        The most frequent code of the spots, counted in one pass. The first code seen wins a tie.
+        """
+        counts = Counter(demo_codes)
+        if not counts:
+            raise ValueError("No demographic code to choose from.")
+        return counts.most_common(1)[0][0]
+
+    def __content_to_dict(self):
+        demo_dict_reader = csv.DictReader(io.StringIO(self._demo_csv))
+        self._fieldnames = demo_dict_reader.fieldnames
+        self._data = list(demo_dict_reader)
+        self.__build_indexes()
+
+    def __build_indexes(self):
+        self._by_numeric_identifier = {}
+        self._by_smd_code = {}
+        for demo in self._data:
+            self._by_numeric_identifier[demo.get("Numeric Identifier")] = demo
+            self._by_smd_code[demo.get("SMD Code")] = demo
+
+    def __get_file_content_by_path(self):
+        matches = re.search(r"s3:\/\/([a-zA-Z0-9_\-\.]+)\/(.+)", self._demo_path)
+        if not matches:
+            raise Exception(
+                f"Demo Mapping path has invalid value '{self._demo_path}'. The value must in format \"s3://bucket-name/path/file.csv\"."
+            )
+
+        source = get_reference_data(matches[1], matches[2], _demo_map_from_content)
+        self._demo_csv = source._demo_csv
+        self._fieldnames = source._fieldnames
+        self._data = source._data
+        self._by_numeric_identifier = source._by_numeric_identifier
+        self._by_smd_code = source._by_smd_code
+
+
+def _demo_map_from_content(content: bytes) -> DemoMap:
+    return DemoMap(demo_csv=content.decode("utf-8-sig"))
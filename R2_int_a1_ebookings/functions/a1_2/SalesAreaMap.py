@@ -3,12 +3,20 @@ import io
 import os
 import boto3
 import re
+from botocore.exceptions import ClientError
 import csv
 
+from functions.parameter_store import get_parameter
+from functions.reference_data_cache import get_reference_data
+
 
 class SalesAreaMap:
     """
     SalesAreaMap is the class to read Sales Area Mapping CSV file.
+    The rows are indexed by BCC and salesAreaNumber, and grouped by parentSalesAreanumber and
+    Overall_ParentSalesAreaNumber, so the lookups don't scan the CSV rows.
+    The CSV read from S3 is parsed once per warm container (see reference_data_cache), the rows are shared by the
+    instances and must not be modified.
     """
 
     def __init__(
@@ -45,11 +53,9 @@ class SalesAreaMap:
             self.__content_to_dict()
         elif self._sales_area_path:
             self.__get_file_content_by_path()
-            self.__content_to_dict()
         elif self._param_name:
             self.__get_path_by_param_name()
             self.__get_file_content_by_path()
-            self.__content_to_dict()
 
     @property
     def data(self):
@@ -59,10 +65,51 @@ class SalesAreaMap:
     def fieldnames(self):
         return self._fieldnames
 
+    def get_by_bcc(self, bcc: str) -> dict:
+        """
+        The Sales Area row of a BCC (the BRQ StationId), None if the BCC is not mapped.
+        When a BCC is on several rows, the last row is returned.
+        """
+        return self._by_bcc.get(bcc)
+
+    def get_by_sales_area_number(self, sales_area_number: str) -> dict:
+        """
+        The Sales Area row of a salesAreaNumber, None if it doesn't exist.
+        """
+        return self._by_sales_area_number.get(sales_area_number)
+
+    def get_children(self, parent_sales_area_number: str) -> list:
+        """
+        The rows with this parentSalesAreanumber, in the CSV order.
+        """
+        return self._by_parent.get(parent_sales_area_number, [])
+
+    def get_overall_children(self, overall_parent_sales_area_number: str) -> list:
+        """
+        The rows with this Overall_ParentSalesAreaNumber, in the CSV order.
+        """
+        return self._by_overall_parent.get(overall_parent_sales_area_number, [])
+
     def __content_to_dict(self):
         sales_area_dict_reader = csv.DictReader(io.StringIO(self._sales_area_csv))
         self._fieldnames = sales_area_dict_reader.fieldnames
         self._data = list(sales_area_dict_reader)
+        self.__build_indexes()
+
+    def __build_indexes(self):
+        self._by_bcc = {}
+        self._by_sales_area_number = {}
+        self._by_parent = {}
+        self._by_overall_parent = {}
+        for area in self._data:
+            self._by_bcc[area.get("BCC")] = area
+            self._by_sales_area_number[area.get("salesAreaNumber")] = area
+            self._by_parent.setdefault(area.get("parentSalesAreanumber"), []).append(
+                area
+            )
+            self._by_overall_parent.setdefault(
+                area.get("Overall_ParentSalesAreaNumber"), []
+            ).append(area)
 
     def __get_file_content_by_path(self):
         matches = re.search("s3:\/\/([a-zA-Z0-9_\-\.]+)\/(.+)", self._sales_area_path)
@@ -73,17 +120,23 @@ class SalesAreaMap:
 
         bucket = matches[1]
         key = matches[2]
-        client = boto3.client("s3")
-        s3object = client.get_object(Bucket=bucket, Key=key)
-        self._sales_area_csv = s3object["Body"].read().decode("utf-8-sig")
+        source = get_reference_data(bucket, key, _sales_area_map_from_content)
+        self._sales_area_csv = source._sales_area_csv
+        self._fieldnames = source._fieldnames
+        self._data = source._data
+        self._by_bcc = source._by_bcc
+        self._by_sales_area_number = source._by_sales_area_number
+        self._by_parent = source._by_parent
+        self._by_overall_parent = source._by_overall_parent
 
     def __get_path_by_param_name(self):
-        client = boto3.client("ssm")
-        parameter = client.get_parameter(Name=self._param_name, WithDecryption=True)
-
-        if "Parameter" not in parameter or parameter["Parameter"] == None:
+        try:
+            self._sales_area_path = get_parameter(self._param_name)
+        except ClientError as e:
             raise Exception(
                 f"Sales Area Mapping CSV file path parmaeter does not exist. The parameter '{self._param_name}' must exist in AWS Parameter Store."
-            )
+            ) from e
+
 
-        self._sales_area_path = parameter["Parameter"].Value
+def _sales_area_map_from_content(content: bytes) -> SalesAreaMap:
+    return SalesAreaMap(sales_area_csv=content.decode("utf-8-sig"))
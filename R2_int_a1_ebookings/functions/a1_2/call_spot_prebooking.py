@@ -2,16 +2,24 @@ import boto3
 import json
 import os
 import logging
-from boto3 import client as boto3_client
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
+from functions.adaptor_client import (
+    LANDMARK_UNAVAILABLE,
+    AdaptorResponse,
+    adaptor_client,
+)
 from functions.s3_utils import save_to_s3, read_from_s3
+from functions.sf_composite import CompositeBatcher
+from functions.tranche_planner import tranche_spot_counts, tranche_stats
+from functions.a1_2.tranche_manifest import TrancheManifest
 from functions.a1_2.task_integration_job_spots_prebooking_api import (
     update_int_job_spots_loading,
 )
 
 AWS_REGION = os.environ["SEIL_AWS_REGION"]
 ARN_SF_ADAPTOR = os.environ["SALESFORCE_ADAPTOR"]
-lambda_client = boto3_client("lambda", region_name=AWS_REGION)
 logger = logging.getLogger("a1_2_call_spot_prebooking_function")
 logger.setLevel(logging.INFO)
 
@@ -52,6 +60,15 @@ class CallSpotPrebookingAPIHandler:
         self.brq_json_bucket = event["brqJsonBucket"]
         self.brq_json_key = event["brqJsonKey"]
 
+        # the number of tranches sent to Landmark at the same time, 1 sends them one after another
+        self.parallelism = max(int(os.environ.get("SPOT_PREBOOKING_PARALLELISM", 1)), 1)
+
+        # the Landmark latency of the tranches, recorded for the tranche planner
+        self.observations = []
+
+        # the Salesforce writes of the invocation, sent as composite requests
+        self.batcher = CompositeBatcher(adaptor_arn=ARN_SF_ADAPTOR)
+
         # Get the same logger instance as defined globally
         self.logger = logging.getLogger("a1_2_call_spot_prebooking_function")
         self.logger.setLevel(logging.INFO)  # Ensure level is set
@@ -93,78 +110,111 @@ class CallSpotPrebookingAPIHandler:
             spotPrebookingResponsePathList = []
             spotPrebookingResponseCodeList = []
             spotPrebookingStatusList = []
+            print(payload_list)
 
-            # Loop through iteration count
-            for i in range(iteration_count):
-                print(payload_list)
-                if i >= len(payload_list):
-                    raise IndexError(f"Index {i} out of range for payload list")
-
-                payload_value = payload_list[i]
+            # the tranches answered by a previous run are not sent again, see tranche_manifest
+            self.manifest = TrancheManifest.load(
+                self.temp_bucket_name, self.correlation_id
+            )
+            self.logger.info(
+                f"{self.correlation_id} - Resuming from tranche {self.manifest.first_incomplete(payload_list[:iteration_count])}"
+            )
 
-                self.__invoke_landmark_adaptor(payload_value)
-                status = self.__determine_status()
-                response_body_json = json.loads(self.response_body)
-                lmk_status = self.__get_downstream_status(response_body_json)
-                if status == "QueueMessage":
-                    spotPrebookingStatusList.append("QueueMessage")
-                    spotPrebookingResponseCodeList.append(503)
-                    self.event.update(
-                        {
-                            "spotPrebookingStage": True,
-                            "spotPrebookingResponseCode": spotPrebookingResponseCodeList,
-                            "spotPrebookingerror": "Landmark responded with 503, transaction has been queued",
-                            "spotPrebookingStatus": spotPrebookingStatusList,
-                        }
-                    )
-                    return self.event
-                elif status == "failed":
-                    file_path = self.__save_response_to_s3(i+1)
-                    spotPrebookingResponsePathList.append(file_path)
-                    spotPrebookingResponseCodeList.append(lmk_status)
-                    spotPrebookingStatusList.append("failed")
-                    self.event.update(
-                        {
-                            "spotPrebookingStatus": "failed",
-                            "spotPrebookingStage": True,
-                            "spotPrebookingResponsePath": spotPrebookingResponsePathList,
-                            "spotPrebookingResponseCode": lmk_status,
-                        }
-                    )
-                else:
-                    file_path = self.__save_response_to_s3(i+1)
-                    spotPrebookingResponsePathList.append(file_path)
-                    spotPrebookingResponseCodeList.append(lmk_status)
-                    spotPrebookingStatusList.append("success")
+            # Loop through the tranche responses, in tranche order whatever the parallelism
+            tranches = self.__submit_tranches(payload_list, iteration_count)
+            spot_counts = self.__tranche_spot_counts(len(payload_list))
+            try:
+                for i, response in tranches:
+                    self.__observe_tranche(spot_counts, i, response)
+                    self.response = response
+                    self.response_body = response.body
+                    self.logger.info(f"LMK Response: {self.response_body}")
+                    status = self.__determine_status()
+                    response_body_json = json.loads(self.response_body)
+                    lmk_status = self.__get_downstream_status(response_body_json)
+                    if status == "QueueMessage":
+                        spotPrebookingStatusList.append("QueueMessage")
+                        spotPrebookingResponseCodeList.append(503)
+                        self.event.update(
+                            {
+                                "spotPrebookingStage": True,
+                                "spotPrebookingResponseCode": spotPrebookingResponseCodeList,
+                                "spotPrebookingerror": "Landmark responded with 503, transaction has been queued",
+                                "spotPrebookingStatus": spotPrebookingStatusList,
+                            }
+                        )
+                        tranches.close()
+                        self.__record_observations()
+                        return self.event
+                    elif status == "failed":
+                        file_path = self.__save_response_to_s3(i+1)
+                        self.manifest.complete(
+                            i + 1, payload_list[i], status, file_path, lmk_status
+                        )
+                        spotPrebookingResponsePathList.append(file_path)
+                        spotPrebookingResponseCodeList.append(lmk_status)
+                        spotPrebookingStatusList.append("failed")
+                        self.event.update(
+                            {
+                                "spotPrebookingStatus": "failed",
+                                "spotPrebookingStage": True,
+                                "spotPrebookingResponsePath": spotPrebookingResponsePathList,
+                                "spotPrebookingResponseCode": lmk_status,
+                            }
+                        )
+                    else:
+                        file_path = self.__save_response_to_s3(i+1)
+                        self.manifest.complete(
+                            i + 1, payload_list[i], status, file_path, lmk_status
+                        )
+                        spotPrebookingResponsePathList.append(file_path)
+                        spotPrebookingResponseCodeList.append(lmk_status)
+                        spotPrebookingStatusList.append("success")
+                        self.event.update(
+                            {
+                                "spotPrebookingResponsePath": spotPrebookingResponsePathList,
+                            }
+                        )
+                        # a failed tranche fails the pre-booking, whatever the tranches answered after it
+                        if "failed" not in spotPrebookingStatusList:
+                            self.event.update(
+                                {
+                                    "spotPrebookingResponseCode": lmk_status,
+                                    "spotPrebookingStatus": "success",
+                                }
+                            )
                     self.event.update(
                         {
-                            "spotPrebookingResponseCode": lmk_status,
-                            "spotPrebookingResponsePath": spotPrebookingResponsePathList,
-                            "spotPrebookingStatus": "success",
+                            "spot_iteration": i + 1,
                         }
                     )
-                self.event.update(
-                    {
-                        "spot_iteration": i + 1,
-                    }
-                )
 
-                update_int_job_spots_loading(self.event, "context")
+                    update_int_job_spots_loading(self.event, "context", self.batcher)
+            finally:
+                # the executor is shut down even when a tranche response can't be handled
+                tranches.close()
+            self.flush_sf_writes()
+            self.__record_observations()
             return self.event
 
     def update_sf_opportunity(self, payload, opp_id):
-        payload["method"] = "UPDATE"
-        payload["oppId"] = opp_id
+        """
+        Queue the Opportunity update, it is sent with the next flush_sf_writes
+        """
+        return self.batcher.update("Opportunity", opp_id, payload["payload"])
+
+    def flush_sf_writes(self):
+        if len(self.batcher) == 0:
+            return None
         try:
-            invoke_response = lambda_client.invoke(
-                FunctionName=ARN_SF_ADAPTOR,
-                InvocationType="RequestResponse",
-                Payload=json.dumps(payload),
-            )
-            self.logger.info(f" Opp Update response: {invoke_response}")
-            return json.loads(invoke_response["Payload"].read())
+            response = self.batcher.flush()
+            self.logger.info(f" Salesforce composite response: {response}")
+            return response
         except Exception as e:
-            self.logger.info(f" Error occured in Opp Update: {e}")
+            # the writes stay queued, they are sent again with the next flush
+            self.logger.error(
+                f" Error occured in Salesforce update, {len(self.batcher)} writes queued: {e}"
+            )
             return None
 
     # def __invoke_landmark_adaptor(self):
@@ -209,26 +259,146 @@ class CallSpotPrebookingAPIHandler:
     #         self.logger.info(f"LMK Response type: {type(self.response_body)}")
     #     return self.response
 
-    def __invoke_landmark_adaptor(self, payload_value):
-        client = boto3.client("lambda")
+    def __tranche_spot_counts(self, tranche_count):
+        total_spots = int(self.event.get("total_spots", 0))
+        tranche_size = self.event.get("tranchePlan", {}).get("size") or total_spots
+        return tranche_spot_counts(total_spots, tranche_size, tranche_count)
 
-        response = client.invoke(
-            FunctionName=self.landmark_adaptor,
-            Payload=json.dumps(
+    def __observe_tranche(self, spot_counts, index, response):
+        """
+        Keep the Landmark latency of the tranche for the tranche planner, see tranche_planner
+        """
+        if response.seconds is None:
+            # not sent to Landmark
+            return
+        self.observations.append(
+            {
+                "spots": spot_counts[index] if index < len(spot_counts) else 0,
+                "seconds": round(response.seconds, 3),
+                "status": "QueueMessage" if response.landmark_unavailable else "answered",
+            }
+        )
+
+    def __record_observations(self):
+        answered = [
+            observation
+            for observation in self.observations
+            if observation["status"] != "QueueMessage"
+        ]
+        seconds = sum(observation["seconds"] for observation in answered)
+        spots = sum(observation["spots"] for observation in answered)
+        self.logger.info(
+            json.dumps(
                 {
-                    "operation": "post",
-                    "landmarkEndpoint": "/api/v1/SpotPreBooking",
-                    "content": payload_value,
+                    "spotPrebookingThroughput": {
+                        "tranches": len(self.observations),
+                        "spots": spots,
+                        "seconds": round(seconds, 3),
+                        "spotsPerSecond": round(spots / seconds, 2) if seconds else None,
+                        "trancheSize": self.event.get("tranchePlan", {}).get("size"),
+                    }
                 }
-            ),
+            )
+        )
+        tranche_stats.record(self.observations)
+
+    def __submit_tranches(self, payload_list, iteration_count):
+        """
+        Yield (index, Landmark response) of the tranches in tranche order.
+
+        With SPOT_PREBOOKING_PARALLELISM above 1, up to that many tranches are sent to Landmark at the same time.
+        Once a tranche is answered 503, the tranches not sent yet are not sent any more: their response is a 503
+        as well. The Salesforce writes are flushed from this thread only, before each response is handled.
+        """
+        if self.parallelism <= 1:
+            for i in range(iteration_count):
+                if i >= len(payload_list):
+                    raise IndexError(f"Index {i} out of range for payload list")
+                completed = self.manifest.completed(i + 1, payload_list[i])
+                if completed is not None:
+                    yield i, self.__completed_response(completed)
+                    continue
+                # Salesforce shows the writes queued so far while Landmark processes the tranche
+                self.flush_sf_writes()
+                yield i, self.__invoke_landmark_adaptor(payload_list[i])
+            return
+
+        unavailable = threading.Event()
+        executor = ThreadPoolExecutor(
+            max_workers=self.parallelism, thread_name_prefix="spot-prebooking"
+        )
+        futures = []
+        handled = -1
+        try:
+            for number, payload_value in enumerate(payload_list[:iteration_count], 1):
+                completed = self.manifest.completed(number, payload_value)
+                futures.append(
+                    None
+                    if completed is not None
+                    else executor.submit(
+                        self.__send_tranche, payload_value, unavailable
+                    )
+                )
+            for i in range(iteration_count):
+                if i >= len(futures):
+                    raise IndexError(f"Index {i} out of range for payload list")
+                self.flush_sf_writes()
+                if futures[i] is None:
+                    response = self.__completed_response(
+                        self.manifest.completed(i + 1, payload_list[i])
+                    )
+                else:
+                    response = futures[i].result()
+                handled = i
+                yield i, response
+        finally:
+            # the handler stops at the first 503, the tranches still queued are dropped
+            unavailable.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+            self.__checkpoint_in_flight(payload_list, futures[handled + 1 :], handled + 1)
+
+    def __completed_response(self, completed):
+        self.logger.info(
+            f"{self.correlation_id} - Tranche already answered by Landmark: {completed}"
+        )
+        return AdaptorResponse(self.manifest.read_response(completed).strip())
+
+    def __checkpoint_in_flight(self, payload_list, futures, start):
+        """
+        Record the tranches Landmark answered after the handler stopped at a 503, so that they aren't sent again
+        """
+        for i, future in enumerate(futures, start):
+            if future is None or not future.done() or future.cancelled():
+                continue
+            if future.exception() is not None:
+                continue
+            response = future.result()
+            if response.seconds is None or response.landmark_unavailable:
+                continue
+            try:
+                self.response_body = response.body
+                status = self.__determine_status()
+                lmk_status = self.__get_downstream_status(json.loads(response.body))
+                file_path = self.__save_response_to_s3(i + 1)
+                self.manifest.complete(
+                    i + 1, payload_list[i], status, file_path, lmk_status
+                )
+            except Exception as e:
+                self.logger.info(f"{self.correlation_id} - Tranche {i + 1} not recorded: {e}")
+
+    def __send_tranche(self, payload_value, unavailable: threading.Event):
+        if unavailable.is_set():
+            return AdaptorResponse(LANDMARK_UNAVAILABLE, attempts=0, short_circuited=True)
+        response = self.__invoke_landmark_adaptor(payload_value)
+        if response.landmark_unavailable:
+            unavailable.set()
+        return response
+
+    def __invoke_landmark_adaptor(self, payload_value):
+        # response will be 503 if LMK is unavailable (or short-circuited by the breaker)
+        return adaptor_client.landmark(
+            self.landmark_adaptor, "post", "/api/v1/SpotPreBooking", payload_value
         )
-        # response will be 503 if LMK is unavailable
-        self.response = response
-        self.response_body = self.response["Payload"].read().decode("utf-8").strip()
-        self.logger.info(f"LMK Response: {self.response_body}")
-        if self.response_body == "503":
-            self.logger.info(f"LMK Response type: {type(self.response_body)}")
-        return self.response
 
     def __get_downstream_status(self, response_body_json):
         """
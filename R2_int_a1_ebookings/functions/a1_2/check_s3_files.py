@@ -1,6 +1,8 @@
 import boto3
 import os
 
+from functions.a1_2.tranche_manifest import MANIFEST_FILE_NAME, TrancheManifest
+
 
 def lambda_handler(event, context):
     """
@@ -35,8 +37,23 @@ def lambda_handler(event, context):
 
     for page in pages:
         if "Contents" in page:
-            file_count += len(page["Contents"])
+            # the tranche manifest isn't a tranche file
+            file_count += len(
+                [
+                    content
+                    for content in page["Contents"]
+                    if not content["Key"].endswith("/" + MANIFEST_FILE_NAME)
+                ]
+            )
 
     event.update({"trancheFileCount": file_count})
 
+    # the tranches answered by a previous run are skipped by the Call Spot Prebooking API
+    payload_paths = event.get("spotPayloadFilePath", [])
+    if isinstance(payload_paths, list):
+        manifest = TrancheManifest.load(bucket_name, correlation_id)
+        event.update(
+            {"trancheResumeFrom": manifest.first_incomplete(payload_paths[:file_count])}
+        )
+
     return event
@@ -3,6 +3,8 @@ from datetime import datetime
 import boto3
 import json
 
+from functions.sf_composite import CompositeBatcher
+
 
 def lambda_handler(event, context):
     handler = CreateTaskUpdateOpportunityHandler(event)
@@ -45,57 +47,37 @@ class CreateTaskUpdateOpportunityHandler:
     def __create_task_in_sf(self):
         today = datetime.now().strftime(r"%Y-%m-%d")
 
-        invocation_data = {
-            "invocationType": "COMPOSITE",
-            "payload": {
-                "allOrNone": True,
-                "compositeRequest": [
-                    {
-                        "method": "POST",
-                        "url": "/services/data/v58.0/sobjects/Task",
-                        "referenceId": "refTask",
-                        "body": {
-                            "Subject": TASK_SUBJECT,
-                            "Description": f"BRQ spot '{self.file_name}' has been loaded and the status is '{self.spot_result_status_filtered}'",
-                            "whatId": self.opportunity_id,  # opportunity ID
-                            "ActivityDate": today,  # today
-                            # "CompletedDateTime": "",
-                            # "Type": TASK_TYPE
-                        },
-                    },
-                    {
-                        "method": "PATCH",
-                        "url": f"/services/data/v58.0/sobjects/Opportunity/{self.opportunity_id}",
-                        "referenceId": "refOpp",
-                        "body": {
-                            "SWM_Spots_created__c": self.spot_result_status_filtered
-                        },
-                    },
-                    {
-                        "method": "PATCH",
-                        "url": f"/services/data/v58.0/sobjects/Opportunity/{self.opportunity_id}",
-                        "referenceId": "refOpp2",
-                        "body": {"SWM_Error_Message__c": ""},
-                    },
-                ],
+        batcher = CompositeBatcher(adaptor_arn=self.salesforce_adaptor)
+        task = batcher.create(
+            "Task",
+            {
+                "Subject": TASK_SUBJECT,
+                "Description": f"BRQ spot '{self.file_name}' has been loaded and the status is '{self.spot_result_status_filtered}'",
+                "whatId": self.opportunity_id,  # opportunity ID
+                "ActivityDate": today,  # today
+                # "CompletedDateTime": "",
+                # "Type": TASK_TYPE
             },
-        }
-
-        lambda_client = boto3.client("lambda")
-        lambda_response = lambda_client.invoke(
-            FunctionName=self.salesforce_adaptor,
-            InvocationType="RequestResponse",
-            Payload=json.dumps(invocation_data),
+            reference_id="refTask",
+        )
+        batcher.update(
+            "Opportunity",
+            self.opportunity_id,
+            {"SWM_Spots_created__c": self.spot_result_status_filtered},
+            reference_id="refOpp",
+        )
+        batcher.update(
+            "Opportunity",
+            self.opportunity_id,
+            {"SWM_Error_Message__c": ""},
+            reference_id="refOpp2",
         )
 
-        print("Salesforce response")
-        print(lambda_response)
-
-        sf_response_json = json.loads(lambda_response["Payload"].read())
+        sf_response_json = batcher.flush()[0]
         print("Salesforce response body")
         print(sf_response_json)
 
-        task_id = sf_response_json["compositeResponse"][0]["body"]["id"]
+        task_id = task.body["id"]
         self.task_id = task_id
 
         return {"salesforceTaskID": self.task_id}
@@ -1,56 +1,53 @@
 import json
-import boto3
 from botocore.exceptions import ClientError
 import logging
 import os
 
+from functions.sf_composite import CompositeBatcher
+
 
 logger = logging.getLogger("a1_processing statemachine")
 logger.setLevel(logging.INFO)
 
 
 def create_update_integration_job(
-    operation, opportunity_id, stage, sf_status, sf_job_message, sf_job_type
+    operation,
+    opportunity_id,
+    stage,
+    sf_status,
+    sf_job_message,
+    sf_job_type,
+    batcher: CompositeBatcher = None,
 ):
-    client = boto3.client("lambda")
-
-    updateReqPayload = {
-        "allOrNone": True,
-        "compositeRequest": [
-            {
-                "method": "PATCH",
-                "referenceId": "IntegrationJobUpdate",
-                "url": "/services/data/v58.0/sobjects/Integration_Job__c/IntegrationJob_ExId__c/"
-                + stage
-                + "+"
-                + opportunity_id,
-                "body": {
-                    "Status__c": sf_status,
-                    "Job_Message__c": sf_job_message,
-                    "Platform__c": "LandMark",
-                    "Job_Type__c": sf_job_type,
-                    "Opportunity__c": opportunity_id,
-                },
-            }
-        ],
+    """
+    Upsert the Integration Job of the stage. The upsert is queued in batcher when it is given and its
+    CompositeResult returned, otherwise it is sent right away and the adaptor response returned.
+    """
+    body = {
+        "Status__c": sf_status,
+        "Job_Message__c": sf_job_message,
+        "Platform__c": "LandMark",
+        "Job_Type__c": sf_job_type,
+        "Opportunity__c": opportunity_id,
     }
+    external_id = stage + "+" + opportunity_id
 
-    reqPayload = updateReqPayload
-
-    payload = {"invocationType": "COMPOSITE", "payload": reqPayload}
+    if batcher is not None:
+        return batcher.upsert(
+            "Integration_Job__c", "IntegrationJob_ExId__c", external_id, body
+        )
 
     try:
-        salesforceResponse = client.invoke(
-            FunctionName=os.environ["SALESFORCE_ADAPTOR"],
-            InvocationType="RequestResponse",
-            Payload=json.dumps(payload),
+        batcher = CompositeBatcher(adaptor_arn=os.environ["SALESFORCE_ADAPTOR"])
+        batcher.upsert(
+            "Integration_Job__c",
+            "IntegrationJob_ExId__c",
+            external_id,
+            body,
+            reference_id="IntegrationJobUpdate",
         )
-        logger.info(salesforceResponse)
-
-        salesforcePayload = json.load(salesforceResponse["Payload"])
+        salesforcePayload = batcher.flush()[0]
         logger.info(salesforcePayload)
         return salesforcePayload
     except Exception as e:
         logger.exception(f"Server error - {str(e)}")
-
-    
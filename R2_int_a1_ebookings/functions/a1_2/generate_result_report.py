@@ -1,11 +1,19 @@
 import os
 import json
+import logging
 import re
 import csv
 import io
-from functions.s3_utils import save_to_s3, read_from_s3
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from functions.s3_utils import DEFAULT_REGION, read_from_s3
+from functions.s3_multipart import S3MultipartWriter
+from functions.brq_sidecar import load_brq_object
+from functions.a1_2.tranche_manifest import TrancheManifest, s3_key
 from datetime import datetime
 
+logger = logging.getLogger("a1_2_generate_result_report_function")
 
 """
 Field Mapping: Key=Title in the Report; Value=Field Name in the BRQ object
@@ -27,6 +35,19 @@ BRQ_OBJECT_FIELD_MAPPING = {
     "Proposed Agency Spot ID": "UniqueAgencyProposedSpotId",
     "Booking Modifiers": "BookingModifiers",
 }
+# the detail fields of the report, AgencyName is read from the header
+BRQ_DETAIL_REPORT_FIELDS = [
+    field for field in BRQ_OBJECT_FIELD_MAPPING.values() if field != "AgencyName"
+]
+REPORT_TITLES = [report_title for report_title in BRQ_OBJECT_FIELD_MAPPING] + [
+    "title",
+    "status",
+    "detail",
+]
+# the file name suffix of the report of all the tranches
+COMBINED_REPORT_SUFFIX = "all"
+# the CSV rows are sent to the upload by chunks of this size
+CSV_FLUSH_SIZE = 256 * 1024
 
 
 def lambda_handler(event, context):
@@ -55,11 +76,14 @@ class ResultReportGenerator:
 
         self.in_bucket_name = os.environ["EBOOKINGS_S3_FILEIN_BUCKET"]
         self.temp_bucket_name = os.environ["EBOOKINGS_S3_TEMP_BUCKET"]
+        # the tranches read ahead while one is reported
+        self.prefetch_tranches = int(os.environ.get("REPORT_PREFETCH_TRANCHES", 2))
 
     def generate(self):
         # read brq json
-        brq_json_content = read_from_s3(self.brqJsonBucket, self.brqJsonKey)
-        self.brq_json = json.loads(brq_json_content)
+        self.brq_json = load_brq_object(
+            self.brqJsonBucket, self.brqJsonKey, BRQ_DETAIL_REPORT_FIELDS
+        )
 
         # Get iteration count and payload list from event
         iteration_count = int(self.event.get("trancheFileCount", 1))
@@ -74,73 +98,129 @@ class ResultReportGenerator:
         else:
             payload_list = []  # fallback if it's neither string nor list
         response_list = self.event.get("spotPrebookingResponsePath", [])
+        if iteration_count > len(payload_list):
+            raise IndexError(f"Index {len(payload_list)} out of range for payload list")
 
         spotPrebookingReportlist = []
         spotPrebookingResultStatusList = []
         spotPrebookingResultFileNameToSF = []
-        self.overall_report_json = []
-        self.cur_iteration_report_json = []
-        # Loop through iteration count
-        for i in range(iteration_count):
-            if i >= len(payload_list):
-                raise IndexError(f"Index {i} out of range for payload list")
-
-            payload_value = payload_list[i]
-            response_value = response_list[i]
-            payload_s3_path = payload_value
-            bucket_prefix = "s3://" + self.temp_bucket_name + "/"
-            if payload_s3_path.startswith(bucket_prefix):
-                payload_key = payload_s3_path[len(bucket_prefix) :]
-            else:
-                payload_key = payload_s3_path
-
-            response_s3_path = response_value
-            bucket_prefix = "s3://" + self.temp_bucket_name + "/"
-            if response_s3_path.startswith(bucket_prefix):
-                response_key = response_s3_path[len(bucket_prefix) :]
-            else:
-                response_key = response_s3_path
-
-            # read spot payload json
-            spot_payload_content = read_from_s3(self.temp_bucket_name, payload_key)
-            self.spot_payload_json = json.loads(spot_payload_content)
-
-            # read spot response json
-            spot_response_content = read_from_s3(self.temp_bucket_name, response_key)
-            print(spot_response_content)
-            self.spot_response_json = json.loads(spot_response_content)
-
-            # there are two types of spot_response_json, one is object, ons is array
-            if isinstance(self.spot_response_json, dict):
-                print(self.spot_response_json)
-                self.status_detail, self.overall_status = self.__dict_to_status_detail(
-                    self.spot_response_json
-                )
-            elif isinstance(self.spot_response_json, list):
-                self.status_detail, self.overall_status = self.__list_to_status_detail(
-                    self.spot_response_json
+        # the tranches reported by a previous run are not reported again, see tranche_manifest
+        manifest = TrancheManifest.load(self.temp_bucket_name, self.correlation_id)
+        tranches = [
+            (
+                i + 1,
+                payload_list[i],
+                response_list[i],
+                manifest.report(i + 1, payload_list[i], response_list[i]),
+            )
+            for i in range(iteration_count)
+        ]
+        self.s3_client = boto3.client("s3", region_name=DEFAULT_REGION)
+        # the rows of all the tranches, written in the same pass as the tranche files
+        self.combine_reports = iteration_count > 1
+        combined = (
+            self.__open_report(COMBINED_REPORT_SUFFIX) if self.combine_reports else None
+        )
+        tranche_reads = _prefetch(self.__read_tranche, tranches, self.prefetch_tranches)
+        try:
+            for tranche, content in tranche_reads:
+                number, payload_value, response_value, reported = tranche
+                if reported is not None:
+                    spotPrebookingReportlist.append(reported["reportPath"])
+                    spotPrebookingResultStatusList.append(reported["status"])
+                    spotPrebookingResultFileNameToSF.append(reported["fileName"])
+                    if combined is not None:
+                        combined.write_rows_csv(content)
+                    continue
+
+                self.spot_payload_json, self.spot_response_json = content
+
+                # there are two types of spot_response_json, one is object, ons is array
+                if isinstance(self.spot_response_json, dict):
+                    self.status_detail, self.overall_status = (
+                        self.__dict_to_status_detail(self.spot_response_json)
+                    )
+                elif isinstance(self.spot_response_json, list):
+                    self.status_detail, self.overall_status = (
+                        self.__list_to_status_detail(self.spot_response_json)
+                    )
+                else:
+                    raise Exception("Spot response must be either object or array.")
+
+                # Glue status_detail with brq content, each row written to the tranche and the combined reports
+                report = self.__open_report(number)
+                self.report_file_name = report.file_name
+                with report:
+                    for row in self.__glue_with_brq_content():
+                        report.writerow(row)
+                        if combined is not None:
+                            combined.writerow(row)
+                file_path = self.report_file_uri = report.uri
+                logger.info(
+                    f"Report of tranche {number}: {report.rows} rows in {file_path}"
                 )
-            else:
-                raise Exception("Spot response must be either object or array.")
 
-            # Glue status_detail with brq content
-            self.cur_iteration_report_json = self.__glue_with_brq_content()
-            self.overall_report_json += self.__glue_with_brq_content()
-
-            # generate csv file
-            self.__generate_csv()
-
-            # save to s3
-            file_path = self.__save_to_s3(i + 1)
-            spotPrebookingReportlist.append(file_path)
-            spotPrebookingResultStatusList.append(self.overall_status)
-            spotPrebookingResultFileNameToSF.append(self.report_file_name)
+                spotPrebookingReportlist.append(file_path)
+                spotPrebookingResultStatusList.append(self.overall_status)
+                spotPrebookingResultFileNameToSF.append(self.report_file_name)
+                manifest.complete_report(
+                    number,
+                    payload_value,
+                    response_value,
+                    file_path,
+                    self.overall_status,
+                    self.report_file_name,
+                )
+        except BaseException:
+            if combined is not None:
+                combined.abort()
+            raise
+        finally:
+            tranche_reads.close()
+        if combined is not None:
+            combined.close()
         return {
             "spotPrebookingReport": spotPrebookingReportlist,
             "spotPrebookingResultStatus": spotPrebookingResultStatusList,
             "spotPrebookingResultFileNameToSF": spotPrebookingResultFileNameToSF,
+            "spotPrebookingCombinedReport": (
+                combined.uri
+                if combined is not None
+                else (spotPrebookingReportlist or [None])[0]
+            ),
         }
 
+    def __read_tranche(self, tranche):
+        """
+        The payload and response json of a tranche to report, the rows of the recorded report of a reported one
+        (None when there is no combined report)
+        """
+        number, payload_value, response_value, reported = tranche
+        if reported is not None:
+            if not self.combine_reports:
+                return None
+            # the recorded report, without its header
+            content = read_from_s3(
+                self.temp_bucket_name,
+                s3_key(self.temp_bucket_name, reported["reportPath"]),
+                Client=self.s3_client,
+            )
+            return content.partition("\r\n")[2]
+
+        # read spot payload json
+        spot_payload_content = read_from_s3(
+            self.temp_bucket_name,
+            s3_key(self.temp_bucket_name, payload_value),
+            Client=self.s3_client,
+        )
+        # read spot response json
+        spot_response_content = read_from_s3(
+            self.temp_bucket_name,
+            s3_key(self.temp_bucket_name, response_value),
+            Client=self.s3_client,
+        )
+        return json.loads(spot_payload_content), json.loads(spot_response_content)
+
     def __construct_file_name(self, index) -> str:
         # Refer to https://code7plus.atlassian.net/browse/R2DEV-1758
         # Updated for ticket - https://code7plus.atlassian.net/browse/R2DEV-2501
@@ -158,33 +238,32 @@ class ResultReportGenerator:
         )
         return file_name
 
-    def __save_to_s3(self, index) -> str:
+    def __open_report(self, index) -> "CsvReportUpload":
         """
-        Save the report to S3 and return the report path in format "s3://{bucket}/{file_key}".
+        The report streamed to "s3://{bucket}/{correlation_id}/{file_name}"
         """
         file_name = self.__construct_file_name(index)
-        self.report_file_name = file_name
-
-        file_key = f"{self.correlation_id}/{file_name}"
-
-        print("self.csv_content")
-        print(self.csv_content)
-        save_to_s3(self.csv_content.encode("utf-8"), self.temp_bucket_name, file_key)
-        self.report_file_uri = f"s3://{self.temp_bucket_name}/{file_key}"
-        return self.report_file_uri
+        return CsvReportUpload(
+            self.temp_bucket_name,
+            f"{self.correlation_id}/{file_name}",
+            file_name,
+            self.s3_client,
+        )
 
     def __glue_with_brq_content(self):
-        result = []
-        for index in self.status_detail:
-            brq_object = self.brq_json["details"][index]
+        """
+        The report rows of the status details, one at a time
+        """
+        details = self.brq_json["details"]
+        # read once per tranche rather than once per reported spot
+        agency_name = self.__get_from_header("AgencyName")
+        for index, status_detail in self.status_detail.items():
+            brq_object = details[index]
 
             one_report_entity = {}
-            for report_title in BRQ_OBJECT_FIELD_MAPPING:
-                field_name = BRQ_OBJECT_FIELD_MAPPING[report_title]
+            for report_title, field_name in BRQ_OBJECT_FIELD_MAPPING.items():
                 if field_name == "AgencyName":
-                    one_report_entity[report_title] = self.__get_from_header(
-                        "AgencyName"
-                    )
+                    one_report_entity[report_title] = agency_name
                 elif field_name == "BookingModifiers":
                     one_report_entity[report_title] = "".join(
                         brq_object["BookingModifiers"]
@@ -194,34 +273,12 @@ class ResultReportGenerator:
 
             one_report_entity.update(
                 {
-                    "title": self.status_detail[index]["title"],
-                    "status": self.status_detail[index]["status"],
-                    "detail": self.status_detail[index]["msg"],
+                    "title": status_detail["title"],
+                    "status": status_detail["status"],
+                    "detail": status_detail["msg"],
                 }
             )
-            result.append(one_report_entity)
-
-        self.report_json = result
-        print("self.report_json")
-        print(json.dumps(self.report_json))
-        return self.report_json
-
-    def __generate_csv(self):
-        titles = [report_title for report_title in BRQ_OBJECT_FIELD_MAPPING] + [
-            "title",
-            "status",
-            "detail",
-        ]
-        csv_stream = io.StringIO()
-        writer = csv.DictWriter(
-            csv_stream, titles, delimiter=",", quoting=csv.QUOTE_NONNUMERIC
-        )
-        writer.writeheader()
-        writer.writerows(self.cur_iteration_report_json)
-
-        self.csv_content = csv_stream.getvalue()
-
-        return self.csv_content
+            yield one_report_entity
 
     def __list_to_status_detail(self, spot_response_list):
         """
@@ -260,14 +317,12 @@ class ResultReportGenerator:
         hasFailed = False
         hasSuccess = False
         result = {}
+        # match the line_number in self.spot_payload, a line number not in it falls on the last detail
+        self.line_number_index = self.__index_line_numbers()
+        unmatched_index = len(self.spot_payload_json["spotPreBookingDetails"]) - 1
         for item in spot_response_list:
             line_number = item["lineNumber"]
-            # match the line_number in self.spot_payload
-            index = -1
-            for payload_detail in self.spot_payload_json["spotPreBookingDetails"]:
-                index += 1
-                if payload_detail["lineNumber"] == line_number:
-                    break
+            index = self.line_number_index.get(line_number, unmatched_index)
             status = 0
             msg = ""
             title = ""
@@ -297,6 +352,17 @@ class ResultReportGenerator:
 
         return result, self.overall_status
 
+    def __index_line_numbers(self) -> dict:
+        """
+        {lineNumber: index in the spot payload json} of the tranche, the first detail of a line number wins
+        """
+        line_number_index = {}
+        for index, payload_detail in enumerate(
+            self.spot_payload_json["spotPreBookingDetails"]
+        ):
+            line_number_index.setdefault(payload_detail["lineNumber"], index)
+        return line_number_index
+
     def __dict_to_status_detail(self, spot_response_dict):
         """
         return a dict
@@ -347,3 +413,82 @@ class ResultReportGenerator:
 
     def __get_from_header(self, field_name):
         return self.brq_json["header"][field_name]
+
+
+class CsvReportUpload:
+    """
+    A report CSV streamed to s3://bucket/key, see S3MultipartWriter. Used as a context manager, the report is
+    created on exit unless an exception is raised.
+    """
+
+    def __init__(self, bucket, key, file_name, s3_client=None):
+        self.file_name = file_name
+        self.upload = S3MultipartWriter(bucket, key, s3_client=s3_client)
+        self.rows = 0
+        self.buffer = io.StringIO()
+        self.writer = csv.DictWriter(
+            self.buffer, REPORT_TITLES, delimiter=",", quoting=csv.QUOTE_NONNUMERIC
+        )
+        self.writer.writeheader()
+
+    @property
+    def uri(self) -> str:
+        return self.upload.uri
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def writerow(self, row: dict):
+        self.writer.writerow(row)
+        self.rows += 1
+        if self.buffer.tell() >= CSV_FLUSH_SIZE:
+            self.__flush()
+
+    def write_rows_csv(self, csv_rows: str):
+        """
+        Append the rows of another report, written without their header
+        """
+        self.buffer.write(csv_rows)
+        self.__flush()
+
+    def close(self):
+        self.__flush()
+        self.upload.close()
+
+    def abort(self):
+        self.upload.abort()
+
+    def __flush(self):
+        self.upload.write(self.buffer.getvalue().encode("utf-8"))
+        self.buffer.seek(0)
+        self.buffer.truncate()
+
+
+def _prefetch(load, items: list, workers: int):
+    """
+    (item, load(item)) of each item in order, up to workers items being loaded ahead
+    """
+    if workers < 1:
+        for item in items:
+            yield item, load(item)
+        return
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report")
+    pending = deque()
+    try:
+        for item in items:
+            pending.append((item, executor.submit(load, item)))
+            if len(pending) > workers:
+                item, future = pending.popleft()
+                yield item, future.result()
+        while pending:
+            item, future = pending.popleft()
+            yield item, future.result()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -5,6 +5,8 @@ import json
 import re
 
 from functions.BRQParser import BRQParser
+from functions.adaptor_client import adaptor_client
+from functions.brq_sidecar import save_brq_sidecar
 
 
 def lambda_handler(event, context):
@@ -136,11 +138,19 @@ class GetBRQFileHandler:
         s3client = boto3.client("s3", region_name=self.region)
         brq_json_string = json.dumps(brq_object)
         file_key = self.correlation_id + "/" + self.raw_brq_file_name + ".json"
-        s3client.put_object(
+        response = s3client.put_object(
             Bucket=self.temp_bucket_name,
             Key=file_key,
             Body=brq_json_string.encode("utf-8"),
         )
+        # columnar copy of the JSON for the next steps, see brq_sidecar
+        save_brq_sidecar(
+            self.temp_bucket_name,
+            file_key,
+            brq_object,
+            (response or {}).get("ETag"),
+            s3client,
+        )
         return (self.temp_bucket_name, file_key)
 
     def __read_brq_file_content(self, brq_file_info) -> str:
@@ -148,23 +158,17 @@ class GetBRQFileHandler:
         This method read the BRQ file from Creative Media bucket through S3 Link API
         """
         salesforce_adaptor_arn = os.environ["SALESFORCE_ADAPTOR"]
-        lambda_client = boto3.client("lambda", region_name=self.region)
-        lambda_invoke_response = lambda_client.invoke(
-            FunctionName=salesforce_adaptor_arn,
-            InvocationType="RequestResponse",
-            Payload=json.dumps(
-                {
-                    "invocationType": "S3LINK_READFILECONTENT",
-                    "record_id": brq_file_info["record_id"],
-                    "type": "text",
-                    "bucket_name": self.temp_bucket_name,
-                    "brq_zip_flag": brq_file_info["brq_zip_flag"],
-                }
-            ),
+        adaptor_response = adaptor_client.salesforce(
+            {
+                "invocationType": "S3LINK_READFILECONTENT",
+                "record_id": brq_file_info["record_id"],
+                "type": "text",
+                "bucket_name": self.temp_bucket_name,
+                "brq_zip_flag": brq_file_info["brq_zip_flag"],
+            },
+            salesforce_adaptor_arn,
         )
-        # brq_file_content = lambda_invoke_response["Payload"].read().decode("utf-8-sig")
-        s3_details = lambda_invoke_response["Payload"].read().decode("utf-8-sig")
-        s3_json_data = json.loads(s3_details)
+        s3_json_data = adaptor_response.json()
         print("s3_json_data: ", s3_json_data)
         s3 = boto3.client("s3")
         response = s3.get_object(
@@ -197,22 +201,17 @@ class GetBRQFileHandler:
             f"Getting Salesforce file list by opportunity: {opportunity_id}..."
         )
 
-        lambda_client = boto3.client("lambda", region_name=self.region)
-        lambda_invoke_response = lambda_client.invoke(
-            FunctionName=salesforce_adaptor_arn,
-            InvocationType="RequestResponse",
-            Payload=json.dumps(
-                {
-                    "invocationType": "QUERY",
-                    "query": "SELECT+FIELDS(ALL)+FROM+NEILON__File__c+WHERE+(NEILON__Category__c='E-Booking Request'+OR+NEILON__Category__c='EBookings Request')"
-                    + f"+AND+NEILON__Opportunity__c='{opportunity_id}'"
-                    + "+AND+(+NEILON__Extension__c='.brq'"
-                    + "+OR+Name+LIKE+'%brq.zip'+)"
-                    + "+ORDER+BY+NEILON__Last_Replaced_Date__c+DESC+NULLS+LAST+LIMIT+1",
-                }
-            ),
-        )
-        sf_file_list = json.loads(lambda_invoke_response["Payload"].read())
+        sf_file_list = adaptor_client.salesforce(
+            {
+                "invocationType": "QUERY",
+                "query": "SELECT+FIELDS(ALL)+FROM+NEILON__File__c+WHERE+(NEILON__Category__c='E-Booking Request'+OR+NEILON__Category__c='EBookings Request')"
+                + f"+AND+NEILON__Opportunity__c='{opportunity_id}'"
+                + "+AND+(+NEILON__Extension__c='.brq'"
+                + "+OR+Name+LIKE+'%brq.zip'+)"
+                + "+ORDER+BY+NEILON__Last_Replaced_Date__c+DESC+NULLS+LAST+LIMIT+1",
+            },
+            salesforce_adaptor_arn,
+        ).json()
         self.logger.info("File list from Salesforce")
         self.logger.info(sf_file_list)
         print("File list from Salesforce")
@@ -11,6 +11,9 @@ from datetime import timedelta, datetime as dt
 import datetime
 
 from functions.a1_2.SalesAreaMap import SalesAreaMap
+from functions.brq_details import BRQDetails
+from functions.brq_sidecar import load_brq_object
+from functions.parameter_store import get_parameter
 from functions.simple_table import (
     sum_by,
     group_by_count,
@@ -53,6 +56,10 @@ def lambda_handler(event, context):
     return event
 
 
+# the detail fields used for the campaign header
+CAMPAIGN_HEADER_COLUMNS = ["StationId", "WCDate", "RequestedSize"]
+
+
 class PrepareCampaignHeaderPayloadHandler:
     def __init__(self, event):
         self._param_name = os.environ["LMK_DAYPART_ID"]
@@ -113,15 +120,7 @@ class PrepareCampaignHeaderPayloadHandler:
     #     }
 
     def __get_path_by_param_name(self):
-        client = boto3.client("ssm")
-        response = client.get_parameter(Name=self._param_name, WithDecryption=True)
-
-        if "Parameter" not in response or response["Parameter"] == None:
-            raise Exception(
-                f"Parameter does not exist, The parameter '{self._param_name}' must exist in AWS Parameter Store."
-            )
-
-        return response["Parameter"]["Value"]
+        return get_parameter(self._param_name)
 
     def __fixed_campaign_header(self):
         payload = self.event["detail"]["sf_payload"]
@@ -177,51 +176,58 @@ class PrepareCampaignHeaderPayloadHandler:
 
     def __read_brq_json(self):
         s3client = boto3.client("s3", region_name=self.region)
-        s3object = s3client.get_object(
-            Bucket=self.brq_json_bucket, Key=self.brq_json_key
+        brq_object = load_brq_object(
+            self.brq_json_bucket, self.brq_json_key, CAMPAIGN_HEADER_COLUMNS, s3client
         )
-        file_content = s3object["Body"].read()
-        brq_object = json.loads(file_content.decode("utf-8"))
 
         self.brq_object = brq_object
 
         return brq_object
 
-    def __prepare_sales_area_dict(self):
+    def __prepare_sales_area_map(self):
         self.sales_area_map = SalesAreaMap(sales_area_path=self.sales_area_mapping_path)
 
-        # sa_dict for fast search
-        sa_dict = {}  # key is the salesAreaNumber
-        for area in self.sales_area_map.data:
-            # sa_dict contains both BCC and salesAreaNumber key
-            if "BCC" in area and area["BCC"]:
-                sa_dict[area["BCC"]] = area
-            sa_dict[area["salesAreaNumber"]] = (
-                area  # support both BCC and salesAreaNumber
-            )
-
-        self.sa_dict = sa_dict
+    def __lookup_sales_area(self, station_id):
+        """
+        The Sales Area row of a StationId, support both BCC and salesAreaNumber
+        """
+        sales_area = self.sales_area_map.get_by_sales_area_number(station_id)
+        if sales_area is None and station_id:
+            sales_area = self.sales_area_map.get_by_bcc(station_id)
+        if sales_area is None:
+            raise KeyError(station_id)
+        return sales_area
 
     def __group_by_parent_sales_area(self):
-        if not hasattr(self, "sa_dict"):
-            self.__prepare_sales_area_dict()
+        if not hasattr(self, "sales_area_map"):
+            self.__prepare_sales_area_map()
 
         merged_list = []
         grouped = {}  # key is the parentSalesArea, value is a list of BRQ rows
         overall_grouped = {}
 
-        for row in self.brq_object["details"]:
-            stationId = row["StationId"]
-            salesArea = self.sa_dict[stationId]
+        # group the row indexes by station first, the parent sales area is then resolved once per station
+        rows = self.brq_object["details"]
+        # key is the parentSalesArea, value is a list of row indexes
+        grouped_indexes = {}
+        details = (
+            rows if isinstance(rows, BRQDetails) else BRQDetails.from_records(rows)
+        )
+        for stationId, indexes in details.group_indexes_by("StationId").items():
+            salesArea = self.__lookup_sales_area(stationId)
             parentArea = (
                 salesArea["Overall_ParentSalesAreaNumber"]
                 if salesArea["Overall_ParentSalesAreaNumber"]
                 else salesArea["salesAreaNumber"]
             )
-            if parentArea in grouped:
-                grouped[parentArea].append(row)
+            if parentArea in grouped_indexes:
+                grouped_indexes[parentArea].extend(indexes)
             else:
-                grouped[parentArea] = [row]
+                grouped_indexes[parentArea] = indexes
+
+        for parentArea, indexes in grouped_indexes.items():
+            indexes.sort()  # keep the BRQ row order within one parent sales area
+            grouped[parentArea] = [rows[index] for index in indexes]
 
         # Merge arrays(spot lenght data) for all keys(sales areas)
         # to make common across overall campaign - Fix as part SIT issue 2416
@@ -316,8 +322,8 @@ class PrepareCampaignHeaderPayloadHandler:
         # for the documentation
         # calculate SalesArea
 
-        if not hasattr(self, "sa_dict"):
-            self.__prepare_sales_area_dict()
+        if not hasattr(self, "sales_area_map"):
+            self.__prepare_sales_area_map()
 
         percentage_base = len(
             self.brq_object["details"]
@@ -349,22 +355,20 @@ class PrepareCampaignHeaderPayloadHandler:
             #         f"PERCENTAGE of Sales Area = {parent_area_percentage}, {remaining}, {percentage}"
             #     )
             # print(f"DEBUG: spotsPercentage: {percentage}")
+            salesArea = self.__lookup_sales_area(stationId)
             salesAreaDetails.append(
                 {
-                    "salesAreaNumber": int(self.sa_dict[stationId]["salesAreaNumber"]),
+                    "salesAreaNumber": int(salesArea["salesAreaNumber"]),
                     "isExcluded": False,
                     "percentageSplit": percentage,
                     "spotsPercentage": percentage,
                 }
             )
-            used_sales_areas.append(self.sa_dict[stationId]["salesAreaNumber"])
+            used_sales_areas.append(salesArea["salesAreaNumber"])
 
         # Add remaining SalesAreas although they are 0%
-        for area in self.sales_area_map.data:
-            if (
-                area["Overall_ParentSalesAreaNumber"] == parent_sales_area_number
-                and area["salesAreaNumber"] not in used_sales_areas
-            ):
+        for area in self.sales_area_map.get_overall_children(parent_sales_area_number):
+            if area["salesAreaNumber"] not in used_sales_areas:
                 salesAreaDetails.append(
                     {
                         "salesAreaNumber": int(area["salesAreaNumber"]),
@@ -6,9 +6,27 @@ import json
 import math
 
 from functions.a1_2.SalesAreaMap import SalesAreaMap
+from functions.a1_2.tranche_manifest import TrancheManifest
+from functions.brq_sidecar import load_brq_object
+from functions.parameter_store import get_parameter, parameter_store
+from functions.tranche_planner import tranche_planner
 
 BUSINESS_TYPE_CODE = "PDS"
 BOOKING_TYPE = 2
+# the detail fields used for the spot payload
+SPOT_PAYLOAD_COLUMNS = [
+    "StationId",
+    "WCDate",
+    "RequestedDay",
+    "RequestedTime",
+    "RequestedSize",
+    "RequestedGrossRate",
+    "RequestedProgram",
+    "DemographicOneTarp",
+    "BookingModifiers",
+]
+
+parameter_store.declare(os.environ.get("SPOT_HANDLING_LIMIT"))
 
 
 def lambda_handler(event, context):
@@ -42,11 +60,8 @@ class PrepareSpotsPayloadHandler:
         self.brq_json_bucket = event["brqJsonBucket"]
         self.brq_json_key = event["brqJsonKey"]
 
-        # Prepare the Sales Area Dict
+        # Prepare the Sales Area Map, the rows are looked up by BCC
         self.sales_area_map = SalesAreaMap(sales_area_path=self.sales_area_mapping_path)
-        self.sa_dict = {}  # key is the salesAreaNumber
-        for area in self.sales_area_map.data:
-            self.sa_dict[area["BCC"]] = area
 
         # prepare the logger with correlation ID
         self.logger = logging.getLogger("prepare_spot_payload.lambda_handler")
@@ -64,23 +79,13 @@ class PrepareSpotsPayloadHandler:
         return file_path
     
     def get_path_by_param_name(self, param_name):
-        client = boto3.client("ssm")
-        response = client.get_parameter(Name=param_name, WithDecryption=True)
-
-        if "Parameter" not in response or response["Parameter"] == None:
-            raise Exception(
-                f"Parameter does not exist, The parameter '{self._param_name}' must exist in AWS Parameter Store."
-            )
-
-        return response["Parameter"]["Value"]
+        return get_parameter(param_name)
     
     def __read_brq_json(self):
         s3client = boto3.client("s3", region_name=self.region)
-        s3object = s3client.get_object(
-            Bucket=self.brq_json_bucket, Key=self.brq_json_key
+        brq_object = load_brq_object(
+            self.brq_json_bucket, self.brq_json_key, SPOT_PAYLOAD_COLUMNS, s3client
         )
-        file_content = s3object["Body"].read()
-        brq_object = json.loads(file_content.decode("utf-8"))
 
         self.brq_object = brq_object
 
@@ -88,17 +93,19 @@ class PrepareSpotsPayloadHandler:
 
     def __lookup_sales_area(self, detail_row):
         station_id = detail_row["StationId"]
-        if station_id not in self.sa_dict:
+        sales_area = self.sales_area_map.get_by_bcc(station_id)
+        if sales_area is None:
             raise Exception(f"StationID '{station_id}' not found in SalesArea Mapping.")
         else:
-            return self.sa_dict[station_id]["code"]
+            return sales_area["code"]
 
     def __lookup_break_area(self, detail_row):
         station_id = detail_row["StationId"]
-        if station_id not in self.sa_dict:
+        sales_area = self.sales_area_map.get_by_bcc(station_id)
+        if sales_area is None:
             raise Exception(f"StationID '{station_id}' not found in SalesArea Mapping.")
         else:
-            return self.sa_dict[station_id]["breakCode"]
+            return sales_area["breakCode"]
 
     def __lookup_extra_date(self, detail_row):
         requested_day = detail_row["RequestedDay"]
@@ -240,12 +247,18 @@ class PrepareSpotsPayloadHandler:
         date_time_stamp = self._spot_full_payload.get("dateTimeStamp")
         details = self._spot_full_payload.get("spotPreBookingDetails", [])
 
-        # Chunk size
-        chunk_size = int(self.get_path_by_param_name(os.environ["SPOT_HANDLING_LIMIT"]))
-        
-        
+        # Chunk size, adapted to the observed Landmark latency within the SPOT_HANDLING_LIMIT
+        tranche_plan = tranche_planner.plan(
+            int(self.get_path_by_param_name(os.environ["SPOT_HANDLING_LIMIT"]))
+        )
+        chunk_size = tranche_plan["size"]
+        self.event["tranchePlan"] = tranche_plan
+
         total_objects = len(details)
 
+        # the tranches of a previous payload are not checkpoints of this one
+        TrancheManifest(self.temp_bucket_name, self.correlation_id).reset()
+
         # If objects <= 5000 → single file in root
         if total_objects <= chunk_size:
             self.event.update(
@@ -4,6 +4,7 @@ import boto3
 import os
 from botocore.exceptions import ClientError
 from functions.a1_2.create_update_integration_job import create_update_integration_job
+from functions.parameter_store import get_parameter
 
 logger = logging.getLogger("integration_job_update_spots_pre_booking")
 logger.setLevel(logging.INFO)
@@ -11,21 +12,19 @@ logger.setLevel(logging.INFO)
 INTEGRATION_NUMBER = "A1"
 
 def get_path_by_param_name(param_name):
-        client = boto3.client("ssm")
-        response = client.get_parameter(Name=param_name, WithDecryption=True)
+        return get_parameter(param_name)
 
-        if "Parameter" not in response or response["Parameter"] == None:
-            raise Exception(
-                f"Parameter does not exist, The parameter '{param_name}' must exist in AWS Parameter Store."
-            )
-
-        return response["Parameter"]["Value"]
-
-def update_int_job_spots_loading(event, context):
+def update_int_job_spots_loading(event, context, batcher=None):
+    """
+    Create or update the Integration Job of the spots loading, queued in batcher when it is given
+    """
     logger.info(f"create_update_integration_job started for spots pre booking")
     logger.info(event)
     try:
-        chunk_size = int(get_path_by_param_name(os.environ["SPOT_HANDLING_LIMIT"]))
+        if "tranchePlan" in event:
+            chunk_size = event["tranchePlan"]["size"]
+        else:
+            chunk_size = int(get_path_by_param_name(os.environ["SPOT_HANDLING_LIMIT"]))
         if "campaignHeaderResponseCode" in event and (
             event["campaignHeaderResponseCode"] == 200
             or event["campaignHeaderResponseCode"] == 201
@@ -72,7 +71,13 @@ def update_int_job_spots_loading(event, context):
                 
 
             integration_job_response = create_update_integration_job(
-                operation, opportunity_id, stage, sf_status, sf_job_message, sf_job_type
+                operation,
+                opportunity_id,
+                stage,
+                sf_status,
+                sf_job_message,
+                sf_job_type,
+                batcher,
             )
             logger.info(f"integration_job_response: {integration_job_response}")
     except Exception as e:
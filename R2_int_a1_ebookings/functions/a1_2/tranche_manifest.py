@@ -0,0 +1,158 @@
+"""
+Checkpoints of the spot pre-booking tranches of a correlation id, in the manifest object
+{correlation_id}/tranche/manifest.json of the temp bucket.
+
+CallSpotPrebooking records each tranche answered by Landmark (its status, response path and response code) and
+GenerateResultReport the report of each tranche. When a handler is run again for the same correlation id (a retry
+of the state machine or the queued message processed again), the recorded tranches are not sent to Landmark or
+reported again: the recorded result is used and the handler resumes from the first incomplete tranche. An entry
+is only used for the tranche file it was recorded with.
+
+PrepareSpotPayload empties the manifest when it writes the tranche files of a new payload.
+"""
+
+import json
+import logging
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+from functions.s3_utils import read_from_s3, save_to_s3
+
+MANIFEST_FILE_NAME = "manifest.json"
+
+logger = logging.getLogger(__name__)
+
+
+def manifest_key(correlation_id: str) -> str:
+    return f"{correlation_id}/tranche/{MANIFEST_FILE_NAME}"
+
+
+def s3_key(bucket: str, path: str) -> str:
+    """
+    The key of an "s3://{bucket}/{key}" path of the bucket
+    """
+    prefix = f"s3://{bucket}/"
+    return path[len(prefix) :] if path.startswith(prefix) else path
+
+
+class TrancheManifest:
+    """
+    {"tranches": {number: {...}}, "reports": {number: {...}}}, the tranches being numbered from 1
+    """
+
+    def __init__(self, bucket: str, correlation_id: str, manifest: dict = None):
+        self.bucket = bucket
+        self.correlation_id = correlation_id
+        self.manifest = manifest or {"tranches": {}, "reports": {}}
+
+    @classmethod
+    def load(cls, bucket: str, correlation_id: str) -> "TrancheManifest":
+        """
+        The manifest of the correlation id, empty when there is none or it can't be read
+        """
+        try:
+            manifest = json.loads(read_from_s3(bucket, manifest_key(correlation_id)))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                logger.warning(f"Tranche manifest not read: {e}")
+            manifest = None
+        except ValueError as e:
+            logger.warning(f"Tranche manifest not read: {e}")
+            manifest = None
+        return cls(bucket, correlation_id, manifest)
+
+    def save(self):
+        try:
+            save_to_s3(
+                json.dumps(self.manifest),
+                self.bucket,
+                manifest_key(self.correlation_id),
+            )
+        except Exception as e:
+            # the booking goes on, a retry would send the tranche again
+            logger.warning(f"Tranche manifest not saved: {e}")
+
+    def reset(self):
+        self.manifest = {"tranches": {}, "reports": {}}
+        self.save()
+
+    def completed(self, number: int, payload_path: str):
+        """
+        The recorded Landmark result of the tranche, None when it has to be sent
+        """
+        entry = self.manifest["tranches"].get(str(number))
+        if entry is None or entry["payloadPath"] != payload_path:
+            return None
+        return entry
+
+    def complete(
+        self,
+        number: int,
+        payload_path: str,
+        status: str,
+        response_path: str,
+        response_code,
+    ):
+        entry = {
+            "payloadPath": payload_path,
+            "status": status,
+            "responsePath": response_path,
+            "responseCode": response_code,
+        }
+        self.__record("tranches", number, entry)
+
+    def read_response(self, entry: dict) -> str:
+        """
+        The Landmark response body recorded for a tranche
+        """
+        return read_from_s3(self.bucket, s3_key(self.bucket, entry["responsePath"]))
+
+    def report(self, number: int, payload_path: str, response_path: str):
+        """
+        The recorded report of the tranche, None when it has to be generated
+        """
+        entry = self.manifest["reports"].get(str(number))
+        if (
+            entry is None
+            or entry["payloadPath"] != payload_path
+            or entry["responsePath"] != response_path
+        ):
+            return None
+        return entry
+
+    def complete_report(
+        self,
+        number: int,
+        payload_path: str,
+        response_path: str,
+        report_path: str,
+        status: str,
+        file_name: str,
+    ):
+        entry = {
+            "payloadPath": payload_path,
+            "responsePath": response_path,
+            "reportPath": report_path,
+            "status": status,
+            "fileName": file_name,
+        }
+        self.__record("reports", number, entry)
+
+    def first_incomplete(self, payload_paths: list) -> int:
+        """
+        The number of the first tranche not answered by Landmark yet, len(payload_paths) + 1 when all are
+        """
+        for index, payload_path in enumerate(payload_paths):
+            if self.completed(index + 1, payload_path) is None:
+                return index + 1
+        return len(payload_paths) + 1
+
+    def __record(self, section: str, number: int, entry: dict):
+        recorded = dict(self.manifest[section].get(str(number), {}))
+        recorded.pop("recordedAt", None)
+        if recorded == entry:
+            return
+        entry["recordedAt"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        self.manifest[section][str(number)] = entry
+        self.save()
@@ -4,6 +4,7 @@ import boto3
 import os
 from botocore.exceptions import ClientError
 import re
+from functions.adaptor_client import adaptor_client
 from functions.s3_utils import read_from_s3, save_to_s3
 
 logger = logging.getLogger("a1_2_update_campaign_header_function")
@@ -207,20 +208,14 @@ class UpdateCampaignHeaderHandler:
         return "status unknown"
 
     def __invoke_landmark_adaptor(self):
-        client = boto3.client("lambda")
-
-        response = client.invoke(
-            FunctionName=self.landmark_adaptor,
-            Payload=json.dumps(
-                {
-                    "operation": "post",
-                    "landmarkEndpoint": "/api/v1/UploadCampaign",
-                    "content": self.event["campaignHeaderPayloadPath"],
-                }
-            ),
+        response = adaptor_client.landmark(
+            self.landmark_adaptor,
+            "post",
+            "/api/v1/UploadCampaign",
+            self.event["campaignHeaderPayloadPath"],
         )
         self.response = response
-        self.response_body = self.response["Payload"].read().decode("utf-8").strip()
+        self.response_body = response.body
         self.logger.info(f"LMK Response: {self.response_body}")
         if self.response_body == "503":
             self.logger.info(f"LMK Response type: {type(self.response_body)}")
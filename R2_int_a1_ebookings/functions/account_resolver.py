@@ -0,0 +1,273 @@
+"""
+Salesforce accounts of a BRQ resolved with batched SOQL queries through the Salesforce adaptor.
+
+The validation rules and the opportunity creation used to send one query per account check. The accounts a BRQ
+refers to (its agency, its client and the Landmark buyer) are read with one IN (...) query selecting every field
+the checks need, RecordType.Name included, and the 'Billing Account of' relationships between them with a second
+one. The result is a plain dict, so it is passed from Lambda to Lambda in the validation event (sfAccounts).
+
+find_accounts, find_accounts_by_landmark_id and find_relationships answer a check from that dict in the shape of
+the adaptor response ({"totalSize": ..., "records": [...]}). They return None when the dict doesn't cover the
+check, the caller then queries Salesforce itself as before.
+"""
+
+import copy
+import json
+import logging
+
+from functions.sf_metadata_cache import query_salesforce_metadata
+
+ACCOUNT_FIELDS = [
+    "Name",
+    "Id",
+    "SWM_External_Account_ID__c",
+    "SWM_Additional_External_Ids__c",
+    "SWM_LandMark_ID__c",
+    "RecordTypeId",
+    "RecordType.Name",
+    "Type",
+    "SWM_Trading_Type__c",
+    "vlocity_cmt__Status__c",
+    "Credit_Status__c",
+]
+RELATIONSHIP_FIELDS = [
+    "Account__c",
+    "Related_Account__c",
+    "Active__c",
+    "SWM_End_Date__c",
+    "SWM_Start_Date__c",
+    "Account_Name__c",
+    "Related_Account_Name__c",
+]
+BILLING_RELATIONSHIP_TYPE = "Billing Account of"
+
+logger = logging.getLogger(__name__)
+
+
+def _literal(value: str) -> str:
+    return "'" + str(value).replace("\\", "\\\\").replace("'", "\\'") + "'"
+
+
+def _in(field: str, values) -> str:
+    return f"{field}+IN+({','.join(_literal(value) for value in values)})"
+
+
+def _same(value, other) -> bool:
+    # SOQL compares the strings case insensitively
+    return (
+        isinstance(value, str)
+        and isinstance(other, str)
+        and value.casefold() == other.casefold()
+    )
+
+
+def _unique(values) -> list:
+    return list(dict.fromkeys(value for value in values if value))
+
+
+def _without_attributes(record: dict) -> dict:
+    return {
+        field: (_without_attributes(value) if isinstance(value, dict) else value)
+        for field, value in record.items()
+        if field != "attributes"
+    }
+
+
+def _record_type_name(account: dict):
+    return (account.get("RecordType") or {}).get("Name")
+
+
+def _has_external_id(account: dict, external_id: str, additional_ids: bool) -> bool:
+    if _same(account.get("SWM_External_Account_ID__c"), external_id):
+        return True
+    # the LIKE predicates of a single id: 'id', 'id;%', '%;id;%' and '%;id'
+    return additional_ids and any(
+        _same(additional_id, external_id)
+        for additional_id in (
+            account.get("SWM_Additional_External_Ids__c") or ""
+        ).split(";")
+    )
+
+
+def _response(records: list) -> dict:
+    return {"totalSize": len(records), "records": records}
+
+
+class AccountResolver:
+    """
+    Runs the batched queries with the Salesforce adaptor Lambda
+    """
+
+    def __init__(self, lambda_client, adaptor_arn: str):
+        self._lambda_client = lambda_client
+        self._adaptor_arn = adaptor_arn
+
+    def query(self, query: str) -> dict:
+        """
+        The adaptor response of a SOQL query, the spaces of the query being '+'
+        """
+        invoke_response = self._lambda_client.invoke(
+            FunctionName=self._adaptor_arn,
+            InvocationType="RequestResponse",
+            Payload=json.dumps({"invocationType": "QUERY", "query": query}),
+        )
+        return json.loads(invoke_response["Payload"].read())
+
+    def resolve(
+        self,
+        external_ids=(),
+        landmark_ids=(),
+        with_relationships: bool = False,
+        resolved: dict = None,
+    ) -> dict:
+        """
+        The accounts of the given ids, added to a copy of resolved (a previous result) when it is given. Only the
+        ids resolved doesn't cover yet are queried, no query is sent when it covers them all.
+        :param external_ids: External Account Ids, matched with SWM_External_Account_ID__c or one of the
+            SWM_Additional_External_Ids__c
+        :param landmark_ids: Landmark Ids, matched with SWM_LandMark_ID__c
+        :param with_relationships: query the 'Billing Account of' relationships between the resolved accounts too
+        """
+        resolved = (
+            copy.deepcopy(resolved)
+            if resolved
+            else {
+                "externalIds": [],
+                "landmarkIds": [],
+                "accounts": [],
+            }
+        )
+        external_ids = [
+            external_id
+            for external_id in _unique(external_ids)
+            if external_id not in resolved["externalIds"]
+        ]
+        landmark_ids = [
+            landmark_id
+            for landmark_id in _unique(landmark_ids)
+            if landmark_id not in resolved["landmarkIds"]
+        ]
+        if external_ids or landmark_ids:
+            accounts = self.__query_accounts(external_ids, landmark_ids)
+            known = {account["Id"] for account in resolved["accounts"]}
+            resolved["accounts"].extend(
+                account for account in accounts if account["Id"] not in known
+            )
+            resolved["externalIds"].extend(external_ids)
+            resolved["landmarkIds"].extend(landmark_ids)
+            resolved.pop("relationships", None)
+
+        if with_relationships and "relationships" not in resolved:
+            resolved["relationships"] = self.__query_relationships(
+                [account["Id"] for account in resolved["accounts"]]
+            )
+        return resolved
+
+    def resolve_record_types(self, developer_names, sobject_type: str) -> dict:
+        """
+        {DeveloperName: Id} of the record types of an SObject, the response is cached (see sf_metadata_cache)
+        """
+        developer_names = _unique(developer_names)
+        if not developer_names:
+            return {}
+        response = query_salesforce_metadata(
+            self._lambda_client,
+            self._adaptor_arn,
+            f"SELECT+Id,+DeveloperName+FROM+RecordType+WHERE+{_in('DeveloperName', developer_names)}"
+            f"+AND+SobjectType+={_literal(sobject_type)}",
+        )
+        return {record["DeveloperName"]: record["Id"] for record in response["records"]}
+
+    def __query_accounts(self, external_ids: list, landmark_ids: list) -> list:
+        predicates = []
+        if external_ids:
+            predicates.append(_in("SWM_External_Account_ID__c", external_ids))
+            predicates.append(_in("SWM_Additional_External_Ids__c", external_ids))
+            for external_id in external_ids:
+                for pattern in (
+                    f"{external_id};%",
+                    f"%;{external_id};%",
+                    f"%;{external_id}",
+                ):
+                    predicates.append(
+                        f"SWM_Additional_External_Ids__c+LIKE+{_literal(pattern)}"
+                    )
+        if landmark_ids:
+            predicates.append(_in("SWM_LandMark_ID__c", landmark_ids))
+        response = self.query(
+            f"SELECT+{',+'.join(ACCOUNT_FIELDS)}+FROM+Account+WHERE+{'+OR+'.join(predicates)}"
+        )
+        logger.info(
+            f"{response['totalSize']} Salesforce accounts resolved for {external_ids + landmark_ids}"
+        )
+        return [_without_attributes(record) for record in response["records"]]
+
+    def __query_relationships(self, account_ids: list) -> list:
+        if len(account_ids) < 2:
+            return []
+        response = self.query(
+            f"SELECT+{',+'.join(RELATIONSHIP_FIELDS)}+FROM+Account_Account_Relationship__c+WHERE+"
+            f"Relationship_Type__c+={_literal(BILLING_RELATIONSHIP_TYPE)}+AND+{_in('Account__c', account_ids)}"
+            f"+AND+{_in('Related_Account__c', account_ids)}+AND+Active__c+=True"
+        )
+        return [_without_attributes(record) for record in response["records"]]
+
+
+def find_accounts(
+    resolved: dict,
+    external_id: str,
+    record_type: str = None,
+    additional_ids: bool = False,
+) -> dict:
+    """
+    The resolved accounts of an External Account Id as an adaptor response, None if resolved doesn't cover it.
+    :param record_type: the RecordType.Name the accounts must have
+    :param additional_ids: match the SWM_Additional_External_Ids__c too
+    """
+    if not resolved or external_id not in resolved["externalIds"]:
+        return None
+    return _response(
+        [
+            account
+            for account in resolved["accounts"]
+            if _has_external_id(account, external_id, additional_ids)
+            and (record_type is None or _same(_record_type_name(account), record_type))
+        ]
+    )
+
+
+def find_accounts_by_landmark_id(resolved: dict, landmark_id: str) -> dict:
+    """
+    The resolved accounts of a Landmark Id as an adaptor response, None if resolved doesn't cover it
+    """
+    if not resolved or landmark_id not in resolved["landmarkIds"]:
+        return None
+    return _response(
+        [
+            account
+            for account in resolved["accounts"]
+            if _same(account.get("SWM_LandMark_ID__c"), landmark_id)
+        ]
+    )
+
+
+def find_relationships(
+    resolved: dict, account_id: str, related_account_id: str
+) -> dict:
+    """
+    The active 'Billing Account of' relationships of two resolved accounts as an adaptor response, None if
+    resolved doesn't cover them
+    """
+    if not resolved or resolved.get("relationships") is None:
+        return None
+    account_ids = {account["Id"] for account in resolved["accounts"]}
+    if account_id not in account_ids or related_account_id not in account_ids:
+        return None
+    return _response(
+        [
+            relationship
+            for relationship in resolved["relationships"]
+            if relationship["Account__c"] == account_id
+            and relationship["Related_Account__c"] == related_account_id
+        ]
+    )
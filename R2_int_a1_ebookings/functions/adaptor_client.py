@@ -0,0 +1,374 @@
+"""
+Client of the Salesforce and Landmark adaptor Lambdas shared by the functions of a container.
+
+The Lambda client is created once per container, on first use, with a botocore config tuned for the adaptor calls
+(connection pool, TCP keep-alive, timeouts). botocore's own retries are off, the retries are made here:
+    - an invocation throttled by Lambda (TooManyRequestsException, ...) or failing with a 5xx of the Lambda service
+      is retried with a jittered exponential backoff, the adaptor didn't run
+    - a Landmark response of 503 (the body of the Landmark adaptor) is retried the same way, Landmark didn't take
+      the request. A 502 or 504 comes from a gateway, Landmark may have processed the request before it failed, so
+      they are retried for the GETs only: resending a POST (SpotPreBooking, UploadCampaign) could book it twice.
+      A 500 or a timeout is not retried, the request may have been processed.
+
+A circuit breaker per Landmark adaptor counts its consecutive 503 responses. Once LANDMARK_BREAKER_FAILURES of them
+are received, the calls are short-circuited for LANDMARK_BREAKER_RESET_SECONDS: they return a 503 response right
+away, which the callers handle as before (the transaction is queued). The next call after that delay is sent, the
+breaker closes again when it doesn't answer 503.
+
+The latency of every call is recorded in a histogram per adaptor and operation, see AdaptorClient.latency_stats.
+"""
+
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+# the adaptors are invoked synchronously and Landmark can take minutes to answer a spot pre-booking
+CLIENT_CONFIG = Config(
+    max_pool_connections=int(os.environ.get("ADAPTOR_MAX_POOL_CONNECTIONS", 50)),
+    tcp_keepalive=True,
+    connect_timeout=float(os.environ.get("ADAPTOR_CONNECT_TIMEOUT_SECONDS", 5)),
+    read_timeout=float(os.environ.get("ADAPTOR_READ_TIMEOUT_SECONDS", 900)),
+    retries={"total_max_attempts": 1, "mode": "standard"},
+)
+
+THROTTLING_ERROR_CODES = {
+    "TooManyRequestsException",
+    "ThrottlingException",
+    "Throttling",
+    "ProvisionedThroughputExceededException",
+    "EC2ThrottledException",
+}
+# the responses retried for a request that is safe to resend, and for any request
+LANDMARK_IDEMPOTENT_RETRYABLE_BODIES = {"502", "503", "504"}
+LANDMARK_RETRYABLE_BODIES = {"503"}
+LANDMARK_UNAVAILABLE = "503"
+
+# the upper bounds of the latency buckets, in milliseconds
+LATENCY_BUCKETS_MS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000]
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptorResponse:
+    """
+    The response of an adaptor invocation, body being the decoded and stripped payload
+    """
+
+    def __init__(
+        self,
+        body: str,
+        status_code: int = 200,
+        function_error: str = None,
+        attempts: int = 1,
+        short_circuited: bool = False,
+        seconds: float = None,
+    ):
+        self.body = body
+        self.status_code = status_code
+        self.function_error = function_error
+        self.attempts = attempts
+        self.short_circuited = short_circuited
+        # the duration of the answered attempt, None when the adaptor wasn't invoked
+        self.seconds = seconds
+
+    @property
+    def landmark_unavailable(self) -> bool:
+        return self.body == LANDMARK_UNAVAILABLE
+
+    def json(self):
+        return json.loads(self.body)
+
+
+class RetryPolicy:
+    """
+    Jittered ("full jitter") exponential backoff: the delay before the retry n is random between 0 and
+    min(max_delay, base_delay * 2 ** n)
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = None,
+        base_delay: float = 0.2,
+        max_delay: float = 5.0,
+        sleep=time.sleep,
+        jitter=random.random,
+    ):
+        if max_attempts is None:
+            max_attempts = int(os.environ.get("ADAPTOR_MAX_ATTEMPTS", 3))
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._sleep = sleep
+        self._jitter = jitter
+
+    def delay(self, attempt: int) -> float:
+        return self._jitter() * min(self.max_delay, self.base_delay * 2**attempt)
+
+    def backoff(self, attempt: int):
+        self._sleep(self.delay(attempt))
+
+
+class CircuitBreaker:
+    """
+    Open after failure_threshold consecutive failures, until reset_seconds have passed
+    """
+
+    def __init__(
+        self, failure_threshold: int = None, reset_seconds: float = None, clock=None
+    ):
+        if failure_threshold is None:
+            failure_threshold = int(os.environ.get("LANDMARK_BREAKER_FAILURES", 5))
+        if reset_seconds is None:
+            reset_seconds = float(os.environ.get("LANDMARK_BREAKER_RESET_SECONDS", 30))
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._clock = clock or time.monotonic
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at = None
+
+    @property
+    def is_open(self) -> bool:
+        return self.opened_at is not None
+
+    def allow(self) -> bool:
+        """
+        False while the breaker is open, the first call after reset_seconds is let through
+        """
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if self._clock() - self.opened_at >= self.reset_seconds:
+                # half open, the call decides whether the breaker closes or opens again
+                self.opened_at = None
+                self.failures = self.failure_threshold - 1
+                return True
+            return False
+
+    def record(self, failed: bool):
+        with self._lock:
+            if not failed:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.failure_threshold and self.opened_at is None:
+                self.opened_at = self._clock()
+                logger.warning(
+                    f"Circuit breaker opened after {self.failures} failures, calls short-circuited for "
+                    f"{self.reset_seconds}s"
+                )
+
+
+class LatencyHistogram:
+    """
+    Call latencies counted in LATENCY_BUCKETS_MS buckets, the last bucket being unbounded
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def record(self, latency_ms: float):
+        index = 0
+        while (
+            index < len(LATENCY_BUCKETS_MS) and latency_ms > LATENCY_BUCKETS_MS[index]
+        ):
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total_ms += latency_ms
+        self.max_ms = max(self.max_ms, latency_ms)
+
+    def percentile(self, fraction: float):
+        """
+        The upper bound of the bucket of the percentile, max_ms for the unbounded bucket
+        """
+        if not self.count:
+            return None
+        rank = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                return (
+                    LATENCY_BUCKETS_MS[index]
+                    if index < len(LATENCY_BUCKETS_MS)
+                    else round(self.max_ms, 1)
+                )
+        return round(self.max_ms, 1)
+
+    def stats(self) -> dict:
+        labels = [f"le{bound}" for bound in LATENCY_BUCKETS_MS] + ["inf"]
+        return {
+            "count": self.count,
+            "meanMs": round(self.total_ms / self.count, 1) if self.count else None,
+            "maxMs": round(self.max_ms, 1),
+            "p50Ms": self.percentile(0.5),
+            "p90Ms": self.percentile(0.9),
+            "p99Ms": self.percentile(0.99),
+            "buckets": dict(zip(labels, self.counts)),
+        }
+
+
+class AdaptorClient:
+    """
+    Invokes the adaptor Lambdas with the retry policy, the Landmark circuit breakers and the latency histograms
+    of the container.
+    :param lambda_client: the Lambda client, the container client (created with CLIENT_CONFIG) when None
+    """
+
+    def __init__(self, lambda_client=None, retry_policy: RetryPolicy = None):
+        self._lambda_client = lambda_client
+        self._shared_client = None
+        self.retry_policy = retry_policy or RetryPolicy()
+        self._lock = threading.Lock()
+        self._breakers = {}
+        self._histograms = {}
+
+    @property
+    def lambda_client(self):
+        if self._lambda_client is not None:
+            return self._lambda_client
+        with self._lock:
+            if self._shared_client is None:
+                self._shared_client = boto3.client(
+                    "lambda",
+                    region_name=os.environ.get("SEIL_AWS_REGION") or None,
+                    config=CLIENT_CONFIG,
+                )
+            return self._shared_client
+
+    def salesforce(self, payload: dict, adaptor_arn: str = None) -> AdaptorResponse:
+        """
+        Invoke the Salesforce adaptor, SALESFORCE_ADAPTOR when adaptor_arn isn't given
+        """
+        adaptor_arn = adaptor_arn or os.environ["SALESFORCE_ADAPTOR"]
+        return self.invoke(adaptor_arn, payload, payload.get("invocationType"))
+
+    def landmark(
+        self, adaptor_arn: str, operation: str, endpoint: str, content=""
+    ) -> AdaptorResponse:
+        """
+        Invoke the Landmark adaptor through its circuit breaker, a 503 response is returned without invoking it
+        while the breaker is open
+        """
+        breaker = self.breaker(adaptor_arn)
+        if not breaker.allow():
+            logger.warning(f"Landmark call short-circuited: {operation} {endpoint}")
+            return AdaptorResponse(
+                LANDMARK_UNAVAILABLE, attempts=0, short_circuited=True
+            )
+        return self.invoke(
+            adaptor_arn,
+            {"operation": operation, "landmarkEndpoint": endpoint, "content": content},
+            endpoint,
+            breaker=breaker,
+            retryable_bodies=(
+                LANDMARK_IDEMPOTENT_RETRYABLE_BODIES
+                if operation.lower() == "get"
+                else LANDMARK_RETRYABLE_BODIES
+            ),
+        )
+
+    def invoke(
+        self,
+        function_name: str,
+        payload: dict,
+        operation: str = None,
+        breaker: CircuitBreaker = None,
+        retryable_bodies=LANDMARK_RETRYABLE_BODIES,
+    ) -> AdaptorResponse:
+        """
+        Invoke an adaptor synchronously, retrying the throttled invocations (and the Landmark responses of
+        retryable_bodies when breaker is given)
+        """
+        attempt = 0
+        while True:
+            attempt += 1
+            start = time.perf_counter()
+            try:
+                invoke_response = self.lambda_client.invoke(
+                    FunctionName=function_name,
+                    InvocationType="RequestResponse",
+                    Payload=json.dumps(payload),
+                )
+            except ClientError as e:
+                self.__record_latency(function_name, operation, start)
+                if attempt < self.retry_policy.max_attempts and _is_retryable(e):
+                    logger.warning(f"Adaptor invocation retried ({attempt}): {e}")
+                    self.retry_policy.backoff(attempt - 1)
+                    continue
+                raise
+            response = AdaptorResponse(
+                invoke_response["Payload"].read().decode("utf-8-sig").strip(),
+                invoke_response.get("StatusCode", 200),
+                invoke_response.get("FunctionError"),
+                attempt,
+                seconds=time.perf_counter() - start,
+            )
+            self.__record_latency(function_name, operation, start)
+            if breaker is None:
+                return response
+            breaker.record(response.landmark_unavailable)
+            if (
+                response.body in retryable_bodies
+                and attempt < self.retry_policy.max_attempts
+                and not breaker.is_open
+            ):
+                logger.warning(
+                    f"Landmark responded {response.body}, retried ({attempt})"
+                )
+                self.retry_policy.backoff(attempt - 1)
+                continue
+            return response
+
+    def breaker(self, adaptor_arn: str) -> CircuitBreaker:
+        with self._lock:
+            if adaptor_arn not in self._breakers:
+                self._breakers[adaptor_arn] = CircuitBreaker()
+            return self._breakers[adaptor_arn]
+
+    def latency_stats(self) -> dict:
+        """
+        {"<function name> <operation>": histogram stats} of the calls of the container
+        """
+        with self._lock:
+            return {
+                label: histogram.stats()
+                for label, histogram in sorted(self._histograms.items())
+            }
+
+    def clear(self):
+        """
+        Forget the breakers, the histograms and the container Lambda client
+        """
+        with self._lock:
+            self._breakers.clear()
+            self._histograms.clear()
+            self._shared_client = None
+
+    def __record_latency(self, function_name: str, operation: str, start: float):
+        latency_ms = (time.perf_counter() - start) * 1000
+        label = f"{function_name.rsplit(':function:', 1)[-1]} {operation or ''}".strip()
+        with self._lock:
+            histogram = self._histograms.setdefault(label, LatencyHistogram())
+            histogram.record(latency_ms)
+
+
+def _is_retryable(error: ClientError) -> bool:
+    code = error.response.get("Error", {}).get("Code")
+    status = error.response.get("ResponseMetadata", {}).get("HTTPStatusCode") or 0
+    return code in THROTTLING_ERROR_CODES or status == 429 or status >= 500
+
+
+adaptor_client = AdaptorClient()
@@ -0,0 +1,97 @@
+from operator import itemgetter
+
+
+class FixedWidthCodec:
+    """
+    Compiled decoder for the BRQ fixed-width slice configs.
+
+    A slice config is a dictionary of ``field -> [start, end, converter]`` (see ``BRQParser``).
+    Walking that dictionary for every line means re-checking the config length, building the
+    slice and dispatching the converter for each of the ~45 detail fields. The codec does that
+    work once: all the slices are folded into a single ``itemgetter`` which cuts the line in C,
+    and only the fields that really need a conversion are visited afterwards.
+
+    Converter semantics are the same as ``BRQParser.__convert``:
+        - ``"money"``: ``"0000012345" -> 123.45``, falls back to ``0.0``
+        - ``"decimaltwoandone"``: ``"231" -> 23.1``
+        - a type (``int``, ``float``): falls back to the type default (``0``, ``0.0``) when the value can't be converted
+        - any other callable: applied as is, errors are raised
+    """
+
+    __slots__ = ("fields", "_getter", "_converters")
+
+    _RAISE = object()
+
+    def __init__(self, slice_config: dict):
+        self.fields = tuple(slice_config)
+        slices = []
+        converters = []
+        for field, config in slice_config.items():
+            slices.append(slice(config[0], config[1]))
+            if len(config) >= 3 and config[2]:
+                converters.append(
+                    (
+                        field,
+                        FixedWidthCodec.__resolve_converter(config[2]),
+                        FixedWidthCodec.__resolve_fallback(config[2]),
+                    )
+                )
+        if len(slices) == 1:
+            single = itemgetter(slices[0])
+            self._getter = lambda line: (single(line),)
+        else:
+            self._getter = itemgetter(*slices)
+        self._converters = tuple(converters)
+
+    def decode(self, line: str) -> dict:
+        """
+        Decode one fixed-width line to a dictionary, keys are in the slice config order.
+        """
+        record = dict(zip(self.fields, map(str.strip, self._getter(line))))
+        for field, convert, fallback in self._converters:
+            try:
+                record[field] = convert(record[field])
+            except Exception:
+                if fallback is FixedWidthCodec._RAISE:
+                    raise
+                record[field] = fallback
+        return record
+
+    def decode_many(self, lines) -> [dict]:
+        """
+        Bulk path of decode(). Attribute lookups are hoisted out of the loop as this runs once per spot.
+        """
+        fields = self.fields
+        getter = self._getter
+        converters = self._converters
+        strip = str.strip
+        raise_marker = FixedWidthCodec._RAISE
+        result = []
+        append = result.append
+        for line in lines:
+            record = dict(zip(fields, map(strip, getter(line))))
+            for field, convert, fallback in converters:
+                try:
+                    record[field] = convert(record[field])
+                except Exception:
+                    if fallback is raise_marker:
+                        raise
+                    record[field] = fallback
+            append(record)
+        return result
+
+    @staticmethod
+    def __resolve_converter(value_type):
+        if value_type == "money":
+            return lambda value: float(value[0:-2] + "." + value[-2:])
+        if value_type == "decimaltwoandone":  # 231 -> 23.1, 001 -> 0.1
+            return lambda value: int(value) / 10.0
+        return value_type
+
+    @staticmethod
+    def __resolve_fallback(value_type):
+        if value_type == "money":
+            return float(0)
+        if isinstance(value_type, type):
+            return value_type()
+        return FixedWidthCodec._RAISE
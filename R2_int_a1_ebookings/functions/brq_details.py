@@ -0,0 +1,599 @@
+"""
+Columnar container for the BRQ detail records.
+
+A parsed BRQ detail record is a dictionary of ~45 keys, a 50k spots BRQ is 50k dictionaries holding their own
+str/float objects. BRQDetails keeps one column per field instead:
+    - WCDate as the date ordinal (array of int)
+    - the rates as cents (array of int)
+    - the sizes/times as int (array of int), the demographic thousands and tarps as float (array of double)
+    - the other fields as lists of interned strings, i.e. a client name repeated on every spot is stored once
+Aggregations (sums, min/max WC date, counts by station, spots missing demo) run over the columns.
+The rows are still available as read-only dictionary-like views for the code which works on a row basis.
+Each column can be encoded to bytes (see brq_sidecar) and decoded on its own, so a reader only decodes the columns
+it needs.
+
+An empty value ("" in the BRQ JSON of the temp bucket) is kept as a sentinel in the typed columns, so the row views
+give back exactly the values the column was built with. A column falls back to a plain list when a value doesn't
+fit its type.
+"""
+
+import json
+import math
+import struct
+import sys
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+from datetime import date
+
+MONEY_FIELDS = [
+    "ProposedGrossRate",
+    "ProposedNetRate",
+    "RequestedGrossRate",
+    "RequestedNetRate",
+]
+
+INT_FIELDS = [
+    "ProposedStartEndTime",
+    "ProposedSize",
+    "RequestedSize",
+]
+
+FLOAT_FIELDS = [
+    "DemographicOneThousand",
+    "DemographicTwoThousand",
+    "DemographicThreeThousand",
+    "DemographicFourThousand",
+    "DemographicOneTarp",
+    "DemographicTwoTarp",
+    "DemographicThreeTarp",
+    "DemographicFourTarp",
+]
+
+DEMO_CODE_FIELDS = [
+    "DemographicCodeOne",
+    "DemographicCodeTwo",
+    "DemographicCodeThree",
+    "DemographicCodeFour",
+]
+
+_EMPTY_INT = -(2**63)
+
+
+class _ColumnTypeError(Exception):
+    pass
+
+
+def _array_to_bytes(data: array) -> bytes:
+    """
+    The encoded columns are little-endian whatever the platform
+    """
+    if sys.byteorder == "big":
+        data = array(data.typecode, data)
+        data.byteswap()
+    return data.tobytes()
+
+
+def _array_from_bytes(typecode: str, payload: bytes) -> array:
+    data = array(typecode)
+    data.frombytes(payload)
+    if sys.byteorder == "big":
+        data.byteswap()
+    return data
+
+
+def _encode_dictionary(values: list) -> bytes:
+    """
+    [distinct values as JSON, length-prefixed] + [one uint32 code per value]
+    A TypeError is raised for unhashable values.
+    """
+    codes = array("I")
+    distinct = []
+    index = {}
+    for value in values:
+        key = (type(value), value)  # 1, 1.0 and True are different values
+        code = index.get(key)
+        if code is None:
+            code = index[key] = len(distinct)
+            distinct.append(value)
+        codes.append(code)
+    distinct_json = json.dumps(distinct, separators=(",", ":")).encode("utf-8")
+    return (
+        struct.pack("<I", len(distinct_json)) + distinct_json + _array_to_bytes(codes)
+    )
+
+
+def _decode_dictionary(payload: bytes) -> (list, array):
+    (distinct_length,) = struct.unpack_from("<I", payload)
+    distinct = json.loads(payload[4 : 4 + distinct_length])
+    codes = _array_from_bytes("I", payload[4 + distinct_length :])
+    return distinct, codes
+
+
+class _ObjectColumn:
+    __slots__ = ("data",)
+
+    def __init__(self, values=()):
+        self.data = list(values)
+
+    def append(self, value):
+        if type(value) is str:
+            value = sys.intern(value)
+        self.data.append(value)
+
+    def extend(self, values):
+        intern = sys.intern
+        self.data.extend(
+            [intern(value) if type(value) is str else value for value in values]
+        )
+
+    def get(self, index):
+        return self.data[index]
+
+    def values(self) -> list:
+        return list(self.data)
+
+    def encode(self) -> (str, bytes):
+        try:
+            return "dictionary", _encode_dictionary(self.data)
+        except TypeError:
+            return "json", json.dumps(self.data, separators=(",", ":")).encode("utf-8")
+
+    @classmethod
+    def decode(cls, kind: str, payload: bytes):
+        if kind == "json":
+            return cls(json.loads(payload))
+        distinct, codes = _decode_dictionary(payload)
+        distinct = [
+            sys.intern(value) if type(value) is str else value for value in distinct
+        ]
+        return cls(map(distinct.__getitem__, codes))
+
+
+class _IntColumn:
+    """
+    int values, "" is stored as _EMPTY_INT
+    """
+
+    __slots__ = ("data",)
+    KIND = "int64"
+
+    def __init__(self):
+        self.data = array("q")
+
+    def append(self, value):
+        if type(value) is int:
+            self.data.append(value)
+        elif value == "":
+            self.data.append(_EMPTY_INT)
+        else:
+            raise _ColumnTypeError()
+
+    def extend(self, values):
+        if all(type(value) is int for value in values):
+            self.data.extend(array("q", values))
+        else:
+            for value in values:
+                self.append(value)
+
+    def get(self, index):
+        value = self.data[index]
+        return "" if value == _EMPTY_INT else value
+
+    def values(self) -> list:
+        return ["" if value == _EMPTY_INT else value for value in self.data]
+
+    def encode(self) -> (str, bytes):
+        return self.KIND, _array_to_bytes(self.data)
+
+    @classmethod
+    def decode(cls, kind: str, payload: bytes):
+        column = cls()
+        column.data = _array_from_bytes("q", payload)
+        return column
+
+
+class _CentsColumn(_IntColumn):
+    """
+    Money values stored as integer cents, 62.1 -> 6210
+    """
+
+    __slots__ = ()
+    KIND = "cents64"
+
+    def append(self, value):
+        if type(value) is float:
+            cents = round(value * 100)
+            if cents / 100 != value:  # not a cent value, keep the float as is
+                raise _ColumnTypeError()
+            self.data.append(cents)
+        elif value == "":
+            self.data.append(_EMPTY_INT)
+        else:
+            raise _ColumnTypeError()
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def get(self, index):
+        value = self.data[index]
+        return "" if value == _EMPTY_INT else value / 100
+
+    def values(self) -> list:
+        return ["" if value == _EMPTY_INT else value / 100 for value in self.data]
+
+
+class _FloatColumn:
+    """
+    float values, "" is stored as NaN
+    """
+
+    __slots__ = ("data",)
+    KIND = "float64"
+
+    def __init__(self):
+        self.data = array("d")
+
+    def append(self, value):
+        if type(value) is float and not math.isnan(value):
+            self.data.append(value)
+        elif value == "":
+            self.data.append(math.nan)
+        else:
+            raise _ColumnTypeError()
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def get(self, index):
+        value = self.data[index]
+        return "" if value != value else value
+
+    def values(self) -> list:
+        return ["" if value != value else value for value in self.data]
+
+    def encode(self) -> (str, bytes):
+        return self.KIND, _array_to_bytes(self.data)
+
+    @classmethod
+    def decode(cls, kind: str, payload: bytes):
+        column = cls()
+        column.data = _array_from_bytes("d", payload)
+        return column
+
+
+class _DateColumn(_IntColumn):
+    """
+    "YYYYMMDD" dates stored as date ordinals, "" is stored as _EMPTY_INT
+    """
+
+    __slots__ = ("_ordinals", "_formatted")
+    KIND = "date64"
+
+    def __init__(self):
+        super().__init__()
+        # "YYYYMMDD" <-> ordinal, a BRQ only has a few distinct WC dates
+        self._ordinals = {}
+        self._formatted = {}
+
+    def append(self, value):
+        if type(value) is not str:
+            raise _ColumnTypeError()
+        ordinal = self._ordinals.get(value)
+        if ordinal is None:
+            ordinal = _DateColumn.__to_ordinal(value)
+            self._ordinals[value] = ordinal
+            self._formatted[ordinal] = value
+        self.data.append(ordinal)
+
+    @staticmethod
+    def __to_ordinal(value) -> int:
+        if value == "":
+            return _EMPTY_INT
+        if len(value) != 8 or not value.isdigit():
+            raise _ColumnTypeError()
+        try:
+            return date(int(value[:4]), int(value[4:6]), int(value[6:])).toordinal()
+        except ValueError:
+            raise _ColumnTypeError()
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def get(self, index):
+        value = self.data[index]
+        return "" if value == _EMPTY_INT else self._formatted[value]
+
+    def values(self) -> list:
+        formatted = self._formatted
+        return ["" if value == _EMPTY_INT else formatted[value] for value in self.data]
+
+    @classmethod
+    def decode(cls, kind: str, payload: bytes):
+        column = super().decode(kind, payload)
+        for ordinal in set(column.data):
+            if ordinal != _EMPTY_INT:
+                value = date.fromordinal(ordinal).strftime("%Y%m%d")
+                column._ordinals[value] = ordinal
+                column._formatted[ordinal] = value
+        return column
+
+
+class _ModifiersColumn(_ObjectColumn):
+    """
+    BookingModifiers lists, stored as tuples so the empty ones share the same object
+    """
+
+    __slots__ = ()
+
+    def append(self, value):
+        if type(value) is list:
+            self.data.append(tuple(sys.intern(code) for code in value))
+        else:
+            super().append(value)
+
+    def extend(self, values):
+        for value in values:
+            self.append(value)
+
+    def get(self, index):
+        value = self.data[index]
+        return list(value) if type(value) is tuple else value
+
+    def values(self) -> list:
+        return [list(value) if type(value) is tuple else value for value in self.data]
+
+    def encode(self) -> (str, bytes):
+        return "modifiers", _encode_dictionary(self.data)
+
+    @classmethod
+    def decode(cls, kind: str, payload: bytes):
+        distinct, codes = _decode_dictionary(payload)
+        distinct = [
+            tuple(sys.intern(code) for code in value) if type(value) is list else value
+            for value in distinct
+        ]
+        return cls(map(distinct.__getitem__, codes))
+
+
+def _new_column(field: str):
+    if field == "WCDate":
+        return _DateColumn()
+    if field in MONEY_FIELDS:
+        return _CentsColumn()
+    if field in INT_FIELDS:
+        return _IntColumn()
+    if field in FLOAT_FIELDS:
+        return _FloatColumn()
+    if field == "BookingModifiers":
+        return _ModifiersColumn()
+    return _ObjectColumn()
+
+
+_COLUMN_KINDS = {
+    "dictionary": _ObjectColumn,
+    "json": _ObjectColumn,
+    _IntColumn.KIND: _IntColumn,
+    _CentsColumn.KIND: _CentsColumn,
+    _FloatColumn.KIND: _FloatColumn,
+    _DateColumn.KIND: _DateColumn,
+    "modifiers": _ModifiersColumn,
+}
+
+
+def _build_column(field: str, values: list):
+    column = _new_column(field)
+    try:
+        column.extend(values)
+    except _ColumnTypeError:
+        column = _ObjectColumn()
+        column.extend(values)
+    return column
+
+
+class BRQDetailRow(Mapping):
+    """
+    Read-only view of one detail record, it behaves like the detail dictionary.
+    """
+
+    __slots__ = ("_details", "_index")
+
+    def __init__(self, details, index: int):
+        self._details = details
+        self._index = index
+
+    def __getitem__(self, field):
+        return self._details._columns[field].get(self._index)
+
+    def __iter__(self):
+        return iter(self._details.fields)
+
+    def __len__(self):
+        return len(self._details.fields)
+
+    def __repr__(self):
+        return f"BRQDetailRow({self.to_dict()!r})"
+
+    def to_dict(self) -> dict:
+        index = self._index
+        return {
+            field: column.get(index) for field, column in self._details._columns.items()
+        }
+
+
+class BRQDetails:
+    """
+    Columnar BRQ detail records, build it with BRQDetails.from_records(brq_object["details"]) or append the records
+    one by one while parsing.
+    """
+
+    __slots__ = ("fields", "_columns", "_size")
+
+    def __init__(self, fields=()):
+        self.fields = list(fields)
+        self._columns = {field: _new_column(field) for field in self.fields}
+        self._size = 0
+
+    @classmethod
+    def from_records(cls, records) -> "BRQDetails":
+        """
+        Build the columns from a list of detail records, column by column.
+        """
+        if not isinstance(records, list):
+            records = list(records)
+        if not records:
+            return cls()
+        details = cls(records[0].keys())
+        fields = details.fields
+        try:
+            # the rows as tuples (an itemgetter of one field would return the values themselves), transposed
+            columns = zip(
+                *[tuple(record[field] for field in fields) for record in records]
+            )
+        except KeyError:
+            columns = (
+                [record.get(field, "") for record in records]
+                for field in details.fields
+            )
+        for field, values in zip(details.fields, columns):
+            details._columns[field] = _build_column(field, list(values))
+        details._size = len(records)
+        return details
+
+    def append(self, record):
+        if not self.fields:
+            self.fields = list(record.keys())
+            self._columns = {field: _new_column(field) for field in self.fields}
+        for field, column in self._columns.items():
+            value = record.get(field, "")
+            try:
+                column.append(value)
+            except _ColumnTypeError:
+                column = _ObjectColumn(column.values())
+                column.append(value)
+                self._columns[field] = column
+        self._size += 1
+
+    @classmethod
+    def from_encoded(cls, encoded_columns: dict, size: int) -> "BRQDetails":
+        """
+        Build the details from the columns encoded with encode_column, {field: (kind, payload)}.
+        The fields can be a subset of the fields of the encoded details.
+        """
+        details = cls()
+        for field, (kind, payload) in encoded_columns.items():
+            if kind not in _COLUMN_KINDS:
+                raise ValueError(f"Unknown column kind '{kind}' for the field {field}.")
+            column = _COLUMN_KINDS[kind].decode(kind, payload)
+            if len(column.data) != size:
+                raise ValueError(
+                    f"Column {field} has {len(column.data)} values, expected {size}."
+                )
+            details.fields.append(field)
+            details._columns[field] = column
+        details._size = size
+        return details
+
+    def encode_column(self, field: str) -> (str, bytes):
+        """
+        (kind, payload) of one column, see from_encoded
+        """
+        return self._columns[field].encode()
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index: int) -> BRQDetailRow:
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("BRQDetails index out of range")
+        return BRQDetailRow(self, index)
+
+    def __iter__(self):
+        for index in range(self._size):
+            yield BRQDetailRow(self, index)
+
+    def column(self, field: str) -> list:
+        """
+        The values of one field in the row order, as they are in the detail records.
+        """
+        return self._columns[field].values()
+
+    def to_records(self) -> [dict]:
+        columns = [self._columns[field].values() for field in self.fields]
+        return [dict(zip(self.fields, row)) for row in zip(*columns)]
+
+    def sum(self, field: str) -> float:
+        """
+        Sum of a numeric field, the empty values are ignored.
+        The money fields are summed in cents, so the result has no float rounding error.
+        """
+        column = self._columns[field]
+        if type(column) is _CentsColumn:
+            return sum(value for value in column.data if value != _EMPTY_INT) / 100
+        if type(column) is _IntColumn:
+            return sum(value for value in column.data if value != _EMPTY_INT)
+        if type(column) is _FloatColumn:
+            return math.fsum(value for value in column.data if value == value)
+        return sum(float(value) for value in column.data if value != "")
+
+    def min_wc_date(self) -> date:
+        ordinals = self.__wc_date_ordinals()
+        return date.fromordinal(min(ordinals)) if ordinals else None
+
+    def max_wc_date(self) -> date:
+        ordinals = self.__wc_date_ordinals()
+        return date.fromordinal(max(ordinals)) if ordinals else None
+
+    def count_wc_dates_before(self, before: date) -> int:
+        """
+        Number of spots with a WC date before the given date, e.g. the spots in the past weeks
+        """
+        before_ordinal = before.toordinal()
+        return sum(
+            1 for ordinal in self.__wc_date_ordinals() if ordinal < before_ordinal
+        )
+
+    def count_by(self, field: str) -> dict:
+        """
+        {value: number of spots}, the keys are in the order of their first occurrence
+        """
+        return dict(Counter(self.column(field)))
+
+    def distinct(self, field: str) -> list:
+        """
+        The distinct values of a field, in the order of their first occurrence
+        """
+        return list(dict.fromkeys(self.column(field)))
+
+    def group_indexes_by(self, field: str) -> dict:
+        """
+        {value: [row indexes]}, the keys are in the order of their first occurrence
+        """
+        groups = {}
+        for index, value in enumerate(self.column(field)):
+            if value in groups:
+                groups[value].append(index)
+            else:
+                groups[value] = [index]
+        return groups
+
+    def count_missing_demo(self) -> int:
+        """
+        Number of spots without any of the four demographic codes
+        """
+        return sum(
+            1
+            for codes in zip(*[self._columns[field].data for field in DEMO_CODE_FIELDS])
+            if not any(codes)
+        )
+
+    def __wc_date_ordinals(self):
+        column = self._columns["WCDate"]
+        if type(column) is not _DateColumn or _EMPTY_INT in column.data:
+            raise ValueError("WCDate column contains invalid dates.")
+        return column.data
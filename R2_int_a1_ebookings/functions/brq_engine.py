@@ -0,0 +1,312 @@
+"""
+The BRQ parse engine shared by the BRQ file parser, the opportunity creation and the A1.2 Lambdas.
+
+The fixed-width layout of a BRQ file is defined once (BRQ_HEADER_LAYOUT and BRQ_DETAIL_LAYOUT).
+The consumers read the same fields with different value types, this is a BRQDialect:
+    - PARSER_DIALECT: the BRQParser (A1.2) types, e.g. the demographic thousands are float and empty numbers are 0
+    - EBOOKING_DIALECT: the types of the BRQ JSON in the temp bucket written by parse_brq_file,
+      e.g. the demographic thousands stay strings and empty values stay ""
+Both dialects are compiled to FixedWidthCodec once per process.
+"""
+
+from datetime import date, datetime
+from itertools import islice
+
+from functions.brq_codec import FixedWidthCodec
+from functions.brq_reader import (
+    DETAIL,
+    HEADER,
+    NARRATIVE,
+    read_brq_lines,
+    read_brq_records,
+)
+
+BRQ_HEADER_LENGTH = 418
+BRQ_DETAIL_MIN_LENGTH = 620
+
+BRQ_HEADER_LAYOUT = {
+    "GenerationDate": [0, 8],
+    "GenerationTime": [8, 12],
+    "NetworkId": [12, 18],
+    "NetworkName": [18, 58],
+    "AgencyId": [58, 64],
+    "AgencyName": [64, 104],
+    "BookingDetailRecordCounter": [104, 110],
+    "BookingTotalGrossValue": [110, 120],
+    "ProposedDetailRecordCounter": [120, 126],
+    "ProposedTotalGrossValue": [126, 136],
+    "NarrativeRecordCounter": [136, 138],
+    "NetworkDomainName": [138, 178],
+    "NetworkContactName": [178, 208],
+    "NetworkContactEmail": [208, 278],
+    "AgencyDomainName": [278, 318],
+    "AgencyContactName": [318, 348],
+    "AgencyContactEmail": [348, 418],
+}
+
+BRQ_DETAIL_LAYOUT = {
+    "ClientId": [0, 6],
+    "ClientName": [6, 46],
+    "ClientProductId": [46, 52],
+    "ClientProductName": [52, 92],
+    "StationId": [92, 98],
+    "StationName": [98, 138],
+    "UniqueNetworkProposedSpotId": [138, 158],
+    "UniqueNetworkPreviousSpotId": [158, 178],
+    "UniqueNetworkParentSpotId": [178, 198],
+    "UniqueAgencyProposedSpotId": [198, 218],
+    "UniqueAgencyPreviousSpotId": [218, 238],
+    "UniqueAgencyParentSpotId": [238, 258],
+    "WCDate": [258, 266],
+    "ProposedDay": [266, 273],
+    "ProposedStartEndTime": [273, 281],
+    "RequestedDay": [281, 288],
+    "RequestedTime": [288, 296],
+    "ProposedSize": [296, 304],
+    "ProposedGrossRate": [304, 314],
+    "ProposedNetRate": [314, 324],
+    "RequestedSize": [324, 332],
+    "RequestedGrossRate": [332, 342],
+    "RequestedNetRate": [342, 352],
+    "ProposedProgram": [352, 392],
+    "RequestedProgram": [392, 432],
+    "KeyNumber": [432, 452],
+    "MaterialInstruction": [452, 512],
+    "DemographicOneThousand": [512, 519],
+    "DemographicTwoThousand": [519, 526],
+    "DemographicThreeThousand": [526, 533],
+    "DemographicFourThousand": [533, 540],
+    "RecordType": [540, 542],
+    "RatingsOverrideFlag1": [542, 543],
+    "RatingsOverrideFlag2": [543, 544],
+    "RatingsOverrideFlag3": [544, 545],
+    "RatingsOverrideFlag4": [545, 546],
+    "DemographicCodeOne": [546, 561],
+    "DemographicOneTarp": [561, 564],
+    "DemographicCodeTwo": [564, 579],
+    "DemographicTwoTarp": [579, 582],
+    "DemographicCodeThree": [582, 597],
+    "DemographicThreeTarp": [597, 600],
+    "DemographicCodeFour": [600, 615],
+    "DemographicFourTarp": [615, 618],
+    "BookingModifiers": [618, None],
+}
+
+TARP_FIELDS = [
+    "DemographicOneTarp",
+    "DemographicTwoTarp",
+    "DemographicThreeTarp",
+    "DemographicFourTarp",
+]
+
+
+def convert_booking_modifiers(value: str) -> [str]:
+    """
+    "TPMDTA//" -> ["TP", "MD", "TA"]
+    """
+    if value:
+        str_value = value[:-2]  # remove the ending //
+        n = 2  # group by 2 characters
+        return [str_value[i : i + n] for i in range(0, len(str_value), n)]
+    else:
+        return []
+
+
+def _non_empty(converter):
+    """
+    EBOOKING_DIALECT keeps the empty values as "" instead of converting them
+    """
+    return lambda value: converter(value) if value != "" else value
+
+
+def _ebooking_int(value: str) -> int:
+    return int(value)
+
+
+def _ebooking_money(value: str) -> float:
+    return float(f"{value[:8].strip()}.{value[-2:].strip()}")
+
+
+def _ebooking_tarp(value: str) -> float:
+    return float(f"{value[:2].strip()}.{value[-1:].strip()}")
+
+
+class BRQDialect:
+    """
+    The value types of a BRQ layout, converters follow the FixedWidthCodec converter semantics
+    """
+
+    def __init__(self, name: str, header_converters: dict, detail_converters: dict):
+        self.name = name
+        self.header_slice_config = BRQDialect.__slice_config(
+            BRQ_HEADER_LAYOUT, header_converters
+        )
+        self.detail_slice_config = BRQDialect.__slice_config(
+            BRQ_DETAIL_LAYOUT, detail_converters
+        )
+        self.header_codec = FixedWidthCodec(self.header_slice_config)
+        self.detail_codec = FixedWidthCodec(self.detail_slice_config)
+
+    @staticmethod
+    def __slice_config(layout: dict, converters: dict) -> dict:
+        return {
+            field: (
+                [start, end, converters[field]] if field in converters else [start, end]
+            )
+            for field, (start, end) in layout.items()
+        }
+
+
+PARSER_DIALECT = BRQDialect(
+    "parser",
+    header_converters={
+        "BookingDetailRecordCounter": int,
+        "BookingTotalGrossValue": "money",
+        "ProposedDetailRecordCounter": int,
+        "ProposedTotalGrossValue": "money",
+        "NarrativeRecordCounter": int,
+    },
+    detail_converters={
+        "ProposedSize": int,
+        "ProposedGrossRate": "money",
+        "ProposedNetRate": "money",
+        "RequestedSize": int,
+        "RequestedGrossRate": "money",
+        "RequestedNetRate": "money",
+        "DemographicOneThousand": float,
+        "DemographicTwoThousand": float,
+        "DemographicThreeThousand": float,
+        "DemographicFourThousand": float,
+        **{field: "decimaltwoandone" for field in TARP_FIELDS},
+        "BookingModifiers": convert_booking_modifiers,
+    },
+)
+
+EBOOKING_DIALECT = BRQDialect(
+    "ebooking",
+    header_converters={
+        **{
+            field: _non_empty(_ebooking_int)
+            for field in [
+                "GenerationDate",
+                "GenerationTime",
+                "BookingDetailRecordCounter",
+                "ProposedDetailRecordCounter",
+                "NarrativeRecordCounter",
+            ]
+        },
+        "BookingTotalGrossValue": _non_empty(_ebooking_money),
+        "ProposedTotalGrossValue": _non_empty(_ebooking_money),
+    },
+    detail_converters={
+        **{
+            field: _non_empty(_ebooking_int)
+            for field in [
+                "ProposedStartEndTime",
+                "ProposedSize",
+                "ProposedGrossRate",
+                "ProposedNetRate",
+                "RequestedSize",
+            ]
+        },
+        "RequestedGrossRate": _non_empty(_ebooking_money),
+        "RequestedNetRate": _non_empty(_ebooking_money),
+        **{field: _non_empty(_ebooking_tarp) for field in TARP_FIELDS},
+        "BookingModifiers": _non_empty(convert_booking_modifiers),
+    },
+)
+
+
+def parse_brq(
+    source,
+    dialect: BRQDialect = EBOOKING_DIALECT,
+    strict: bool = False,
+    removed_before: date = None,
+    raw_lines: tuple = None,
+) -> dict:
+    """
+    Parse a BRQ file to {"header": {}, "narrativeRecords": [], "details": []}.
+    :param source: the BRQ content, see brq_reader.iter_source_lines (S3 StreamingBody, str or lines)
+    :param dialect: PARSER_DIALECT or EBOOKING_DIALECT
+    :param strict: when True the header must be 418 characters, the header NarrativeRecordCounter gives the
+        number of narrative lines and all other lines must be detail lines of 620+ characters ending with '//'.
+        Otherwise every line ending with '//' is a detail record and any other line a narrative record (stripped).
+    :param removed_before: when set, the detail records with a WCDate before this date are moved to "removedDetails"
+    :param raw_lines: optional (current_date_lines, other_date_lines) lists which are filled with the raw lines of the
+        BRQ files for the details and removedDetails (header and narratives are in both, each list ends with 'EOF//')
+    """
+    brq_object = {"header": {}, "narrativeRecords": [], "details": []}
+    if removed_before is not None:
+        brq_object["removedDetails"] = []
+
+    if strict:
+        records = _strict_records(source, dialect)
+    else:
+        records = read_brq_records(source)
+
+    decode_detail = dialect.detail_codec.decode
+    narratives = brq_object["narrativeRecords"]
+    details = brq_object["details"]
+    removed_details = brq_object.get("removedDetails")
+    removed_before_key = (
+        removed_before.strftime("%Y%m%d") if removed_before is not None else None
+    )
+    current_date_lines, other_date_lines = raw_lines if raw_lines else (None, None)
+
+    for record_type, line in records:
+        if record_type == DETAIL:
+            detail = decode_detail(line)
+            if removed_before_key is not None and _is_removed(
+                detail["WCDate"], removed_before_key
+            ):
+                removed_details.append(detail)
+                if raw_lines:
+                    other_date_lines.append(line)
+            else:
+                details.append(detail)
+                if raw_lines:
+                    current_date_lines.append(line)
+        elif record_type == HEADER:
+            brq_object["header"] = dialect.header_codec.decode(line)
+            if raw_lines:
+                current_date_lines.append(line)
+                other_date_lines.append(line)
+        else:
+            if not strict:
+                line = line.strip()
+            narratives.append(line)
+            if raw_lines:
+                current_date_lines.append(line)
+                other_date_lines.append(line)
+
+    if raw_lines:
+        current_date_lines.append("EOF//")
+        other_date_lines.append("EOF//")
+    return brq_object
+
+
+def _is_removed(wc_date: str, removed_before_key: str) -> bool:
+    datetime.strptime(wc_date, "%Y%m%d")  # raise ValueError for an invalid WCDate
+    return wc_date < removed_before_key
+
+
+def _strict_records(source, dialect: BRQDialect):
+    lines = read_brq_lines(source)
+    header_line = next(lines)
+    if len(header_line) != BRQ_HEADER_LENGTH:
+        raise Exception(f"Header line must be {BRQ_HEADER_LENGTH} character length.")
+    yield (HEADER, header_line)
+    narrative_counter = dialect.header_codec.decode(header_line)[
+        "NarrativeRecordCounter"
+    ]
+    if narrative_counter and narrative_counter > 0:
+        for line in islice(lines, narrative_counter):
+            yield (NARRATIVE, line)
+    for counter, line in enumerate(lines, start=1):
+        if len(line) < BRQ_DETAIL_MIN_LENGTH:
+            raise Exception(
+                f"Detail line #{counter} has less then {BRQ_DETAIL_MIN_LENGTH} characters."
+            )
+        if line[-2:] != "//":
+            raise Exception(f"Detail line #{counter} is not end with '//'.")
+        yield (DETAIL, line)
@@ -13,6 +13,12 @@ import time
 
 from functions.brq_file_parser.resolve_brq_file_name import resolve_brq_file_name
 from functions.common_utils import CommonUtils
+from functions.a1_2.DemoMap import DemoMap
+from functions.a1_2.SalesAreaMap import SalesAreaMap
+from functions.parameter_store import get_parameter, parameter_store
+from functions.sf_metadata_cache import query_salesforce_metadata
+from functions.brq_engine import EBOOKING_DIALECT, parse_brq
+from functions.validation_completion import validation_completion
 
 logger = logging.getLogger("a1_brq_parser_function")
 logger.setLevel(logging.INFO)
@@ -24,78 +30,9 @@ CEE_NOTIFICATION_ENGINE = os.environ["CEE_NOTIFICATION_ENGINE"]
 step_function = boto3_client("stepfunctions", region_name=AWS_REGION)
 lambda_client = boto3_client("lambda", region_name=AWS_REGION)
 step_function = boto3_client("stepfunctions", region_name=AWS_REGION)
-
-
-brq_header_slice_config = {
-    "GenerationDate": [0, 8],
-    "GenerationTime": [8, 12],
-    "NetworkId": [12, 18],
-    "NetworkName": [18, 58],
-    "AgencyId": [58, 64],
-    "AgencyName": [64, 104],
-    "BookingDetailRecordCounter": [104, 110],
-    "BookingTotalGrossValue": [110, 120],
-    "ProposedDetailRecordCounter": [120, 126],
-    "ProposedTotalGrossValue": [126, 136],
-    "NarrativeRecordCounter": [136, 138],
-    "NetworkDomainName": [138, 178],
-    "NetworkContactName": [178, 208],
-    "NetworkContactEmail": [208, 278],
-    "AgencyDomainName": [278, 318],
-    "AgencyContactName": [318, 348],
-    "AgencyContactEmail": [348, 418],
-}
-
-brq_detail_records_slice_config = {
-    "ClientId": [0, 6],
-    "ClientName": [6, 46],
-    "ClientProductId": [46, 52],
-    "ClientProductName": [52, 92],
-    "StationId": [92, 98],
-    "StationName": [98, 138],
-    "UniqueNetworkProposedSpotId": [138, 158],
-    "UniqueNetworkPreviousSpotId": [158, 178],
-    "UniqueNetworkParentSpotId": [178, 198],
-    "UniqueAgencyProposedSpotId": [198, 218],
-    "UniqueAgencyPreviousSpotId": [218, 238],
-    "UniqueAgencyParentSpotId": [238, 258],
-    "WCDate": [258, 266],
-    "ProposedDay": [266, 273],
-    "ProposedStartEndTime": [273, 281],
-    "RequestedDay": [281, 288],
-    "RequestedTime": [288, 296],
-    "ProposedSize": [296, 304, int],
-    "ProposedGrossRate": [304, 314],
-    "ProposedNetRate": [314, 324],
-    "RequestedSize": [324, 332, int],
-    "RequestedGrossRate": [
-        332,
-        342,
-    ],
-    "RequestedNetRate": [342, 352],
-    "ProposedProgram": [352, 392],
-    "RequestedProgram": [392, 432],
-    "KeyNumber": [432, 452],
-    "MaterialInstruction": [452, 512],
-    "DemographicOneThousand": [512, 519],
-    "DemographicTwoThousand": [519, 526],
-    "DemographicThreeThousand": [526, 533],
-    "DemographicFourThousand": [533, 540],
-    "RecordType": [540, 542],
-    "RatingsOverrideFlag1": [542, 543],
-    "RatingsOverrideFlag2": [543, 544],
-    "RatingsOverrideFlag3": [544, 545],
-    "RatingsOverrideFlag4": [545, 546],
-    "DemographicCodeOne": [546, 561],
-    "DemographicOneTarp": [561, 564],
-    "DemographicCodeTwo": [564, 579],
-    "DemographicTwoTarp": [579, 582],
-    "DemographicCodeThree": [582, 597],
-    "DemographicThreeTarp": [597, 600],
-    "DemographicCodeFour": [600, 615],
-    "DemographicFourTarp": [615, 618],
-    "BookingModifiers": [618, None],
-}
+parameter_store.declare(
+    os.environ.get("SF_PARENT_RECORD_TYPE_NAME"), os.environ.get("SF_RECORD_TYPE_NAME")
+)
 
 
 def push_file_via_s3_link_api(opportunity_id, s3_obj):
@@ -122,59 +59,67 @@ def push_file_via_s3_link_api(opportunity_id, s3_obj):
 def get_ssm_parameter(parameter_name: str) -> str:
     """Function to retrive AWS SSM parameters"""
     try:
-        ssm = boto3.client("ssm")
-        response = ssm.get_parameter(Name=parameter_name, WithDecryption=True)
-        return response["Parameter"]["Value"]
+        return get_parameter(parameter_name)
     except Exception as e:
         raise RuntimeError(f"Error retrieving parameter '{parameter_name}': {e}") from e
 
 
-def get_csv_data(file_name):
+def get_demo_map():
     """
-    Function to read the csv data from config bucket
+    Function to read the Demo Mapping csv from config bucket, indexed by Numeric Identifier and SMD Code
     """
+    file_name = os.environ["SEIL_DEMO_MAPPING_FILE"]
     seil_config_bucket_name = os.environ["SEIL_CONFIG_BUCKET_NAME"]
     try:
-        s3 = boto3.client("s3")
-        s3_object = s3.get_object(Bucket=seil_config_bucket_name, Key=file_name)
-        data = s3_object["Body"].read().decode("utf-8-sig").splitlines()
-        csv_records = csv.DictReader(data)
-        csv_data = list(csv_records)
-        return csv_data
+        return DemoMap(demo_path=f"s3://{seil_config_bucket_name}/{file_name}")
     except Exception as e:
         raise RuntimeError(
             f"Error retrieving CSV data from file: {file_name}: {e}"
         ) from e
 
 
-def construct_sales_area_details(csv_data, parent_sales_area_no):
+def get_sales_area_map():
+    """
+    Function to read the Sales Area Mapping csv from config bucket, indexed by BCC and sales area numbers
+    """
+    file_name = os.environ["SEIL_SALES_AREA_MAPPING_FILE"]
+    seil_config_bucket_name = os.environ["SEIL_CONFIG_BUCKET_NAME"]
+    try:
+        return SalesAreaMap(
+            sales_area_path=f"s3://{seil_config_bucket_name}/{file_name}"
+        )
+    except Exception as e:
+        raise RuntimeError(
+            f"Error retrieving CSV data from file: {file_name}: {e}"
+        ) from e
+
+
+def construct_sales_area_details(sales_area_map, parent_sales_area_no):
     """
     Function to contruct sales area details based on parent sales area number
     """
     try:
         sales_area_details_obj = []
         count = 0
-        for sub in csv_data:
-            if sub["parentSalesAreanumber"] == parent_sales_area_no:
-                res_data = sub
-                if count == 0:
-                    sales_area_details_obj.append(
-                        {
-                            "salesAreaNumber": res_data.get("salesAreaNumber"),
-                            "isExcluded": False,
-                            "percentageSplit": 100,
-                            "spotsPercentage": 100,
-                        }
-                    )
-                else:
-                    sales_area_details_obj.append(
-                        {
-                            "salesAreaNumber": res_data.get("salesAreaNumber"),
-                            "isExcluded": False,
-                            "percentageSplit": 0,
-                        }
-                    )
-                count += 1
+        for res_data in sales_area_map.get_children(parent_sales_area_no):
+            if count == 0:
+                sales_area_details_obj.append(
+                    {
+                        "salesAreaNumber": res_data.get("salesAreaNumber"),
+                        "isExcluded": False,
+                        "percentageSplit": 100,
+                        "spotsPercentage": 100,
+                    }
+                )
+            else:
+                sales_area_details_obj.append(
+                    {
+                        "salesAreaNumber": res_data.get("salesAreaNumber"),
+                        "isExcluded": False,
+                        "percentageSplit": 0,
+                    }
+                )
+            count += 1
         logger.info(f"Mapped Sales area details: {sales_area_details_obj}")
         return sales_area_details_obj
     except Exception as e:
@@ -188,17 +133,13 @@ def get_sales_area_details(station_code):
     try:
         sales_area_no = ""
         sales_area_details = ""
-        count = 0
-        csv_data = get_csv_data(os.environ["SEIL_SALES_AREA_MAPPING_FILE"])
-        for sub in csv_data:
-            if sub["BCC"] == station_code:
-                res_data = sub
-                count += 1
-        if count != 0:
+        sales_area_map = get_sales_area_map()
+        res_data = sales_area_map.get_by_bcc(station_code)
+        if res_data is not None:
             sales_area_no = res_data.get("salesAreaNumber")
             parent_sales_area_no = res_data.get("parentSalesAreanumber")
             sales_area_details = construct_sales_area_details(
-                csv_data, parent_sales_area_no
+                sales_area_map, parent_sales_area_no
             )
         return int(parent_sales_area_no), json.dumps(sales_area_details)
     except Exception as e:
@@ -209,24 +150,13 @@ def get_demo_details(demo_code_one):
     """Function to retrive demographic trading information from CSV"""
     try:
         message = []
-        demo_mapping = ""
-        comparing_attribute = ""
-        count = 0
-        csv_data = get_csv_data(os.environ["SEIL_DEMO_MAPPING_FILE"])
+        demo_map = get_demo_map()
         logger.info(demo_code_one)
-        demo_code_one = list(demo_code_one)
-        most_frequent_demo = max(set(demo_code_one), key=demo_code_one.count)
+        most_frequent_demo = DemoMap.most_frequent(demo_code_one)
         logger.info(f"most_frequent_demo: {most_frequent_demo}")
         demo_code_one = most_frequent_demo
-        if demo_code_one and demo_code_one.isdigit():
-            comparing_attribute = "Numeric Identifier"
-        else:
-            comparing_attribute = "SMD Code"
-        for sub in csv_data:
-            if sub[comparing_attribute] == demo_code_one:
-                res_data = sub
-                count += 1
-        if count < 1:
+        res_data = demo_map.lookup(demo_code_one)
+        if res_data is None:
             message.append(f"BRQ Demo [{demo_code_one}] is not a SWM Trading Demo")
             logger.info(f"No demographic details found for '{demo_code_one}'")
             demo_name = ""
@@ -282,12 +212,9 @@ def get_sf_recordtype_id(opp_relationship):
         "query": f"SELECT+Id+from+RecordType+WHERE+DeveloperName+='{recordtype_name}'+AND+SobjectType+='Opportunity'+LIMIT+1",
     }
     try:
-        invoke_response = lambda_client.invoke(
-            FunctionName=ARN_SF_ADAPTOR,
-            InvocationType="RequestResponse",
-            Payload=json.dumps(payload),
+        downstream_response = query_salesforce_metadata(
+            lambda_client, ARN_SF_ADAPTOR, payload["query"]
         )
-        downstream_response = json.loads(invoke_response["Payload"].read())
         downstream_response = downstream_response["records"][0]["Id"]
         logger.info(downstream_response)
         return downstream_response
@@ -315,61 +242,14 @@ def receive_brq_time(key):
     return receive_date
 
 
-def santize_brq_line_data(key, line_data):
-    if line_data != "":
-        if key in [
-            "GenerationDate",
-            "GenerationTime",
-            "BookingDetailRecordCounter",
-            "ProposedDetailRecordCounter",
-            "NarrativeRecordCounter",
-            "ProposedStartEndTime",
-            "RequestedTime",
-            "ProposedSize",
-            "ProposedGrossRate",
-            "ProposedNetRate",
-            "RequestedSize",
-        ]:
-            return int(line_data)
-        if key in [
-            "BookingTotalGrossValue",
-            "ProposedTotalGrossValue",
-            "RequestedGrossRate",
-            "RequestedNetRate",
-        ]:
-            integer = line_data[:8].strip()
-            decimal = line_data[-2:].strip()
-            return float(f"{integer}.{decimal}")
-        if key in [
-            "DemographicOneTarp",
-            "DemographicTwoTarp",
-            "DemographicThreeTarp",
-            "DemographicFourTarp",
-        ]:
-            integer = line_data[:2].strip()
-            decimal = line_data[-1:].strip()
-            return float(f"{integer}.{decimal}")
-        if key in [
-            "BookingModifiers",
-        ]:
-            if line_data:
-                str_value = line_data[:-2]  # remove the ending //
-                n = 2  # group by 2 characters
-                return [str_value[i : i + n] for i in range(0, len(str_value), n)]
-            else:
-                return []
-    return line_data
-
 
 def prepare_brq_json(brq_file_name_list, brq_type="", ignore_list=[]):
     brq_object_wrapper = {"header": {}, "narrativeRecords": [], "details": []}
-    detail_records = {}
     s3 = boto3.resource("s3")
     bucket = s3.Bucket(os.environ["EBOOKINGS_S3_TEMP_BUCKET"])
     logger.info(f"Working File:{brq_file_name_list}")
     brq_file_name = ""
     booking_request_id = ""
-    line_data = ""
     from_email = ""
     pdf_attached = "No"
     logger.info("BRQ file parsing started")
@@ -381,51 +261,10 @@ def prepare_brq_json(brq_file_name_list, brq_type="", ignore_list=[]):
                 (from_email, booking_request_id, brq_file_name) = resolve_brq_file_name(
                     brq_file_name, brq_type
                 )
-                line_count = 0
-                for line in obj.get()["Body"].read().decode("utf-8").splitlines():
-                    if line_count < 1:
-                        for key in brq_header_slice_config:
-                            brq_object_wrapper["header"][key] = santize_brq_line_data(
-                                key,
-                                line[
-                                    brq_header_slice_config[key][
-                                        0
-                                    ] : brq_header_slice_config[key][1]
-                                ].strip(),
-                            )
-                    else:
-                        if line[0:6].strip() != "EOF//":
-                            if line[-2:] == "//":
-                                for key in brq_detail_records_slice_config:
-                                    if brq_detail_records_slice_config[key][1] == None:
-                                        detail_records[key] = santize_brq_line_data(
-                                            key,
-                                            line[
-                                                brq_detail_records_slice_config[key][
-                                                    0
-                                                ] :
-                                            ].strip(),
-                                        )
-                                    else:
-                                        detail_records[key] = santize_brq_line_data(
-                                            key,
-                                            line[
-                                                brq_detail_records_slice_config[key][
-                                                    0
-                                                ] : brq_detail_records_slice_config[
-                                                    key
-                                                ][
-                                                    1
-                                                ]
-                                            ].strip(),
-                                        )
-                                brq_object_wrapper["details"].append(detail_records)
-                                detail_records = {}
-                            else:
-                                line_data = line.strip()
-                                brq_object_wrapper["narrativeRecords"].append(line_data)
-                                line_data = ""
-                    line_count += 1
+                brq_object = parse_brq(obj.get()["Body"], EBOOKING_DIALECT)
+                brq_object_wrapper["header"] = brq_object["header"]
+                for key in ["narrativeRecords", "details"]:
+                    brq_object_wrapper[key].extend(brq_object[key])
             else:
                 if obj.key.endswith(".pdf"):
                     logger.info(f"Working PDF File:{obj.key}")
@@ -478,19 +317,14 @@ def get_client_type(client_id):
         return False
 
 
-def get_geo_data(station_code):
+def get_geo_data(station_code, sales_area_map):
     """
     Function to retrive geography information from CSV
     """
     try:
         geo = ""
-        count = 0
-        csv_data = get_csv_data(os.environ["SEIL_SALES_AREA_MAPPING_FILE"])
-        for sub in csv_data:
-            if sub["BCC"] == station_code:
-                res_data = sub
-                count += 1
-        if count != 0:
+        res_data = sales_area_map.get_by_bcc(station_code)
+        if res_data is not None:
             geo = res_data.get("Geography")
         return geo
     except Exception as e:
@@ -513,6 +347,7 @@ def get_detail_records_summary(detail_records):
     geo_data = ""
     overall_budget = 0
     overall_spot_count = 0
+    sales_area_map = get_sales_area_map()
     for index, elem in enumerate(detail_records):
         dateTimeObj = datetime.strptime(elem["WCDate"], "%Y%m%d")
         wc_dates.append(dateTimeObj.date())
@@ -527,7 +362,7 @@ def get_detail_records_summary(detail_records):
                 str(elem["DemographicCodeFour"]),
             ]
         )
-        geo = get_geo_data(elem["StationId"])
+        geo = get_geo_data(elem["StationId"], sales_area_map)
         if geo != "" and geo not in geo_list:
             geo_list.append(geo)
         overall_spot_count += 1
@@ -781,6 +616,9 @@ def get_brq_validation_response(
         "lmkProductResponse": {},
         "correlationID": "32rh32fh239fdj2390jd20j20",  # ToDo - fetch the actual correlationId from the context.
         "otherFiles": [],
+        "validationEngineMode": os.environ.get(
+            "VALIDATION_ENGINE_MODE", "state-machine"
+        ),
         "validationResult": {
             "result": "",
             "createOrUpdate": "",
@@ -788,43 +626,12 @@ def get_brq_validation_response(
             "details": [],
         },
     }
-    try:
-        invoke_response = step_function.start_execution(
-            stateMachineArn=ARN_VALIDATION_ENGINE,
-            input=json.dumps(event_data),
-        )
-    except Exception as e:
-        # https://aws.amazon.com/premiumsupport/knowledge-center/lambda-troubleshoot-invoke-error-502-500/
-        # Lambda function is not ready. Retry to see if it works.
-        if "CodeArtifactUserPendingException" in str(e):
-            logger.exception(
-                f"Caught CodeArtifactUserPendingException. This is Attempt."
-            )
-        else:
-            raise  # rethrow the exception if it's not CodeArtifactUserPendingException
-    logger.info(f" validation engine invoke response: {invoke_response}")
-    max_retries = 15
-    retry_interval = 60
-    for attempt in range(max_retries):
-        try:
-            describe_response = step_function.describe_execution(
-                executionArn=invoke_response["executionArn"]
-            )
-            logger.info(f" validation engine describe_response: {describe_response}")
-            describe_response = describe_response
-            if "output" not in describe_response:
-                raise ValueError("No OUTPUT from Statemachine")
-            return describe_response
-        except Exception as e:
-            logger.info(
-                f"Attempt - {attempt}, No OUTPUT from Statemachine, Still processing..."
-            )
-            if attempt < max_retries - 1:
-                logger.info(f"Retrying in {retry_interval} seconds...")
-                time.sleep(retry_interval)
-            else:
-                logger.info("Maximum retry attempts reached. Exiting.")
-                raise
+    # returns once the execution has ended, see validation_completion for the modes
+    validation_response = validation_completion(
+        ARN_VALIDATION_ENGINE, step_function
+    ).run(event_data)
+    logger.info(f" validation engine response: {validation_response}")
+    return validation_response
 
 
 # def retry_statemachine_invocation(function, max_retries=15, retry_interval=60, *args):
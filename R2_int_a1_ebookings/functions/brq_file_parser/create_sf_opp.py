@@ -9,11 +9,21 @@ import boto3
 from datetime import datetime, timedelta
 from boto3 import client as boto3_client
 from collections import Counter
-import time
 
 from swm_logger.swm_common_logger import LambdaLogger
 from functions.brq_file_parser.resolve_brq_file_name import resolve_brq_file_name
 from functions.common_utils import CommonUtils
+from functions.a1_2.DemoMap import DemoMap
+from functions.a1_2.SalesAreaMap import SalesAreaMap
+from functions.parameter_store import get_parameter, parameter_store
+from functions.brq_details import BRQDetails, DEMO_CODE_FIELDS
+from functions.brq_sidecar import load_brq_object
+from functions.brq_engine import EBOOKING_DIALECT, parse_brq
+from functions.account_resolver import (
+    AccountResolver,
+    find_accounts,
+    find_accounts_by_landmark_id,
+)
 
 custom_logger = LambdaLogger(log_group_name=os.environ["LOG_GROUP_NAME"])
 
@@ -24,123 +34,10 @@ CEE_NOTIFICATION_ENGINE = os.environ["CEE_NOTIFICATION_ENGINE"]
 step_function = boto3_client("stepfunctions", region_name=AWS_REGION)
 lambda_client = boto3_client("lambda", region_name=AWS_REGION)
 step_function = boto3_client("stepfunctions", region_name=AWS_REGION)
-
-brq_header_slice_config = {
-    "GenerationDate": [0, 8],
-    "GenerationTime": [8, 12],
-    "NetworkId": [12, 18],
-    "NetworkName": [18, 58],
-    "AgencyId": [58, 64],
-    "AgencyName": [64, 104],
-    "BookingDetailRecordCounter": [104, 110],
-    "BookingTotalGrossValue": [110, 120],
-    "ProposedDetailRecordCounter": [120, 126],
-    "ProposedTotalGrossValue": [126, 136],
-    "NarrativeRecordCounter": [136, 138],
-    "NetworkDomainName": [138, 178],
-    "NetworkContactName": [178, 208],
-    "NetworkContactEmail": [208, 278],
-    "AgencyDomainName": [278, 318],
-    "AgencyContactName": [318, 348],
-    "AgencyContactEmail": [348, 418],
-}
-
-brq_detail_records_slice_config = {
-    "ClientId": [0, 6],
-    "ClientName": [6, 46],
-    "ClientProductId": [46, 52],
-    "ClientProductName": [52, 92],
-    "StationId": [92, 98],
-    "StationName": [98, 138],
-    "UniqueNetworkProposedSpotId": [138, 158],
-    "UniqueNetworkPreviousSpotId": [158, 178],
-    "UniqueNetworkParentSpotId": [178, 198],
-    "UniqueAgencyProposedSpotId": [198, 218],
-    "UniqueAgencyPreviousSpotId": [218, 238],
-    "UniqueAgencyParentSpotId": [238, 258],
-    "WCDate": [258, 266],
-    "ProposedDay": [266, 273],
-    "ProposedStartEndTime": [273, 281],
-    "RequestedDay": [281, 288],
-    "RequestedTime": [288, 296],
-    "ProposedSize": [296, 304, int],
-    "ProposedGrossRate": [304, 314],
-    "ProposedNetRate": [314, 324],
-    "RequestedSize": [324, 332, int],
-    "RequestedGrossRate": [
-        332,
-        342,
-    ],
-    "RequestedNetRate": [342, 352],
-    "ProposedProgram": [352, 392],
-    "RequestedProgram": [392, 432],
-    "KeyNumber": [432, 452],
-    "MaterialInstruction": [452, 512],
-    "DemographicOneThousand": [512, 519],
-    "DemographicTwoThousand": [519, 526],
-    "DemographicThreeThousand": [526, 533],
-    "DemographicFourThousand": [533, 540],
-    "RecordType": [540, 542],
-    "RatingsOverrideFlag1": [542, 543],
-    "RatingsOverrideFlag2": [543, 544],
-    "RatingsOverrideFlag3": [544, 545],
-    "RatingsOverrideFlag4": [545, 546],
-    "DemographicCodeOne": [546, 561],
-    "DemographicOneTarp": [561, 564],
-    "DemographicCodeTwo": [564, 579],
-    "DemographicTwoTarp": [579, 582],
-    "DemographicCodeThree": [582, 597],
-    "DemographicThreeTarp": [597, 600],
-    "DemographicCodeFour": [600, 615],
-    "DemographicFourTarp": [615, 618],
-    "BookingModifiers": [618, None],
-}
-
-
-def santize_brq_line_data(key, line_data):
-    if line_data != "":
-        if key in [
-            "GenerationDate",
-            "GenerationTime",
-            "BookingDetailRecordCounter",
-            "ProposedDetailRecordCounter",
-            "NarrativeRecordCounter",
-            "ProposedStartEndTime",
-            "RequestedTime",
-            "ProposedSize",
-            "ProposedGrossRate",
-            "ProposedNetRate",
-            "RequestedSize",
-        ]:
-            return int(line_data)
-        if key in [
-            "BookingTotalGrossValue",
-            "ProposedTotalGrossValue",
-            "RequestedGrossRate",
-            "RequestedNetRate",
-        ]:
-            integer = line_data[:8].strip()
-            decimal = line_data[-2:].strip()
-            return float(f"{integer}.{decimal}")
-        if key in [
-            "DemographicOneTarp",
-            "DemographicTwoTarp",
-            "DemographicThreeTarp",
-            "DemographicFourTarp",
-        ]:
-            integer = line_data[:2].strip()
-            decimal = line_data[-1:].strip()
-            return float(f"{integer}.{decimal}")
-        if key in [
-            "BookingModifiers",
-        ]:
-            if line_data:
-                str_value = line_data[:-2]  # remove the ending //
-                n = 2  # group by 2 characters
-                return [str_value[i : i + n] for i in range(0, len(str_value), n)]
-            else:
-                return []
-    return line_data
+parameter_store.declare(
+    os.environ.get("SF_PARENT_RECORD_TYPE_NAME"), os.environ.get("SF_RECORD_TYPE_NAME")
+)
+account_resolver = AccountResolver(lambda_client, ARN_SF_ADAPTOR)
 
 
 def receive_brq_time(key):
@@ -152,52 +49,62 @@ def receive_brq_time(key):
     return receive_date
 
 
-def get_csv_data(file_name):
+def get_demo_map():
     """
-    Function to read the csv data from config bucket
+    Function to read the Demo Mapping csv from config bucket, indexed by Numeric Identifier and SMD Code
     """
+    file_name = os.environ["SEIL_DEMO_MAPPING_FILE"]
     seil_config_bucket_name = os.environ["SEIL_CONFIG_BUCKET_NAME"]
     try:
-        s3 = boto3.client("s3")
-        s3_object = s3.get_object(Bucket=seil_config_bucket_name, Key=file_name)
-        data = s3_object["Body"].read().decode("utf-8-sig").splitlines()
-        csv_records = csv.DictReader(data)
-        csv_data = list(csv_records)
-        return csv_data
+        return DemoMap(demo_path=f"s3://{seil_config_bucket_name}/{file_name}")
     except Exception as e:
         raise RuntimeError(
             f"Error retrieving CSV data from file: {file_name}: {e}"
         ) from e
 
 
-def construct_sales_area_details(csv_data, parent_sales_area_no):
+def get_sales_area_map():
+    """
+    Function to read the Sales Area Mapping csv from config bucket, indexed by BCC and sales area numbers
+    """
+    file_name = os.environ["SEIL_SALES_AREA_MAPPING_FILE"]
+    seil_config_bucket_name = os.environ["SEIL_CONFIG_BUCKET_NAME"]
+    try:
+        return SalesAreaMap(
+            sales_area_path=f"s3://{seil_config_bucket_name}/{file_name}"
+        )
+    except Exception as e:
+        raise RuntimeError(
+            f"Error retrieving CSV data from file: {file_name}: {e}"
+        ) from e
+
+
+def construct_sales_area_details(sales_area_map, parent_sales_area_no):
     """
     Function to contruct sales area details based on parent sales area number
     """
     try:
         sales_area_details_obj = []
         count = 0
-        for sub in csv_data:
-            if sub["parentSalesAreanumber"] == parent_sales_area_no:
-                res_data = sub
-                if count == 0:
-                    sales_area_details_obj.append(
-                        {
-                            "salesAreaNumber": res_data.get("salesAreaNumber"),
-                            "isExcluded": False,
-                            "percentageSplit": 100,
-                            "spotsPercentage": 100,
-                        }
-                    )
-                else:
-                    sales_area_details_obj.append(
-                        {
-                            "salesAreaNumber": res_data.get("salesAreaNumber"),
-                            "isExcluded": False,
-                            "percentageSplit": 0,
-                        }
-                    )
-                count += 1
+        for res_data in sales_area_map.get_children(parent_sales_area_no):
+            if count == 0:
+                sales_area_details_obj.append(
+                    {
+                        "salesAreaNumber": res_data.get("salesAreaNumber"),
+                        "isExcluded": False,
+                        "percentageSplit": 100,
+                        "spotsPercentage": 100,
+                    }
+                )
+            else:
+                sales_area_details_obj.append(
+                    {
+                        "salesAreaNumber": res_data.get("salesAreaNumber"),
+                        "isExcluded": False,
+                        "percentageSplit": 0,
+                    }
+                )
+            count += 1
         custom_logger.info(f"Mapped Sales area details: {sales_area_details_obj}")
         return sales_area_details_obj
     except Exception as e:
@@ -208,24 +115,13 @@ def get_demo_details(demo_code_one):
     """Function to retrive demographic trading information from CSV"""
     try:
         message = []
-        demo_mapping = ""
-        comparing_attribute = ""
-        count = 0
-        csv_data = get_csv_data(os.environ["SEIL_DEMO_MAPPING_FILE"])
+        demo_map = get_demo_map()
         custom_logger.info(demo_code_one)
-        demo_code_one = list(demo_code_one)
-        most_frequent_demo = max(set(demo_code_one), key=demo_code_one.count)
+        most_frequent_demo = DemoMap.most_frequent(demo_code_one)
         custom_logger.info(f"most_frequent_demo: {most_frequent_demo}")
         demo_code_one = most_frequent_demo
-        if demo_code_one and demo_code_one.isdigit():
-            comparing_attribute = "Numeric Identifier"
-        else:
-            comparing_attribute = "SMD Code"
-        for sub in csv_data:
-            if sub[comparing_attribute] == demo_code_one:
-                res_data = sub
-                count += 1
-        if count < 1:
+        res_data = demo_map.lookup(demo_code_one)
+        if res_data is None:
             message.append(f"BRQ Demo [{demo_code_one}] is not a SWM Trading Demo")
             custom_logger.info(f"No demographic details found for '{demo_code_one}'")
             demo_name = ""
@@ -251,19 +147,21 @@ def get_demo_details(demo_code_one):
         custom_logger.info(f"Error returning demographic details: {e}")
 
 
-def get_client_type(client_id, agency_id):
+def get_client_type(client_id, agency_id, sf_accounts=None):
     client_type = ""
     payload = {
         "invocationType": "QUERY",
         "query": f"SELECT+Name,+Id,+Type+from+Account+WHERE+SWM_External_Account_ID__c+='{client_id}'",
     }
     try:
-        invoke_response = lambda_client.invoke(
-            FunctionName=ARN_SF_ADAPTOR,
-            InvocationType="RequestResponse",
-            Payload=json.dumps(payload),
-        )
-        downstream_response = json.loads(invoke_response["Payload"].read())
+        downstream_response = find_accounts(sf_accounts, client_id)
+        if downstream_response is None:
+            invoke_response = lambda_client.invoke(
+                FunctionName=ARN_SF_ADAPTOR,
+                InvocationType="RequestResponse",
+                Payload=json.dumps(payload),
+            )
+            downstream_response = json.loads(invoke_response["Payload"].read())
         type = downstream_response["records"][0]["Type"]
         if type == "Direct Client":
             client_type = "Direct Client"
@@ -281,18 +179,20 @@ def get_client_type(client_id, agency_id):
         return False
 
 
-def get_sf_account_id(agency_id):
+def get_sf_account_id(agency_id, sf_accounts=None):
     payload = {
         "invocationType": "QUERY",
         "query": f"SELECT+Id,+Name+from+Account+WHERE+SWM_External_Account_ID__c+='{agency_id}'+OR+SWM_Additional_External_Ids__c+='{agency_id}'+OR+SWM_Additional_External_Ids__c+LIKE+'{agency_id};%'+OR+SWM_Additional_External_Ids__c+LIKE+'%;{agency_id};%'+OR+SWM_Additional_External_Ids__c+LIKE+'%;{agency_id}'",
     }
     try:
-        invoke_response = lambda_client.invoke(
-            FunctionName=ARN_SF_ADAPTOR,
-            InvocationType="RequestResponse",
-            Payload=json.dumps(payload),
-        )
-        downstream_response = json.loads(invoke_response["Payload"].read())
+        downstream_response = find_accounts(sf_accounts, agency_id, additional_ids=True)
+        if downstream_response is None:
+            invoke_response = lambda_client.invoke(
+                FunctionName=ARN_SF_ADAPTOR,
+                InvocationType="RequestResponse",
+                Payload=json.dumps(payload),
+            )
+            downstream_response = json.loads(invoke_response["Payload"].read())
         downstream_response = downstream_response["records"][0]["Id"]
         custom_logger.info(downstream_response)
         return downstream_response
@@ -310,30 +210,26 @@ def get_brq_campaign_type(client_type):
 def get_ssm_parameter(parameter_name: str) -> str:
     """Function to retrive AWS SSM parameters"""
     try:
-        ssm = boto3.client("ssm")
-        response = ssm.get_parameter(Name=parameter_name, WithDecryption=True)
-        return response["Parameter"]["Value"]
+        return get_parameter(parameter_name)
     except Exception as e:
         raise RuntimeError(f"Error retrieving parameter '{parameter_name}': {e}") from e
 
 
 def get_sf_recordtype_id(opp_relationship):
+    """
+    The Id of the Opportunity record type of the relationship. The parent and the child record types are
+    queried together, the response is cached (see sf_metadata_cache).
+    """
+    parent_recordtype_name = get_ssm_parameter(os.environ["SF_PARENT_RECORD_TYPE_NAME"])
+    child_recordtype_name = get_ssm_parameter(os.environ["SF_RECORD_TYPE_NAME"])
     if opp_relationship == "PARENT":
-        recordtype_name = get_ssm_parameter(os.environ["SF_PARENT_RECORD_TYPE_NAME"])
+        recordtype_name = parent_recordtype_name
     else:
-        recordtype_name = get_ssm_parameter(os.environ["SF_RECORD_TYPE_NAME"])
-    payload = {
-        "invocationType": "QUERY",
-        "query": f"SELECT+Id+from+RecordType+WHERE+DeveloperName+='{recordtype_name}'+AND+SobjectType+='Opportunity'+LIMIT+1",
-    }
+        recordtype_name = child_recordtype_name
     try:
-        invoke_response = lambda_client.invoke(
-            FunctionName=ARN_SF_ADAPTOR,
-            InvocationType="RequestResponse",
-            Payload=json.dumps(payload),
-        )
-        downstream_response = json.loads(invoke_response["Payload"].read())
-        downstream_response = downstream_response["records"][0]["Id"]
+        downstream_response = account_resolver.resolve_record_types(
+            [parent_recordtype_name, child_recordtype_name], "Opportunity"
+        )[recordtype_name]
         custom_logger.info(downstream_response)
         return downstream_response
     except Exception as e:
@@ -341,7 +237,29 @@ def get_sf_recordtype_id(opp_relationship):
         return False
 
 
-def get_sf_buying_agency_id(validation_response):
+def resolve_sf_accounts(brq_json_data, validation_response):
+    """
+    The accounts resolved by the validation engine (sfAccounts) completed with the ones it didn't resolve, the
+    Landmark buyer among them, in one query. None when the resolution fails, the accounts are then queried one
+    by one.
+    """
+    try:
+        return account_resolver.resolve(
+            external_ids=[
+                brq_json_data["header"]["AgencyId"],
+                brq_json_data["details"][0]["ClientId"],
+            ],
+            landmark_ids=[
+                validation_response["lmkProductResponse"].get("agencyCode", "")
+            ],
+            resolved=validation_response.get("sfAccounts"),
+        )
+    except Exception as e:
+        custom_logger.info(f"Error resolving salesforce accounts: {e}")
+        return None
+
+
+def get_sf_buying_agency_id(validation_response, sf_accounts=None):
     lmk_product_response = validation_response["lmkProductResponse"]
     lmk_buyer_id = lmk_product_response.get("agencyCode", "")
     if lmk_buyer_id != "":
@@ -350,12 +268,16 @@ def get_sf_buying_agency_id(validation_response):
             "query": f"SELECT+Id,+Name+from+Account+WHERE+SWM_LandMark_ID__c+='{lmk_buyer_id}'",
         }
         try:
-            invoke_response = lambda_client.invoke(
-                FunctionName=ARN_SF_ADAPTOR,
-                InvocationType="RequestResponse",
-                Payload=json.dumps(payload),
+            downstream_response = find_accounts_by_landmark_id(
+                sf_accounts, lmk_buyer_id
             )
-            downstream_response = json.loads(invoke_response["Payload"].read())
+            if downstream_response is None:
+                invoke_response = lambda_client.invoke(
+                    FunctionName=ARN_SF_ADAPTOR,
+                    InvocationType="RequestResponse",
+                    Payload=json.dumps(payload),
+                )
+                downstream_response = json.loads(invoke_response["Payload"].read())
             downstream_response = downstream_response["records"][0]["Id"]
             custom_logger.info(downstream_response)
             return downstream_response
@@ -384,8 +306,11 @@ def prepare_sf_opp_payload(
     lmk_product_response = validation_response["lmkProductResponse"]
     lmk_product_id = lmk_product_response.get("productCode", "")
     lmk_product_name = lmk_product_response.get("productName", "")
-    billing_agency_id = get_sf_account_id(brq_json_data["header"]["AgencyId"])
-    buying_agency_id = get_sf_buying_agency_id(validation_response)
+    sf_accounts = resolve_sf_accounts(brq_json_data, validation_response)
+    billing_agency_id = get_sf_account_id(
+        brq_json_data["header"]["AgencyId"], sf_accounts
+    )
+    buying_agency_id = get_sf_buying_agency_id(validation_response, sf_accounts)
     if buying_agency_id == "":
         buying_agency_id = billing_agency_id
     demo_name, demo_number, demo_message = get_demo_details(record_summary["demo_code"])
@@ -426,7 +351,9 @@ def prepare_sf_opp_payload(
         split_status = True
     if (
         get_client_type(
-            brq_json_data["details"][0]["ClientId"], brq_json_data["header"]["AgencyId"]
+            brq_json_data["details"][0]["ClientId"],
+            brq_json_data["header"]["AgencyId"],
+            sf_accounts,
         )
         == "Direct Client"
     ):
@@ -436,17 +363,20 @@ def prepare_sf_opp_payload(
             "brqid": booking_request_id,
             "payload": {
                 "BRQ_Received_DateTime__c": receive_time,
-                "AccountId": get_sf_account_id(brq_json_data["details"][0]["ClientId"]),
+                "AccountId": get_sf_account_id(
+                    brq_json_data["details"][0]["ClientId"], sf_accounts
+                ),
                 "SWM_Billing_Agency__c": get_sf_account_id(
-                    brq_json_data["details"][0]["ClientId"]
+                    brq_json_data["details"][0]["ClientId"], sf_accounts
                 ),
                 "SWM_Buying_Agency__c": get_sf_account_id(
-                    brq_json_data["details"][0]["ClientId"]
+                    brq_json_data["details"][0]["ClientId"], sf_accounts
                 ),
                 "SWM_Campaign_Type__c": get_brq_campaign_type(
                     get_client_type(
                         brq_json_data["details"][0]["ClientId"],
                         brq_json_data["header"]["AgencyId"],
+                        sf_accounts,
                     )
                 ),
                 "Name": "TestTest Op 000123",
@@ -484,11 +414,14 @@ def prepare_sf_opp_payload(
             "brqid": booking_request_id,
             "payload": {
                 "BRQ_Received_DateTime__c": receive_time,
-                "AccountId": get_sf_account_id(brq_json_data["details"][0]["ClientId"]),
+                "AccountId": get_sf_account_id(
+                    brq_json_data["details"][0]["ClientId"], sf_accounts
+                ),
                 "SWM_Campaign_Type__c": get_brq_campaign_type(
                     get_client_type(
                         brq_json_data["details"][0]["ClientId"],
                         brq_json_data["header"]["AgencyId"],
+                        sf_accounts,
                     )
                 ),
                 "Name": "TestTest Op 000123",
@@ -589,12 +522,10 @@ def prepare_brq_json(
     context, event_id, brq_file_name_list, brq_type="", ignore_list=[]
 ):
     brq_object_wrapper = {"header": {}, "narrativeRecords": [], "details": []}
-    detail_records = {}
     s3 = boto3.resource("s3")
     bucket = s3.Bucket(os.environ["EBOOKINGS_S3_TEMP_BUCKET"])
     brq_file_name = ""
     booking_request_id = ""
-    line_data = ""
     from_email = ""
     pdf_attached = "No"
     for obj in bucket.objects.filter(Prefix=brq_file_name_list):
@@ -604,51 +535,10 @@ def prepare_brq_json(
                 (from_email, booking_request_id, brq_file_name) = resolve_brq_file_name(
                     brq_file_name, context, event_id, brq_type
                 )
-                line_count = 0
-                for line in obj.get()["Body"].read().decode("utf-8").splitlines():
-                    if line_count < 1:
-                        for key in brq_header_slice_config:
-                            brq_object_wrapper["header"][key] = santize_brq_line_data(
-                                key,
-                                line[
-                                    brq_header_slice_config[key][
-                                        0
-                                    ] : brq_header_slice_config[key][1]
-                                ].strip(),
-                            )
-                    else:
-                        if line[0:6].strip() != "EOF//":
-                            if line[-2:] == "//":
-                                for key in brq_detail_records_slice_config:
-                                    if brq_detail_records_slice_config[key][1] == None:
-                                        detail_records[key] = santize_brq_line_data(
-                                            key,
-                                            line[
-                                                brq_detail_records_slice_config[key][
-                                                    0
-                                                ] :
-                                            ].strip(),
-                                        )
-                                    else:
-                                        detail_records[key] = santize_brq_line_data(
-                                            key,
-                                            line[
-                                                brq_detail_records_slice_config[key][
-                                                    0
-                                                ] : brq_detail_records_slice_config[
-                                                    key
-                                                ][
-                                                    1
-                                                ]
-                                            ].strip(),
-                                        )
-                                brq_object_wrapper["details"].append(detail_records)
-                                detail_records = {}
-                            else:
-                                line_data = line.strip()
-                                brq_object_wrapper["narrativeRecords"].append(line_data)
-                                line_data = ""
-                    line_count += 1
+                brq_object = parse_brq(obj.get()["Body"], EBOOKING_DIALECT)
+                brq_object_wrapper["header"] = brq_object["header"]
+                for key in ["narrativeRecords", "details"]:
+                    brq_object_wrapper[key].extend(brq_object[key])
             else:
                 if obj.key.endswith(".pdf"):
                     pdf_attached = "Yes"
@@ -684,14 +574,11 @@ def update_sf_opportunity(payload, opp_id):
         return None
 
 
-def read_file_from_s3(bucket_name, file_key):
+def read_file_from_s3(bucket_name, file_key, columns=None):
     session = boto3.Session()
     s3_client = session.client("s3")
     try:
-        response = s3_client.get_object(Bucket=bucket_name, Key=file_key)
-        content = response["Body"].read().decode("utf-8")
-        json_data = json.loads(content)
-        return json_data
+        return load_brq_object(bucket_name, file_key, columns, s3_client)
     except Exception as e:
         return None
 
@@ -705,35 +592,27 @@ def get_current_week_sunday():
 
 def get_detail_records_summary(detail_records):
     record_summary = {}
-    wc_dates = []
-    req_spot_size = []
-    demo_num = []
-    overall_demo_num = []
+    details = BRQDetails.from_records(detail_records)
     geo_list = []
-    station_id_list = []
     geo_data = ""
-    overall_budget = 0
-    overall_spot_count = 0
-    for index, elem in enumerate(detail_records):
-        dateTimeObj = datetime.strptime(elem["WCDate"], "%Y%m%d")
-        wc_dates.append(dateTimeObj.date())
-        overall_budget += float(elem["RequestedGrossRate"])
-        req_spot_size.append(int(elem["RequestedSize"]))
-        demo_num.append(str(elem["DemographicCodeOne"]))
+    wc_dates = [details.min_wc_date(), details.max_wc_date()]
+    overall_budget = details.sum("RequestedGrossRate")
+    req_spot_size = [int(size) for size in details.column("RequestedSize")]
+    demo_num = [str(code) for code in details.column("DemographicCodeOne")]
+    overall_demo_num = []
+    for demo_code_field in DEMO_CODE_FIELDS:
         overall_demo_num.extend(
-            [
-                str(elem["DemographicCodeOne"]),
-                str(elem["DemographicCodeTwo"]),
-                str(elem["DemographicCodeThree"]),
-                str(elem["DemographicCodeFour"]),
-            ]
+            str(code) for code in details.column(demo_code_field)
         )
-        geo = get_geo_data(elem["StationId"])
-        if elem["StationId"] != "" and elem["StationId"] not in station_id_list:
-            station_id_list.append(elem["StationId"])
+    # the geography is the same for all the spots of a station, look it up once per station
+    station_ids = details.distinct("StationId")
+    sales_area_map = get_sales_area_map()
+    for station_id in station_ids:
+        geo = get_geo_data(station_id, sales_area_map)
         if geo != "" and geo not in geo_list:
             geo_list.append(geo)
-        overall_spot_count += 1
+    station_id_list = [station_id for station_id in station_ids if station_id != ""]
+    overall_spot_count = len(details)
     if len(geo_list) > 1:
         geo_data = "National"
     else:
@@ -767,19 +646,14 @@ def get_detail_records_summary(detail_records):
     return record_summary
 
 
-def get_geo_data(station_code):
+def get_geo_data(station_code, sales_area_map):
     """
     Function to retrive geography information from CSV
     """
     try:
         geo = ""
-        count = 0
-        csv_data = get_csv_data(os.environ["SEIL_SALES_AREA_MAPPING_FILE"])
-        for sub in csv_data:
-            if sub["BCC"] == station_code:
-                res_data = sub
-                count += 1
-        if count != 0:
+        res_data = sales_area_map.get_by_bcc(station_code)
+        if res_data is not None:
             geo = res_data.get("Geography")
         return geo
     except Exception as e:
@@ -804,8 +678,9 @@ def lambda_handler(event, context):
         receive_time = receive_brq_time(key)
         record_summary = event["record_summary"]
         validation_response = event["validation_response"]
+        # the opportunity payload only needs the header and the client of the first spot
         brq_json_data = read_file_from_s3(
-            os.environ["EBOOKINGS_S3_TEMP_BUCKET"], brq_file_name + ".json"
+            os.environ["EBOOKINGS_S3_TEMP_BUCKET"], brq_file_name + ".json", ["ClientId"]
         )
         if validation_response["validationResult"]["result"] != "ERROR":
             if validation_response["brqSplit"] == "YES":
@@ -1062,7 +937,6 @@ def lambda_handler(event, context):
         body = "The BRQ sent through is corrupt. Please refer to attached email and follow up with Agency/Direct Client."
         event = {"brqDirPath": key}
         common_utils.send_email_notification(from_email, subject, body, event, [".eml"])
-        time.sleep(15)
         common_utils.move_file_s3_to_s3(
             os.environ["EBOOKINGS_S3_TEMP_BUCKET"],
             os.environ["EBOOKINGS_S3_ERROR_BUCKET"],
@@ -9,11 +9,12 @@ import boto3
 from datetime import datetime, timedelta
 from boto3 import client as boto3_client
 from collections import Counter
-import time
 
 from swm_logger.swm_common_logger import LambdaLogger
 from functions.brq_file_parser.resolve_brq_file_name import resolve_brq_file_name
 from functions.common_utils import CommonUtils
+from functions.brq_engine import EBOOKING_DIALECT, parse_brq
+from functions.brq_sidecar import save_brq_sidecar
 
 custom_logger = LambdaLogger(log_group_name=os.environ["LOG_GROUP_NAME"])
 
@@ -22,123 +23,6 @@ CEE_NOTIFICATION_ENGINE = os.environ["CEE_NOTIFICATION_ENGINE"]
 step_function = boto3_client("stepfunctions", region_name=AWS_REGION)
 lambda_client = boto3_client("lambda", region_name=AWS_REGION)
 
-brq_header_slice_config = {
-    "GenerationDate": [0, 8],
-    "GenerationTime": [8, 12],
-    "NetworkId": [12, 18],
-    "NetworkName": [18, 58],
-    "AgencyId": [58, 64],
-    "AgencyName": [64, 104],
-    "BookingDetailRecordCounter": [104, 110],
-    "BookingTotalGrossValue": [110, 120],
-    "ProposedDetailRecordCounter": [120, 126],
-    "ProposedTotalGrossValue": [126, 136],
-    "NarrativeRecordCounter": [136, 138],
-    "NetworkDomainName": [138, 178],
-    "NetworkContactName": [178, 208],
-    "NetworkContactEmail": [208, 278],
-    "AgencyDomainName": [278, 318],
-    "AgencyContactName": [318, 348],
-    "AgencyContactEmail": [348, 418],
-}
-
-brq_detail_records_slice_config = {
-    "WCDate": [258, 266],
-    "ClientId": [0, 6],
-    "ClientName": [6, 46],
-    "ClientProductId": [46, 52],
-    "ClientProductName": [52, 92],
-    "StationId": [92, 98],
-    "StationName": [98, 138],
-    "UniqueNetworkProposedSpotId": [138, 158],
-    "UniqueNetworkPreviousSpotId": [158, 178],
-    "UniqueNetworkParentSpotId": [178, 198],
-    "UniqueAgencyProposedSpotId": [198, 218],
-    "UniqueAgencyPreviousSpotId": [218, 238],
-    "UniqueAgencyParentSpotId": [238, 258],
-    "ProposedDay": [266, 273],
-    "ProposedStartEndTime": [273, 281],
-    "RequestedDay": [281, 288],
-    "RequestedTime": [288, 296],
-    "ProposedSize": [296, 304, int],
-    "ProposedGrossRate": [304, 314],
-    "ProposedNetRate": [314, 324],
-    "RequestedSize": [324, 332, int],
-    "RequestedGrossRate": [
-        332,
-        342,
-    ],
-    "RequestedNetRate": [342, 352],
-    "ProposedProgram": [352, 392],
-    "RequestedProgram": [392, 432],
-    "KeyNumber": [432, 452],
-    "MaterialInstruction": [452, 512],
-    "DemographicOneThousand": [512, 519],
-    "DemographicTwoThousand": [519, 526],
-    "DemographicThreeThousand": [526, 533],
-    "DemographicFourThousand": [533, 540],
-    "RecordType": [540, 542],
-    "RatingsOverrideFlag1": [542, 543],
-    "RatingsOverrideFlag2": [543, 544],
-    "RatingsOverrideFlag3": [544, 545],
-    "RatingsOverrideFlag4": [545, 546],
-    "DemographicCodeOne": [546, 561],
-    "DemographicOneTarp": [561, 564],
-    "DemographicCodeTwo": [564, 579],
-    "DemographicTwoTarp": [579, 582],
-    "DemographicCodeThree": [582, 597],
-    "DemographicThreeTarp": [597, 600],
-    "DemographicCodeFour": [600, 615],
-    "DemographicFourTarp": [615, 618],
-    "BookingModifiers": [618, None],
-}
-
-
-def santize_brq_line_data(key, line_data):
-    if line_data != "":
-        if key in [
-            "GenerationDate",
-            "GenerationTime",
-            "BookingDetailRecordCounter",
-            "ProposedDetailRecordCounter",
-            "NarrativeRecordCounter",
-            "ProposedStartEndTime",
-            "ProposedSize",
-            "ProposedGrossRate",
-            "ProposedNetRate",
-            "RequestedSize",
-        ]:
-            return int(line_data)
-        if key in [
-            "BookingTotalGrossValue",
-            "ProposedTotalGrossValue",
-            "RequestedGrossRate",
-            "RequestedNetRate",
-        ]:
-            integer = line_data[:8].strip()
-            decimal = line_data[-2:].strip()
-            return float(f"{integer}.{decimal}")
-        if key in [
-            "DemographicOneTarp",
-            "DemographicTwoTarp",
-            "DemographicThreeTarp",
-            "DemographicFourTarp",
-        ]:
-            integer = line_data[:2].strip()
-            decimal = line_data[-1:].strip()
-            return float(f"{integer}.{decimal}")
-        if key in [
-            "BookingModifiers",
-        ]:
-            if line_data:
-                str_value = line_data[:-2]  # remove the ending //
-                n = 2  # group by 2 characters
-                return [str_value[i : i + n] for i in range(0, len(str_value), n)]
-            else:
-                return []
-    return line_data
-
-
 def prepare_brq_json(context, event_id,brq_file_name_list, brq_type="", ignore_list=[]):
     brq_object_wrapper = {
         "header": {},
@@ -146,22 +30,16 @@ def prepare_brq_json(context, event_id,brq_file_name_list, brq_type="", ignore_l
         "details": [],
         "removedDetails": [],
     }
-    detail_records = {}
-    removed_detail_records = {}
     s3 = boto3.resource("s3")
     bucket = s3.Bucket(os.environ["EBOOKINGS_S3_TEMP_BUCKET"])
     brq_file_name = ""
     booking_request_id = ""
-    line_data = ""
     from_email = ""
     pdf_attached = "No"
     current_date_lines = []
     other_date_lines = []
-    header_line_data = ""
-    has_past_date_records = False
     custom_logger.info("BRQ file parsing started", context, correlationId=event_id)
     current_sunday = get_current_week_sunday()
-    current_sunday = datetime.strptime(f"{current_sunday}", "%Y-%m-%d")
     for obj in bucket.objects.filter(Prefix=brq_file_name_list):
         if obj.key not in ignore_list:
             if obj.key.endswith(".brq"):
@@ -170,120 +48,17 @@ def prepare_brq_json(context, event_id,brq_file_name_list, brq_type="", ignore_l
                 (from_email, booking_request_id, brq_file_name) = resolve_brq_file_name(
                     brq_file_name, context, event_id, brq_type
                 )
-                line_count = 0
-                for line in obj.get()["Body"].read().decode("utf-8").splitlines():
-                    if line_count < 1:
-                        header_line_data = line
-                        # Initialize lists to store header data
-                        current_date_lines = [header_line_data]
-                        other_date_lines = [header_line_data]
-                        for key in brq_header_slice_config:
-                            brq_object_wrapper["header"][key] = santize_brq_line_data(
-                                key,
-                                line[
-                                    brq_header_slice_config[key][
-                                        0
-                                    ] : brq_header_slice_config[key][1]
-                                ].strip(),
-                            )
-                    else:
-                        if line[0:6].strip() != "EOF//":
-                            if line[-2:] == "//":
-                                for key in brq_detail_records_slice_config:
-                                    if key == "WCDate":
-                                        wcdate = santize_brq_line_data(
-                                            key,
-                                            line[
-                                                brq_detail_records_slice_config[key][
-                                                    0
-                                                ] : brq_detail_records_slice_config[
-                                                    key
-                                                ][
-                                                    1
-                                                ]
-                                            ].strip(),
-                                        )
-                                        wcdate_converted = sanitize_date_format(wcdate)
-                                        wcdate_converted = datetime.strptime(
-                                            f"{wcdate_converted}", "%Y-%m-%d"
-                                        )
-                                        if wcdate_converted >= current_sunday:
-                                            has_past_date_records = False
-                                            current_date_lines.append(line)
-                                        else:
-                                            has_past_date_records = True
-                                            other_date_lines.append(line)
-                                    if brq_detail_records_slice_config[key][1] == None:
-                                        if has_past_date_records == True:
-                                            removed_detail_records[key] = (
-                                                santize_brq_line_data(
-                                                    key,
-                                                    line[
-                                                        brq_detail_records_slice_config[
-                                                            key
-                                                        ][0] :
-                                                    ].strip(),
-                                                )
-                                            )
-                                        else:
-                                            detail_records[key] = santize_brq_line_data(
-                                                key,
-                                                line[
-                                                    brq_detail_records_slice_config[
-                                                        key
-                                                    ][0] :
-                                                ].strip(),
-                                            )
-                                    else:
-                                        if has_past_date_records == True:
-                                            removed_detail_records[key] = (
-                                                santize_brq_line_data(
-                                                    key,
-                                                    line[
-                                                        brq_detail_records_slice_config[
-                                                            key
-                                                        ][
-                                                            0
-                                                        ] : brq_detail_records_slice_config[
-                                                            key
-                                                        ][
-                                                            1
-                                                        ]
-                                                    ].strip(),
-                                                )
-                                            )
-                                        else:
-                                            detail_records[key] = santize_brq_line_data(
-                                                key,
-                                                line[
-                                                    brq_detail_records_slice_config[
-                                                        key
-                                                    ][
-                                                        0
-                                                    ] : brq_detail_records_slice_config[
-                                                        key
-                                                    ][
-                                                        1
-                                                    ]
-                                                ].strip(),
-                                            )
-                                if has_past_date_records == True:
-                                    brq_object_wrapper["removedDetails"].append(
-                                        removed_detail_records
-                                    )
-                                else:
-                                    brq_object_wrapper["details"].append(detail_records)
-                                removed_detail_records = {}
-                                detail_records = {}
-                            else:
-                                line_data = line.strip()
-                                brq_object_wrapper["narrativeRecords"].append(line_data)
-                                current_date_lines.append(line_data)
-                                other_date_lines.append(line_data)
-                                line_data = ""
-                    line_count += 1
-                current_date_lines.append("EOF//")
-                other_date_lines.append("EOF//")
+                current_date_lines = []
+                other_date_lines = []
+                brq_object = parse_brq(
+                    obj.get()["Body"],
+                    EBOOKING_DIALECT,
+                    removed_before=current_sunday,
+                    raw_lines=(current_date_lines, other_date_lines),
+                )
+                brq_object_wrapper["header"] = brq_object["header"]
+                for key in ["narrativeRecords", "details", "removedDetails"]:
+                    brq_object_wrapper[key].extend(brq_object[key])
 
             else:
                 if obj.key.endswith(".pdf"):
@@ -306,7 +81,7 @@ def prepare_brq_json(context, event_id,brq_file_name_list, brq_type="", ignore_l
 def push_file_to_temp_s3(file_prefix, file_data, bucket_name, extension):
     filename = file_prefix + extension
     s3 = boto3.resource("s3")
-    s3.Object(bucket_name, filename).put(Body=file_data)
+    return s3.Object(bucket_name, filename).put(Body=file_data)
 
 
 def rename_file_in_s3(bucket_name, old_key, new_key):
@@ -333,13 +108,6 @@ def get_current_week_sunday():
     return last_sunday
 
 
-def sanitize_date_format(wc_date):
-    dateTimeObj = datetime.strptime(wc_date, "%Y%m%d")
-    wc_date = dateTimeObj.date()
-    wc_date = wc_date.strftime("%Y-%m-%d")
-    return wc_date
-
-
 def update_header_line_data(line, updates):
     # Sort the updates by start index in descending order to avoid messing up indices as we replace
     sorted_updates = sorted(updates.items(), key=lambda x: x[0][0], reverse=True)
@@ -437,12 +205,19 @@ def lambda_handler(event, context):
         current_brq_data = "\n".join(current_date_lines)
         removed_brq_data = "\n".join(other_date_lines)
         brq_file_name = remove_brq_extension(brq_file_name)
-        push_file_to_temp_s3(
+        json_response = push_file_to_temp_s3(
             brq_file_name,
             brq_json_data,
             os.environ["EBOOKINGS_S3_TEMP_BUCKET"],
             ".json",
         )
+        # columnar copy of the JSON for the validation steps
+        save_brq_sidecar(
+            os.environ["EBOOKINGS_S3_TEMP_BUCKET"],
+            brq_file_name + ".json",
+            brq_json_data_converted,
+            json_response.get("ETag"),
+        )
         if removed_spots > 0:
             rename_file_in_s3(
                 os.environ["EBOOKINGS_S3_TEMP_BUCKET"],
@@ -468,7 +243,6 @@ def lambda_handler(event, context):
             correlationId=event_id,
         )
 
-        time.sleep(60)
         return {
             "id":event_id,
             "parseBrqFile": {
@@ -496,7 +270,6 @@ def lambda_handler(event, context):
         event = {"brqDirPath": key}
         recipients = [from_email]
         common_utils.send_email_notification(recipients, subject, body, event, [".eml"])
-        time.sleep(15)
         custom_logger.info(
             f"'BRQ is corrupt' email sent", context, correlationId=event_id
         )
@@ -1,6 +1,5 @@
 import logging
 import json
-import csv
 import os
 import urllib.parse
 import datetime as dt
@@ -14,6 +13,10 @@ import time
 from swm_logger.swm_common_logger import LambdaLogger
 from functions.brq_file_parser.resolve_brq_file_name import resolve_brq_file_name
 from functions.common_utils import CommonUtils
+from functions.a1_2.SalesAreaMap import SalesAreaMap
+from functions.brq_details import BRQDetails, DEMO_CODE_FIELDS
+from functions.account_resolver import AccountResolver, find_accounts
+from functions.validation_completion import validation_completion
 
 custom_logger = LambdaLogger(log_group_name=os.environ["LOG_GROUP_NAME"])
 
@@ -23,40 +26,33 @@ ARN_VALIDATION_ENGINE = os.environ["ARN_VALIDATION_ENGINE_SERVICE"]
 CEE_NOTIFICATION_ENGINE = os.environ["CEE_NOTIFICATION_ENGINE"]
 step_function = boto3_client("stepfunctions", region_name=AWS_REGION)
 lambda_client = boto3_client("lambda", region_name=AWS_REGION)
-step_function = boto3_client("stepfunctions", region_name=AWS_REGION)
+account_resolver = AccountResolver(lambda_client, ARN_SF_ADAPTOR)
 
 
-def get_csv_data(file_name):
+def get_sales_area_map():
     """
-    Function to read the csv data from config bucket
+    Function to read the Sales Area Mapping csv from config bucket, indexed by BCC and sales area numbers
     """
+    file_name = os.environ["SEIL_SALES_AREA_MAPPING_FILE"]
     seil_config_bucket_name = os.environ["SEIL_CONFIG_BUCKET_NAME"]
     try:
-        s3 = boto3.client("s3")
-        s3_object = s3.get_object(Bucket=seil_config_bucket_name, Key=file_name)
-        data = s3_object["Body"].read().decode("utf-8-sig").splitlines()
-        csv_records = csv.DictReader(data)
-        csv_data = list(csv_records)
-        return csv_data
+        return SalesAreaMap(
+            sales_area_path=f"s3://{seil_config_bucket_name}/{file_name}"
+        )
     except Exception as e:
         raise RuntimeError(
             f"Error retrieving CSV data from file: {file_name}: {e}"
         ) from e
 
 
-def get_geo_data(station_code, csv_data):
+def get_geo_data(station_code, sales_area_map):
     """
     Function to retrive geography information from CSV
     """
     try:
         geo = ""
-        count = 0
-        res_data = None
-        for sub in csv_data:
-            if sub["BCC"] == station_code:
-                res_data = sub
-                count += 1
-        if count != 0:
+        res_data = sales_area_map.get_by_bcc(station_code)
+        if res_data is not None:
             geo = res_data.get("Geography")
         return geo
     except Exception as e:
@@ -74,13 +70,12 @@ def validate_sales_area_codes(station_code_list, station_list, context, event_id
     failed_codes = []
 
     try:
-        csv_data = get_csv_data(os.environ["SEIL_SALES_AREA_MAPPING_FILE"])
-        valid_bcc_codes = {row["BCC"] for row in csv_data}
+        sales_area_map = get_sales_area_map()
 
         # Iterate through each station code provided in the input list
         for code in station_code_list:
-            # Check if the current code is present in our set of valid BCC codes
-            if code not in valid_bcc_codes:
+            # Check if the current code is a BCC of the sales area mapping
+            if sales_area_map.get_by_bcc(code) is None:
                 for station_item in station_list:
                     if code in station_item["station_id"]:
                         failed_codes.append(
@@ -124,40 +119,35 @@ def validate_sales_area_codes(station_code_list, station_list, context, event_id
 
 def get_detail_records_summary(detail_records, context, event_id):
     record_summary = {}
-    wc_dates = []
-    req_spot_size = []
-    demo_num = []
-    overall_demo_num = []
+    details = BRQDetails.from_records(detail_records)
     geo_list = []
-    station_id_list = []
     station_list = []
     geo_data = ""
-    overall_budget = 0
-    overall_spot_count = 0
-    csv_data = get_csv_data(os.environ["SEIL_SALES_AREA_MAPPING_FILE"])
-    for index, elem in enumerate(detail_records):
-        dateTimeObj = datetime.strptime(elem["WCDate"], "%Y%m%d")
-        wc_dates.append(dateTimeObj.date())
-        overall_budget += float(elem["RequestedGrossRate"])
-        req_spot_size.append(int(elem["RequestedSize"]))
-        demo_num.append(str(elem["DemographicCodeOne"]))
-        overall_demo_num.extend(
-            [
-                str(elem["DemographicCodeOne"]),
-                str(elem["DemographicCodeTwo"]),
-                str(elem["DemographicCodeThree"]),
-                str(elem["DemographicCodeFour"]),
-            ]
-        )
-        geo = get_geo_data(elem["StationId"], csv_data)
-        if elem["StationId"] != "" and elem["StationId"] not in station_id_list:
-            station_id_list.append(elem["StationId"])
+    sales_area_map = get_sales_area_map()
+    wc_dates = [details.min_wc_date(), details.max_wc_date()]
+    overall_budget = details.sum("RequestedGrossRate")
+    req_spot_size = [int(size) for size in details.column("RequestedSize")]
+    demo_num = [str(code) for code in details.column("DemographicCodeOne")]
+    overall_demo_num = []
+    for demo_code_field in DEMO_CODE_FIELDS:
+        overall_demo_num.extend(str(code) for code in details.column(demo_code_field))
+    # the geography and the name are the same for all the spots of a station, look them up once per station
+    first_station_names = {}
+    for station_id, station_name in zip(
+        details.column("StationId"), details.column("StationName")
+    ):
+        first_station_names.setdefault(station_id, station_name)
+    station_id_list = []
+    for station_id, station_name in first_station_names.items():
+        geo = get_geo_data(station_id, sales_area_map)
+        if station_id != "":
+            station_id_list.append(station_id)
             station_list.append(
-                {"station_id": elem["StationId"], "station_name": elem["StationName"]}
+                {"station_id": station_id, "station_name": station_name}
             )
         if geo != "" and geo not in geo_list:
             geo_list.append(geo)
-        overall_spot_count += 1
+    overall_spot_count = len(details)
     if len(geo_list) > 1:
         geo_data = "National"
     else:
@@ -197,7 +187,30 @@ def get_detail_records_summary(detail_records, context, event_id):
     return record_summary
 
 
-def get_client_type(client_id, agency_id, context, event_id):
+def resolve_sf_accounts(brq_json_data, context, event_id):
+    """
+    Resolve the Salesforce accounts of the BRQ agency and client, and their relationships, for all the validation
+    rules. None when the resolution fails, the rules then query Salesforce themselves.
+    """
+    try:
+        return account_resolver.resolve(
+            external_ids=[
+                brq_json_data["header"]["AgencyId"],
+                brq_json_data["details"][0]["ClientId"],
+            ],
+            with_relationships=True,
+        )
+    except Exception as e:
+        custom_logger.error(
+            f"Error resolving the salesforce accounts:",
+            context,
+            correlationId=event_id,
+            error={e},
+        )
+        return None
+
+
+def get_client_type(client_id, agency_id, context, event_id, sf_accounts=None):
     client_type = ""
     payload = {
         "invocationType": "QUERY",
@@ -209,12 +222,14 @@ def get_client_type(client_id, agency_id, context, event_id):
             context,
             correlationId=event_id,
         )
-        invoke_response = lambda_client.invoke(
-            FunctionName=ARN_SF_ADAPTOR,
-            InvocationType="RequestResponse",
-            Payload=json.dumps(payload),
-        )
-        downstream_response = json.loads(invoke_response["Payload"].read())
+        downstream_response = find_accounts(sf_accounts, client_id)
+        if downstream_response is None:
+            invoke_response = lambda_client.invoke(
+                FunctionName=ARN_SF_ADAPTOR,
+                InvocationType="RequestResponse",
+                Payload=json.dumps(payload),
+            )
+            downstream_response = json.loads(invoke_response["Payload"].read())
         type = downstream_response["records"][0]["Type"]
         if type == "Direct Client":
             client_type = "Direct Client"
@@ -264,6 +279,7 @@ def get_brq_validation_response(
     context,
     event_id,
     errored_sales_area_list,
+    sf_accounts=None,
 ):
     event_data = {
         "validationMessages": [],
@@ -281,9 +297,13 @@ def get_brq_validation_response(
         "oppData": {},
         "oppId": "",
         "sfAccountType": sf_account_type,
+        "sfAccounts": sf_accounts,
         "lmkProductResponse": {},
         "correlationID": "32rh32fh239fdj2390jd20j20",  # ToDo - fetch the actual correlationId from the context.
         "otherFiles": [],
+        "validationEngineMode": os.environ.get(
+            "VALIDATION_ENGINE_MODE", "state-machine"
+        ),
         "validationResult": {
             "result": "",
             "createOrUpdate": "",
@@ -291,59 +311,17 @@ def get_brq_validation_response(
             "details": [],
         },
     }
-    try:
-        invoke_response = step_function.start_execution(
-            stateMachineArn=ARN_VALIDATION_ENGINE,
-            input=json.dumps(event_data),
-        )
-    except Exception as e:
-        # https://aws.amazon.com/premiumsupport/knowledge-center/lambda-troubleshoot-invoke-error-502-500/
-        # Lambda function is not ready. Retry to see if it works.
-        if "CodeArtifactUserPendingException" in str(e):
-            custom_logger.exception(
-                f"Caught CodeArtifactUserPendingException. This is Attempt.",
-                context,
-                correlationId=event_id,
-            )
-        else:
-            raise  # rethrow the exception if it's not CodeArtifactUserPendingException
+    # returns once the execution has ended, see validation_completion for the modes
+    validation_response = validation_completion(
+        ARN_VALIDATION_ENGINE, step_function
+    ).run(event_data)
     custom_logger.info(
-        f"Validation engine invoke response",
+        f"Validation engine execution response",
         context,
         correlationId=event_id,
-        data=invoke_response,
+        data=validation_response,
     )
-    max_retries = 15
-    retry_interval = 60
-    for attempt in range(max_retries):
-        try:
-            describe_response = step_function.describe_execution(
-                executionArn=invoke_response["executionArn"]
-            )
-            describe_response = describe_response
-            if "output" not in describe_response:
-                raise ValueError("No OUTPUT from Statemachine")
-            return describe_response
-        except Exception as e:
-            custom_logger.info(
-                f"Attempt - {attempt}, No OUTPUT from Statemachine, Still processing...",
-                context,
-                correlationId=event_id,
-            )
-            if attempt < max_retries - 1:
-                custom_logger.info(
-                    f"Retrying in {retry_interval} seconds...",
-                    context,
-                    correlationId=event_id,
-                )
-                time.sleep(retry_interval)
-            else:
-                custom_logger.info(
-                    "Maximum retry attempts reached. Exiting.",
-                    context,
-                    correlationId=event_id,
-                )
-                raise
+    return validation_response
 
 
 def read_file_from_s3(bucket_name, file_key):
@@ -383,11 +361,13 @@ def lambda_handler(event, context):
                 context,
                 event_id,
             )
+            sf_accounts = resolve_sf_accounts(brq_json_data, context, event_id)
             sf_account_type = get_client_type(
                 brq_json_data["details"][0]["ClientId"],
                 brq_json_data["header"]["AgencyId"],
                 context,
                 event_id,
+                sf_accounts,
             )
             ebookings_temp_info = get_brq_zip_details(
                 key, os.environ["EBOOKINGS_S3_TEMP_BUCKET"]
@@ -403,6 +383,7 @@ def lambda_handler(event, context):
                 context,
                 event_id,
                 errored_sales_area_list,
+                sf_accounts,
             )
             validation_response = json.loads(validation_response["output"])
             custom_logger.info(
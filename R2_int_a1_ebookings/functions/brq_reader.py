@@ -0,0 +1,74 @@
+HEADER = "header"
+NARRATIVE = "narrative"
+DETAIL = "detail"
+
+EOF_LINE = "EOF//"
+
+# botocore StreamingBody.iter_lines reads 1KB chunks by default, BRQ detail lines are ~630 bytes
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+class BRQFormatError(ValueError):
+    pass
+
+
+def iter_source_lines(source, encoding="utf-8", chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield the lines of a BRQ file one by one without the line endings.
+    :param source: One of
+        - the S3 object body (botocore StreamingBody), it is read chunk by chunk and decoded line by line
+        - a str with the whole file content (for the callers which already have the content in memory)
+        - any iterable of str or bytes lines, e.g. an opened file
+    """
+    if isinstance(source, str):
+        yield from source.splitlines()
+        return
+    if hasattr(source, "iter_lines"):
+        for line in source.iter_lines(chunk_size=chunk_size):
+            yield line.decode(encoding)
+        return
+    for line in source:
+        if isinstance(line, bytes):
+            line = line.decode(encoding)
+        yield line.rstrip("\r\n")
+
+
+def read_brq_lines(source, encoding="utf-8", chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield the header, narrative and detail lines of a BRQ file, the 'EOF//' trailer is not yielded.
+    The reader holds one line back, so the trailer is only checked once the whole file has been read:
+    the caller has already consumed every other line when BRQFormatError is raised for a missing trailer.
+    Blank lines after the trailer are ignored.
+    """
+    previous = None
+    blank_lines = []
+    for line in iter_source_lines(source, encoding, chunk_size):
+        if not line.strip():
+            blank_lines.append(line)
+            continue
+        if previous is not None:
+            yield previous
+        yield from blank_lines
+        blank_lines = []
+        previous = line
+    if previous is None:
+        raise BRQFormatError("BRQ file is empty.")
+    if previous.rstrip() != EOF_LINE:
+        raise BRQFormatError(f"Last line must be '{EOF_LINE}'.")
+
+
+def read_brq_records(source, encoding="utf-8", chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield (record_type, line) tuples from a BRQ file, record_type is one of HEADER, NARRATIVE and DETAIL.
+    The first line is the header, then every line ending with '//' is a detail record and any other line
+    is a narrative record.
+    """
+    lines = read_brq_lines(source, encoding, chunk_size)
+    for line in lines:
+        yield (HEADER, line)
+        break
+    for line in lines:
+        if line[-2:] == "//":
+            yield (DETAIL, line)
+        else:
+            yield (NARRATIVE, line)
@@ -0,0 +1,299 @@
+"""
+Compact columnar copy ("sidecar") of a BRQ JSON in the temp bucket.
+
+The parsed BRQ is written as JSON to the temp bucket and every following step downloads and json.loads the whole
+file, even when it only needs a few columns. The sidecar is written next to the JSON ({json_key}.cols) with the
+detail records encoded column by column (see BRQDetails.encode_column), so a step reads and decodes only the
+columns it needs.
+
+Layout (version 1), all integers little-endian:
+    b"BRQC" | version: uint16 | directory length: uint32 | directory (JSON) | blocks
+The directory gives the ETag of the JSON the sidecar was built from, the position of the document block (the BRQ
+object without the detail tables, e.g. the header and the narrative records) and of every column block:
+    {
+        "sourceETag": "...",
+        "document": [offset, length],
+        "tables": {"details": {"rows": 3, "columns": [[field, kind, offset, length], ...]}, ...}
+    }
+The offsets are relative to the first block and every block is zlib compressed.
+
+The reader falls back to the JSON when the sidecar is missing, has another version, is corrupt or doesn't match
+the JSON anymore (the JSON ETag changed), so the JSON stays the source of truth.
+
+Inside brq_object_scope, the BRQ objects are read once, with all their columns, and shared by the callers.
+"""
+
+import contextlib
+import json
+import logging
+import struct
+import threading
+import zlib
+
+import boto3
+from botocore.exceptions import ClientError
+
+from functions.brq_details import BRQDetails
+
+SIDECAR_SUFFIX = ".cols"
+SIDECAR_MAGIC = b"BRQC"
+SIDECAR_VERSION = 1
+DETAIL_TABLES = ["details", "removedDetails"]
+
+_PREAMBLE = struct.Struct("<4sHI")
+# first read of a sidecar, the directory and most of the small BRQs fit in it
+_FIRST_READ_SIZE = 64 * 1024
+# blocks closer than this are read with one range request
+_MAX_RANGE_GAP = 32 * 1024
+
+logger = logging.getLogger(__name__)
+
+# the BRQ objects read in the current brq_object_scope, None outside of it
+_scoped_objects = None
+_scope_lock = threading.RLock()
+
+
+def sidecar_key(json_key: str) -> str:
+    return json_key + SIDECAR_SUFFIX
+
+
+def encode_brq_sidecar(brq_object: dict, source_etag: str) -> bytes:
+    """
+    Encode a BRQ object, the detail tables are lists of detail records or BRQDetails
+    """
+    blocks = []
+    position = 0
+
+    def add_block(payload: bytes) -> list:
+        nonlocal position
+        block = zlib.compress(payload)
+        blocks.append(block)
+        span = [position, len(block)]
+        position += len(block)
+        return span
+
+    document = {
+        key: value for key, value in brq_object.items() if key not in DETAIL_TABLES
+    }
+    directory = {
+        "sourceETag": source_etag,
+        "document": add_block(json.dumps(document).encode("utf-8")),
+        "tables": {},
+    }
+    for table in DETAIL_TABLES:
+        if table not in brq_object:
+            continue
+        details = brq_object[table]
+        if not isinstance(details, BRQDetails):
+            details = BRQDetails.from_records(details)
+        columns = []
+        for field in details.fields:
+            kind, payload = details.encode_column(field)
+            columns.append([field, kind, *add_block(payload)])
+        directory["tables"][table] = {"rows": len(details), "columns": columns}
+
+    directory_json = json.dumps(directory, separators=(",", ":")).encode("utf-8")
+    return b"".join(
+        [
+            _PREAMBLE.pack(SIDECAR_MAGIC, SIDECAR_VERSION, len(directory_json)),
+            directory_json,
+            *blocks,
+        ]
+    )
+
+
+def decode_brq_sidecar(content: bytes, columns: list = None) -> dict:
+    """
+    Decode a whole sidecar content, see load_brq_object for the columns
+    """
+    directory, blocks_start = _read_directory(content)
+    return _decode(
+        directory,
+        columns,
+        lambda offset, length: content[
+            blocks_start + offset : blocks_start + offset + length
+        ],
+    )
+
+
+def save_brq_sidecar(
+    bucket: str, json_key: str, brq_object: dict, json_etag: str, s3_client=None
+) -> str:
+    """
+    Write the sidecar of the BRQ JSON just written to bucket/json_key.
+    :param json_etag: the ETag returned by the put of the JSON, nothing is written without it
+    :return: the sidecar key or None when it isn't written, the steps then read the JSON
+    """
+    if not json_etag:
+        return None
+    key = sidecar_key(json_key)
+    s3_client = s3_client or boto3.client("s3")
+    try:
+        s3_client.put_object(
+            Bucket=bucket, Key=key, Body=encode_brq_sidecar(brq_object, json_etag)
+        )
+    except ClientError as e:
+        # the JSON is there, a step reading a missing/outdated sidecar falls back to it
+        logger.warning(f"BRQ sidecar s3://{bucket}/{key} not written: {e}")
+        return None
+    return key
+
+
+def load_brq_object(
+    bucket: str, json_key: str, columns: list = None, s3_client=None
+) -> dict:
+    """
+    Read the BRQ object of bucket/json_key from its sidecar, or from the JSON when there is no valid sidecar.
+    The detail tables ("details", "removedDetails") are BRQDetails, the other keys are as in the JSON.
+    :param columns: the detail fields to read, None for all of them. The details read from the JSON have all the
+        fields.
+    """
+    with _scope_lock:
+        if _scoped_objects is not None:
+            if (bucket, json_key) not in _scoped_objects:
+                _scoped_objects[(bucket, json_key)] = _load(
+                    bucket, json_key, None, s3_client
+                )
+            return _scoped_objects[(bucket, json_key)]
+    return _load(bucket, json_key, columns, s3_client)
+
+
+@contextlib.contextmanager
+def brq_object_scope():
+    """
+    Share the BRQ objects read by load_brq_object until the scope is left: a BRQ object is read once with all its
+    columns, the following calls get the same object (whatever their columns) and must not modify it. Used when
+    several steps reading the same BRQ run in one invocation.
+    """
+    global _scoped_objects
+    with _scope_lock:
+        outermost = _scoped_objects is None
+        if outermost:
+            _scoped_objects = {}
+    try:
+        yield
+    finally:
+        if outermost:
+            with _scope_lock:
+                _scoped_objects = None
+
+
+def _load(bucket: str, json_key: str, columns: list, s3_client) -> dict:
+    s3_client = s3_client or boto3.client("s3")
+    brq_object = _load_from_sidecar(s3_client, bucket, json_key, columns)
+    if brq_object is None:
+        response = s3_client.get_object(Bucket=bucket, Key=json_key)
+        brq_object = json.loads(response["Body"].read().decode("utf-8"))
+        for table in DETAIL_TABLES:
+            if table in brq_object:
+                brq_object[table] = BRQDetails.from_records(brq_object[table])
+    return brq_object
+
+
+def _load_from_sidecar(s3_client, bucket: str, json_key: str, columns: list) -> dict:
+    key = sidecar_key(json_key)
+    try:
+        first_read = _read_range(s3_client, bucket, key, 0, _FIRST_READ_SIZE)
+        if first_read[:4] != SIDECAR_MAGIC or len(first_read) < _PREAMBLE.size:
+            logger.warning(f"s3://{bucket}/{key} is not a BRQ sidecar.")
+            return None
+        _, version, directory_length = _PREAMBLE.unpack_from(first_read)
+        if version != SIDECAR_VERSION:
+            logger.info(f"s3://{bucket}/{key} has the sidecar version {version}.")
+            return None
+        blocks_start = _PREAMBLE.size + directory_length
+        if len(first_read) < blocks_start:
+            first_read += _read_range(
+                s3_client, bucket, key, len(first_read), blocks_start - len(first_read)
+            )
+        directory, _ = _read_directory(first_read)
+
+        json_etag = s3_client.head_object(Bucket=bucket, Key=json_key)["ETag"]
+        if json_etag != directory["sourceETag"]:
+            logger.info(f"s3://{bucket}/{key} is outdated, reading the JSON.")
+            return None
+
+        blocks = _read_blocks(
+            s3_client,
+            bucket,
+            key,
+            first_read,
+            blocks_start,
+            _selected_spans(directory, columns),
+        )
+        return _decode(directory, columns, lambda offset, length: blocks[offset])
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+            logger.warning(f"BRQ sidecar s3://{bucket}/{key} not read: {e}")
+        return None
+    except (ValueError, KeyError, struct.error, zlib.error) as e:
+        logger.warning(
+            f"BRQ sidecar s3://{bucket}/{key} is corrupt, reading the JSON: {e}"
+        )
+        return None
+
+
+def _read_range(s3_client, bucket: str, key: str, start: int, length: int) -> bytes:
+    response = s3_client.get_object(
+        Bucket=bucket, Key=key, Range=f"bytes={start}-{start + length - 1}"
+    )
+    return response["Body"].read()
+
+
+def _read_directory(content: bytes) -> (dict, int):
+    magic, version, directory_length = _PREAMBLE.unpack_from(content)
+    if magic != SIDECAR_MAGIC or version != SIDECAR_VERSION:
+        raise ValueError(f"Not a BRQ sidecar of version {SIDECAR_VERSION}.")
+    blocks_start = _PREAMBLE.size + directory_length
+    return json.loads(content[_PREAMBLE.size : blocks_start]), blocks_start
+
+
+def _selected_spans(directory: dict, columns: list) -> [list]:
+    spans = [directory["document"]]
+    for table in directory["tables"].values():
+        for field, _, offset, length in table["columns"]:
+            if columns is None or field in columns:
+                spans.append([offset, length])
+    return spans
+
+
+def _read_blocks(
+    s3_client, bucket: str, key: str, first_read: bytes, blocks_start: int, spans
+) -> dict:
+    """
+    {offset: block} of the spans, the spans not in the first read are read with as few range requests as possible
+    """
+    blocks = {}
+    missing = []
+    for offset, length in sorted(spans):
+        start = blocks_start + offset
+        if start + length <= len(first_read):
+            blocks[offset] = first_read[start : start + length]
+        elif missing and offset - (missing[-1][1]) <= _MAX_RANGE_GAP:
+            missing[-1][1] = offset + length
+            missing[-1][2].append((offset, length))
+        else:
+            missing.append([offset, offset + length, [(offset, length)]])
+    for range_start, range_end, range_spans in missing:
+        content = _read_range(
+            s3_client, bucket, key, blocks_start + range_start, range_end - range_start
+        )
+        for offset, length in range_spans:
+            blocks[offset] = content[
+                offset - range_start : offset - range_start + length
+            ]
+    return blocks
+
+
+def _decode(directory: dict, columns: list, get_block) -> dict:
+    brq_object = json.loads(zlib.decompress(get_block(*directory["document"])))
+    for table, table_directory in directory["tables"].items():
+        encoded_columns = {
+            field: (kind, zlib.decompress(get_block(offset, length)))
+            for field, kind, offset, length in table_directory["columns"]
+            if columns is None or field in columns
+        }
+        brq_object[table] = BRQDetails.from_encoded(
+            encoded_columns, table_directory["rows"]
+        )
+    return brq_object
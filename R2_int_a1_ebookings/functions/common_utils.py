@@ -2,6 +2,10 @@ import logging
 import json
 import csv
 import os
+import contextlib
+import copy
+import functools
+import threading
 import datetime as dt
 import boto3
 import zipfile
@@ -15,6 +19,13 @@ from calendar import monthcalendar
 from datetime import datetime
 from boto3 import client as boto3_client, resource
 
+from functions.notification_dispatcher import (
+    NotificationDispatcher,
+    snapshot_attachments,
+)
+from functions.parameter_store import get_parameter, parameter_store
+from functions.sf_metadata_cache import query_salesforce_metadata
+
 email_msgs = json.load(
     open(
         os.path.abspath(
@@ -24,6 +35,76 @@ email_msgs = json.load(
 )
 
 
+# the SSM parameters read by CommonUtils, fetched with the ones of the Lambda
+parameter_store.declare(
+    os.environ.get("EBOOKINGS_CASE_QUEUE_ID"),
+    os.environ.get("SF_AD_SALES_RECORD_TYPE_NAME"),
+    os.environ.get("SPLIT_OPP_THRESHOLD_DATE"),
+)
+
+# the calls of the CommonUtils methods acting outside of the validation (emails, Salesforce cases, moves and writes of
+# the BRQ files) made by a rule run ahead of its turn by the rules engine, see deferred_effects
+_deferred = threading.local()
+
+
+class EffectOutOfTurn(BaseException):
+    """
+    Raised in a rule run ahead of its turn on a call whose result the rule uses, the rule is run again in its turn.
+    A BaseException, the rules catching Exception around their calls must not swallow it.
+    """
+
+
+@contextlib.contextmanager
+def deferred_effects():
+    """
+    Record, instead of making them, the effect calls of this thread in the block. The recorded calls are made by
+    replay_effects once the rule is known to run in the sequential order, or dropped.
+    """
+    previous = getattr(_deferred, "effects", None)
+    _deferred.effects = []
+    try:
+        yield _deferred.effects
+    finally:
+        _deferred.effects = previous
+
+
+def replay_effects(effects: list):
+    """
+    Make the recorded effect calls, in their order
+    """
+    for method, args, kwargs in effects:
+        method(*args, **kwargs)
+
+
+def _effect(deferrable: bool = True):
+    """
+    Mark a CommonUtils method as an effect call. When deferred, a deferrable call returns None, the others raise
+    EffectOutOfTurn as their result is needed.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            effects = getattr(_deferred, "effects", None)
+            if effects is None:
+                return method(self, *args, **kwargs)
+            if not deferrable:
+                raise EffectOutOfTurn(method.__name__)
+            # copied, the rule goes on updating the event after the call
+            effects.append(
+                (
+                    functools.partial(method, self),
+                    copy.deepcopy(args),
+                    copy.deepcopy(kwargs),
+                )
+            )
+            return None
+
+        return wrapper
+
+    return decorator
+
+
 class CommonUtils:
 
     def __init__(self, event, custom_logger, context=None):
@@ -33,8 +114,21 @@ class CommonUtils:
         self.region = os.environ["SEIL_AWS_REGION"]
         self.CEE_NOTIFICATION_ENGINE = os.environ["CEE_NOTIFICATION_ENGINE"]
         self.ARN_SF_ADAPTOR = os.environ["SALESFORCE_ADAPTOR"]
-        self.lambda_client = boto3_client("lambda", region_name=self.region)
-        self.step_function = boto3_client("stepfunctions", region_name=self.region)
+        # created on first use, most of the validation rules don't call Salesforce or the notification engine
+        self._lambda_client = None
+        self._step_function = None
+
+    @property
+    def lambda_client(self):
+        if self._lambda_client is None:
+            self._lambda_client = boto3_client("lambda", region_name=self.region)
+        return self._lambda_client
+
+    @property
+    def step_function(self):
+        if self._step_function is None:
+            self._step_function = boto3_client("stepfunctions", region_name=self.region)
+        return self._step_function
 
     def extract_move_brq_file(
         self, filekey, source_bucket_name, err_bucket, brq_file_name
@@ -74,6 +168,7 @@ class CommonUtils:
         except Exception as e:
             self.custom_logger.info(f"Error: Unable to gzip & upload file: {e}")
 
+    @_effect()
     def move_file_s3_to_s3(
         self,
         source_bucket: object,
@@ -150,14 +245,19 @@ class CommonUtils:
                             "link": f"s3://{os.environ['EBOOKINGS_S3_TEMP_BUCKET']}/{obj.key}",
                         }
                     )
+        # the case refers to copies, the BRQ files can be moved once it is created
+        copies = snapshot_attachments(
+            bucket.name, [attachment["key"] for attachment in s3_attachments]
+        )
+        for attachment in s3_attachments:
+            attachment["key"] = copies[attachment["key"]]
+            attachment["link"] = f"s3://{bucket.name}/{attachment['key']}"
         return s3_attachments
 
     def get_ssm_parameter(self, parameter_name: str) -> str:
         """Function to retrive AWS SSM parameters"""
         try:
-            ssm = boto3.client("ssm")
-            response = ssm.get_parameter(Name=parameter_name, WithDecryption=True)
-            return response["Parameter"]["Value"]
+            return get_parameter(parameter_name)
         except botocore.exceptions.ClientError as e:
             self.custom_logger.info(f"exception error in getting ssm param: {e}")
             return e
@@ -168,12 +268,9 @@ class CommonUtils:
             "query": f"SELECT+Id+from+RecordType+WHERE+DeveloperName+='{recordtype_name}'+AND+SobjectType+='Case'+LIMIT+1",
         }
         try:
-            invoke_response = self.lambda_client.invoke(
-                FunctionName=self.ARN_SF_ADAPTOR,
-                InvocationType="RequestResponse",
-                Payload=json.dumps(payload),
+            downstream_response = query_salesforce_metadata(
+                self.lambda_client, self.ARN_SF_ADAPTOR, payload["query"]
             )
-            downstream_response = json.loads(invoke_response["Payload"].read())
             downstream_response = downstream_response["records"][0]["Id"]
             self.custom_logger.info(downstream_response)
             return downstream_response
@@ -187,6 +284,7 @@ class CommonUtils:
             "query": f"select+Id,Email,IsActive+from+user+where+email+='{email_id}'+and+IsActive+=true+LIMIT+1",
         }
         try:
+            # not cached with the metadata, an owner can be deactivated or replaced at any time
             invoke_response = self.lambda_client.invoke(
                 FunctionName=self.ARN_SF_ADAPTOR,
                 InvocationType="RequestResponse",
@@ -200,6 +298,7 @@ class CommonUtils:
             self.custom_logger.info(f"Error getting salesforce Record Type Id: {e}")
             return False
 
+    @_effect()
     def create_sf_case_SA_notmatch(self, brq_file_name, description, event):
         """
         Function to create salesforce case for Sales Area not match scenario.
@@ -261,6 +360,7 @@ class CommonUtils:
             self.custom_logger.info(f"Error on salesforce case creation: {e}")
             return False
 
+    @_effect(deferrable=False)
     def create_sf_case_product_notmatch(
         self,
         brq_file_name,
@@ -330,6 +430,7 @@ class CommonUtils:
             self.custom_logger.info(f"Error on salesforce case creation: {e}")
             return False
 
+    @_effect()
     def create_sf_case(self, brq_file_name, description, event):
         """
         Function to create salesforce case.
@@ -372,6 +473,7 @@ class CommonUtils:
             self.custom_logger.info(f"Error on salesforce case creation: {e}")
             return False
 
+    @_effect()
     def send_email_notification(
         self, recipients, subject, body, event, file_ext_list=[]
     ):
@@ -386,6 +488,7 @@ class CommonUtils:
             },
         }
         try:
+            attachment_keys = []
             if len(file_ext_list) != 0:
                 brq_file_name_list, child_brq_file_list, other_file_list = (
                     self.get_s3_files_for_extension(
@@ -395,19 +498,13 @@ class CommonUtils:
                     )
                 )
                 if len(other_file_list) != 0:
-                    eml_file_name = other_file_list[0].split("/")[1]
-                    payload["body"]["files"] = [
-                        {
-                            "path": f"s3://{os.environ['EBOOKINGS_S3_TEMP_BUCKET']}/{event['brqDirPath']}/{eml_file_name}"
-                        }
-                    ]
-            self.custom_logger.info(
-                f"Email notification request payload to CEE: {payload}"
-            )
-            invoke_response = self.step_function.start_execution(
-                stateMachineArn=self.CEE_NOTIFICATION_ENGINE,
-                input=json.dumps(payload),
-            )
+                    attachment_keys = other_file_list[:1]
+            # sent with copies of the attachments, the BRQ files can be moved once it returns
+            invoke_response = NotificationDispatcher(
+                self.CEE_NOTIFICATION_ENGINE,
+                os.environ["EBOOKINGS_S3_TEMP_BUCKET"],
+                self.step_function,
+            ).send_email(payload, attachment_keys)
             self.custom_logger.info(f"Email notification sent: {invoke_response}")
             return invoke_response
         except Exception as e:
@@ -514,6 +611,7 @@ class CommonUtils:
         wc_date = wc_date.strftime("%Y-%m-%d")
         return wc_date
 
+    @_effect(deferrable=False)
     def create_file_in_s3(self, lines, bucket_name, file_key):
         """
         Function to create file in specified S3 bucket
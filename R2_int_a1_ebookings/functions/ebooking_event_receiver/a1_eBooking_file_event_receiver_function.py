@@ -10,6 +10,7 @@ import boto3
 import botocore
 import uuid
 from swm_logger.swm_common_logger import LambdaLogger
+from event_idempotency import event_idempotency
 
 custom_logger = LambdaLogger(log_group_name=os.environ["LOG_GROUP_NAME"])
 UnqID = uuid.uuid4()
@@ -51,6 +52,28 @@ def extract_brq_file(filekey, source_bucket_name, temp_bucket, event_id, context
 
 
 def lambda_handler(event, context):
+    # claimed until the invocation times out, a retry after a timeout is processed
+    idempotency_key = event_idempotency.claim(
+        event["Records"][0],
+        context.get_remaining_time_in_millis() / 1000 if context else None,
+    )
+    if idempotency_key is None:
+        custom_logger.info(
+            "Duplicate S3 event ignored",
+            context,
+            integrationId=INTEGRATION_NUMBER,
+            data=event,
+        )
+        return
+    try:
+        process_event(event, context, idempotency_key)
+    except Exception:
+        event_idempotency.release(idempotency_key)
+        raise
+    event_idempotency.complete(idempotency_key)
+
+
+def process_event(event, context, idempotency_key):
     lambda_client = boto3.client("lambda")
     event["id"] = str(uuid.uuid4())
     event_id = event["id"]
@@ -81,7 +104,7 @@ def lambda_handler(event, context):
         input_msg = {
             "integrationId": INTEGRATION_NUMBER,
             "groupId": INTEGRATION_NUMBER + str(event_id),
-            "deduplicationId": INTEGRATION_NUMBER + str(event_id),
+            "deduplicationId": INTEGRATION_NUMBER + idempotency_key,
             "correlationId": INTEGRATION_NUMBER + str(event_id),
             "processingStateMachineARN": processing_state_machine_arn,
             "payload": event,
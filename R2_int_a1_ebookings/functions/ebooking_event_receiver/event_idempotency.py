@@ -0,0 +1,235 @@
+"""
+Idempotency of the S3 events received by the event receiver.
+
+S3 delivers an event at least once, so the same upload of a zip can start the receiver twice. An event is identified
+by the bucket, key, ETag and sequencer of its object: the first receiver claiming it in the store processes the zip,
+the other ones return at once. The claim expires when the invocation times out, so the retry of an invocation that
+timed out or ran out of memory is processed. It is kept for IDEMPOTENCY_TTL_SECONDS once the event is processed, and
+released when the processing fails.
+
+IDEMPOTENCY_STORE_PATH selects the store: "s3://bucket/prefix" (objects created with a conditional put), a local
+directory such as /tmp/idempotency, or an in-memory store of the container when it is not set.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+# the object was created or changed since it was read
+CONDITIONAL_WRITE_ERRORS = ("PreconditionFailed", "ConditionalRequestConflict", "412")
+
+logger = logging.getLogger(__name__)
+
+
+def event_key(record: dict) -> str:
+    """
+    The key of the object version of an S3 event record
+    """
+    s3 = record["s3"]
+    identity = "/".join(
+        [
+            s3["bucket"]["name"],
+            s3["object"]["key"],
+            s3["object"].get("eTag", ""),
+            s3["object"].get("sequencer", ""),
+        ]
+    )
+    return hashlib.sha256(identity.encode("utf-8")).hexdigest()
+
+
+class MemoryStore:
+    """
+    The claims of the container
+    """
+
+    def __init__(self):
+        self._claims = {}
+        self._lock = threading.Lock()
+
+    def claim(self, key: str, now: float, expires_at: float) -> bool:
+        with self._lock:
+            if self._claims.get(key, now) > now:
+                return False
+            self._claims[key] = expires_at
+            return True
+
+    def extend(self, key: str, expires_at: float):
+        with self._lock:
+            self._claims[key] = expires_at
+
+    def release(self, key: str):
+        with self._lock:
+            self._claims.pop(key, None)
+
+
+class LocalFileStore:
+    """
+    The claims as JSON files of a directory, created exclusively
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def claim(self, key: str, now: float, expires_at: float) -> bool:
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{key}.json")
+        for _ in range(2):
+            try:
+                claim_file = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    with open(path) as existing_file:
+                        if json.load(existing_file)["expiresAt"] > now:
+                            return False
+                except (OSError, ValueError, KeyError):
+                    # released or being written meanwhile
+                    return False
+                os.remove(path)
+                continue
+            with os.fdopen(claim_file, "w") as new_file:
+                json.dump({"expiresAt": expires_at}, new_file)
+            return True
+        return False
+
+    def extend(self, key: str, expires_at: float):
+        path = os.path.join(self.directory, f"{key}.json")
+        # written aside and renamed, a reader never sees a partial file
+        with open(f"{path}.{os.getpid()}.tmp", "w") as claim_file:
+            json.dump({"expiresAt": expires_at}, claim_file)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+    def release(self, key: str):
+        try:
+            os.remove(os.path.join(self.directory, f"{key}.json"))
+        except FileNotFoundError:
+            pass
+
+
+class S3Store:
+    """
+    The claims as JSON objects under a prefix of a bucket, created with a conditional put (If-None-Match) and taken
+    over once expired with a conditional put on the ETag read (If-Match)
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", s3_client=None):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self._s3_client = s3_client
+
+    @property
+    def s3_client(self):
+        if self._s3_client is None:
+            self._s3_client = boto3.client("s3")
+        return self._s3_client
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}.json" if self.prefix else f"{key}.json"
+
+    def claim(self, key: str, now: float, expires_at: float) -> bool:
+        body = json.dumps({"expiresAt": expires_at}).encode("utf-8")
+        if self.__put(key, body, IfNoneMatch="*"):
+            return True
+        try:
+            existing = self.s3_client.get_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                # released meanwhile
+                return self.__put(key, body, IfNoneMatch="*")
+            raise
+        if json.loads(existing["Body"].read())["expiresAt"] > now:
+            return False
+        return self.__put(key, body, IfMatch=existing["ETag"])
+
+    def extend(self, key: str, expires_at: float):
+        self.__put(key, json.dumps({"expiresAt": expires_at}).encode("utf-8"))
+
+    def release(self, key: str):
+        self.s3_client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def __put(self, key: str, body: bytes, **condition) -> bool:
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket,
+                Key=self._key(key),
+                Body=body,
+                ContentType="application/json",
+                **condition,
+            )
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in CONDITIONAL_WRITE_ERRORS:
+                return False
+            raise
+        return True
+
+
+def store_from_path(path: str):
+    """
+    The store of IDEMPOTENCY_STORE_PATH, the in-memory store when it is not set
+    """
+    if not path:
+        return MemoryStore()
+    matches = re.match(r"s3:\/\/([a-zA-Z0-9_\-\.]+)\/?(.*)", path)
+    if matches:
+        return S3Store(matches[1], matches[2])
+    return LocalFileStore(path)
+
+
+class EventIdempotency:
+    def __init__(self, store=None, ttl_seconds: float = None, clock=time.time):
+        if ttl_seconds is None:
+            ttl_seconds = float(
+                os.environ.get("IDEMPOTENCY_TTL_SECONDS", DEFAULT_TTL_SECONDS)
+            )
+        self.store = store if store is not None else MemoryStore()
+        self.ttl_seconds = ttl_seconds
+        # the claims are shared by containers, so they are stamped with the wall clock
+        self._clock = clock
+
+    def claim(self, record: dict, in_progress_seconds: float = None):
+        """
+        The key of the event when it is claimed for processing, None when it is a duplicate
+        :param in_progress_seconds: expiry of the claim until the processing completes, the TTL when not given
+        """
+        key = event_key(record)
+        now = self._clock()
+        if in_progress_seconds is None:
+            in_progress_seconds = self.ttl_seconds
+        try:
+            if not self.store.claim(key, now, now + in_progress_seconds):
+                return None
+        except Exception as e:
+            # a duplicate processed rather than an event lost
+            logger.warning(f"Event {key} processed without its claim: {e}")
+        return key
+
+    def complete(self, key: str):
+        """
+        Keep the claim of a processed event for the TTL
+        """
+        try:
+            self.store.extend(key, self._clock() + self.ttl_seconds)
+        except Exception as e:
+            # the duplicates are dropped until the claim expires anyway
+            logger.warning(f"Claim of event {key} not extended: {e}")
+
+    def release(self, key: str):
+        """
+        Forget the claim of a failed processing, so that the retry of the event is processed
+        """
+        try:
+            self.store.release(key)
+        except Exception as e:
+            logger.warning(f"Claim of event {key} not released: {e}")
+
+
+event_idempotency = EventIdempotency(
+    store_from_path(os.environ.get("IDEMPOTENCY_STORE_PATH"))
+)
@@ -0,0 +1,181 @@
+"""
+Cache of the Landmark products of the product date range validation, keyed by external code.
+
+Landmark answers a Products query with the products of the external code valid over the whole campaign date range.
+A product valid over a range is valid over any range inside it, so an answer is kept with its validity window and
+used for the queries whose range is inside that window. The window is the date range of the query, widened to the
+validity of the products (startDate/endDate) when they carry it. For LMK_PRODUCT_CACHE_TTL_SECONDS.
+
+"No product" is cached too, for LMK_PRODUCT_CACHE_NEGATIVE_TTL_SECONDS: no product is valid over a range containing
+the one queried either, so it answers the queries whose range contains it.
+
+The dates are ISO dates (YYYY-MM-DD), compared as strings. A product added in Landmark is seen once the entries
+covering its dates have expired.
+"""
+
+import copy
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL_SECONDS = 15 * 60
+DEFAULT_NEGATIVE_TTL_SECONDS = 5 * 60
+DEFAULT_MAX_PRODUCTS = 512
+VALIDITY_FIELDS = ("startDate", "endDate")
+
+logger = logging.getLogger(__name__)
+
+
+def _date(value) -> str:
+    return str(value)[:10]
+
+
+def _validity_window(products: list, start_date: str, end_date: str):
+    """
+    The range all the products are valid over, the queried range when they don't carry their validity
+    """
+    starts = [product.get(VALIDITY_FIELDS[0]) for product in products]
+    ends = [product.get(VALIDITY_FIELDS[1]) for product in products]
+    if not all(starts) or not all(ends):
+        return start_date, end_date
+    window_start = max(_date(start) for start in starts)
+    window_end = min(_date(end) for end in ends)
+    if window_start > start_date or window_end < end_date:
+        # not what Landmark answered for, the queried range is kept
+        return start_date, end_date
+    return window_start, window_end
+
+
+class LandmarkProductCache:
+    """
+    The counters:
+    - hits: answered with products
+    - negativeHits: answered with "no product"
+    - misses: queried with Landmark
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = None,
+        negative_ttl_seconds: float = None,
+        max_products: int = None,
+        clock=time.monotonic,
+    ):
+        if ttl_seconds is None:
+            ttl_seconds = float(
+                os.environ.get("LMK_PRODUCT_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)
+            )
+        if negative_ttl_seconds is None:
+            negative_ttl_seconds = float(
+                os.environ.get(
+                    "LMK_PRODUCT_CACHE_NEGATIVE_TTL_SECONDS",
+                    DEFAULT_NEGATIVE_TTL_SECONDS,
+                )
+            )
+        if max_products is None:
+            max_products = int(
+                os.environ.get("LMK_PRODUCT_CACHE_MAX_PRODUCTS", DEFAULT_MAX_PRODUCTS)
+            )
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_products = max_products
+        self._clock = clock
+        self._lock = threading.Lock()
+        # {external code: [{"start", "end", "products", "expiresAt"}]}
+        self._windows = OrderedDict()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+
+    def lookup(self, external_code: str, start_date: str, end_date: str):
+        """
+        The cached products of the external code over the range, [] for a cached "no product", None when
+        Landmark has to be queried
+        """
+        now = self._clock()
+        with self._lock:
+            windows = [
+                window
+                for window in self._windows.get(external_code, [])
+                if window["expiresAt"] > now
+            ]
+            for window in windows:
+                if window["products"]:
+                    answers = (
+                        window["start"] <= start_date and end_date <= window["end"]
+                    )
+                else:
+                    answers = (
+                        start_date <= window["start"] and window["end"] <= end_date
+                    )
+                if answers:
+                    self._windows.move_to_end(external_code)
+                    if window["products"]:
+                        self.hits += 1
+                    else:
+                        self.negative_hits += 1
+                    return copy.deepcopy(window["products"])
+            self.misses += 1
+            return None
+
+    def store(self, external_code: str, start_date: str, end_date: str, products: list):
+        """
+        Keep the Landmark answer of a query, products being [] when there is no product
+        """
+        now = self._clock()
+        if products:
+            window_start, window_end = _validity_window(products, start_date, end_date)
+            expires_at = now + self.ttl_seconds
+        else:
+            window_start, window_end = start_date, end_date
+            expires_at = now + self.negative_ttl_seconds
+        with self._lock:
+            windows = [
+                window
+                for window in self._windows.get(external_code, [])
+                if window["expiresAt"] > now
+                # "no product" doesn't hold any more over the ranges of the products found
+                and not (
+                    products
+                    and not window["products"]
+                    and window_start <= window["end"]
+                    and window["start"] <= window_end
+                )
+            ]
+            windows.append(
+                {
+                    "start": window_start,
+                    "end": window_end,
+                    "products": copy.deepcopy(products),
+                    "expiresAt": expires_at,
+                }
+            )
+            self._windows[external_code] = windows
+            self._windows.move_to_end(external_code)
+            while len(self._windows) > self.max_products:
+                self._windows.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.negative_hits + self.misses
+        return {
+            "hits": self.hits,
+            "negativeHits": self.negative_hits,
+            "misses": self.misses,
+            "hitRate": (
+                round((self.hits + self.negative_hits) / lookups, 4)
+                if lookups
+                else None
+            ),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._windows.clear()
+            self.hits = 0
+            self.negative_hits = 0
+            self.misses = 0
+
+
+landmark_product_cache = LandmarkProductCache()
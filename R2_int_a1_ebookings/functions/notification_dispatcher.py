@@ -0,0 +1,81 @@
+"""
+Dispatch of the emails and Salesforce cases with attachments of the BRQ files.
+
+The attachments are read by the notification engine (CEE) after the request is sent, while the failing validations
+move the BRQ files out of the temp bucket right after it. So the attachments are copied (a server-side copy of the
+objects, no download) to NOTIFICATION_SNAPSHOT_PREFIX/<snapshot id>/ in the same bucket and the request refers to
+the copies: the request is started and the caller goes on, the BRQ files can be moved at once. The copies are
+deleted with the other objects of the temp bucket by its lifecycle rule.
+"""
+
+import json
+import logging
+import posixpath
+import uuid
+
+import boto3
+
+from functions.s3_utils import DEFAULT_REGION
+
+NOTIFICATION_SNAPSHOT_PREFIX = "notification-attachments"
+
+logger = logging.getLogger(__name__)
+
+
+def snapshot_attachments(bucket: str, keys: list, s3_client=None) -> dict:
+    """
+    Copy the objects of keys to a new snapshot directory of the bucket
+    :return: {key: key of the copy}
+    """
+    if not keys:
+        return {}
+    s3_client = s3_client or boto3.client("s3", region_name=DEFAULT_REGION)
+    snapshot = f"{NOTIFICATION_SNAPSHOT_PREFIX}/{uuid.uuid4().hex}"
+    copies = {}
+    for key in keys:
+        copy_key = f"{snapshot}/{posixpath.basename(key)}"
+        s3_client.copy_object(
+            Bucket=bucket, Key=copy_key, CopySource={"Bucket": bucket, "Key": key}
+        )
+        copies[key] = copy_key
+    return copies
+
+
+class NotificationDispatcher:
+    """
+    Sends the email requests to the notification engine state machine
+    """
+
+    def __init__(
+        self, state_machine_arn: str, bucket: str, step_function=None, s3_client=None
+    ):
+        self.state_machine_arn = state_machine_arn
+        self.bucket = bucket
+        self._step_function = step_function
+        self._s3_client = s3_client
+
+    @property
+    def step_function(self):
+        if self._step_function is None:
+            self._step_function = boto3.client(
+                "stepfunctions", region_name=DEFAULT_REGION
+            )
+        return self._step_function
+
+    def send_email(self, payload: dict, attachment_keys: list = ()) -> dict:
+        """
+        Start the notification of payload with the snapshots of the attachments (keys of the bucket) as its files,
+        returns the StartExecution response without waiting for the email
+        """
+        copies = snapshot_attachments(
+            self.bucket, list(attachment_keys), self._s3_client
+        )
+        if copies:
+            payload["body"]["files"] = [
+                {"path": f"s3://{self.bucket}/{copy_key}"}
+                for copy_key in copies.values()
+            ]
+        logger.info(f"Email notification request payload to CEE: {payload}")
+        return self.step_function.start_execution(
+            stateMachineArn=self.state_machine_arn, input=json.dumps(payload)
+        )
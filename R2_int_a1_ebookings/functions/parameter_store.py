@@ -0,0 +1,128 @@
+"""
+AWS Parameter Store facade with a cache surviving the invocations of a warm Lambda container.
+
+A Lambda module declares the parameters it reads (parameter_store.declare) when it is imported. The first get()
+then fetches all the declared parameters with get_parameters, MAX_BATCH_SIZE names per request, instead of one
+get_parameter per name. The values are cached for PARAMETER_STORE_TTL_SECONDS, after that the expired parameters
+are fetched again, in batches too.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+# get_parameters accepts up to 10 names
+MAX_BATCH_SIZE = 10
+DEFAULT_TTL_SECONDS = 300
+
+logger = logging.getLogger(__name__)
+
+
+class ParameterStore:
+    """
+    The decrypted values of SSM parameters by name, cached for ttl_seconds
+    """
+
+    def __init__(self, ttl_seconds: float = None, clock=time.monotonic):
+        if ttl_seconds is None:
+            ttl_seconds = float(
+                os.environ.get("PARAMETER_STORE_TTL_SECONDS", DEFAULT_TTL_SECONDS)
+            )
+        self.ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._declared = {}
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def declare(self, *names: str):
+        """
+        Parameters to fetch with the first parameter read. None and empty names are ignored, so os.environ.get of
+        a variable not set for this Lambda can be given.
+        """
+        with self._lock:
+            for name in names:
+                if name:
+                    self._declared[name] = True
+
+    def get(self, name: str, ssm_client=None) -> str:
+        """
+        The value of a parameter, the expired declared parameters are fetched with it.
+        :raise ClientError: ParameterNotFound when the parameter doesn't exist
+        """
+        with self._lock:
+            now = self._clock()
+            cached = self._values.get(name)
+            if cached is not None and now - cached[1] < self.ttl_seconds:
+                return cached[0]
+            names = [name] + [
+                declared
+                for declared in self._declared
+                if declared != name and self._is_expired(declared, now)
+            ]
+        self._fetch(names, ssm_client)
+
+        with self._lock:
+            cached = self._values.get(name)
+        if cached is None:
+            raise ClientError(
+                {
+                    "Error": {
+                        "Code": "ParameterNotFound",
+                        "Message": f"Parameter {name} not found.",
+                    }
+                },
+                "GetParameters",
+            )
+        return cached[0]
+
+    def prefetch(self, ssm_client=None):
+        """
+        Fetch the declared parameters not cached or expired
+        """
+        with self._lock:
+            now = self._clock()
+            names = [name for name in self._declared if self._is_expired(name, now)]
+        if names:
+            self._fetch(names, ssm_client)
+
+    def clear(self):
+        """
+        Forget the cached values, the declared names are kept
+        """
+        with self._lock:
+            self._values.clear()
+
+    def _is_expired(self, name: str, now: float) -> bool:
+        cached = self._values.get(name)
+        return cached is None or now - cached[1] >= self.ttl_seconds
+
+    def _fetch(self, names: list, ssm_client=None):
+        ssm_client = ssm_client or boto3.client("ssm")
+        for start in range(0, len(names), MAX_BATCH_SIZE):
+            batch = names[start : start + MAX_BATCH_SIZE]
+            response = ssm_client.get_parameters(Names=batch, WithDecryption=True)
+            fetched_at = self._clock()
+            with self._lock:
+                for parameter in response.get("Parameters", []):
+                    # a parameter requested by ARN is returned with its name
+                    for key in (parameter.get("Name"), parameter.get("ARN")):
+                        if key in batch:
+                            self._values[key] = (parameter["Value"], fetched_at)
+            if response.get("InvalidParameters"):
+                logger.warning(
+                    f"SSM parameters not found: {response['InvalidParameters']}"
+                )
+
+
+parameter_store = ParameterStore()
+
+
+def get_parameter(name: str) -> str:
+    """
+    The value of an SSM parameter from the container cache, see ParameterStore.get
+    """
+    return parameter_store.get(name)
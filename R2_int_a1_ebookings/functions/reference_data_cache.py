@@ -0,0 +1,125 @@
+"""
+Cache of the reference data files (the mapping CSVs in the config bucket) for the warm Lambda containers.
+
+The module level cache survives the invocations of a warm container. An entry is served as it is for
+REFERENCE_DATA_REVALIDATE_SECONDS after it was read or revalidated; after that the object is read again with a
+conditional GET (If-None-Match with the ETag of the cached content) and the content is downloaded and parsed again
+only when it changed.
+
+The parsed value is shared by all the callers, it must not be modified.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import boto3
+from botocore.exceptions import ClientError
+
+DEFAULT_REVALIDATE_SECONDS = 300
+
+logger = logging.getLogger(__name__)
+
+
+class _Entry:
+    __slots__ = ["etag", "value", "checked_at"]
+
+    def __init__(self, etag: str, value, checked_at: float):
+        self.etag = etag
+        self.value = value
+        self.checked_at = checked_at
+
+
+class ReferenceDataCache:
+    """
+    Parsed S3 objects keyed by bucket, key and parser, revalidated with their ETag.
+
+    The counters:
+    - hits: served from the cache without any S3 request
+    - notModified: served from the cache after a conditional GET answered 304 Not Modified
+    - misses: downloaded and parsed, the object wasn't cached yet or has changed
+    """
+
+    def __init__(self, revalidate_seconds: float = None, clock=time.monotonic):
+        if revalidate_seconds is None:
+            revalidate_seconds = float(
+                os.environ.get(
+                    "REFERENCE_DATA_REVALIDATE_SECONDS", DEFAULT_REVALIDATE_SECONDS
+                )
+            )
+        self.revalidate_seconds = revalidate_seconds
+        self._clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.not_modified = 0
+        self.misses = 0
+
+    def get(self, bucket: str, key: str, parse, s3_client=None):
+        """
+        The parsed content of s3://bucket/key.
+        :param parse: function parsing the object content (bytes), the same function must be given for the same
+            parsed value to be reused
+        """
+        cache_key = (bucket, key, parse)
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            now = self._clock()
+            if entry is not None and now - entry.checked_at < self.revalidate_seconds:
+                self.hits += 1
+                return entry.value
+
+        s3_client = s3_client or boto3.client("s3")
+        request = {"Bucket": bucket, "Key": key}
+        if entry is not None and entry.etag:
+            request["IfNoneMatch"] = entry.etag
+        try:
+            response = s3_client.get_object(**request)
+        except ClientError as e:
+            if "IfNoneMatch" not in request or not _is_not_modified(e):
+                raise
+            with self._lock:
+                entry.checked_at = now
+                self.not_modified += 1
+            return entry.value
+
+        value = parse(response["Body"].read())
+        with self._lock:
+            self._entries[cache_key] = _Entry(response.get("ETag"), value, now)
+            self.misses += 1
+        logger.info(f"Reference data s3://{bucket}/{key} loaded. {self.stats()}")
+        return value
+
+    def stats(self) -> dict:
+        return {
+            "hits": self.hits,
+            "notModified": self.not_modified,
+            "misses": self.misses,
+        }
+
+    def clear(self):
+        """
+        Forget the cached objects and reset the counters
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.not_modified = 0
+            self.misses = 0
+
+
+def _is_not_modified(error: ClientError) -> bool:
+    return error.response.get("ResponseMetadata", {}).get(
+        "HTTPStatusCode"
+    ) == 304 or error.response.get("Error", {}).get("Code") in ("304", "NotModified")
+
+
+reference_data_cache = ReferenceDataCache()
+
+
+def get_reference_data(bucket: str, key: str, parse, s3_client=None):
+    """
+    The parsed content of s3://bucket/key from the container cache, see ReferenceDataCache.get
+    """
+    return reference_data_cache.get(bucket, key, parse, s3_client)
@@ -0,0 +1,131 @@
+"""
+Streaming upload of an S3 object.
+
+The content written is buffered up to part_size and sent as the parts of a multipart upload, only one part is held
+in memory. The object is created by close. An object smaller than part_size is sent with a single put_object, the
+upload is only started once a part is full. On an exception in a with block, the upload is aborted and no object is
+created.
+"""
+
+import logging
+
+import boto3
+
+from functions.s3_utils import DEFAULT_REGION
+
+# S3 requires the parts but the last one to be at least 5 MiB
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+logger = logging.getLogger(__name__)
+
+
+class S3MultipartWriter:
+    """
+    Binary writer of s3://bucket/key
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        key: str,
+        part_size: int = DEFAULT_PART_SIZE,
+        s3_client=None,
+    ):
+        if part_size < MIN_PART_SIZE:
+            raise ValueError(f"The part size must be at least {MIN_PART_SIZE} bytes.")
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.s3_client = s3_client or boto3.client("s3", region_name=DEFAULT_REGION)
+        self.upload_id = None
+        self.parts = []
+        self.size = 0
+        self.closed = False
+        self._buffer = bytearray()
+
+    @property
+    def uri(self) -> str:
+        return f"s3://{self.bucket}/{self.key}"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+        return False
+
+    def write(self, data: bytes) -> int:
+        if self.closed:
+            raise ValueError(f"{self.uri} is closed.")
+        self._buffer += data
+        self.size += len(data)
+        while len(self._buffer) >= self.part_size:
+            part = bytes(self._buffer[: self.part_size])
+            del self._buffer[: self.part_size]
+            self.__upload_part(part)
+        return len(data)
+
+    def close(self):
+        """
+        Create the object with the content written
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self.upload_id is None:
+            self.s3_client.put_object(
+                Body=bytes(self._buffer), Bucket=self.bucket, Key=self.key
+            )
+            self._buffer = bytearray()
+            return
+        try:
+            if self._buffer:
+                self.__upload_part(bytes(self._buffer))
+                self._buffer = bytearray()
+            self.s3_client.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+                MultipartUpload={"Parts": self.parts},
+            )
+        except Exception:
+            self.__abort_upload()
+            raise
+
+    def abort(self):
+        """
+        Drop the content written, no object is created
+        """
+        self.closed = True
+        self._buffer = bytearray()
+        if self.upload_id is not None:
+            self.__abort_upload()
+
+    def __upload_part(self, part: bytes):
+        if self.upload_id is None:
+            self.upload_id = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key
+            )["UploadId"]
+        part_number = len(self.parts) + 1
+        response = self.s3_client.upload_part(
+            Body=part,
+            Bucket=self.bucket,
+            Key=self.key,
+            PartNumber=part_number,
+            UploadId=self.upload_id,
+        )
+        self.parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    def __abort_upload(self):
+        try:
+            self.s3_client.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+            )
+        except Exception as e:
+            # the incomplete upload is removed by the bucket lifecycle rule, if any
+            logger.warning(f"Multipart upload of {self.uri} not aborted: {e}")
+        self.upload_id = None
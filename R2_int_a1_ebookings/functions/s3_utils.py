@@ -9,7 +9,7 @@ def save_to_s3(Body, Bucket, Key, Region=None):
     return response
 
 
-def read_from_s3(Bucket, Key, Encoding="utf-8", Region=None):
+def read_from_s3(Bucket, Key, Encoding="utf-8", Region=None, Client=None):
     """
     Read an object content from S3
 
@@ -17,8 +17,9 @@ def read_from_s3(Bucket, Key, Encoding="utf-8", Region=None):
     :param Key str: The key of the object
     :param Encoding str: Optional and the default value is utf-8. If Encoding is None or "binary", the raw binary data will be returned.
     :param Region str: Optional and the default value is ap-southeast-2 Sydney.
+    :param Client: Optional S3 client to read with, e.g. one shared by threads. A new client is created by default.
     """
-    client = boto3.client("s3", region_name=(Region or DEFAULT_REGION))
+    client = Client or boto3.client("s3", region_name=(Region or DEFAULT_REGION))
     s3_object = client.get_object(Bucket=Bucket, Key=Key)
     content = s3_object["Body"].read()
     if not Encoding or Encoding == "binary":
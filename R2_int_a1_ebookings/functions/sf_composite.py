@@ -0,0 +1,192 @@
+"""
+Batcher of the Salesforce sObject writes of a Lambda invocation, sent as composite requests through the adaptor.
+
+The writes are queued with create, update, upsert (or add for any composite sub-request) and sent by flush, up to
+MAX_SUBREQUESTS sub-requests per COMPOSITE invocation of the adaptor. Each queued write returns a CompositeResult,
+filled with the sub-response of its referenceId when the batch is flushed.
+
+allOrNone applies to one composite request: when more than MAX_SUBREQUESTS writes are queued, the requests already
+sent are not rolled back by a later failing one. A sub-request may refer to an earlier one of the same request
+("@{referenceId.id}"), flush raises ValueError when the two end up in different requests.
+"""
+
+import json
+import logging
+import re
+
+from functions.adaptor_client import AdaptorClient, adaptor_client
+
+# the composite API accepts up to 25 sub-requests
+MAX_SUBREQUESTS = 25
+API_VERSION = "v58.0"
+
+logger = logging.getLogger(__name__)
+
+
+class CompositeResult:
+    """
+    The sub-response of a queued write, response stays None until the batch is flushed
+    """
+
+    def __init__(self, reference_id: str):
+        self.reference_id = reference_id
+        self.response = None
+
+    @property
+    def status_code(self):
+        return (self.response or {}).get("httpStatusCode")
+
+    @property
+    def body(self):
+        return (self.response or {}).get("body")
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code is not None and 200 <= self.status_code < 300
+
+    @property
+    def id(self):
+        """
+        The Id of the created record, None when the write didn't create one
+        """
+        return self.body.get("id") if isinstance(self.body, dict) else None
+
+
+class CompositeBatcher:
+    """
+    The queued sub-requests of a Lambda invocation. Used as a context manager, the batch is flushed on exit unless
+    an exception is raised.
+    """
+
+    def __init__(self, lambda_client=None, adaptor_arn: str = None, all_or_none=True):
+        # the container adaptor client unless a Lambda client is given
+        self._adaptor_client = (
+            adaptor_client if lambda_client is None else AdaptorClient(lambda_client)
+        )
+        self._adaptor_arn = adaptor_arn
+        self.all_or_none = all_or_none
+        self._pending = []
+        self._reference_ids = set()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.flush()
+        return False
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(
+        self, method: str, url: str, body: dict = None, reference_id: str = None
+    ) -> CompositeResult:
+        """
+        Queue a composite sub-request, the referenceId is generated when it is not given
+        """
+        if reference_id is None:
+            reference_id = f"ref{len(self._reference_ids) + 1}"
+            while reference_id in self._reference_ids:
+                reference_id += "_"
+        elif reference_id in self._reference_ids:
+            raise ValueError(f"Duplicate composite referenceId '{reference_id}'.")
+        self._reference_ids.add(reference_id)
+        sub_request = {"method": method, "url": url, "referenceId": reference_id}
+        if body is not None:
+            sub_request["body"] = body
+        result = CompositeResult(reference_id)
+        self._pending.append((sub_request, result))
+        return result
+
+    def create(
+        self, sobject: str, body: dict, reference_id: str = None
+    ) -> CompositeResult:
+        return self.add("POST", _sobject_url(sobject), body, reference_id)
+
+    def update(
+        self, sobject: str, record_id: str, body: dict, reference_id: str = None
+    ) -> CompositeResult:
+        return self.add("PATCH", _sobject_url(sobject, record_id), body, reference_id)
+
+    def upsert(
+        self,
+        sobject: str,
+        external_id_field: str,
+        external_id: str,
+        body: dict,
+        reference_id: str = None,
+    ) -> CompositeResult:
+        return self.add(
+            "PATCH",
+            _sobject_url(sobject, external_id_field, external_id),
+            body,
+            reference_id,
+        )
+
+    def flush(self) -> list:
+        """
+        Send the queued sub-requests, MAX_SUBREQUESTS per composite request. When a request fails, its
+        sub-requests and the ones not sent yet stay queued for the next flush and the error is raised.
+        :return: the adaptor responses, one per composite request
+        """
+        responses = []
+        batches = _batches(self._pending)
+        self._pending = []
+        for index, batch in enumerate(batches):
+            try:
+                response = self.__send(batch)
+            except Exception:
+                self._pending = [
+                    queued for unsent in batches[index:] for queued in unsent
+                ] + self._pending
+                raise
+            responses.append(response)
+            sub_responses = {
+                sub_response.get("referenceId"): sub_response
+                for sub_response in (response or {}).get("compositeResponse", [])
+            }
+            for sub_request, result in batch:
+                result.response = sub_responses.get(sub_request["referenceId"])
+        return responses
+
+    def __send(self, batch: list):
+        payload = {
+            "invocationType": "COMPOSITE",
+            "payload": {
+                "allOrNone": self.all_or_none,
+                "compositeRequest": [sub_request for sub_request, _ in batch],
+            },
+        }
+        response = self._adaptor_client.salesforce(payload, self._adaptor_arn).json()
+        logger.info(f"Composite request of {len(batch)} sub-requests: {response}")
+        return response
+
+
+def _sobject_url(sobject: str, *path: str) -> str:
+    return "/".join([f"/services/data/{API_VERSION}/sobjects", sobject, *path])
+
+
+def _references(sub_request: dict) -> set:
+    return set(re.findall(r"@\{(\w+)\.", json.dumps(sub_request)))
+
+
+def _batches(pending: list) -> list:
+    """
+    pending cut in batches of up to MAX_SUBREQUESTS.
+    :raise ValueError: a sub-request refers to one of another batch
+    """
+    batches = [
+        pending[start : start + MAX_SUBREQUESTS]
+        for start in range(0, len(pending), MAX_SUBREQUESTS)
+    ]
+    for batch in batches:
+        reference_ids = {sub_request["referenceId"] for sub_request, _ in batch}
+        for sub_request, _ in batch:
+            missing = _references(sub_request) - reference_ids
+            if missing:
+                raise ValueError(
+                    f"Composite sub-request '{sub_request['referenceId']}' refers to {sorted(missing)} outside its "
+                    f"request of {MAX_SUBREQUESTS} sub-requests."
+                )
+    return batches
@@ -0,0 +1,238 @@
+"""
+Cache of the Salesforce metadata queries (record types) sent to the Salesforce adaptor. The users are not cached,
+they can be deactivated or replaced at any time.
+
+The responses are kept in an LRU of SF_METADATA_CACHE_MAX_ENTRIES entries surviving the invocations of a warm
+container, for SF_METADATA_CACHE_TTL_SECONDS. When SF_METADATA_CACHE_PATH is set ("s3://bucket/prefix" or a local
+directory such as /tmp/sf-metadata), the responses are shared through that backing too, so a cold container reads
+them there instead of querying Salesforce. The backing entries expire after the same TTL.
+
+Only the responses with records are cached, a query returning nothing is sent again the next time.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import boto3
+from botocore.exceptions import ClientError
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+
+logger = logging.getLogger(__name__)
+
+
+class LocalFileBacking:
+    """
+    The cached responses as JSON files of a directory
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def load(self, key: str):
+        try:
+            with open(os.path.join(self.directory, f"{key}.json")) as entry_file:
+                return json.load(entry_file)
+        except (OSError, ValueError):
+            return None
+
+    def store(self, key: str, entry: dict):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f"{key}.json")
+        # written aside and renamed, a reader never sees a partial file
+        with open(f"{path}.{os.getpid()}.tmp", "w") as entry_file:
+            json.dump(entry, entry_file)
+        os.replace(f"{path}.{os.getpid()}.tmp", path)
+
+
+class S3Backing:
+    """
+    The cached responses as JSON objects under a prefix of a bucket
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", s3_client=None):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self._s3_client = s3_client
+
+    @property
+    def s3_client(self):
+        if self._s3_client is None:
+            self._s3_client = boto3.client("s3")
+        return self._s3_client
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}.json" if self.prefix else f"{key}.json"
+
+    def load(self, key: str):
+        try:
+            response = self.s3_client.get_object(Bucket=self.bucket, Key=self._key(key))
+            return json.loads(response["Body"].read())
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                logger.warning(f"Salesforce metadata cache entry not read: {e}")
+            return None
+
+    def store(self, key: str, entry: dict):
+        self.s3_client.put_object(
+            Bucket=self.bucket,
+            Key=self._key(key),
+            Body=json.dumps(entry).encode("utf-8"),
+            ContentType="application/json",
+        )
+
+
+def backing_from_path(path: str):
+    """
+    The backing of SF_METADATA_CACHE_PATH, None when it is not set
+    """
+    if not path:
+        return None
+    matches = re.match(r"s3:\/\/([a-zA-Z0-9_\-\.]+)\/?(.*)", path)
+    if matches:
+        return S3Backing(matches[1], matches[2])
+    return LocalFileBacking(path)
+
+
+class SalesforceMetadataCache:
+    """
+    Adaptor responses keyed by SOQL query.
+
+    The counters:
+    - hits: served from the in-memory LRU
+    - backingHits: served from the backing, then kept in the LRU
+    - misses: queried with Salesforce
+    """
+
+    def __init__(
+        self,
+        max_entries: int = None,
+        ttl_seconds: float = None,
+        backing=None,
+        clock=time.time,
+    ):
+        if max_entries is None:
+            max_entries = int(
+                os.environ.get("SF_METADATA_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+            )
+        if ttl_seconds is None:
+            ttl_seconds = float(
+                os.environ.get("SF_METADATA_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)
+            )
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.backing = backing
+        # the backing is shared by containers, so the entries are stamped with the wall clock
+        self._clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.backing_hits = 0
+        self.misses = 0
+
+    def query(self, query: str, run_query) -> dict:
+        """
+        The adaptor response of a metadata query.
+        :param run_query: function sending the query to the adaptor and returning its response
+        """
+        key = hashlib.sha256(query.encode("utf-8")).hexdigest()
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.__is_fresh(entry, now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry["response"]
+
+        entry = self.__load(key, now)
+        if entry is not None:
+            with self._lock:
+                self.__keep(key, entry)
+                self.backing_hits += 1
+            return entry["response"]
+
+        response = run_query(query)
+        with self._lock:
+            self.misses += 1
+        if response.get("records"):
+            entry = {"storedAt": now, "response": response}
+            with self._lock:
+                self.__keep(key, entry)
+            self.__store(key, entry)
+        logger.info(f"Salesforce metadata queried: {query}. {self.stats()}")
+        return response
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.backing_hits + self.misses
+        return {
+            "hits": self.hits,
+            "backingHits": self.backing_hits,
+            "misses": self.misses,
+            "hitRate": (
+                round((self.hits + self.backing_hits) / lookups, 4) if lookups else None
+            ),
+        }
+
+    def clear(self):
+        """
+        Forget the in-memory entries and reset the counters, the backing is left as it is
+        """
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.backing_hits = 0
+            self.misses = 0
+
+    def __is_fresh(self, entry: dict, now: float) -> bool:
+        return now - entry["storedAt"] < self.ttl_seconds
+
+    def __keep(self, key: str, entry: dict):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def __load(self, key: str, now: float):
+        if self.backing is None:
+            return None
+        entry = self.backing.load(key)
+        if entry is None or not self.__is_fresh(entry, now):
+            return None
+        return entry
+
+    def __store(self, key: str, entry: dict):
+        if self.backing is None:
+            return
+        try:
+            self.backing.store(key, entry)
+        except Exception as e:
+            # the response is cached in memory anyway
+            logger.warning(f"Salesforce metadata cache entry not stored: {e}")
+
+
+sf_metadata_cache = SalesforceMetadataCache(
+    backing=backing_from_path(os.environ.get("SF_METADATA_CACHE_PATH"))
+)
+
+
+def query_salesforce_metadata(lambda_client, adaptor_arn: str, query: str) -> dict:
+    """
+    The adaptor response of a metadata query from the container cache, see SalesforceMetadataCache.query
+    """
+
+    def run_query(query):
+        invoke_response = lambda_client.invoke(
+            FunctionName=adaptor_arn,
+            InvocationType="RequestResponse",
+            Payload=json.dumps({"invocationType": "QUERY", "query": query}),
+        )
+        return json.loads(invoke_response["Payload"].read())
+
+    return sf_metadata_cache.query(query, run_query)
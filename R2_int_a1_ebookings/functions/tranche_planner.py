@@ -0,0 +1,174 @@
+"""
+Size of the spot pre-booking tranches adapted to the Landmark latency observed by CallSpotPrebooking.
+
+CallSpotPrebooking records the spots, the duration and the outcome (answered or QueueMessage) of each tranche
+in the stats store, per hour of the day (UTC) as Landmark's response time varies with it. PrepareSpotPayload then
+sizes the tranches of the next campaign so that a Landmark call takes TRANCHE_TARGET_SECONDS at the throughput
+observed during that hour (the whole day when the hour has less than MIN_OBSERVATIONS answered calls), bounded by
+TRANCHE_MIN_SIZE and the SPOT_HANDLING_LIMIT parameter. Without enough observations the tranches keep the
+SPOT_HANDLING_LIMIT size.
+
+The store is a JSON object of the TRANCHE_STATS_PATH backing ("s3://bucket/prefix" or a local directory, see
+sf_metadata_cache.backing_from_path), kept in memory when it is not set. The executions update it without locking,
+the observations of two executions finishing together may be partly lost.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+
+from functions.sf_metadata_cache import backing_from_path
+
+DEFAULT_TARGET_SECONDS = 120
+DEFAULT_MIN_SIZE = 500
+MIN_OBSERVATIONS = 3
+MAX_OBSERVATIONS_PER_HOUR = 50
+STATS_KEY = "landmark_spot_prebooking"
+
+logger = logging.getLogger(__name__)
+
+
+def tranche_spot_counts(
+    total_spots: int, tranche_size: int, tranche_count: int
+) -> list:
+    """
+    The number of spots of each tranche, the last one holding the remainder
+    """
+    return [
+        max(min(tranche_size, total_spots - index * tranche_size), 0)
+        for index in range(tranche_count)
+    ]
+
+
+class TrancheStatsStore:
+    """
+    The Landmark call observations per hour of the day: {"hours": {"13": [{"at", "spots", "seconds", "status"}]}}
+    """
+
+    def __init__(self, backing=None, clock=time.time):
+        self.backing = backing
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._stats = {"hours": {}}
+
+    def load(self) -> dict:
+        if self.backing is None:
+            return self._stats
+        try:
+            return self.backing.load(STATS_KEY) or {"hours": {}}
+        except Exception as e:
+            logger.warning(f"Tranche stats not read: {e}")
+            return {"hours": {}}
+
+    def record(self, observations: list):
+        """
+        Add the observations ({"spots", "seconds", "status"}) of the Landmark calls just made
+        """
+        if not observations:
+            return
+        now = self._clock()
+        hour = str(time.gmtime(now).tm_hour)
+        with self._lock:
+            stats = self.load()
+            hour_observations = stats["hours"].setdefault(hour, [])
+            hour_observations.extend(
+                dict(observation, at=round(now)) for observation in observations
+            )
+            del hour_observations[:-MAX_OBSERVATIONS_PER_HOUR]
+            if self.backing is None:
+                self._stats = stats
+                return
+            try:
+                self.backing.store(STATS_KEY, stats)
+            except Exception as e:
+                logger.warning(f"Tranche stats not stored: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._stats = {"hours": {}}
+
+
+class TranchePlanner:
+    """
+    Picks the tranche size from the observations of the store
+    """
+
+    def __init__(
+        self,
+        store: TrancheStatsStore,
+        target_seconds: float = None,
+        min_size: int = None,
+        clock=time.time,
+    ):
+        if target_seconds is None:
+            target_seconds = float(
+                os.environ.get("TRANCHE_TARGET_SECONDS", DEFAULT_TARGET_SECONDS)
+            )
+        if min_size is None:
+            min_size = int(os.environ.get("TRANCHE_MIN_SIZE", DEFAULT_MIN_SIZE))
+        self.store = store
+        self.target_seconds = target_seconds
+        self.min_size = min_size
+        self._clock = clock
+
+    def plan(self, max_size: int) -> dict:
+        """
+        The tranche size of the next campaign and the figures it comes from.
+        :param max_size: the SPOT_HANDLING_LIMIT, the size kept without enough observations
+        """
+        hour = str(time.gmtime(self._clock()).tm_hour)
+        hours = self.store.load()["hours"]
+        observations = hours.get(hour, [])
+        scope = "hour"
+        if len(_answered(observations)) < MIN_OBSERVATIONS:
+            observations = [
+                observation
+                for hour_observations in hours.values()
+                for observation in hour_observations
+            ]
+            scope = "day"
+        answered = _answered(observations)
+        plan = {
+            "size": max_size,
+            "source": "static",
+            "hour": int(hour),
+            "observations": len(answered),
+            "spotsPerSecond": None,
+            "unavailableRate": (
+                round(1 - len(answered) / len(observations), 4)
+                if observations
+                else None
+            ),
+        }
+        seconds = sum(observation["seconds"] for observation in answered)
+        if len(answered) >= MIN_OBSERVATIONS and seconds > 0:
+            spots_per_second = sum(observation["spots"] for observation in answered) / (
+                seconds
+            )
+            size = int(spots_per_second * self.target_seconds)
+            plan.update(
+                {
+                    "size": max(min(size, max_size), min(self.min_size, max_size)),
+                    "source": scope,
+                    "spotsPerSecond": round(spots_per_second, 2),
+                }
+            )
+        logger.info(json.dumps({"tranchePlan": plan}))
+        return plan
+
+
+def _answered(observations: list) -> list:
+    return [
+        observation
+        for observation in observations
+        if observation.get("status") != "QueueMessage"
+        and observation.get("seconds") is not None
+    ]
+
+
+tranche_stats = TrancheStatsStore(
+    backing_from_path(os.environ.get("TRANCHE_STATS_PATH"))
+)
+tranche_planner = TranchePlanner(tranche_stats)
@@ -0,0 +1,187 @@
+"""
+Run of the BRQ validation engine for a caller waiting for its output.
+
+VALIDATION_COMPLETION selects how the caller gets the output:
+    - "sync-express": StartSyncExecution of the express copy of the validation engine
+      (ARN_VALIDATION_ENGINE_EXPRESS_SERVICE), the call returns when the execution ends. Express executions are
+      limited to 5 minutes. The call is made with its own client, reading for longer than that and never retried:
+      a retry would start the execution again, and the rules would send their emails and cases again.
+    - "poll" (default): StartExecution of the standard validation engine, then DescribeExecution after 1, 2, 4...
+      seconds, at most POLL_MAX_INTERVAL_SECONDS apart, until the execution ends or VALIDATION_TIMEOUT_SECONDS
+    - "local": the rules engine run in the process, a stand-in for the state machine for the tests and local runs
+
+Every mode returns a response with the "status" and the JSON "output" of the execution, as DescribeExecution does,
+and raises RuntimeError when the execution doesn't succeed.
+"""
+
+import json
+import logging
+import os
+import time
+
+import boto3
+from botocore.config import Config
+
+from functions.s3_utils import DEFAULT_REGION
+
+SYNC_EXPRESS = "sync-express"
+POLL = "poll"
+LOCAL = "local"
+DEFAULT_TIMEOUT_SECONDS = 840
+DEFAULT_POLL_MAX_INTERVAL_SECONDS = 30
+START_ATTEMPTS = 3
+# longer than the 5 minutes of an express execution
+SYNC_READ_TIMEOUT_SECONDS = 330
+
+logger = logging.getLogger(__name__)
+
+
+def _start(start, **kwargs) -> dict:
+    """
+    Start the execution, again when the Lambda of the first state is not ready yet
+    """
+    for attempt in range(START_ATTEMPTS):
+        try:
+            return start(**kwargs)
+        except Exception as e:
+            # https://aws.amazon.com/premiumsupport/knowledge-center/lambda-troubleshoot-invoke-error-502-500/
+            if (
+                "CodeArtifactUserPendingException" not in str(e)
+                or attempt == START_ATTEMPTS - 1
+            ):
+                raise
+            logger.warning(f"Validation engine not ready, attempt {attempt}: {e}")
+            time.sleep(2**attempt)
+
+
+def _check(response: dict) -> dict:
+    if response["status"] != "SUCCEEDED":
+        raise RuntimeError(
+            f"Validation engine execution {response['status']}: "
+            f"{response.get('error', '')} {response.get('cause', '')}".strip()
+        )
+    return response
+
+
+def sync_step_function_client():
+    """
+    Step Functions client of StartSyncExecution: waits for the end of the execution and doesn't retry
+    """
+    return boto3.client(
+        "stepfunctions",
+        region_name=DEFAULT_REGION,
+        config=Config(
+            read_timeout=SYNC_READ_TIMEOUT_SECONDS,
+            retries={"total_max_attempts": 1},
+        ),
+    )
+
+
+class SyncExpressCompletion:
+    def __init__(self, state_machine_arn: str, step_function=None):
+        self.state_machine_arn = state_machine_arn
+        self.step_function = step_function or sync_step_function_client()
+
+    def run(self, event_data: dict) -> dict:
+        response = _start(
+            self.step_function.start_sync_execution,
+            stateMachineArn=self.state_machine_arn,
+            input=json.dumps(event_data),
+        )
+        logger.info(
+            f"Validation engine execution {response.get('executionArn')}: {response['status']}"
+        )
+        return _check(response)
+
+
+class PollingCompletion:
+    def __init__(
+        self,
+        state_machine_arn: str,
+        step_function=None,
+        timeout_seconds: float = None,
+        max_interval_seconds: float = None,
+        sleep=time.sleep,
+        clock=time.monotonic,
+    ):
+        if timeout_seconds is None:
+            timeout_seconds = float(
+                os.environ.get("VALIDATION_TIMEOUT_SECONDS", DEFAULT_TIMEOUT_SECONDS)
+            )
+        if max_interval_seconds is None:
+            max_interval_seconds = float(
+                os.environ.get(
+                    "POLL_MAX_INTERVAL_SECONDS", DEFAULT_POLL_MAX_INTERVAL_SECONDS
+                )
+            )
+        self.state_machine_arn = state_machine_arn
+        self.step_function = step_function or boto3.client(
+            "stepfunctions", region_name=DEFAULT_REGION
+        )
+        self.timeout_seconds = timeout_seconds
+        self.max_interval_seconds = max_interval_seconds
+        self._sleep = sleep
+        self._clock = clock
+
+    def run(self, event_data: dict) -> dict:
+        execution_arn = _start(
+            self.step_function.start_execution,
+            stateMachineArn=self.state_machine_arn,
+            input=json.dumps(event_data),
+        )["executionArn"]
+        deadline = self._clock() + self.timeout_seconds
+        interval = 1.0
+        while True:
+            response = self.step_function.describe_execution(executionArn=execution_arn)
+            if response["status"] != "RUNNING":
+                return _check(response)
+            remaining = deadline - self._clock()
+            if remaining <= 0:
+                raise RuntimeError(
+                    f"Validation engine execution {execution_arn} still running after "
+                    f"{self.timeout_seconds} seconds."
+                )
+            self._sleep(min(interval, remaining))
+            interval = min(interval * 2, self.max_interval_seconds)
+
+
+class LocalCompletion:
+    """
+    Stand-in for the state machine: handler(event, context) run in the process
+    """
+
+    def __init__(self, handler=None):
+        if handler is None:
+            from functions.validation_engine.rules_engine import RulesEngine
+
+            handler = RulesEngine().run
+        self.handler = handler
+
+    def run(self, event_data: dict) -> dict:
+        # a copy, as the input of an execution
+        event = json.loads(json.dumps(event_data))
+        try:
+            output = self.handler(event, None)
+        except Exception as e:
+            raise RuntimeError(
+                f"Validation engine execution FAILED: {type(e).__name__} {e}"
+            ) from e
+        return {"status": "SUCCEEDED", "output": json.dumps(output)}
+
+
+def validation_completion(state_machine_arn: str, step_function=None):
+    """
+    The completion of VALIDATION_COMPLETION, state_machine_arn being the standard validation engine.
+    step_function is the client of the polling, the sync call has its own client.
+    """
+    mode = os.environ.get("VALIDATION_COMPLETION", POLL)
+    if mode == SYNC_EXPRESS:
+        return SyncExpressCompletion(
+            os.environ["ARN_VALIDATION_ENGINE_EXPRESS_SERVICE"],
+            sync_step_function_client(),
+        )
+    if mode == POLL:
+        return PollingCompletion(state_machine_arn, step_function)
+    if mode == LOCAL:
+        return LocalCompletion()
+    raise ValueError(f"Unknown VALIDATION_COMPLETION '{mode}'.")
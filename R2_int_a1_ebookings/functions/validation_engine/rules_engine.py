@@ -0,0 +1,554 @@
+"""
+Rules-engine mode of the BRQ validation engine: the validation rules run in a single Lambda invocation, instead of
+one Task state (and Lambda) per rule in the a1_ebooking_validation_engine state machine.
+
+The rules are the lambda_handler of the validation_engine modules, run against the same event as in the state
+machine, so both modes return the same validationResult. The per-rule Lambdas stay deployed: the state machine runs
+the rules engine when its input has "validationEngineMode": "rules-engine" and the rule Tasks otherwise. In one
+invocation the rules share:
+    - the BRQ object, read once with all its columns (see brq_sidecar.brq_object_scope)
+    - the SSM parameters declared by all the rule modules, read in one batch by the parameter store
+    - the clients and caches of the container (adaptor client, Salesforce metadata, Landmark products)
+
+Once a rule sets continueValidation to False, the following rules are skipped as their handler would do nothing
+but those marked always (e.g. validate_brq_split sets brqSplit first). The account type choices are still made:
+a BRQ without a supported sfAccountType fails like the Choice states without a default of the state machine.
+
+Each rule declares the event fields it reads, writes and appends to. A rule depends on the earlier rules it shares
+a field with (see Rule.depends_on), the rules between two always rules run in a thread pool of
+VALIDATION_RULES_WORKERS as soon as the rules they depend on are done, so a validation takes about the time of its
+longest chain of dependent rules instead of the sum of the rules. The result is the one of the sequential order:
+    - a rule runs on a copy of the event with the changes of the rules it depends on, its changes are merged into
+      the event in the rule order (the details and messages appended keep that order)
+    - a rule run ahead of its turn has its emails, Salesforce cases and moves of the BRQ files deferred
+      (common_utils.deferred_effects), they are made when it is merged, dropped when an earlier rule stops the
+      validation. A rule needing the result of such a call is run again in its turn.
+"""
+
+import copy
+import importlib
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from functions.brq_sidecar import brq_object_scope
+from functions.common_utils import EffectOutOfTurn, deferred_effects, replay_effects
+from functions.parameter_store import parameter_store
+
+RULES_ENGINE_MODE = "rules-engine"
+ACCOUNT_TYPE_VARIABLE = "sfAccountType"
+DEFAULT_WORKERS = 4
+
+logger = logging.getLogger("a1_validation_engine")
+logger.setLevel(logging.INFO)
+
+
+class NoChoiceMatched(Exception):
+    """
+    Raised when a choice has no branch for the event, as States.NoChoiceMatched in the state machine
+    """
+
+
+class Rule:
+    """
+    A validation rule, the lambda_handler of module run as the Task state state_name.
+    :param always: run even when continueValidation is False, the handler checks it itself
+    :param reads: the event fields the rule, and the CommonUtils calls it makes, read
+    :param writes: the event fields the rule sets
+    :param appends: the event lists the rule appends to, without reading them
+    """
+
+    def __init__(
+        self,
+        state_name: str,
+        module: str,
+        always: bool = False,
+        reads: tuple = (),
+        writes: tuple = (),
+        appends: tuple = (),
+    ):
+        self.state_name = state_name
+        self.module = module
+        self.always = always
+        self.reads = frozenset(reads)
+        self.writes = frozenset(writes)
+        self.appends = frozenset(appends)
+
+    @property
+    def handler(self):
+        # imported on first use, the rule modules read their environment when imported
+        return importlib.import_module(self.module).lambda_handler
+
+    def steps(self, event: dict) -> list:
+        return [self]
+
+    def depends_on(self, other: "Rule") -> bool:
+        """
+        True when the rule has to run after other, an earlier rule: one reads what the other changes or both set
+        the same field. Appending to the same list doesn't order them, the items are merged in the rule order.
+        """
+        changed = other.writes | other.appends
+        return bool(
+            self.reads & changed
+            or self.writes & (other.reads | changed)
+            or self.appends & (other.reads | other.writes)
+        )
+
+
+class Choice:
+    """
+    The rules of the branch of event[variable], as a Choice state without a default
+    """
+
+    def __init__(self, state_name: str, variable: str, branches: dict):
+        self.state_name = state_name
+        self.variable = variable
+        self.branches = branches
+
+    def steps(self, event: dict) -> list:
+        value = event.get(self.variable)
+        if value not in self.branches:
+            raise NoChoiceMatched(
+                f"{self.state_name}: no branch for {self.variable} '{value}'."
+            )
+        return [
+            step
+            for branch_step in self.branches[value]
+            for step in branch_step.steps(event)
+        ]
+
+
+BRQ_FILE = ("brqJsonPath", "brqFileName")
+# read by the emails, Salesforce cases and moves of the BRQ files
+NOTIFICATION = ("brqEmail", "brqId", "brqDirPath", "brqFileName")
+CASE = NOTIFICATION + ("brqNetworkName",)
+
+# the states of a1_ebooking_validation_engine.asl.json, in their order
+VALIDATION_RULES = [
+    Rule(
+        "Validate File not corrupt",
+        "functions.validation_engine.validate_file_format",
+        always=True,
+    ),
+    Rule(
+        "File not meant for Seven - Validate BRQ Network ID",
+        "functions.validation_engine.validate_network_id",
+        reads=BRQ_FILE + NOTIFICATION,
+    ),
+    Rule(
+        "Validate Demo within tolerance",
+        "functions.validation_engine.validate_demo_tolerance",
+        reads=BRQ_FILE + NOTIFICATION,
+    ),
+    Rule(
+        "W/C Dates all in the past - Validate WC dates",
+        "functions.validation_engine.validate_brq_wcdates",
+        reads=BRQ_FILE + NOTIFICATION + ("brqWcStartDate", "errored_sales_area_list"),
+        writes=(
+            "brqAgencyId",
+            "brqAgencyName",
+            "brqClientId",
+            "brqClientName",
+            "brqNetworkName",
+            "brqClientProductId",
+            "brqClientProductName",
+        ),
+        appends=("validationMessages",),
+    ),
+    Rule(
+        "Validate BRQ Id duplication on SF",
+        "functions.validation_engine.validate_brq_request_id",
+        reads=NOTIFICATION,
+        writes=("oppStage", "oppId", "oppData"),
+    ),
+    Rule(
+        "Adverstiser client validation",
+        "functions.validation_engine.validate_sf_agency_ad_client",
+        reads=CASE + ("brqClientId", "brqClientName", "sfAccounts"),
+        writes=("sfAdvertiserAccountId", "sfAdvertiserAccountName"),
+        appends=("caseContent",),
+    ),
+    Choice(
+        "Check SF account type",
+        ACCOUNT_TYPE_VARIABLE,
+        {
+            "Agency Client": [
+                Rule(
+                    "Agency client validation",
+                    "functions.validation_engine.validate_sf_agency_client",
+                    reads=CASE
+                    + (
+                        "brqAgencyId",
+                        "brqAgencyName",
+                        "brqClientId",
+                        "sfAccounts",
+                        "caseContent",
+                    ),
+                    writes=(
+                        "sfAdAccountLandmarkId",
+                        "sfAccountLandmarkId",
+                        "sfAgencyAccountId",
+                        "caseContent",
+                    ),
+                ),
+                Rule(
+                    "B2B Relationship Validation",
+                    "functions.validation_engine.validate_sf_b2b_client",
+                    reads=CASE
+                    + (
+                        "sfAgencyAccountId",
+                        "sfAdvertiserAccountId",
+                        "sfAccounts",
+                        "brqWcStartDate",
+                        "brqWcEndDate",
+                        "brqAgencyName",
+                        "brqClientName",
+                        "caseContent",
+                    ),
+                    writes=("caseContent",),
+                ),
+            ],
+            "Direct Client": [
+                Rule(
+                    "If SF Account is Direct Client",
+                    "functions.validation_engine.validate_sf_direct_client",
+                    reads=CASE
+                    + ("brqClientId", "brqClientName", "sfAccounts", "caseContent"),
+                    writes=("sfAdAgAccountLandmarkId", "caseContent"),
+                ),
+            ],
+        },
+    ),
+    Rule(
+        "Validate Product exists in LMK within date range",
+        "functions.validation_engine.validate_product_date_range",
+        reads=CASE
+        + (
+            "brqClientProductId",
+            "brqClientProductName",
+            "brqWcStartDate",
+            "brqWcEndDate",
+            "sfAdvertiserAccountId",
+        ),
+        writes=("lmkProductResponse",),
+        appends=("validationMessages",),
+    ),
+    Rule(
+        "Validate Product advertiser",
+        "functions.validation_engine.validate_product_advertiser",
+        reads=CASE
+        + (
+            "sfAdAccountLandmarkId",
+            "lmkProductResponse",
+            "brqClientName",
+            "sfAdvertiserAccountId",
+        ),
+        appends=("validationMessages",),
+    ),
+    Choice(
+        "Product-Check SF account type",
+        ACCOUNT_TYPE_VARIABLE,
+        {
+            "Agency Client": [
+                Rule(
+                    "Validate Product agency client",
+                    "functions.validation_engine.validate_product_agency_client",
+                    reads=CASE
+                    + (
+                        "sfAccountLandmarkId",
+                        "lmkProductResponse",
+                        "brqAgencyName",
+                        "sfAdvertiserAccountId",
+                    ),
+                    appends=("validationMessages",),
+                ),
+            ],
+            "Direct Client": [
+                Rule(
+                    "Validate Product direct client",
+                    "functions.validation_engine.validate_product_direct_client",
+                    reads=CASE
+                    + (
+                        "sfAdAgAccountLandmarkId",
+                        "lmkProductResponse",
+                        "brqClientName",
+                        "sfAdvertiserAccountId",
+                    ),
+                    appends=("validationMessages",),
+                ),
+            ],
+        },
+    ),
+    Rule(
+        "Validate Opportunity Split",
+        "functions.validation_engine.validate_brq_split",
+        always=True,
+    ),
+]
+
+
+def flatten(steps: list, event: dict) -> tuple:
+    """
+    The rules run for the event, and the NoChoiceMatched to raise once they have run, if any
+    """
+    rules = []
+    for step in steps:
+        try:
+            rules.extend(step.steps(event))
+        except NoChoiceMatched as e:
+            return rules, e
+    return rules, None
+
+
+def plan(rules: list) -> list:
+    """
+    The levels of the rules: a rule is on the level after the last of the rules it depends on, an always rule on a
+    level of its own. The rules of a level can run at the same time.
+    """
+    levels = []
+    for index, rule in enumerate(rules):
+        after = [
+            levels[other_index]
+            for other_index, other in enumerate(rules[:index])
+            if rule.always or other.always or rule.depends_on(other)
+        ]
+        levels.append(max(after, default=-1) + 1)
+    return [
+        [rule for rule, rule_level in zip(rules, levels) if rule_level == level]
+        for level in sorted(set(levels))
+    ]
+
+
+def _ancestors(rules: list) -> list:
+    """
+    The indexes of the rules each rule depends on, directly or not, in the rule order
+    """
+    ancestors = []
+    for index, rule in enumerate(rules):
+        indexes = set()
+        for other_index in range(index):
+            if rule.depends_on(rules[other_index]):
+                indexes.add(other_index)
+                indexes.update(ancestors[other_index])
+        ancestors.append(sorted(indexes))
+    return ancestors
+
+
+def _changes(before, after) -> dict:
+    """
+    The changes of a rule to the event: {field: ("set", value) | ("extend", items) | ("update", changes)}
+    """
+    changes = {}
+    for key, value in after.items():
+        previous = before.get(key)
+        if key in before and value == previous:
+            continue
+        if isinstance(value, dict) and isinstance(previous, dict):
+            changes[key] = ("update", _changes(previous, value))
+        elif (
+            isinstance(value, list)
+            and isinstance(previous, list)
+            and value[: len(previous)] == previous
+        ):
+            changes[key] = ("extend", value[len(previous) :])
+        else:
+            changes[key] = ("set", value)
+    return changes
+
+
+def _apply(event: dict, changes: dict):
+    for key, (change, value) in changes.items():
+        if change == "update":
+            _apply(event.setdefault(key, {}), value)
+        elif change == "extend":
+            event.setdefault(key, []).extend(copy.deepcopy(value))
+        else:
+            event[key] = copy.deepcopy(value)
+
+
+class _Outcome:
+    """
+    A run of a rule on a copy of the event, to merge
+    """
+
+    def __init__(self, changes=None, effects=None, ms=None, error=None):
+        self.changes = changes or {}
+        self.effects = effects or []
+        self.ms = ms
+        self.error = error
+
+
+class RulesEngine:
+    """
+    Runs the rules against an event, the timings of the last run are in self.timings
+    """
+
+    def __init__(self, rules: list = None, max_workers: int = None):
+        self.rules = VALIDATION_RULES if rules is None else rules
+        if max_workers is None:
+            max_workers = int(
+                os.environ.get("VALIDATION_RULES_WORKERS", DEFAULT_WORKERS)
+            )
+        self.max_workers = max_workers
+        self.timings = []
+
+    def run(self, event: dict, context=None) -> dict:
+        self.timings = []
+        rules, no_choice_matched = flatten(self.rules, event)
+        with brq_object_scope():
+            segment = []
+            for rule in rules + [None]:
+                if rule is not None and not rule.always:
+                    segment.append(rule)
+                    continue
+                if segment:
+                    event = self.__run_segment(segment, event, context)
+                    segment = []
+                if rule is not None:
+                    event = self.__run_rule(rule, event, context)
+        logger.info(
+            json.dumps(
+                {
+                    "validationRules": self.timings,
+                    "levels": len(plan(rules)),
+                }
+            )
+        )
+        if no_choice_matched is not None:
+            raise no_choice_matched
+        return event
+
+    def __run_rule(self, rule: Rule, event: dict, context) -> dict:
+        if not rule.always and not event["validationResult"]["continueValidation"]:
+            self.timings.append({"rule": rule.state_name, "skipped": True})
+            return event
+        start = time.perf_counter()
+        event = rule.handler(event, context)
+        self.timings.append(
+            {
+                "rule": rule.state_name,
+                "ms": round((time.perf_counter() - start) * 1000, 1),
+                "continueValidation": event["validationResult"]["continueValidation"],
+            }
+        )
+        return event
+
+    def __run_segment(self, rules: list, event: dict, context) -> dict:
+        """
+        Run rules without always rule, concurrently, and merge them into the event in their order
+        """
+        if (
+            self.max_workers <= 1
+            or len(rules) == 1
+            or not event["validationResult"]["continueValidation"]
+        ):
+            for rule in rules:
+                event = self.__run_rule(rule, event, context)
+            return event
+        base = copy.deepcopy(event)
+        ancestors = _ancestors(rules)
+        # imported here, not by the workers
+        handlers = [rule.handler for rule in rules]
+        outcomes = {}
+        running = {}
+        waiting_turn = set()
+        merged = 0
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while merged < len(rules):
+                for index in range(merged, len(rules)):
+                    if index in running or index in outcomes:
+                        continue
+                    if index in waiting_turn and index != merged:
+                        continue
+                    if any(other not in outcomes for other in ancestors[index]):
+                        continue
+                    running[index] = executor.submit(
+                        self.__attempt,
+                        handlers[index],
+                        base,
+                        [outcomes[other].changes for other in ancestors[index]],
+                        context,
+                        index == merged,
+                    )
+                done, _ = wait(running.values(), return_when=FIRST_COMPLETED)
+                for index, future in list(running.items()):
+                    if future in done:
+                        del running[index]
+                        outcome = future.result()
+                        if outcome is None:
+                            waiting_turn.add(index)
+                        else:
+                            outcomes[index] = outcome
+                while merged in outcomes:
+                    if not event["validationResult"]["continueValidation"]:
+                        for rule in rules[merged:]:
+                            self.timings.append(
+                                {"rule": rule.state_name, "skipped": True}
+                            )
+                        return event
+                    self.__merge(rules[merged], outcomes[merged], event)
+                    merged += 1
+            return event
+        finally:
+            # the rules still running are not merged
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    @staticmethod
+    def __attempt(handler, base: dict, changes: list, context, in_turn: bool):
+        """
+        Run a rule on a copy of the event, deferring its effects when it runs ahead of its turn. None when it needs
+        the result of an effect, to run it again in its turn.
+        """
+        event = copy.deepcopy(base)
+        for rule_changes in changes:
+            _apply(event, rule_changes)
+        before = copy.deepcopy(event)
+        start = time.perf_counter()
+        effects = []
+        try:
+            if in_turn:
+                event = handler(event, context)
+            else:
+                with deferred_effects() as effects:
+                    event = handler(event, context)
+        except EffectOutOfTurn:
+            return None
+        except Exception as e:
+            return _Outcome(error=e)
+        return _Outcome(
+            changes=_changes(before, event),
+            effects=effects,
+            ms=round((time.perf_counter() - start) * 1000, 1),
+        )
+
+    def __merge(self, rule: Rule, outcome: _Outcome, event: dict):
+        if outcome.error is not None:
+            raise outcome.error
+        undeclared = (
+            set(outcome.changes) - rule.writes - rule.appends - {"validationResult"}
+        )
+        if undeclared:
+            logger.warning(
+                f"{rule.state_name} changed undeclared fields: {sorted(undeclared)}"
+            )
+        _apply(event, outcome.changes)
+        replay_effects(outcome.effects)
+        self.timings.append(
+            {
+                "rule": rule.state_name,
+                "ms": outcome.ms,
+                "continueValidation": event["validationResult"]["continueValidation"],
+            }
+        )
+
+
+def lambda_handler(event, context):
+    """
+    Validate the BRQ of the event with all the rules, returns the event as the state machine does
+    """
+    # the parameters of all the rules in one call, before the rules run concurrently
+    parameter_store.prefetch()
+    return RulesEngine().run(event, context)
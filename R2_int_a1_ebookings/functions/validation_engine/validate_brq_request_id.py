@@ -2,7 +2,6 @@ import logging
 import boto3
 import os
 import json
-import time
 from boto3 import client as boto3_client
 from functions.common_utils import CommonUtils
 from swm_logger.swm_common_logger import LambdaLogger
@@ -83,7 +82,6 @@ def lambda_handler(event, context):
                 common_utils.send_email_notification(
                     recipients, subject, body, event, [".eml"]
                 )
-                time.sleep(15)
                 common_utils.move_file_s3_to_s3(
                     os.environ["EBOOKINGS_S3_TEMP_BUCKET"],
                     os.environ["EBOOKINGS_S3_ERROR_BUCKET"],
@@ -113,7 +111,6 @@ def lambda_handler(event, context):
                         common_utils.send_email_notification(
                             recipients, subject, body, event, [".eml"]
                         )
-                        time.sleep(15)
                         common_utils.move_file_s3_to_s3(
                             os.environ["EBOOKINGS_S3_TEMP_BUCKET"],
                             os.environ["EBOOKINGS_S3_ERROR_BUCKET"],
@@ -8,6 +8,7 @@ from datetime import date, datetime, timedelta
 from calendar import monthcalendar
 import botocore.exceptions
 from functions.common_utils import CommonUtils
+from functions.brq_sidecar import load_brq_object
 from swm_logger.swm_common_logger import LambdaLogger
 
 custom_logger = LambdaLogger(log_group_name=os.environ["LOG_GROUP_NAME"])
@@ -29,11 +30,8 @@ def lambda_handler(event, context):
         brq_header_data_two = []
         sat_date = common_utils.get_current_year_last_saturday()
         brq_filename = event["brqFileName"].split(".")
-        s3 = boto3.resource("s3")
         key = event["brqFileName"] + ".json"
-        s3_object = s3.Object(event["brqJsonPath"], key)
-        file_content = s3_object.get()["Body"].read().decode("utf-8")
-        json_content = json.loads(file_content)
+        json_content = load_brq_object(event["brqJsonPath"], key)
         split_one_record_count = 0
         split_two_record_count = 0
         split_two_proposed_total = 0
@@ -6,6 +6,7 @@ import time
 from boto3 import client as boto3_client
 from datetime import date, datetime, timedelta
 from functions.common_utils import CommonUtils
+from functions.brq_sidecar import load_brq_object
 from swm_logger.swm_common_logger import LambdaLogger
 
 custom_logger = LambdaLogger(log_group_name=os.environ["LOG_GROUP_NAME"])
@@ -14,13 +15,6 @@ CEE_NOTIFICATION_ENGINE = os.environ["CEE_NOTIFICATION_ENGINE"]
 step_function = boto3_client("stepfunctions", region_name=os.environ["SEIL_AWS_REGION"])
 
 
-def sanitize_date_format(wc_date):
-    dateTimeObj = datetime.strptime(wc_date, "%Y%m%d")
-    wc_date = dateTimeObj.date()
-    wc_date = wc_date.strftime("%Y-%m-%d")
-    return wc_date
-
-
 def get_current_week_sunday():
     today = date.today()
     days_to_last_sunday = (today.weekday() + 1) % 7
@@ -28,13 +22,18 @@ def get_current_week_sunday():
     return last_sunday
 
 
+WCDATES_COLUMNS = [
+    "WCDate",
+    "ClientId",
+    "ClientName",
+    "ClientProductId",
+    "ClientProductName",
+]
+
+
 def validate_wcdates(event):
-    count = 0
-    s3 = boto3.resource("s3")
     key = event["brqFileName"] + ".json"
-    s3_object = s3.Object(event["brqJsonPath"], key)
-    file_content = s3_object.get()["Body"].read().decode("utf-8")
-    json_content = json.loads(file_content)
+    json_content = load_brq_object(event["brqJsonPath"], key, columns=WCDATES_COLUMNS)
 
     # Adding additional required attributes in event response to avopid BRQ file reading operation everytime.
     # Next step functions on the validation flow can access these attributes.
@@ -52,13 +51,10 @@ def validate_wcdates(event):
         event["validationMessages"].append(
             "The Campaign Start Date has been amended as the file contains spots in previous weeks"
         )
-    for item in json_content["details"]:
-        wc_date = sanitize_date_format(item["WCDate"])
-        wc_date = datetime.strptime(f"{wc_date}", "%Y-%m-%d")
-        if current_sunday > wc_date:
-            count += 1
+    details = json_content["details"]
+    count = details.count_wc_dates_before(current_sunday.date())
     if count > 0:
-        if len(json_content["details"]) == count:
+        if len(details) == count:
             custom_logger.info(f"All wc_dates validation failed: {count}")
             return False
     custom_logger.info(f"wc_date validation passed: {count}")
@@ -86,7 +82,6 @@ def lambda_handler(event, context):
             common_utils.send_email_notification(
                 recipients, subject, body, event, [".eml"]
             )
-            time.sleep(15)
             common_utils.move_file_s3_to_s3(
                 os.environ["EBOOKINGS_S3_TEMP_BUCKET"],
                 os.environ["EBOOKINGS_S3_ERROR_BUCKET"],
@@ -109,7 +104,6 @@ def lambda_handler(event, context):
             common_utils.create_sf_case_SA_notmatch(
                 event["brqFileName"], description, event
             )
-            time.sleep(15)
             common_utils.move_file_s3_to_s3(
                 os.environ["EBOOKINGS_S3_TEMP_BUCKET"],
                 os.environ["EBOOKINGS_S3_ERROR_BUCKET"],
@@ -2,15 +2,18 @@ import logging
 import boto3
 import os
 import json
-import time
 from boto3 import client as boto3_client
 from functions.common_utils import CommonUtils
+from functions.brq_details import DEMO_CODE_FIELDS
+from functions.brq_sidecar import load_brq_object
+from functions.parameter_store import parameter_store
 from swm_logger.swm_common_logger import LambdaLogger
 
 
 custom_logger = LambdaLogger(log_group_name=os.environ["LOG_GROUP_NAME"])
 CEE_NOTIFICATION_ENGINE = os.environ["CEE_NOTIFICATION_ENGINE"]
 step_function = boto3_client("stepfunctions", region_name=os.environ["SEIL_AWS_REGION"])
+parameter_store.declare(os.environ.get("DEMO_TOLERANCE_PERCENTAGE"))
 
 
 def find_demo_percentage(part, whole):
@@ -19,23 +22,11 @@ def find_demo_percentage(part, whole):
 
 
 def get_invalid_demo_count(event):
-    count = 0
-    s3 = boto3.resource("s3")
     key = event["brqFileName"] + ".json"
-    s3_object = s3.Object(event["brqJsonPath"], key)
-    file_content = s3_object.get()["Body"].read().decode("utf-8")
-    json_content = json.loads(file_content)
+    brq_object = load_brq_object(event["brqJsonPath"], key, columns=DEMO_CODE_FIELDS)
 
-    total_spot_count = len(json_content["details"])
-    for item in json_content["details"]:
-        if (
-            item["DemographicCodeOne"] == ""
-            and item["DemographicCodeTwo"] == ""
-            and item["DemographicCodeThree"] == ""
-            and item["DemographicCodeFour"] == ""
-        ):
-            count += 1
-    return count, total_spot_count
+    details = brq_object["details"]
+    return details.count_missing_demo(), len(details)
 
 
 def lambda_handler(event, context):
@@ -62,7 +53,6 @@ def lambda_handler(event, context):
             common_utils.send_email_notification(
                 recipients, subject, body, event, [".eml"]
             )
-            time.sleep(15)
             common_utils.move_file_s3_to_s3(
                 os.environ["EBOOKINGS_S3_TEMP_BUCKET"],
                 os.environ["EBOOKINGS_S3_ERROR_BUCKET"],
@@ -2,9 +2,9 @@ import logging
 import boto3
 import os
 import json
-import time
 from boto3 import client as boto3_client
 from functions.common_utils import CommonUtils
+from functions.brq_sidecar import load_brq_object
 from swm_logger.swm_common_logger import LambdaLogger
 
 custom_logger = LambdaLogger(log_group_name=os.environ["LOG_GROUP_NAME"])
@@ -20,11 +20,9 @@ def lambda_handler(event, context):
         validation_status = "SUCCESS"
         continue_validation = True
         custom_logger.info(f"event_data: {event}")
-        s3 = boto3.resource("s3")
         key = event["brqFileName"] + ".json"
-        s3_object = s3.Object(event["brqJsonPath"], key)
-        file_content = s3_object.get()["Body"].read().decode("utf-8")
-        json_content = json.loads(file_content)
+        # the header only, no detail column is read from the sidecar
+        json_content = load_brq_object(event["brqJsonPath"], key, columns=[])
         allowed_network_ids = ["PRIPRO", "SEVNET", "7QLD"]
         if json_content["header"]["NetworkId"] not in allowed_network_ids:
             custom_logger.info(f"BRQ [{event['brqId']}] is meant for another Network")
@@ -34,7 +32,6 @@ def lambda_handler(event, context):
             common_utils.send_email_notification(
                 recipients, subject, body, event, [".eml"]
             )
-            time.sleep(15)
             common_utils.move_file_s3_to_s3(
                 os.environ["EBOOKINGS_S3_TEMP_BUCKET"],
                 os.environ["EBOOKINGS_S3_ERROR_BUCKET"],
@@ -3,21 +3,23 @@ import boto3
 import os
 import json
 from boto3 import client as boto3_client
+from functions.adaptor_client import adaptor_client
 from functions.common_utils import CommonUtils
+from functions.landmark_product_cache import landmark_product_cache
+from functions.parameter_store import get_parameter, parameter_store
 from swm_logger.swm_common_logger import LambdaLogger
 
 custom_logger = LambdaLogger(log_group_name=os.environ["LOG_GROUP_NAME"])
+parameter_store.declare(
+    os.environ.get("LANDMARK_BASE_URL"), os.environ.get("LANDMARK_ADAPTOR_FUNCTION")
+)
 
 
 def get_ssm(param_name):
     """
     function to feth ssm values from AWS param store
     """
-    ssm_client = boto3.client("ssm")
-    param_value = (
-        ssm_client.get_parameter(Name=param_name).get("Parameter").get("Value")
-    )
-    return param_value
+    return get_parameter(param_name)
 
 
 def get_lmk_product_details(event):
@@ -25,7 +27,16 @@ def get_lmk_product_details(event):
     Function to Invoke Landmark Adaptor
     """
     custom_logger.info(f"ENTRY Invoke Lambda Adaptor")
-    client = boto3.client("lambda")
+
+    # Products already returned by Landmark for this external code over these dates, no SSM or Landmark call
+    cached_products = landmark_product_cache.lookup(
+        event["brqClientProductId"], event["brqWcStartDate"], event["brqWcEndDate"]
+    )
+    if cached_products is not None:
+        custom_logger.info(
+            f"Landmark product answered from the cache: {landmark_product_cache.stats()}"
+        )
+        return {"statusCode": "200", "data": cached_products}
 
     lmk_base_url = get_ssm(os.environ["LANDMARK_BASE_URL"])
     lmk_adaptor = get_ssm(os.environ["LANDMARK_ADAPTOR_FUNCTION"])
@@ -40,24 +51,11 @@ def get_lmk_product_details(event):
     )
     custom_logger.info(f"Landmark URL: {lmk_product_url}")
 
-    # Landmark Header with authenticatin token
-    lmk_request = {
-        "landmarkEndpoint": lmk_product_url,
-        "content": "",
-        "operation": "get",
-    }
-
-    # Invoke Landmark Adapatar Lambda function using boto3 invoke method
+    # Invoke Landmark Adapatar Lambda function through the shared adaptor client
     try:
         custom_logger.info(f"Invoke Landmark Adapator for A1 product check")
-        lmk_response = client.invoke(
-            FunctionName=lmk_adaptor,
-            InvocationType="RequestResponse",
-            Payload=json.dumps(lmk_request),
-        )
-        custom_logger.info(lmk_response)
-        lmk_raw_response = lmk_response["Payload"].read()
-        lmk_raw_response = json.loads(lmk_raw_response.decode())
+        lmk_response = adaptor_client.landmark(lmk_adaptor, "get", lmk_product_url)
+        lmk_raw_response = lmk_response.json()
         custom_logger.info(f"LMK raw response: {lmk_raw_response}")
         if type(lmk_raw_response) is not list and lmk_raw_response in [
             503,
@@ -76,6 +74,13 @@ def get_lmk_product_details(event):
                 custom_logger.info("Landmark product data retrival sucessful")
                 lmk_resp = lmk_raw_response
                 status_code = "200"
+            if type(lmk_resp) is list:
+                landmark_product_cache.store(
+                    event["brqClientProductId"],
+                    event["brqWcStartDate"],
+                    event["brqWcEndDate"],
+                    lmk_resp,
+                )
         return {"statusCode": status_code, "data": lmk_resp}
     except Exception as e:
         custom_logger.error(f"Error in Landmark Adapator Invoke - {e}")
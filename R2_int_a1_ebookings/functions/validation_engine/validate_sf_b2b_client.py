@@ -5,6 +5,7 @@ import json
 import time
 from boto3 import client as boto3_client
 from functions.common_utils import CommonUtils
+from functions.account_resolver import find_relationships
 from datetime import datetime
 from swm_logger.swm_common_logger import LambdaLogger
 
@@ -17,6 +18,7 @@ lambda_client = boto3_client("lambda", region_name=os.environ["SEIL_AWS_REGION"]
 def get_account_details(event):
     """
     Function to fetch the B2B relationship details from salesforce.
+    The relationships resolved for the BRQ (sfAccounts of the event) are used when they cover the accounts.
     """
     sf_agency_account_id = event["sfAgencyAccountId"]
     sf_advertiser_account_id = event["sfAdvertiserAccountId"]
@@ -25,12 +27,16 @@ def get_account_details(event):
         "query": f"SELECT+Active__c,+SWM_End_Date__c,+SWM_Start_Date__c,+Account_Name__c,+Related_Account_Name__c+FROM+Account_Account_Relationship__c+WHERE+Relationship_Type__c+='Billing Account of'+AND+Account__c+='{sf_agency_account_id}'+AND+Related_Account__c+='{sf_advertiser_account_id}'+AND+Active__c+=True",
     }
     try:
-        invoke_response = lambda_client.invoke(
-            FunctionName=ARN_SF_ADAPTOR,
-            InvocationType="RequestResponse",
-            Payload=json.dumps(payload),
+        downstream_response = find_relationships(
+            event.get("sfAccounts"), sf_agency_account_id, sf_advertiser_account_id
         )
-        downstream_response = json.loads(invoke_response["Payload"].read())
+        if downstream_response is None:
+            invoke_response = lambda_client.invoke(
+                FunctionName=ARN_SF_ADAPTOR,
+                InvocationType="RequestResponse",
+                Payload=json.dumps(payload),
+            )
+            downstream_response = json.loads(invoke_response["Payload"].read())
         custom_logger.info(downstream_response)
         return downstream_response
     except Exception as e:
@@ -123,7 +129,6 @@ def lambda_handler(event, context):
         if len(event["caseContent"]) > 0:
             description = "\n".join(event["caseContent"])
             common_utils.create_sf_case(event["brqFileName"], description, event)
-            time.sleep(15)
             common_utils.move_file_s3_to_s3(
                 os.environ["EBOOKINGS_S3_TEMP_BUCKET"],
                 os.environ["EBOOKINGS_S3_ERROR_BUCKET"],
@@ -2,9 +2,10 @@ import logging
 import boto3
 import os
 import json
-import time
 from boto3 import client as boto3_client
 from functions.common_utils import CommonUtils
+from functions.account_resolver import find_accounts
+from functions.sf_metadata_cache import query_salesforce_metadata
 from swm_logger.swm_common_logger import LambdaLogger
 
 custom_logger = LambdaLogger(log_group_name=os.environ["LOG_GROUP_NAME"])
@@ -13,21 +14,24 @@ ARN_SF_ADAPTOR = os.environ["SALESFORCE_ADAPTOR"]
 lambda_client = boto3_client("lambda", region_name=os.environ["SEIL_AWS_REGION"])
 
 
-def get_account_details(client_id):
+def get_account_details(client_id, sf_accounts=None):
     """
     Function to fetch the account details from salesforce matching 'Client Id' from the BRQ file.
+    The accounts resolved for the BRQ (sfAccounts of the event) are used when they cover the client.
     """
     payload = {
         "invocationType": "QUERY",
         "query": f"SELECT+Name,+Id,+SWM_LandMark_ID__c,+RecordTypeId,+Type,+SWM_Trading_Type__c,+vlocity_cmt__Status__c,+Credit_Status__c+FROM+Account+WHERE+SWM_External_Account_ID__c+='{client_id}'",
     }
     try:
-        invoke_response = lambda_client.invoke(
-            FunctionName=ARN_SF_ADAPTOR,
-            InvocationType="RequestResponse",
-            Payload=json.dumps(payload),
-        )
-        downstream_response = json.loads(invoke_response["Payload"].read())
+        downstream_response = find_accounts(sf_accounts, client_id)
+        if downstream_response is None:
+            invoke_response = lambda_client.invoke(
+                FunctionName=ARN_SF_ADAPTOR,
+                InvocationType="RequestResponse",
+                Payload=json.dumps(payload),
+            )
+            downstream_response = json.loads(invoke_response["Payload"].read())
         custom_logger.info(downstream_response)
         return downstream_response
     except Exception as e:
@@ -104,12 +108,9 @@ def get_recordtype_details(recordtype_id):
         "query": f"SELECT+Id+,+Name+FROM+RecordType+WHERE+Id+=+'{recordtype_id}'",
     }
     try:
-        invoke_response = lambda_client.invoke(
-            FunctionName=ARN_SF_ADAPTOR,
-            InvocationType="RequestResponse",
-            Payload=json.dumps(payload),
+        downstream_response = query_salesforce_metadata(
+            lambda_client, ARN_SF_ADAPTOR, payload["query"]
         )
-        downstream_response = json.loads(invoke_response["Payload"].read())
         custom_logger.info(downstream_response)
         return downstream_response
     except Exception as e:
@@ -127,7 +128,7 @@ def lambda_handler(event, context):
         validation_status = "SUCCESS"
         continue_validation = True
         account_data_for_clientid = get_account_details(
-            event["brqClientId"]
+            event["brqClientId"], event.get("sfAccounts")
         )
         if account_data_for_clientid["totalSize"] > 0:
             event["sfAdAgAccountLandmarkId"] = account_data_for_clientid["records"][0][
@@ -136,7 +137,6 @@ def lambda_handler(event, context):
         if len(event["caseContent"]) > 0:
             description = "\n".join(event["caseContent"])
             common_utils.create_sf_case(event["brqFileName"], description, event)
-            time.sleep(15)
             common_utils.move_file_s3_to_s3(
                 os.environ["EBOOKINGS_S3_TEMP_BUCKET"],
                 os.environ["EBOOKINGS_S3_ERROR_BUCKET"],
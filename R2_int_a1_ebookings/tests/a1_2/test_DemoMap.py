@@ -0,0 +1,75 @@
+import io
+import os
+from unittest import mock
+
+import pytest
+import sys
+
+sys.path.append(
+    os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
+)  # project root folder
+
+from tests.mock_boto import mock_client_generator
+from functions.a1_2.DemoMap import DemoMap
+from functions.reference_data_cache import reference_data_cache
+
+DEMO_CSV = """Numeric Identifier,SMD Code,Trading Demo,Landmark Code
+1001,P25-54,P 25-54,25
+1002,,Old Demo,26
+1003,AP,All People,1
+1003,AP,All People,2
+"""
+
+
+class TestDemoMap:
+
+    def setup_method(self):
+        reference_data_cache.clear()
+
+    def test_DemoMap_withContent(self):
+        demo_map = DemoMap(demo_csv=DEMO_CSV)
+        assert demo_map.fieldnames == [
+            "Numeric Identifier",
+            "SMD Code",
+            "Trading Demo",
+            "Landmark Code",
+        ]
+        assert len(demo_map.data) == 4
+
+    def test_DemoMap_lookup(self):
+        demo_map = DemoMap(demo_csv=DEMO_CSV)
+        assert demo_map.lookup("1001")["Trading Demo"] == "P 25-54"
+        assert demo_map.lookup("P25-54")["Numeric Identifier"] == "1001"
+        assert demo_map.lookup("9999") is None
+        assert demo_map.lookup("M18+") is None
+        # the last row wins, as the scan of the CSV did
+        assert demo_map.get_by_numeric_identifier("1003")["Landmark Code"] == "2"
+        assert demo_map.get_by_smd_code("AP")["Landmark Code"] == "2"
+
+    def test_most_frequent(self):
+        assert DemoMap.most_frequent(["AP", "1001", "1001", "AP", "1001"]) == "1001"
+        assert DemoMap.most_frequent(["AP", "1001", "1001", "AP"]) == "AP"
+        with pytest.raises(ValueError):
+            DemoMap.most_frequent([])
+
+    def test_DemoMap_withPath(self):
+        class S3MockClient:
+            def __init__(self, region_name=""):
+                pass
+
+            def get_object(self, Bucket="", Key=""):
+                if Bucket == "seil-config-bucket" and Key == "demo_mapping.csv":
+                    return {"Body": io.BytesIO(("﻿" + DEMO_CSV).encode("utf-8"))}
+                else:
+                    raise NotImplementedError()
+
+        with mock.patch("boto3.client", mock_client_generator({"s3": S3MockClient})):
+            demo_map = DemoMap(demo_path="s3://seil-config-bucket/demo_mapping.csv")
+        assert demo_map.fieldnames[0] == "Numeric Identifier"
+        assert demo_map.lookup("1001")["Landmark Code"] == "25"
+
+    def test_DemoMap_invalid(self):
+        with pytest.raises(ValueError):
+            DemoMap()
+        with pytest.raises(Exception):
+            DemoMap(demo_path="demo_mapping.csv")
@@ -10,8 +10,10 @@ sys.path.append(
     os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 )  # project root folder
 
-from tests.mock_boto import mock_client_generator
+from tests.mock_boto import mock_client_generator, MockSSMClient
 from functions.a1_2.SalesAreaMap import SalesAreaMap
+from functions.parameter_store import parameter_store
+from functions.reference_data_cache import reference_data_cache
 
 TEST_CSV_FILE_NAME = "sales_area_mapping.csv"
 
@@ -31,6 +33,10 @@ class TestSalesAreaMap:
     def setup_class(cls):
         pass
 
+    def setup_method(self):
+        reference_data_cache.clear()
+        parameter_store.clear()
+
     @classmethod
     def teardown_class(cls):
         pass
@@ -99,7 +105,7 @@ class TestSalesAreaMap:
                 else:
                     raise NotImplementedError()
 
-        class SSMMockClient:
+        class SSMMockClient(MockSSMClient):
             def __init__(self, region_name=""):
                 pass
 
@@ -122,3 +128,48 @@ class TestSalesAreaMap:
             assert len(sales_area_map.data) == 144
             assert sales_area_map.data[0]["salesAreaNumber"] == "1"
             assert sales_area_map.data[0]["code"] == "01"
+
+    def test_SalesAreaMap_indexes(self):
+        with open(
+            path.join(path.dirname(__file__), TEST_CSV_FILE_NAME),
+            mode="r",
+            encoding="utf-8-sig",
+        ) as f:
+            content = f.read()
+        sales_area_map = SalesAreaMap(sales_area_csv=content)
+
+        assert sales_area_map.get_by_bcc("SAS")["salesAreaNumber"] == "1001"
+        assert sales_area_map.get_by_bcc("UNKNOWN") is None
+        assert sales_area_map.get_by_sales_area_number("1001")["BCC"] == "SAS"
+        assert sales_area_map.get_by_sales_area_number("999999") is None
+        assert [
+            area["salesAreaNumber"] for area in sales_area_map.get_children("1000")
+        ] == ["1001", "1002", "1004", "1003", "1005"]
+        assert len(sales_area_map.get_overall_children("1000")) == 5
+        assert sales_area_map.get_children("999999") == []
+        assert sales_area_map.get_overall_children("999999") == []
+
+    def test_SalesAreaMap_withPath_cached(self):
+        class S3MockClient:
+            get_object_count = 0
+
+            def __init__(self, region_name=""):
+                pass
+
+            def get_object(self, Bucket="", Key=""):
+                S3MockClient.get_object_count += 1
+                with open(
+                    path.join(path.dirname(__file__), TEST_CSV_FILE_NAME), mode="rb"
+                ) as f:
+                    return {"Body": io.BytesIO(f.read())}
+
+        sales_area_path = (
+            f"s3://{MOCK_ENV['SEIL_CONFIG_BUCKET_NAME']}/{TEST_CSV_FILE_NAME}"
+        )
+        with mock.patch("boto3.client", mock_client_generator({"s3": S3MockClient})):
+            first = SalesAreaMap(sales_area_path=sales_area_path)
+            second = SalesAreaMap(sales_area_path=sales_area_path)
+        assert S3MockClient.get_object_count == 1
+        assert second.data is first.data
+        assert second.get_by_bcc("SAS")["salesAreaNumber"] == "1001"
+        assert reference_data_cache.stats()["hits"] == 1
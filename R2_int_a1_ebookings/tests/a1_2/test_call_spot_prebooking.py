@@ -0,0 +1,200 @@
+import io
+import json
+import os
+import threading
+import time
+from unittest import mock
+
+import pytest
+
+from tests.mock_boto import no_such_key_error
+
+from functions.a1_2.tranche_manifest import MANIFEST_FILE_NAME, manifest_key
+from functions.adaptor_client import AdaptorResponse
+from functions.sf_composite import CompositeBatcher
+from functions.tranche_planner import tranche_stats
+
+MOCK_ENV = {
+    "SEIL_AWS_REGION": "ap-southeast-2",
+    "SALESFORCE_ADAPTOR": "sf-adaptor",
+    "LANDMARK_ADAPTOR": "lmk-adaptor",
+    "EBOOKINGS_S3_FILEIN_BUCKET": "in-bucket",
+    "EBOOKINGS_S3_TEMP_BUCKET": "temp-bucket",
+    "SEIL_CONFIG_BUCKET_NAME": "config-bucket",
+}
+
+with mock.patch.dict(os.environ, MOCK_ENV):
+    from functions.a1_2.call_spot_prebooking import CallSpotPrebookingAPIHandler
+
+TRANCHES = [f"s3://temp-bucket/id/spot_payload_{index}.json" for index in range(1, 6)]
+EVENT = {
+    "id": "id",
+    "brqRequestID": "00000001",
+    "brqJsonBucket": "temp-bucket",
+    "brqJsonKey": "id/brq.json",
+    "campaignHeaderResponseCode": 201,
+    "trancheFileCount": len(TRANCHES),
+    "spotPayloadFilePath": TRANCHES,
+    "detail": {"sf_payload": {"sf": {"opportunityID": "006OPP"}}},
+}
+
+
+class LandmarkAdaptor:
+    """
+    Answers the spot pre-booking of a tranche with its scripted body, the first tranches answering last
+    """
+
+    def __init__(self, bodies: dict):
+        self.bodies = bodies
+        self.sent = []
+        self.lock = threading.Lock()
+
+    def landmark(self, adaptor_arn, operation, endpoint, content=""):
+        index = TRANCHES.index(content)
+        with self.lock:
+            self.sent.append(index)
+        body = self.bodies.get(index, json.dumps([{"messages": [{"status": 201}]}]))
+        if body != "503":
+            time.sleep(0.01 * (len(TRANCHES) - index))
+        return AdaptorResponse(body, seconds=0.01 * (len(TRANCHES) - index))
+
+
+class TestCallSpotPrebooking:
+
+    def setup_method(self):
+        tranche_stats.clear()
+        self.failing_iteration = None
+
+    def update_spots_loading(self, event, context, batcher):
+        if event["spot_iteration"] == self.failing_iteration:
+            raise RuntimeError("Integration Job not updated")
+        self.iterations.append(event["spot_iteration"])
+
+    def save_to_s3(self, Body, Bucket, Key, Region=None):
+        self.objects[(Bucket, Key)] = Body
+        if not Key.endswith(MANIFEST_FILE_NAME):
+            self.saved.append(Key)
+
+    def read_from_s3(self, Bucket, Key, Encoding="utf-8", Region=None):
+        if (Bucket, Key) not in self.objects:
+            raise no_such_key_error()
+        return self.objects[(Bucket, Key)]
+
+    def handle(self, parallelism: int, bodies: dict = None, resume=False):
+        if not resume:
+            self.objects = {}
+        self.adaptor = LandmarkAdaptor(bodies or {})
+        self.iterations = []
+        self.saved = []
+        env = dict(MOCK_ENV, SPOT_PREBOOKING_PARALLELISM=str(parallelism))
+        with mock.patch.dict(os.environ, env), mock.patch(
+            "functions.a1_2.call_spot_prebooking.adaptor_client", self.adaptor
+        ), mock.patch(
+            "functions.a1_2.call_spot_prebooking.save_to_s3", self.save_to_s3
+        ), mock.patch(
+            "functions.a1_2.tranche_manifest.save_to_s3", self.save_to_s3
+        ), mock.patch(
+            "functions.a1_2.tranche_manifest.read_from_s3", self.read_from_s3
+        ), mock.patch(
+            "functions.a1_2.call_spot_prebooking.update_int_job_spots_loading",
+            self.update_spots_loading,
+        ), mock.patch.object(
+            CallSpotPrebookingAPIHandler, "flush_sf_writes"
+        ):
+            handler = CallSpotPrebookingAPIHandler(json.loads(json.dumps(EVENT)))
+            return handler.handle()
+
+    def test_concurrent_tranches_aggregate_like_sequential_ones(self):
+        bodies = {2: json.dumps([{"messages": [{"status": 422}]}])}
+        sequential = self.handle(1, bodies)
+        sequential_saved = self.saved
+
+        concurrent = self.handle(3, bodies)
+
+        assert concurrent == sequential
+        assert self.iterations == [1, 2, 3, 4, 5]
+        assert sorted(self.adaptor.sent) == [0, 1, 2, 3, 4]
+        assert self.saved == sequential_saved
+        assert concurrent["spotPrebookingResponsePath"] == [
+            f"s3://temp-bucket/id/spots_response_{index}.json" for index in range(1, 6)
+        ]
+        # the Landmark latencies of both runs are kept for the tranche planner
+        observations = [
+            observation
+            for hour_observations in tranche_stats.load()["hours"].values()
+            for observation in hour_observations
+        ]
+        assert len(observations) == 10
+        assert observations[0]["seconds"] == 0.05
+
+    def test_a_failed_tranche_fails_the_prebooking(self):
+        event = self.handle(3, {1: json.dumps([{"messages": [{"status": 422}]}])})
+
+        assert event["spotPrebookingStatus"] == "failed"
+        assert event["spotPrebookingResponseCode"] == 422
+        assert len(event["spotPrebookingResponsePath"]) == 5
+
+    def test_tranches_checkpointed_when_a_response_is_not_handled(self):
+        self.failing_iteration = 1
+        with pytest.raises(RuntimeError):
+            self.handle(3)
+
+        # the tranches answered meanwhile are recorded before the error is raised
+        manifest = json.loads(self.objects[("temp-bucket", manifest_key("id"))])
+        assert {"1", "2", "3"} <= set(manifest["tranches"])
+
+    def test_tranches_are_not_sent_after_a_503(self):
+        event = self.handle(3, {1: "503"})
+
+        assert event["spotPrebookingStatus"] == ["success", "QueueMessage"]
+        assert event["spotPrebookingResponseCode"] == [201, 503]
+        assert event["spotPrebookingResponsePath"] == [
+            "s3://temp-bucket/id/spots_response_1.json"
+        ]
+        # the tranches in flight when Landmark answered 503 are awaited, the others aren't sent
+        assert {0, 1} <= set(self.adaptor.sent) <= {0, 1, 2}
+        assert self.iterations == [1]
+
+        sequential = self.handle(1, {1: "503"})
+        assert sequential == event
+        assert self.adaptor.sent == [0, 1]
+
+    def test_a_retry_resumes_from_the_first_tranche_not_answered(self):
+        all_answered = self.handle(1)
+
+        self.handle(3, {1: "503"})
+        answered_before = set(self.adaptor.sent) - {1}
+        manifest = json.loads(self.objects[("temp-bucket", manifest_key("id"))])
+        # the tranches answered while the handler stopped at the 503 are recorded too
+        assert set(manifest["tranches"]) == {
+            str(index + 1) for index in answered_before
+        }
+
+        resumed = self.handle(1, resume=True)
+        assert resumed == all_answered
+        assert sorted(self.adaptor.sent) == sorted(set(range(5)) - answered_before)
+        assert self.iterations == [1, 2, 3, 4, 5]
+
+        self.handle(3, resume=True)
+        assert self.adaptor.sent == []
+
+    def test_salesforce_writes_of_a_failed_flush_are_sent_with_the_next_one(self):
+        lambda_client = mock.MagicMock()
+        lambda_client.invoke.side_effect = [
+            RuntimeError("adaptor failed"),
+            {"Payload": io.BytesIO(b'{"compositeResponse": []}')},
+        ]
+        with mock.patch.dict(os.environ, MOCK_ENV):
+            handler = CallSpotPrebookingAPIHandler(json.loads(json.dumps(EVENT)))
+        handler.batcher = CompositeBatcher(lambda_client, "sf-adaptor")
+        handler.update_sf_opportunity({"payload": {"StageName": "x"}}, "006OPP")
+
+        with mock.patch.object(handler.logger, "error") as error:
+            assert handler.flush_sf_writes() is None
+        error.assert_called_once()
+        assert len(handler.batcher) == 1
+
+        assert handler.flush_sf_writes() == [{"compositeResponse": []}]
+        sent = json.loads(lambda_client.invoke.call_args.kwargs["Payload"])
+        assert sent["payload"]["compositeRequest"][0]["url"].endswith("/006OPP")
+        assert len(handler.batcher) == 0
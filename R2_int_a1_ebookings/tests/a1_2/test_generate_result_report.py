@@ -14,8 +14,13 @@ sys.path.append(
 
 # from functions.a1_2.get_brq_file import GetBRQFileHandler
 from functions.a1_2.generate_result_report import ResultReportGenerator
-from tests.mock_boto import mock_client_generator, mock_lambda_simple_return
+from tests.mock_boto import (
+    mock_client_generator,
+    mock_lambda_simple_return,
+    no_such_key_error,
+)
 from functions.BRQParser import BRQParser
+from functions.brq_sidecar import SIDECAR_SUFFIX
 
 GOOD_EVENT = {
     "version": "0",
@@ -310,6 +315,33 @@ class TestResultReportGenerator:
         )
         assert actual == (expected, "No")
 
+    def test_list_to_status_detail_matches_line_numbers(self):
+        event = json.loads(json.dumps(GOOD_EVENT))
+        event["detail"]["sf_payload"]["approvalID"] = 12345
+        handler = ResultReportGenerator(event)
+        handler.spot_payload_json = json.loads(CONTENT_SPOTS_PAYLOAD_JSON)
+        details = handler.spot_payload_json["spotPreBookingDetails"]
+        details.reverse()
+
+        failed_response_json = [
+            {
+                "campaignNumber": 337,
+                "lineNumber": line_number,
+                "messages": [
+                    {"title": f"Title{line_number}", "status": 422, "detail": "Msg"}
+                ],
+            }
+            for line_number in (5, 1)
+        ]
+
+        status_detail, overall_status = (
+            handler._ResultReportGenerator__list_to_status_detail(failed_response_json)
+        )
+
+        assert list(status_detail) == [len(details) - 5, len(details) - 1]
+        assert status_detail[len(details) - 1]["title"] == "Title1"
+        assert overall_status == "No"
+
     def test_generate(self):
 
         self.written_content = ""
@@ -318,7 +350,9 @@ class TestResultReportGenerator:
             def __init__(sself, *args) -> None:
                 pass
 
-            def get_object(sself, Bucket, Key, *args):
+            def get_object(sself, Bucket, Key, *args, Range=None):
+                if Key.endswith(SIDECAR_SUFFIX):
+                    raise no_such_key_error()
                 if Bucket == MOCK_ENV["EBOOKINGS_S3_TEMP_BUCKET"]:
                     file_name = os.path.basename(Key)
                     content = open(
@@ -365,3 +399,76 @@ class TestResultReportGenerator:
                     "spotPrebookingResultStatus": "Partial",
                     "spotPrebookingResultFileNameToSF": "SpotsNotLoadedinLMK-000000307-SPARK-OpportunityID123-278-2024-01-24_151438.csv",
                 }
+
+    def test_generate_tranches_and_combined_report(self):
+        objects = {}
+        for index in (1, 2):
+            objects[("temp-bucket", f"cid/tranche/payload_{index}.json")] = (
+                CONTENT_SPOTS_PAYLOAD_JSON.encode("utf-8")
+            )
+            objects[("temp-bucket", f"cid/tranche/response_{index}.json")] = (
+                CONTENT_SPOTS_RESPONSE_JSON.encode("utf-8")
+            )
+        objects[("temp-bucket", "brq.json")] = CONTENT_BRQ_JSON.encode("utf-8")
+
+        class MockS3Client:
+            def __init__(sself, *args) -> None:
+                pass
+
+            def get_object(sself, Bucket, Key, *args, Range=None):
+                if (Bucket, Key) not in objects:
+                    raise no_such_key_error()
+                return {"Body": io.BytesIO(objects[(Bucket, Key)])}
+
+            def put_object(sself, Body, Bucket, Key, *args):
+                objects[(Bucket, Key)] = (
+                    Body if isinstance(Body, bytes) else Body.encode("utf-8")
+                )
+
+        event = json.loads(json.dumps(GOOD_EVENT))
+        event.update(
+            {
+                "id": "cid",
+                "trancheFileCount": 2,
+                "spotPayloadFilePath": [
+                    "s3://temp-bucket/cid/tranche/payload_1.json",
+                    "s3://temp-bucket/cid/tranche/payload_2.json",
+                ],
+                "spotPrebookingResponsePath": [
+                    "s3://temp-bucket/cid/tranche/response_1.json",
+                    "s3://temp-bucket/cid/tranche/response_2.json",
+                ],
+            }
+        )
+        event["detail"]["sf_payload"]["approvalID"] = 12345
+
+        def report_lines(path):
+            return (
+                objects[("temp-bucket", path[len("s3://temp-bucket/") :])]
+                .decode("utf-8")
+                .splitlines()
+            )
+
+        with mock.patch("boto3.client", mock_client_generator({"s3": MockS3Client})):
+            output = ResultReportGenerator(json.loads(json.dumps(event))).generate()
+
+            tranche_lines = report_lines(output["spotPrebookingReport"][0])
+            assert len(tranche_lines) == 5
+            assert report_lines(output["spotPrebookingReport"][1]) == tranche_lines
+            assert output["spotPrebookingResultStatus"] == ["Partial", "Partial"]
+            assert output["spotPrebookingCombinedReport"].endswith("-all.csv")
+            assert (
+                report_lines(output["spotPrebookingCombinedReport"])
+                == tranche_lines + tranche_lines[1:]
+            )
+
+            # a run again reuses the reports recorded in the manifest, the tranches aren't read
+            for index in (1, 2):
+                del objects[("temp-bucket", f"cid/tranche/response_{index}.json")]
+            objects[("temp-bucket", "cid/tranche/payload_1.json")] = b""
+            rerun = ResultReportGenerator(json.loads(json.dumps(event))).generate()
+
+            assert rerun["spotPrebookingReport"] == output["spotPrebookingReport"]
+            assert report_lines(rerun["spotPrebookingCombinedReport"]) == (
+                tranche_lines + tranche_lines[1:]
+            )
@@ -15,7 +15,12 @@ sys.path.append(
 
 # from functions.a1_2.get_brq_file import GetBRQFileHandler
 from functions.a1_2.get_brq_file import GetBRQFileHandler, lambda_handler
-from tests.mock_boto import mock_client_generator, mock_lambda_simple_return
+from tests.mock_boto import (
+    mock_client_generator,
+    mock_lambda_simple_return,
+    MockSSMClient,
+)
+from functions.parameter_store import parameter_store
 from functions.BRQParser import BRQParser
 
 BRQ_FILE_PATH = (
@@ -95,6 +100,9 @@ class TestLocalA12Preprocessing:
             TestLocalA12Preprocessing.temp_folder + "/sales_area_mapping.csv",
         )
 
+    def setup_method(self):
+        parameter_store.clear()
+
     @classmethod
     def teardown_class():
         # shutil.rmtree(TestLocalA12Preprocessing.temp_folder)
@@ -120,7 +128,7 @@ class TestLocalA12Preprocessing:
                 f = open(TestLocalA12Preprocessing.temp_folder + "/" + file_name)
                 return {"Body": io.BytesIO(f.read().encode("utf-8"))}
 
-        class SSMMockClient:
+        class SSMMockClient(MockSSMClient):
             def __init__(self, region_name=""):
                 pass
 
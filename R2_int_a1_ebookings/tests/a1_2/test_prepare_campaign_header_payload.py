@@ -6,7 +6,12 @@ import json
 import io
 import csv
 from datetime import datetime
-from tests.mock_boto import mock_client_generator, mock_lambda_simple_return
+from tests.mock_boto import (
+    mock_client_generator,
+    mock_lambda_simple_return,
+    no_such_key_error,
+    MockSSMClient,
+)
 
 import sys
 
@@ -15,6 +20,9 @@ sys.path.append(
 )  # project root folder
 
 from functions.BRQParser import BRQParser
+from functions.a1_2.SalesAreaMap import SalesAreaMap
+from functions.brq_sidecar import SIDECAR_SUFFIX
+from functions.parameter_store import parameter_store
 
 from functions.a1_2.prepare_campaign_header_payload import (
     PrepareCampaignHeaderPayloadHandler,
@@ -49,20 +57,14 @@ GOOD_EVENT["brqJsonKey"] = "test.brq.json"
 # }
 
 
-class MockSalesAreaMap:
+class MockSalesAreaMap(SalesAreaMap):
     def __init__(self, param_name="", sales_area_path="", sales_area_content=None):
         print("test_prepare_spot_payload.MockSalesAreaMap: init...")
         csv_file_path = os.path.join(
             os.path.dirname(__file__), "sales_area_mapping.csv"
         )
         with open(csv_file_path, encoding="utf-8-sig") as csv_file_handler:
-            sales_area_dict_reader = csv.DictReader(csv_file_handler)
-            self._fieldnames = sales_area_dict_reader.fieldnames
-            self._data = list(sales_area_dict_reader)
-
-    @property
-    def data(self):
-        return self._data
+            super().__init__(sales_area_csv=csv_file_handler.read())
 
 
 @mock.patch.dict("os.environ", MOCK_ENV, clear=True)
@@ -72,6 +74,9 @@ class TestPrepareCampaignHeaderPayload:
     def setup_class(cls):
         pass
 
+    def setup_method(self):
+        parameter_store.clear()
+
     @classmethod
     def teardown_class(cls):
         pass
@@ -80,7 +85,7 @@ class TestPrepareCampaignHeaderPayload:
         "functions.a1_2.prepare_campaign_header_payload.SalesAreaMap", MockSalesAreaMap
     )
     def test_calculate_sales_area_for_one_parent_sales_area(self):
-        class SSMMockClient:
+        class SSMMockClient(MockSSMClient):
             def __init__(self, region_name=""):
                 pass
 
@@ -158,7 +163,7 @@ class TestPrepareCampaignHeaderPayload:
         "functions.a1_2.prepare_campaign_header_payload.SalesAreaMap", MockSalesAreaMap
     )
     def test_calculate_strike_weigth_for_one_parent_sales_area(self):
-        class SSMMockClient:
+        class SSMMockClient(MockSSMClient):
             def __init__(self, region_name=""):
                 pass
 
@@ -219,7 +224,7 @@ class TestPrepareCampaignHeaderPayload:
         "functions.a1_2.prepare_campaign_header_payload.SalesAreaMap", MockSalesAreaMap
     )
     def test_calculate_delivery_length_for_one_parent_sales_area(self):
-        class SSMMockClient:
+        class SSMMockClient(MockSSMClient):
             def __init__(self, region_name=""):
                 pass
 
@@ -267,7 +272,7 @@ class TestPrepareCampaignHeaderPayload:
         "functions.a1_2.prepare_campaign_header_payload.SalesAreaMap", MockSalesAreaMap
     )
     def test_calculate_day_parts_for_one_parent_sales_area(self):
-        class SSMMockClient:
+        class SSMMockClient(MockSSMClient):
             def __init__(self, region_name=""):
                 pass
 
@@ -326,7 +331,7 @@ class TestPrepareCampaignHeaderPayload:
         "functions.a1_2.prepare_campaign_header_payload.SalesAreaMap", MockSalesAreaMap
     )
     def test_group_by_parent_sales_area(self):
-        class SSMMockClient:
+        class SSMMockClient(MockSSMClient):
             def __init__(self, region_name=""):
                 pass
 
@@ -380,7 +385,7 @@ class TestPrepareCampaignHeaderPayload:
             def get_object(sself, Bucket, Key):
                 pass
 
-        class SSMMockClient:
+        class SSMMockClient(MockSSMClient):
             def __init__(self, region_name=""):
                 pass
 
@@ -447,7 +452,7 @@ class TestPrepareCampaignHeaderPayload:
         "functions.a1_2.prepare_campaign_header_payload.SalesAreaMap", MockSalesAreaMap
     )
     def test_calculate_campaign(self):
-        class SSMMockClient:
+        class SSMMockClient(MockSSMClient):
             def __init__(self, region_name=""):
                 pass
 
@@ -723,7 +728,9 @@ class TestPrepareCampaignHeaderPayload:
             def put_object(sself, Bucket, Key, Body):
                 self.written_content = Body
 
-            def get_object(sself, Bucket, Key):
+            def get_object(sself, Bucket, Key, Range=None):
+                if Key.endswith(SIDECAR_SUFFIX):
+                    raise no_such_key_error()
                 if Key == "test_no_default.brq.json":
                     file_path = os.path.join(
                         os.path.dirname(__file__),
@@ -739,7 +746,7 @@ class TestPrepareCampaignHeaderPayload:
                 parser.parse()
                 return {"Body": io.BytesIO(json.dumps(parser.json).encode("utf-8"))}
 
-        class SSMMockClient:
+        class SSMMockClient(MockSSMClient):
             def __init__(self, region_name=""):
                 pass
 
@@ -11,6 +11,7 @@ sys.path.append(
     os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 )  # project root folder
 
+from functions.a1_2.SalesAreaMap import SalesAreaMap
 from functions.a1_2.prepare_spot_payload import PrepareSpotsPayloadHandler
 from tests.mock_boto import mock_client_generator, mock_lambda_simple_return
 
@@ -29,7 +30,7 @@ GOOD_EVENT["brqJsonBucket"] = MOCK_ENV["EBOOKINGS_S3_TEMP_BUCKET"]
 GOOD_EVENT["brqJsonKey"] = "test.json"
 
 
-class MockSalesAreaMap:
+class MockSalesAreaMap(SalesAreaMap):
     def __init__(
         self,
         param_name: str = None,
@@ -41,13 +42,7 @@ class MockSalesAreaMap:
             os.path.dirname(__file__), "sales_area_mapping.csv"
         )
         with open(csv_file_path, encoding="utf-8-sig") as csv_file_handler:
-            sales_area_dict_reader = csv.DictReader(csv_file_handler)
-            self._fieldnames = sales_area_dict_reader.fieldnames
-            self._data = list(sales_area_dict_reader)
-
-    @property
-    def data(self):
-        return self._data
+            super().__init__(sales_area_csv=csv_file_handler.read())
 
 
 @mock.patch.dict("os.environ", MOCK_ENV, clear=True)
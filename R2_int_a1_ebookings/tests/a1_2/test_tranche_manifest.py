@@ -0,0 +1,78 @@
+import json
+from unittest import mock
+
+from functions.a1_2.tranche_manifest import TrancheManifest, manifest_key
+from tests.mock_boto import no_such_key_error
+
+PAYLOADS = [
+    f"s3://temp-bucket/id/tranche/spots_payload_{index}.json" for index in (1, 2)
+]
+RESPONSES = [f"s3://temp-bucket/id/spots_response_{index}.json" for index in (1, 2)]
+
+
+class TestTrancheManifest:
+
+    def setup_method(self):
+        self.objects = {}
+        self.puts = 0
+
+        def save_to_s3(Body, Bucket, Key, Region=None):
+            self.puts += 1
+            self.objects[(Bucket, Key)] = Body
+
+        def read_from_s3(Bucket, Key, Encoding="utf-8", Region=None):
+            if (Bucket, Key) not in self.objects:
+                raise no_such_key_error()
+            return self.objects[(Bucket, Key)]
+
+        self.patches = [
+            mock.patch("functions.a1_2.tranche_manifest.save_to_s3", save_to_s3),
+            mock.patch("functions.a1_2.tranche_manifest.read_from_s3", read_from_s3),
+        ]
+        for patch in self.patches:
+            patch.start()
+
+    def teardown_method(self):
+        for patch in self.patches:
+            patch.stop()
+
+    def test_tranches_and_reports_are_checkpointed(self):
+        manifest = TrancheManifest.load("temp-bucket", "id")
+        assert manifest.first_incomplete(PAYLOADS) == 1
+
+        manifest.complete(1, PAYLOADS[0], "success", RESPONSES[0], 201)
+        manifest.complete(1, PAYLOADS[0], "success", RESPONSES[0], 201)
+        assert self.puts == 1
+        self.objects[("temp-bucket", "id/spots_response_1.json")] = "[]"
+
+        loaded = TrancheManifest.load("temp-bucket", "id")
+        assert loaded.first_incomplete(PAYLOADS) == 2
+        assert loaded.read_response(loaded.completed(1, PAYLOADS[0])) == "[]"
+        # an entry only stands for the tranche file it was recorded with
+        assert loaded.completed(1, PAYLOADS[1]) is None
+
+        loaded.complete_report(
+            1,
+            PAYLOADS[0],
+            RESPONSES[0],
+            "s3://temp-bucket/id/r.csv",
+            "success",
+            "r.csv",
+        )
+        reported = TrancheManifest.load("temp-bucket", "id").report(
+            1, PAYLOADS[0], RESPONSES[0]
+        )
+        assert reported["reportPath"] == "s3://temp-bucket/id/r.csv"
+        assert loaded.report(1, PAYLOADS[0], RESPONSES[1]) is None
+
+    def test_reset_forgets_the_previous_payload(self):
+        manifest = TrancheManifest("temp-bucket", "id")
+        manifest.complete(1, PAYLOADS[0], "success", RESPONSES[0], 201)
+
+        TrancheManifest("temp-bucket", "id").reset()
+
+        assert json.loads(self.objects[("temp-bucket", manifest_key("id"))]) == {
+            "tranches": {},
+            "reports": {},
+        }
+        assert TrancheManifest.load("temp-bucket", "id").first_incomplete(PAYLOADS) == 1
@@ -0,0 +1,79 @@
+"""
+Per-line decode cost of the BRQ detail records, interpreted slice config vs compiled codec.
+
+Run from the project root:
+    python -m tests.benchmarks.bench_brq_codec [number_of_lines]
+"""
+
+import os
+import sys
+import timeit
+
+from functions.BRQParser import BRQParser
+
+BRQ_FILE = os.path.join(
+    os.path.dirname(__file__), "..", "brq_test_files", "booking_modify_test.brq"
+)
+
+
+def interpreted_parse_one_line(oneline: str, config_dict: dict) -> dict:
+    """
+    The field by field walk BRQParser used before the codec, kept as the baseline.
+    """
+    result_object = {}
+    for field in config_dict:
+        config = config_dict[field]
+        if config[1] == None:
+            result_object[field] = oneline[config[0] :].strip()
+        else:
+            result_object[field] = oneline[config[0] : config[1]].strip()
+        if len(config) >= 3 and config[2]:
+            value_type = config[2]
+            value = result_object[field]
+            try:
+                if value_type == "money":
+                    result_object[field] = float(value[0:-2] + "." + value[-2:])
+                elif value_type == "decimaltwoandone":
+                    result_object[field] = int(value) / 10.0
+                else:
+                    result_object[field] = value_type(value)
+            except:
+                result_object[field] = (
+                    float(0) if value_type == "money" else value_type()
+                )
+    return result_object
+
+
+def main(number_of_lines=20000):
+    with open(BRQ_FILE, "r") as brq_file:
+        lines = brq_file.read().splitlines()
+    sample = [line for line in lines[1:-1] if line.endswith("//")]
+    detail_lines = (sample * (number_of_lines // len(sample) + 1))[:number_of_lines]
+    config = BRQParser.brq_detail_records_slice_config
+
+    assert [interpreted_parse_one_line(line, config) for line in sample] == (
+        BRQParser.detail_codec.decode_many(sample)
+    )
+
+    before = min(
+        timeit.repeat(
+            lambda: [interpreted_parse_one_line(line, config) for line in detail_lines],
+            number=1,
+            repeat=3,
+        )
+    )
+    after = min(
+        timeit.repeat(
+            lambda: BRQParser.detail_codec.decode_many(detail_lines),
+            number=1,
+            repeat=3,
+        )
+    )
+    print(f"lines: {number_of_lines}")
+    print(f"interpreted: {before / number_of_lines * 1e6:.2f} us/line")
+    print(f"compiled:    {after / number_of_lines * 1e6:.2f} us/line")
+    print(f"speedup:     {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
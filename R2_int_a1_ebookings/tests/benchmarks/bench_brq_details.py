@@ -0,0 +1,49 @@
+"""
+Memory of the BRQ detail records, list of dictionaries vs BRQDetails columns.
+
+Run from the project root:
+    python -m tests.benchmarks.bench_brq_details [number_of_spots]
+"""
+
+import json
+import os
+import sys
+import tracemalloc
+
+from functions.brq_details import BRQDetails
+from functions.brq_engine import EBOOKING_DIALECT, parse_brq
+
+BRQ_FILE = os.path.join(
+    os.path.dirname(__file__), "..", "brq_test_files", "booking_modify_test.brq"
+)
+
+
+def traced_memory(build):
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def main(number_of_spots=50000):
+    with open(BRQ_FILE, "r") as brq_file:
+        lines = brq_file.read().splitlines()
+    sample = lines[1:-1]
+    detail_lines = (sample * (number_of_spots // len(sample) + 1))[:number_of_spots]
+    brq_json = json.dumps(
+        parse_brq([lines[0]] + detail_lines + ["EOF//"], EBOOKING_DIALECT)
+    )
+
+    records, records_size = traced_memory(lambda: json.loads(brq_json)["details"])
+    details, details_size = traced_memory(lambda: BRQDetails.from_records(records))
+    assert details.to_records() == records
+
+    print(f"spots:                {number_of_spots}")
+    print(f"list of dictionaries: {records_size / 1024 / 1024:.1f} MB")
+    print(f"BRQDetails:           {details_size / 1024 / 1024:.1f} MB")
+    print(f"ratio:                {records_size / details_size:.1f}x")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
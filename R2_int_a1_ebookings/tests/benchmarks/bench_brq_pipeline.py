@@ -0,0 +1,373 @@
+"""
+Throughput and peak memory of the BRQ parse and A1.2 transform steps on synthetic BRQs (see brq_generator).
+
+The stages run offline against in-memory S3 and SSM stubs:
+    - brq_parser_parse: BRQParser.parse
+    - prepare_brq_json: parse_brq_file.prepare_brq_json, the BRQ read from the temp bucket
+    - prepare_spot_payload: PrepareSpotsPayloadHandler.__prepare_spot_payload
+    - calculate_campaign: PrepareCampaignHeaderPayloadHandler.__calculate_campaign
+    - generate_result_report: ResultReportGenerator.generate on tranches of SPOT_HANDLING_LIMIT spots, a tenth of
+      the spots rejected by Landmark
+    - list_to_status_detail: ResultReportGenerator.__list_to_status_detail, every spot rejected by Landmark with
+      several messages, in the reverse order of the payload
+A stage whose module can't be imported here (e.g. swm_logger isn't installed) is reported as skipped.
+
+Run from the project root, the JSON report is printed or written to --output:
+    python -m tests.benchmarks.bench_brq_pipeline [--spots 100 1000 10000] [--repeat 3] [--output report.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import re
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+from unittest import mock
+
+from functions.BRQParser import BRQParser
+from functions.parameter_store import parameter_store
+from functions.reference_data_cache import reference_data_cache
+from tests.benchmarks.brq_generator import generate_brq
+from tests.mock_boto import MockSSMClient, no_such_key_error
+
+DEFAULT_SPOTS = [100, 1000, 10000]
+REPORT_VERSION = 1
+
+TEMP_BUCKET = "temp-bucket"
+CONFIG_BUCKET = "seil-config-bucket"
+SALES_AREA_MAPPING_KEY = "sales_area_mapping.csv"
+CORRELATION_ID = "bench-correlation-id"
+BRQ_FILE_KEY = (
+    f"{CORRELATION_ID}/bench@example.com_SEVNET-2024-Request-00000001-BENCH.brq"
+)
+BRQ_JSON_KEY = f"{CORRELATION_ID}/BENCH.brq.json"
+SPOT_PAYLOAD_KEY = f"{CORRELATION_ID}/spot_payload.json"
+SPOT_RESPONSE_KEY = f"{CORRELATION_ID}/spot_response.json"
+
+BENCH_ENV = {
+    "LOG_GROUP_NAME": "bench",
+    "SEIL_AWS_REGION": "ap-southeast-2",
+    "CEE_NOTIFICATION_ENGINE": "cee-notification-engine",
+    "EBOOKINGS_S3_FILEIN_BUCKET": "in-bucket",
+    "EBOOKINGS_S3_TEMP_BUCKET": TEMP_BUCKET,
+    "SEIL_CONFIG_BUCKET_NAME": CONFIG_BUCKET,
+    "SEIL_SALES_AREA_MAPPING_PATH": f"s3://{CONFIG_BUCKET}/{SALES_AREA_MAPPING_KEY}",
+    "LMK_DAYPART_ID": "/bench/lmk/daypart-id",
+    "SPOT_HANDLING_LIMIT": "/bench/a1/spot-handling-limit",
+}
+PARAMETERS = {"/bench/lmk/daypart-id": "35", "/bench/a1/spot-handling-limit": "5000"}
+
+EVENT = {
+    "id": CORRELATION_ID,
+    "brqRequestID": "00000001",
+    "brqJsonBucket": TEMP_BUCKET,
+    "brqJsonKey": BRQ_JSON_KEY,
+    "spotPayloadFilePath": f"s3://{TEMP_BUCKET}/{SPOT_PAYLOAD_KEY}",
+    "spotPrebookingResponsePath": [f"s3://{TEMP_BUCKET}/{SPOT_RESPONSE_KEY}"],
+    "trancheFileCount": 1,
+    "detail": {
+        "campaign_code": 278,
+        "sf_payload": {
+            "approvalID": 1,
+            "sf": {"opportunityID": "0069D00000BENCH"},
+            "campaigns": [{}],
+        },
+    },
+}
+
+
+class StubS3:
+    """
+    In-memory S3 shared by the stub client and resource
+    """
+
+    def __init__(self):
+        self.objects = {}
+
+    def put(self, bucket, key, body):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.objects[(bucket, key)] = body
+
+    def client(self):
+        store = self
+
+        class StubS3Client:
+            def put_object(self, Bucket, Key, Body, **kwargs):
+                store.put(Bucket, Key, Body)
+                return {"ETag": f'"{len(store.objects)}"'}
+
+            def get_object(self, Bucket, Key, Range=None, **kwargs):
+                if (Bucket, Key) not in store.objects:
+                    raise no_such_key_error()
+                body = store.objects[(Bucket, Key)]
+                if Range:
+                    start, end = map(int, re.findall(r"\d+", Range))
+                    body = body[start : end + 1]
+                return {"Body": io.BytesIO(body)}
+
+            def head_object(self, Bucket, Key):
+                if (Bucket, Key) not in store.objects:
+                    raise no_such_key_error("HeadObject")
+                return {"ETag": '"stub"'}
+
+        return StubS3Client()
+
+    def resource(self):
+        store = self
+
+        class StubObject:
+            def __init__(self, bucket, key):
+                self.bucket_name = bucket
+                self.key = key
+
+            def get(self):
+                return {"Body": io.BytesIO(store.objects[(self.bucket_name, self.key)])}
+
+            def put(self, Body):
+                store.put(self.bucket_name, self.key, Body)
+                return {"ETag": '"stub"'}
+
+        class StubObjects:
+            def __init__(self, bucket):
+                self.bucket = bucket
+
+            def filter(self, Prefix=""):
+                return [
+                    StubObject(bucket, key)
+                    for bucket, key in sorted(store.objects)
+                    if bucket == self.bucket and key.startswith(Prefix)
+                ]
+
+        class StubBucket:
+            def __init__(self, name):
+                self.name = name
+                self.objects = StubObjects(name)
+
+        class StubResource:
+            def Bucket(self, name):
+                return StubBucket(name)
+
+            def Object(self, bucket, key):
+                return StubObject(bucket, key)
+
+        return StubResource()
+
+
+class StubSSMClient(MockSSMClient):
+    def get_parameter(self, Name, WithDecryption=True):
+        return {"Parameter": {"Name": Name, "Value": PARAMETERS[Name]}}
+
+
+@contextlib.contextmanager
+def stubbed_aws(store: StubS3):
+    def client(service_name, *args, **kwargs):
+        return store.client() if service_name == "s3" else StubSSMClient()
+
+    with mock.patch.dict(os.environ, BENCH_ENV), mock.patch(
+        "boto3.client", client
+    ), mock.patch("boto3.resource", lambda *args, **kwargs: store.resource()):
+        reference_data_cache.clear()
+        parameter_store.clear()
+        yield
+
+
+def spot_response(
+    spot_payload: dict, rejected_every: int = 10, messages: int = 1
+) -> list:
+    """
+    The Landmark spot pre-booking response, every rejected_every-th spot is rejected with messages errors
+    """
+    return [
+        {
+            "campaignNumber": detail["campaignNumber"],
+            "lineNumber": detail["lineNumber"],
+            "messages": (
+                [
+                    {
+                        "title": "Validation/Save failed",
+                        "status": 422,
+                        "detail": "Schedule Date cannot be outside the Campaign date range",
+                    }
+                ]
+                * messages
+                if index % rejected_every == 0
+                else [{"title": "Created", "status": 201, "detail": ""}]
+            ),
+        }
+        for index, detail in enumerate(spot_payload["spotPreBookingDetails"])
+    ]
+
+
+def stages(store: StubS3, brq_content: str) -> dict:
+    """
+    {stage name: setup}, the setup prepares the stage and returns the function to time
+    """
+
+    def brq_parser_parse():
+        return BRQParser(brq_content).parse
+
+    def prepare_brq_json():
+        from functions.brq_file_parser.parse_brq_file import (
+            prepare_brq_json as prepare,
+        )
+
+        store.put(TEMP_BUCKET, BRQ_FILE_KEY, brq_content)
+        return lambda: prepare(None, CORRELATION_ID, CORRELATION_ID + "/")
+
+    def prepare_spot_payload():
+        from functions.a1_2.prepare_spot_payload import PrepareSpotsPayloadHandler
+
+        handler = PrepareSpotsPayloadHandler(json.loads(json.dumps(EVENT)))
+        handler._PrepareSpotsPayloadHandler__read_brq_json()
+        return handler._PrepareSpotsPayloadHandler__prepare_spot_payload
+
+    def calculate_campaign():
+        from functions.a1_2.prepare_campaign_header_payload import (
+            PrepareCampaignHeaderPayloadHandler,
+        )
+
+        handler = PrepareCampaignHeaderPayloadHandler(json.loads(json.dumps(EVENT)))
+        handler._PrepareCampaignHeaderPayloadHandler__read_brq_json()
+        handler._PrepareCampaignHeaderPayloadHandler__group_by_parent_sales_area()
+        return handler._PrepareCampaignHeaderPayloadHandler__calculate_campaign
+
+    def generate_result_report():
+        from functions.a1_2.generate_result_report import ResultReportGenerator
+        from functions.a1_2.prepare_spot_payload import PrepareSpotsPayloadHandler
+        from functions.a1_2.tranche_manifest import manifest_key
+
+        handler = PrepareSpotsPayloadHandler(json.loads(json.dumps(EVENT)))
+        handler._PrepareSpotsPayloadHandler__read_brq_json()
+        handler._PrepareSpotsPayloadHandler__prepare_spot_payload()
+        # the tranches of SPOT_HANDLING_LIMIT spots written by PrepareSpotPayload
+        details = handler.spot_full_payload["spotPreBookingDetails"]
+        tranche_size = int(PARAMETERS["/bench/a1/spot-handling-limit"])
+        event = json.loads(json.dumps(EVENT))
+        event.update({"spotPayloadFilePath": [], "spotPrebookingResponsePath": []})
+        for number, start in enumerate(range(0, len(details), tranche_size), 1):
+            tranche = dict(
+                handler.spot_full_payload,
+                spotPreBookingDetails=details[start : start + tranche_size],
+            )
+            payload_key = f"{CORRELATION_ID}/tranche/spot_payload_{number}.json"
+            response_key = f"{CORRELATION_ID}/tranche/spot_response_{number}.json"
+            store.put(TEMP_BUCKET, payload_key, json.dumps(tranche))
+            store.put(TEMP_BUCKET, response_key, json.dumps(spot_response(tranche)))
+            event["spotPayloadFilePath"].append(f"s3://{TEMP_BUCKET}/{payload_key}")
+            event["spotPrebookingResponsePath"].append(
+                f"s3://{TEMP_BUCKET}/{response_key}"
+            )
+        event["trancheFileCount"] = len(event["spotPayloadFilePath"])
+        # a report recorded in the tranche manifest by the previous run isn't generated again
+        store.objects.pop((TEMP_BUCKET, manifest_key(CORRELATION_ID)), None)
+        return ResultReportGenerator(event).generate
+
+    def list_to_status_detail():
+        from functions.a1_2.generate_result_report import ResultReportGenerator
+        from functions.a1_2.prepare_spot_payload import PrepareSpotsPayloadHandler
+
+        handler = PrepareSpotsPayloadHandler(json.loads(json.dumps(EVENT)))
+        handler._PrepareSpotsPayloadHandler__read_brq_json()
+        handler._PrepareSpotsPayloadHandler__prepare_spot_payload()
+        response = spot_response(
+            handler.spot_full_payload, rejected_every=1, messages=3
+        )
+        response.reverse()
+        generator = ResultReportGenerator(json.loads(json.dumps(EVENT)))
+        generator.spot_payload_json = handler.spot_full_payload
+        return lambda: generator._ResultReportGenerator__list_to_status_detail(response)
+
+    return {
+        "brq_parser_parse": brq_parser_parse,
+        "prepare_brq_json": prepare_brq_json,
+        "prepare_spot_payload": prepare_spot_payload,
+        "calculate_campaign": calculate_campaign,
+        "generate_result_report": generate_result_report,
+        "list_to_status_detail": list_to_status_detail,
+    }
+
+
+def measure(setup, spots: int, repeat: int) -> dict:
+    """
+    The best time of repeat runs and the peak memory traced during one more run
+    """
+    best = None
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for _ in range(repeat):
+            run = setup()
+            start = time.perf_counter()
+            run()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        run = setup()
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return {
+        "seconds": round(best, 6),
+        "spotsPerSecond": round(spots / best, 1) if best else None,
+        "peakMemoryBytes": peak,
+    }
+
+
+def run_benchmarks(spot_counts=DEFAULT_SPOTS, repeat: int = 3, seed: int = 0) -> dict:
+    results = []
+    for spots in spot_counts:
+        brq_content = generate_brq(spots, seed)
+        store = StubS3()
+        with open(
+            os.path.join(
+                os.path.dirname(__file__), "..", "a1_2", SALES_AREA_MAPPING_KEY
+            ),
+            "rb",
+        ) as csv_file:
+            store.put(CONFIG_BUCKET, SALES_AREA_MAPPING_KEY, csv_file.read())
+        store.put(TEMP_BUCKET, BRQ_JSON_KEY, json.dumps(BRQParser(brq_content).parse()))
+
+        with stubbed_aws(store):
+            for stage, setup in stages(store, brq_content).items():
+                result = {"stage": stage, "spots": spots}
+                try:
+                    result.update(measure(setup, spots, repeat))
+                except ImportError as e:
+                    result["skipped"] = str(e)
+                results.append(result)
+    return {
+        "version": REPORT_VERSION,
+        "generatedAt": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "seed": seed,
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--spots", type=int, nargs="+", default=DEFAULT_SPOTS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="the JSON report file, printed by default")
+    args = parser.parse_args(argv)
+
+    report = json.dumps(run_benchmarks(args.spots, args.repeat, args.seed), indent=2)
+    if args.output:
+        with open(args.output, "w") as report_file:
+            report_file.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,203 @@
+"""
+Deterministic synthetic BRQ files for the benchmarks.
+
+The files follow the fixed-width layout of functions.brq_engine: a 418 characters header, the narrative lines, the
+620+ characters detail lines ending with '//' and the 'EOF//' trailer. About a fifth of the spots are multipart
+spots, a TP detail followed by one or two MD/TA details, as the BookingModifiers of the agency files.
+
+Write a file from the project root:
+    python -m tests.benchmarks.brq_generator number_of_spots output_file [seed]
+"""
+
+import random
+import sys
+from datetime import date, timedelta
+
+from functions.brq_engine import (
+    BRQ_DETAIL_LAYOUT,
+    BRQ_DETAIL_MIN_LENGTH,
+    BRQ_HEADER_LAYOUT,
+    BRQ_HEADER_LENGTH,
+)
+
+MIN_SPOTS = 100
+MAX_SPOTS = 200000
+
+# BCCs of tests/a1_2/sales_area_mapping.csv, metro and regional
+STATION_IDS = [
+    "SAS",
+    "SAS2",
+    "BTQ",
+    "HSV",
+    "TVW",
+    "ATN",
+    "TS34",
+    "TS38",
+    "5417",
+    "TS11",
+]
+PROGRAMS = ["Sunrise", "The Morning Show", "Seven News", "Home and Away", "AFL"]
+DEMOGRAPHIC_CODES = ["P25-54", "P18+", "AP", "W25-54", "1001", "1002"]
+NARRATIVES = [
+    "Please book the spots as per the attached schedule.",
+    "Contact the agency for any change of the key numbers.",
+]
+# the share of the spots which start a multipart run
+MULTIPART_RATIO = 0.2
+
+
+def _fixed_width(layout: dict, values: dict) -> str:
+    """
+    The values placed in their columns, text is left aligned and padded with spaces
+    """
+    line = []
+    for field, (start, end) in layout.items():
+        value = str(values.get(field, ""))
+        if end is None:
+            line.append(value)
+        else:
+            line.append(value[: end - start].ljust(end - start))
+    return "".join(line)
+
+
+def _number(value: int, width: int) -> str:
+    return str(value).rjust(width, "0")
+
+
+def _header_line(spot_count: int, total_cents: int, narrative_count: int) -> str:
+    return _fixed_width(
+        BRQ_HEADER_LAYOUT,
+        {
+            "GenerationDate": "20240101",
+            "GenerationTime": "1052",
+            "NetworkId": "SEVNET",
+            "NetworkName": "Seven Network",
+            "AgencyId": "B00017",
+            "AgencyName": "SYNTHETIC MEDIA AGENCY",
+            "BookingDetailRecordCounter": _number(spot_count, 6),
+            "BookingTotalGrossValue": _number(total_cents, 10),
+            "ProposedDetailRecordCounter": _number(0, 6),
+            "ProposedTotalGrossValue": _number(0, 10),
+            "NarrativeRecordCounter": _number(narrative_count, 2),
+            "NetworkContactName": "Network Contact",
+            "NetworkContactEmail": "network.contact@example.com",
+            "AgencyContactName": "Agency Contact",
+            "AgencyContactEmail": "agency.contact@example.com",
+        },
+    )
+
+
+def _detail_line(
+    rng: random.Random,
+    spot_number: int,
+    wc_date: date,
+    station_id: str,
+    modifiers: str,
+    gross_cents: int,
+) -> str:
+    requested_day = ["N"] * 7
+    requested_day[rng.randrange(7)] = "Y"
+    start_hour = rng.randrange(6, 23)
+    demo_code = rng.choice(DEMOGRAPHIC_CODES)
+    spot_id = f"{spot_number:010d}-{1:09d}"
+    return _fixed_width(
+        BRQ_DETAIL_LAYOUT,
+        {
+            "ClientId": "A00040",
+            "ClientName": "SYNTHETIC CLIENT",
+            "ClientProductId": "61",
+            "ClientProductName": "Activation",
+            "StationId": station_id,
+            "StationName": f"Station {station_id}",
+            "UniqueNetworkProposedSpotId": _number(spot_number, 20),
+            "UniqueAgencyProposedSpotId": spot_id,
+            "UniqueAgencyParentSpotId": spot_id,
+            "WCDate": wc_date.strftime("%Y%m%d"),
+            "RequestedDay": "".join(requested_day),
+            "RequestedTime": f"{start_hour:02d}00{start_hour + 1:02d}00",
+            "RequestedSize": _number(rng.choice([15, 30, 30, 30, 45, 60]), 8),
+            "RequestedGrossRate": _number(gross_cents, 10),
+            "RequestedNetRate": _number(gross_cents * 9 // 10, 10),
+            "RequestedProgram": rng.choice(PROGRAMS),
+            "DemographicCodeOne": demo_code,
+            "DemographicOneTarp": _number(rng.randrange(1, 200), 3),
+            "DemographicCodeTwo": rng.choice(DEMOGRAPHIC_CODES),
+            "DemographicTwoTarp": _number(rng.randrange(1, 200), 3),
+            "DemographicCodeThree": "",
+            "DemographicThreeTarp": "000",
+            "DemographicCodeFour": "",
+            "DemographicFourTarp": "000",
+            "BookingModifiers": modifiers + "//",
+        },
+    )
+
+
+def _modifier_runs(rng: random.Random, spot_count: int):
+    """
+    The BookingModifiers of every spot, a multipart run is "TP" then one or two "MD"/"TA"
+    """
+    modifiers = []
+    while len(modifiers) < spot_count:
+        remaining = spot_count - len(modifiers)
+        if remaining >= 2 and rng.random() < MULTIPART_RATIO:
+            parts = min(rng.choice([1, 1, 2]), remaining - 1)
+            modifiers.append("TP")
+            modifiers.extend(rng.choice(["MD", "TA"]) for _ in range(parts))
+        else:
+            modifiers.append("")
+    return modifiers
+
+
+def generate_brq_lines(
+    spot_count: int,
+    seed: int = 0,
+    first_wc_date: date = date(2024, 1, 1),
+    weeks: int = 8,
+    station_ids: list = None,
+) -> list:
+    """
+    The lines of a synthetic BRQ file, the same arguments always give the same lines.
+    :param spot_count: number of detail lines, from MIN_SPOTS to MAX_SPOTS
+    :param first_wc_date: the Monday of the first week, the spots are spread over weeks weeks
+    :param station_ids: the StationIds (BCC) of the spots, STATION_IDS by default
+    """
+    if not MIN_SPOTS <= spot_count <= MAX_SPOTS:
+        raise ValueError(f"spot_count must be from {MIN_SPOTS} to {MAX_SPOTS}.")
+    rng = random.Random(seed)
+    station_ids = station_ids or STATION_IDS
+
+    details = []
+    total_cents = 0
+    wc_date = first_wc_date
+    station_id = station_ids[0]
+    for spot_number, modifiers in enumerate(_modifier_runs(rng, spot_count), 1):
+        # the parts of a multipart spot are in the same week and station as their TP spot
+        if modifiers in ("", "TP"):
+            wc_date = first_wc_date + timedelta(weeks=rng.randrange(weeks))
+            station_id = rng.choice(station_ids)
+        gross_cents = rng.randrange(50, 5000) * 100
+        total_cents += gross_cents
+        details.append(
+            _detail_line(rng, spot_number, wc_date, station_id, modifiers, gross_cents)
+        )
+
+    header = _header_line(spot_count, total_cents, len(NARRATIVES))
+    assert len(header) == BRQ_HEADER_LENGTH
+    assert all(len(line) >= BRQ_DETAIL_MIN_LENGTH for line in details)
+    return [header] + NARRATIVES + details + ["EOF//"]
+
+
+def generate_brq(spot_count: int, seed: int = 0, **kwargs) -> str:
+    """
+    The content of a synthetic BRQ file, see generate_brq_lines
+    """
+    return "\r\n".join(generate_brq_lines(spot_count, seed, **kwargs)) + "\r\n"
+
+
+def main(spot_count, output_file, seed=0):
+    with open(output_file, "w", newline="") as brq_file:
+        brq_file.write(generate_brq(int(spot_count), int(seed)))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
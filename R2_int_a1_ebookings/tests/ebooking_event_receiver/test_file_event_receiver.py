@@ -0,0 +1,108 @@
+from unittest import mock
+import os
+import sys
+
+import pytest
+
+from tests.mock_boto import FakeClock
+
+RECEIVER_FOLDER = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "functions",
+    "ebooking_event_receiver",
+)
+# the receiver is deployed from its folder, its modules import each other from there
+sys.path.append(RECEIVER_FOLDER)
+
+MOCK_ENV = {
+    "LOG_GROUP_NAME": "TEST_LOG_GROUP",
+    "SEIL_AWS_REGION": "TEST_VAL",
+    "INTEGRATION_NUMBER": "A1",
+    "EBOOKINGS_S3_FILEIN_BUCKET": "FILE_in_Bucket",
+    "EBOOKINGS_S3_TEMP_BUCKET": "TEMP_Bucket",
+    "EBOOKING_PARSE_BRQ_ENGINE_ARN": "arn:parse-brq",
+    "LQS_PUBLISHER_FUNCTION": "lqs-publisher",
+}
+
+
+def new_event():
+    return {
+        "Records": [
+            {
+                "s3": {
+                    "bucket": {"name": "FILE_in_Bucket"},
+                    "object": {"key": "brq1.zip", "eTag": "e1", "sequencer": "0A"},
+                }
+            }
+        ]
+    }
+
+
+class MockContext:
+    def get_remaining_time_in_millis(self):
+        return 900000
+
+
+@mock.patch.dict("os.environ", MOCK_ENV, clear=True)
+class TestFileEventReceiver:
+
+    def setup_method(self):
+        from event_idempotency import EventIdempotency, MemoryStore
+
+        self.clock = FakeClock()
+        self.store = MemoryStore()
+        self.idempotency = EventIdempotency(
+            self.store, ttl_seconds=86400, clock=self.clock
+        )
+        self.lambda_client = mock.MagicMock()
+
+    def run(self, event, resource=mock.MagicMock()):
+        from functions.ebooking_event_receiver import (
+            a1_eBooking_file_event_receiver_function as receiver,
+        )
+
+        with mock.patch.object(
+            receiver, "event_idempotency", self.idempotency
+        ), mock.patch.object(receiver, "resource", resource), mock.patch.object(
+            receiver, "extract_brq_file"
+        ), mock.patch(
+            "boto3.client", return_value=self.lambda_client
+        ):
+            return receiver.lambda_handler(event, MockContext())
+
+    def claim_expiry(self):
+        return list(self.store._claims.values())
+
+    def test_duplicate_event_ignored(self):
+        self.run(new_event())
+        self.run(new_event())
+
+        assert self.lambda_client.invoke.call_count == 1
+        assert self.claim_expiry() == [self.clock.now + 86400]
+
+    def test_failed_processing_releases_the_claim(self):
+        self.lambda_client.invoke.side_effect = RuntimeError("LQS unavailable")
+        with pytest.raises(RuntimeError):
+            self.run(new_event())
+        assert self.claim_expiry() == []
+
+        # failing before the LQS publish as well
+        with pytest.raises(RuntimeError):
+            self.run(new_event(), mock.MagicMock(side_effect=RuntimeError("no S3")))
+        assert self.claim_expiry() == []
+
+        self.lambda_client.invoke.side_effect = None
+        self.run(new_event())
+        assert self.lambda_client.invoke.call_count == 2
+
+    def test_claim_expires_with_the_invocation_until_processed(self):
+        def check_in_progress(*args, **kwargs):
+            assert self.claim_expiry() == [self.clock.now + 900]
+            return {"StatusCode": 200}
+
+        self.lambda_client.invoke.side_effect = check_in_progress
+
+        self.run(new_event())
+
+        assert self.lambda_client.invoke.call_count == 1
+        assert self.claim_expiry() == [self.clock.now + 86400]
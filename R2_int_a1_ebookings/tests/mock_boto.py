@@ -1,14 +1,23 @@
 import io
 import json
 
+from botocore.exceptions import ClientError
+
+from functions.adaptor_client import adaptor_client
+
 
 def mock_client_generator(type_class_dict):
-    return lambda type, region_name="": (
+    if "lambda" in type_class_dict:
+        # the adaptor client creates its Lambda client once, the next one is the mock
+        adaptor_client.clear()
+    return lambda type, region_name="", **kwargs: (
         type_class_dict[type](region_name) if type in type_class_dict else None
     )
 
 
 def mock_lambda_simple_return(return_value):
+    adaptor_client.clear()
+
     class mock_lambda_client:
         def __init__(region_name):
             pass
@@ -16,4 +25,60 @@ def mock_lambda_simple_return(return_value):
         def invoke(self, FunctionName, InvocationType="", Payload=None):
             return {"Payload": io.BytesIO(json.dumps(return_value).encode("utf-8"))}
 
-    return lambda type, region_name="": mock_lambda_client()
+    return lambda type, region_name="", **kwargs: mock_lambda_client()
+
+
+def no_such_key_error(operation_name="GetObject"):
+    return ClientError(
+        {
+            "Error": {
+                "Code": "NoSuchKey",
+                "Message": "The specified key does not exist.",
+            }
+        },
+        operation_name,
+    )
+
+
+def not_modified_error(operation_name="GetObject"):
+    return ClientError(
+        {
+            "Error": {"Code": "304", "Message": "Not Modified"},
+            "ResponseMetadata": {"HTTPStatusCode": 304},
+        },
+        operation_name,
+    )
+
+
+class MockSSMClient:
+    """
+    Base of the SSM mock clients, get_parameters is answered with the get_parameter of the subclass
+    """
+
+    def get_parameters(self, Names, WithDecryption=True):
+        parameters = []
+        invalid_parameters = []
+        for name in Names:
+            try:
+                parameter = self.get_parameter(Name=name, WithDecryption=WithDecryption)
+            except Exception:
+                invalid_parameters.append(name)
+                continue
+            parameter = parameter["Parameter"]
+            value = (
+                parameter["Value"] if isinstance(parameter, dict) else parameter.Value
+            )
+            parameters.append({"Name": name, "Value": value})
+        return {"Parameters": parameters, "InvalidParameters": invalid_parameters}
+
+
+class FakeClock:
+    """
+    A clock of the caches and stores, moved forward by setting now
+    """
+
+    def __init__(self, now=1700000000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
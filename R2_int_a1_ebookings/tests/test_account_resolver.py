@@ -0,0 +1,156 @@
+import io
+import json
+
+from functions.account_resolver import (
+    AccountResolver,
+    find_accounts,
+    find_accounts_by_landmark_id,
+    find_relationships,
+)
+from functions.sf_metadata_cache import sf_metadata_cache
+
+AGENCY = {
+    "attributes": {"type": "Account"},
+    "Id": "001AGENCY",
+    "Name": "Synthetic Media Agency",
+    "SWM_External_Account_ID__c": "B00099",
+    "SWM_Additional_External_Ids__c": "B00001;B00017;B00020",
+    "SWM_LandMark_ID__c": "LMK17",
+    "RecordType": {"attributes": {"type": "RecordType"}, "Name": "Agency"},
+    "Type": "Agency",
+}
+CLIENT = {
+    "attributes": {"type": "Account"},
+    "Id": "001CLIENT",
+    "Name": "Synthetic Client",
+    "SWM_External_Account_ID__c": "A00040",
+    "SWM_Additional_External_Ids__c": None,
+    "SWM_LandMark_ID__c": "LMK40",
+    "RecordType": {"attributes": {"type": "RecordType"}, "Name": "Advertiser"},
+    "Type": "Agency Client",
+}
+RELATIONSHIP = {
+    "Account__c": "001AGENCY",
+    "Related_Account__c": "001CLIENT",
+    "Active__c": True,
+    "SWM_Start_Date__c": "2024-01-01",
+    "SWM_End_Date__c": "2024-12-31",
+}
+
+
+class AdaptorLambdaClient:
+    """
+    The Salesforce adaptor answering the Account, RecordType and relationship queries
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def invoke(self, FunctionName, InvocationType="", Payload=None):
+        query = json.loads(Payload)["query"]
+        self.queries.append(query)
+        if "FROM+Account_Account_Relationship__c" in query:
+            records = [RELATIONSHIP]
+        elif "FROM+RecordType" in query:
+            records = [
+                {"Id": "012PARENT", "DeveloperName": "Parent_Opportunity"},
+                {"Id": "012CHILD", "DeveloperName": "Opportunity"},
+            ]
+        else:
+            records = [
+                account
+                for account in (AGENCY, CLIENT)
+                if account["SWM_LandMark_ID__c"] in query
+                or account["SWM_External_Account_ID__c"] in query
+                or "B00017" in query
+                and account is AGENCY
+            ]
+        response = {"totalSize": len(records), "records": records}
+        return {"Payload": io.BytesIO(json.dumps(response).encode("utf-8"))}
+
+
+class TestAccountResolver:
+
+    def setup_method(self):
+        sf_metadata_cache.clear()
+        self.lambda_client = AdaptorLambdaClient()
+        self.resolver = AccountResolver(self.lambda_client, "sf-adaptor")
+
+    def test_accounts_and_relationships_are_resolved_in_two_queries(self):
+        resolved = self.resolver.resolve(
+            external_ids=["B00017", "A00040", "A00040"], with_relationships=True
+        )
+
+        assert len(self.lambda_client.queries) == 2
+        assert "SWM_External_Account_ID__c+IN+('B00017','A00040')" in (
+            self.lambda_client.queries[0]
+        )
+        assert "SWM_Additional_External_Ids__c+LIKE+'%;B00017;%'" in (
+            self.lambda_client.queries[0]
+        )
+        assert "RecordType.Name" in self.lambda_client.queries[0]
+        assert [account["Id"] for account in resolved["accounts"]] == [
+            "001AGENCY",
+            "001CLIENT",
+        ]
+        assert "attributes" not in resolved["accounts"][0]
+        assert "attributes" not in resolved["accounts"][0]["RecordType"]
+        json.dumps(resolved)
+
+        agency = find_accounts(
+            resolved, "B00017", record_type="Agency", additional_ids=True
+        )
+        assert agency["totalSize"] == 1
+        assert agency["records"][0]["Id"] == "001AGENCY"
+        # the agency matches through its additional External Ids only
+        assert find_accounts(resolved, "B00017")["totalSize"] == 0
+        assert find_accounts(resolved, "A00040")["totalSize"] == 1
+        assert find_accounts(resolved, "A00040", record_type="Agency")["totalSize"] == 0
+
+        relationships = find_relationships(resolved, "001AGENCY", "001CLIENT")
+        assert relationships["records"] == [RELATIONSHIP]
+        assert find_relationships(resolved, "001CLIENT", "001AGENCY")["totalSize"] == 0
+
+    def test_checks_not_covered_are_none(self):
+        resolved = self.resolver.resolve(external_ids=["A00040"])
+
+        assert find_accounts(None, "A00040") is None
+        assert find_accounts(resolved, "B00017") is None
+        assert find_accounts_by_landmark_id(resolved, "LMK17") is None
+        assert find_relationships(resolved, "001AGENCY", "001CLIENT") is None
+
+    def test_only_the_missing_ids_are_queried(self):
+        resolved = self.resolver.resolve(external_ids=["B00017", "A00040"])
+        completed = self.resolver.resolve(
+            external_ids=["B00017", "A00040"],
+            landmark_ids=["LMK17", ""],
+            resolved=resolved,
+        )
+
+        assert len(self.lambda_client.queries) == 2
+        assert "B00017" not in self.lambda_client.queries[1]
+        assert "SWM_LandMark_ID__c+IN+('LMK17')" in self.lambda_client.queries[1]
+        assert resolved["landmarkIds"] == []
+        assert [account["Id"] for account in completed["accounts"]] == [
+            "001AGENCY",
+            "001CLIENT",
+        ]
+        buyer = find_accounts_by_landmark_id(completed, "LMK17")
+        assert buyer["records"][0]["Id"] == "001AGENCY"
+
+        self.resolver.resolve(external_ids=["A00040"], resolved=completed)
+        assert len(self.lambda_client.queries) == 2
+
+    def test_record_types_are_resolved_in_one_query(self):
+        record_types = self.resolver.resolve_record_types(
+            ["Parent_Opportunity", "Opportunity", None], "Opportunity"
+        )
+
+        assert record_types == {
+            "Parent_Opportunity": "012PARENT",
+            "Opportunity": "012CHILD",
+        }
+        assert self.lambda_client.queries == [
+            "SELECT+Id,+DeveloperName+FROM+RecordType+WHERE+DeveloperName+IN+"
+            "('Parent_Opportunity','Opportunity')+AND+SobjectType+='Opportunity'"
+        ]
@@ -0,0 +1,155 @@
+import io
+import json
+from unittest import mock
+
+import pytest
+from botocore.exceptions import ClientError
+
+from functions.adaptor_client import (
+    CLIENT_CONFIG,
+    AdaptorClient,
+    CircuitBreaker,
+    RetryPolicy,
+    adaptor_client,
+)
+
+
+def throttling_error():
+    return ClientError(
+        {
+            "Error": {"Code": "TooManyRequestsException", "Message": "Rate exceeded"},
+            "ResponseMetadata": {"HTTPStatusCode": 429},
+        },
+        "Invoke",
+    )
+
+
+class ScriptedLambdaClient:
+    """
+    Answers the invocations with the scripted bodies, an exception is raised instead of answered
+    """
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.payloads = []
+
+    def invoke(self, FunctionName, InvocationType="", Payload=None):
+        self.payloads.append(json.loads(Payload))
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return {"StatusCode": 200, "Payload": io.BytesIO(answer.encode("utf-8"))}
+
+
+class TestAdaptorClient:
+
+    def setup_method(self):
+        adaptor_client.clear()
+        self.delays = []
+        self.retry_policy = RetryPolicy(
+            max_attempts=3, sleep=self.delays.append, jitter=lambda: 0.5
+        )
+
+    def client(self, *answers) -> AdaptorClient:
+        self.lambda_client = ScriptedLambdaClient(*answers)
+        return AdaptorClient(self.lambda_client, self.retry_policy)
+
+    def test_throttled_invocations_are_retried_with_backoff(self):
+        client = self.client(throttling_error(), throttling_error(), '{"records": []}')
+
+        response = client.salesforce({"invocationType": "QUERY"}, "sf-adaptor")
+
+        assert response.json() == {"records": []}
+        assert response.attempts == 3
+        assert self.delays == [0.1, 0.2]
+
+        client = self.client(throttling_error(), throttling_error(), throttling_error())
+        with pytest.raises(ClientError):
+            client.salesforce({"invocationType": "QUERY"}, "sf-adaptor")
+        assert len(self.lambda_client.payloads) == 3
+
+    def test_landmark_errors_not_safe_to_resend_are_not_retried(self):
+        client = self.client("500")
+        assert client.landmark(
+            "lmk-adaptor", "post", "/api/v1/SpotPreBooking"
+        ).body == ("500")
+
+        client = self.client(
+            ClientError({"Error": {"Code": "AccessDeniedException"}}, "Invoke")
+        )
+        with pytest.raises(ClientError):
+            client.landmark("lmk-adaptor", "post", "/api/v1/SpotPreBooking")
+        assert self.delays == []
+
+    def test_landmark_gateway_errors_retried_for_gets_only(self):
+        client = self.client("504")
+        response = client.landmark("lmk-adaptor", "post", "/api/v1/SpotPreBooking")
+
+        assert response.body == "504" and response.attempts == 1
+        assert len(self.lambda_client.payloads) == 1
+        assert self.delays == []
+
+        client = self.client("502", "504", '{"products": []}')
+        response = client.landmark("lmk-adaptor", "get", "/api/v1/Products")
+
+        assert response.json() == {"products": []}
+        assert response.attempts == 3
+
+    def test_landmark_503_opens_the_circuit_breaker(self):
+        clock = mock.Mock(return_value=100.0)
+        client = self.client("503", "503", "503", "503", '{"status": 201}')
+        client._breakers["lmk-adaptor"] = CircuitBreaker(4, 30, clock=clock)
+
+        first = client.landmark(
+            "lmk-adaptor", "post", "/api/v1/SpotPreBooking", "s3://a"
+        )
+        assert first.landmark_unavailable and first.attempts == 3
+        assert self.lambda_client.payloads[0] == {
+            "operation": "post",
+            "landmarkEndpoint": "/api/v1/SpotPreBooking",
+            "content": "s3://a",
+        }
+        # the fourth 503 opens the breaker, it isn't retried
+        second = client.landmark("lmk-adaptor", "post", "/api/v1/SpotPreBooking")
+        assert second.attempts == 1 and client.breaker("lmk-adaptor").is_open
+
+        short_circuited = client.landmark(
+            "lmk-adaptor", "post", "/api/v1/SpotPreBooking"
+        )
+        assert short_circuited.short_circuited and short_circuited.body == "503"
+        assert len(self.lambda_client.payloads) == 4
+
+        clock.return_value = 130.0
+        response = client.landmark("lmk-adaptor", "post", "/api/v1/SpotPreBooking")
+        assert response.json() == {"status": 201}
+        assert not client.breaker("lmk-adaptor").is_open
+        assert client.breaker("lmk-adaptor").failures == 0
+
+    def test_latencies_are_recorded_per_adaptor_and_operation(self):
+        client = self.client('{"records": []}', '{"records": []}', "[]")
+        arn = "arn:aws:lambda:ap-southeast-2:000000000000:function:sf-adaptor"
+        client.salesforce({"invocationType": "QUERY"}, arn)
+        client.salesforce({"invocationType": "QUERY"}, arn)
+        client.landmark("lmk-adaptor", "get", "/api/v1/Products")
+
+        stats = client.latency_stats()
+        assert list(stats) == ["lmk-adaptor /api/v1/Products", "sf-adaptor QUERY"]
+        assert stats["sf-adaptor QUERY"]["count"] == 2
+        assert sum(stats["sf-adaptor QUERY"]["buckets"].values()) == 2
+        assert stats["sf-adaptor QUERY"]["p50Ms"] == 10
+
+    def test_container_client_is_created_once_with_the_tuned_config(self):
+        created = []
+
+        def client(service_name, **kwargs):
+            created.append(kwargs)
+            return ScriptedLambdaClient("[]", "[]")
+
+        with mock.patch("boto3.client", client):
+            adaptor_client.landmark("lmk-adaptor", "get", "/api/v1/Products")
+            adaptor_client.landmark("lmk-adaptor", "get", "/api/v1/Products")
+
+        assert len(created) == 1
+        assert created[0]["config"] is CLIENT_CONFIG
+        assert CLIENT_CONFIG.tcp_keepalive is True
+        assert CLIENT_CONFIG.retries["total_max_attempts"] == 1
@@ -0,0 +1,47 @@
+import pytest
+
+from functions.brq_codec import FixedWidthCodec
+
+
+class TestFixedWidthCodec:
+
+    @classmethod
+    def setup_class(cls):
+        cls.codec = FixedWidthCodec(
+            {
+                "Name": [0, 6],
+                "Size": [6, 10, int],
+                "Rate": [10, 16, "money"],
+                "Tarp": [16, 19, "decimaltwoandone"],
+                "Rating": [19, 24, float],
+                "Modifiers": [24, None, lambda value: value.split()],
+            }
+        )
+
+    def test_decode(self):
+        record = self.codec.decode("ABC   0015001234231012.5 TP MD")
+        assert list(record) == ["Name", "Size", "Rate", "Tarp", "Rating", "Modifiers"]
+        assert record["Name"] == "ABC"
+        assert record["Size"] == 15
+        assert record["Rate"] == 12.34
+        assert record["Tarp"] == 23.1
+        assert record["Rating"] == 12.5
+        assert record["Modifiers"] == ["TP", "MD"]
+
+    def test_decode_fallbacks(self):
+        record = self.codec.decode("ABC             000     ")
+        assert record["Size"] == 0
+        assert record["Rate"] == 0.0
+        assert record["Rating"] == 0.0
+
+    def test_decode_raises_on_invalid_tarp(self):
+        with pytest.raises(ValueError):
+            self.codec.decode("ABC   0015001234XYZ012.5")
+
+    def test_decode_many(self):
+        lines = ["ABC   0015001234231012.5 TP", "DEF   0030000100001000.0"]
+        assert self.codec.decode_many(lines) == [self.codec.decode(l) for l in lines]
+
+    def test_single_field_config(self):
+        codec = FixedWidthCodec({"Name": [0, 3]})
+        assert codec.decode("ABCDEF") == {"Name": "ABC"}
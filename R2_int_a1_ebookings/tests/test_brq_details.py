@@ -0,0 +1,78 @@
+import os
+from datetime import date
+
+import pytest
+
+from functions.brq_details import BRQDetails
+from functions.brq_engine import EBOOKING_DIALECT, PARSER_DIALECT, parse_brq
+
+
+def _read_brq_file_content(brq_file_name):
+    with open(
+        os.path.join(os.path.dirname(__file__), "brq_test_files", brq_file_name), "r"
+    ) as brq_file:
+        return brq_file.read()
+
+
+class TestBRQDetails:
+
+    @classmethod
+    def setup_class(cls):
+        content = _read_brq_file_content("simple.brq")
+        cls.ebooking_records = parse_brq(content, EBOOKING_DIALECT)["details"]
+        cls.parser_records = parse_brq(content, PARSER_DIALECT)["details"]
+
+    def test_round_trip(self):
+        for records in [self.ebooking_records, self.parser_records]:
+            details = BRQDetails.from_records(records)
+            assert len(details) == len(records)
+            assert details.to_records() == records
+            assert [dict(row) for row in details] == records
+            assert details[-1]["WCDate"] == records[-1]["WCDate"]
+
+    def test_single_field(self):
+        records = [{"ClientName": "ACME"}, {"ClientName": "BETA"}]
+
+        details = BRQDetails.from_records(records)
+
+        assert details.column("ClientName") == ["ACME", "BETA"]
+        assert details.to_records() == records
+
+    def test_append(self):
+        details = BRQDetails()
+        for record in self.ebooking_records:
+            details.append(record)
+        assert details.to_records() == self.ebooking_records
+
+    def test_column_falls_back_to_list(self):
+        records = [dict(record) for record in self.parser_records]
+        records[1]["WCDate"] = "2024-01-07"
+        records[2]["RequestedGrossRate"] = 1.005
+        details = BRQDetails.from_records(records)
+        assert details.to_records() == records
+        with pytest.raises(ValueError):
+            details.min_wc_date()
+
+    def test_aggregates(self):
+        details = BRQDetails.from_records(self.ebooking_records)
+        assert details.min_wc_date() == date(2024, 1, 7)
+        assert details.max_wc_date() == date(2024, 1, 14)
+        assert details.count_wc_dates_before(date(2024, 1, 14)) == 3
+        assert details.sum("RequestedGrossRate") == sum(
+            record["RequestedGrossRate"] for record in self.ebooking_records
+        )
+        assert details.sum("RequestedSize") == 6 * 15
+        assert details.count_by("StationId") == {"TS38": 6}
+        assert details.distinct("StationId") == ["TS38"]
+        assert details.group_indexes_by("WCDate") == {
+            "20240107": [0, 1, 5],
+            "20240114": [2, 3, 4],
+        }
+        assert details.count_missing_demo() == 0
+
+    def test_count_missing_demo(self):
+        records = [dict(record) for record in self.ebooking_records]
+        records[0]["DemographicCodeOne"] = ""
+        records[1]["DemographicCodeOne"] = ""
+        records[1]["DemographicCodeFour"] = "003"
+        assert BRQDetails.from_records(records).count_missing_demo() == 1
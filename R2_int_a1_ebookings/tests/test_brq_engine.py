@@ -0,0 +1,66 @@
+import os
+from datetime import date
+
+from functions.brq_engine import EBOOKING_DIALECT, PARSER_DIALECT, parse_brq
+
+
+def _read_brq_file_content(brq_file_name):
+    with open(
+        os.path.join(os.path.dirname(__file__), "brq_test_files", brq_file_name), "r"
+    ) as brq_file:
+        return brq_file.read()
+
+
+class TestBRQEngine:
+
+    @classmethod
+    def setup_class(cls):
+        cls.simple_brq = _read_brq_file_content("simple.brq")
+
+    def test_ebooking_dialect(self):
+        brq_object = parse_brq(self.simple_brq, EBOOKING_DIALECT)
+        assert list(brq_object) == ["header", "narrativeRecords", "details"]
+
+        header = brq_object["header"]
+        assert header["GenerationDate"] == 20231219
+        assert header["BookingDetailRecordCounter"] == ""
+        assert header["ProposedDetailRecordCounter"] == 6
+
+        detail = brq_object["details"][0]
+        assert len(brq_object["details"]) == 6
+        assert detail["WCDate"] == "20240107"
+        assert detail["RequestedTime"] == "06000900"
+        assert detail["ProposedSize"] == ""
+        assert detail["RequestedSize"] == 15
+        assert detail["RequestedGrossRate"] == 69.0
+        assert detail["RequestedNetRate"] == 62.10
+        assert detail["DemographicOneThousand"] == ""
+        assert detail["DemographicOneTarp"] == 1.2
+        assert detail["BookingModifiers"] == []
+
+    def test_parser_dialect(self):
+        detail = parse_brq(self.simple_brq, PARSER_DIALECT, strict=True)["details"][0]
+        assert detail["ProposedSize"] == 0
+        assert detail["DemographicOneThousand"] == 0.0
+        assert detail["BookingModifiers"] == []
+
+    def test_removed_details_and_raw_lines(self):
+        lines = self.simple_brq.splitlines()
+        current_date_lines = []
+        other_date_lines = []
+        brq_object = parse_brq(
+            self.simple_brq,
+            EBOOKING_DIALECT,
+            removed_before=date(2024, 1, 14),
+            raw_lines=(current_date_lines, other_date_lines),
+        )
+        removed_wc_dates = [d["WCDate"] for d in brq_object["removedDetails"]]
+        current_wc_dates = [d["WCDate"] for d in brq_object["details"]]
+        assert all(wc_date < "20240114" for wc_date in removed_wc_dates)
+        assert all(wc_date >= "20240114" for wc_date in current_wc_dates)
+        assert len(removed_wc_dates) == len(current_wc_dates) == 3
+
+        assert current_date_lines[0] == other_date_lines[0] == lines[0]
+        assert current_date_lines[-1] == other_date_lines[-1] == "EOF//"
+        assert len(current_date_lines) == len(current_wc_dates) + 2
+        assert len(other_date_lines) == len(removed_wc_dates) + 2
@@ -0,0 +1,63 @@
+import pytest
+
+from functions.BRQParser import BRQParser
+from functions.brq_engine import EBOOKING_DIALECT, parse_brq
+from tests.benchmarks.bench_brq_pipeline import run_benchmarks
+from tests.benchmarks.brq_generator import (
+    MAX_SPOTS,
+    MIN_SPOTS,
+    NARRATIVES,
+    generate_brq,
+    generate_brq_lines,
+)
+
+
+class TestBRQGenerator:
+
+    def test_strict_parse(self):
+        parser = BRQParser(generate_brq(500))
+        parser.parse()
+        assert not parser.has_error(), parser.get_error()
+        assert len(parser.get_details()) == 500
+        assert parser.get_narratives() == NARRATIVES
+        assert parser.get_header()["BookingDetailRecordCounter"] == 500
+        assert parser.get_header()["BookingTotalGrossValue"] == pytest.approx(
+            sum(detail["RequestedGrossRate"] for detail in parser.get_details())
+        )
+
+    def test_deterministic(self):
+        assert generate_brq(200, seed=7) == generate_brq(200, seed=7)
+        assert generate_brq(200, seed=7) != generate_brq(200, seed=8)
+
+    def test_multipart_runs(self):
+        details = parse_brq(generate_brq(1000), EBOOKING_DIALECT)["details"]
+        modifiers = [detail["BookingModifiers"] for detail in details]
+        assert ["TP"] in modifiers
+        for index, modifier in enumerate(modifiers):
+            if modifier in (["MD"], ["TA"]):
+                # a part follows its TP spot or another part, in the same week and station
+                assert modifiers[index - 1] in (["TP"], ["MD"], ["TA"])
+                for field in ["WCDate", "StationId"]:
+                    assert details[index][field] == details[index - 1][field]
+
+    def test_spot_count_range(self):
+        with pytest.raises(ValueError):
+            generate_brq_lines(MIN_SPOTS - 1)
+        with pytest.raises(ValueError):
+            generate_brq_lines(MAX_SPOTS + 1)
+
+    def test_benchmark_report(self):
+        report = run_benchmarks([MIN_SPOTS], repeat=1)
+        assert [result["stage"] for result in report["results"]] == [
+            "brq_parser_parse",
+            "prepare_brq_json",
+            "prepare_spot_payload",
+            "calculate_campaign",
+            "generate_result_report",
+            "list_to_status_detail",
+        ]
+        for result in report["results"]:
+            assert result["spots"] == MIN_SPOTS
+            assert "skipped" in result or (
+                result["spotsPerSecond"] > 0 and result["peakMemoryBytes"] > 0
+            )
@@ -0,0 +1,63 @@
+import io
+import os
+
+import pytest
+from botocore.response import StreamingBody
+
+from functions.BRQParser import BRQParser
+from functions.brq_reader import (
+    BRQFormatError,
+    DETAIL,
+    HEADER,
+    NARRATIVE,
+    read_brq_lines,
+    read_brq_records,
+)
+
+
+def _streaming_body(content: bytes) -> StreamingBody:
+    return StreamingBody(io.BytesIO(content), len(content))
+
+
+def _read_test_file(brq_file_name) -> bytes:
+    with open(
+        os.path.join(os.path.dirname(__file__), "brq_test_files", brq_file_name), "rb"
+    ) as brq_file:
+        return brq_file.read()
+
+
+class TestBRQReader:
+
+    def test_read_brq_lines_from_streaming_body(self):
+        content = _read_test_file("narrative_test.brq")
+        lines = list(read_brq_lines(_streaming_body(content), chunk_size=100))
+        assert lines == content.decode("utf-8").splitlines()[:-1]
+
+    def test_read_brq_records(self):
+        content = b"HEADER\nnarrative\nDETAIL//\r\nEOF//\n\n"
+        assert list(read_brq_records(_streaming_body(content))) == [
+            (HEADER, "HEADER"),
+            (NARRATIVE, "narrative"),
+            (DETAIL, "DETAIL//"),
+        ]
+
+    def test_missing_eof(self):
+        lines = read_brq_lines(["HEADER", "DETAIL//"])
+        assert next(lines) == "HEADER"
+        with pytest.raises(BRQFormatError, match="Last line must be 'EOF//'."):
+            next(lines)
+
+    def test_empty_file(self):
+        with pytest.raises(BRQFormatError):
+            list(read_brq_lines(_streaming_body(b"")))
+
+    def test_unicode_decode_error(self):
+        with pytest.raises(UnicodeDecodeError):
+            list(read_brq_lines(_streaming_body(b"HEADER\n\xff\nEOF//")))
+
+    def test_parser_with_streaming_body(self):
+        content = _read_test_file("booking_modify_test.brq")
+        from_string = BRQParser(content.decode("utf-8")).parse()
+        parser = BRQParser(_streaming_body(content))
+        assert parser.parse() == from_string
+        assert parser.has_error() == False
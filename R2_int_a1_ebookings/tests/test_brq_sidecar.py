@@ -0,0 +1,216 @@
+import hashlib
+import io
+import json
+import os
+import re
+import struct
+from datetime import date
+from unittest import mock
+
+from functions import brq_sidecar
+from functions.brq_details import BRQDetails, DEMO_CODE_FIELDS
+from functions.brq_engine import EBOOKING_DIALECT, PARSER_DIALECT, parse_brq
+from functions.brq_sidecar import (
+    SIDECAR_VERSION,
+    decode_brq_sidecar,
+    encode_brq_sidecar,
+    load_brq_object,
+    save_brq_sidecar,
+    sidecar_key,
+)
+from tests.mock_boto import no_such_key_error
+
+BUCKET = "temp-bucket"
+JSON_KEY = "correlation-id/brq.json"
+
+
+def _read_brq_file_content(brq_file_name):
+    with open(
+        os.path.join(os.path.dirname(__file__), "brq_test_files", brq_file_name), "r"
+    ) as brq_file:
+        return brq_file.read()
+
+
+class MemoryS3Client:
+    """
+    Just enough of the S3 client for the sidecar: put/get (with Range)/head, the requests are recorded
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.requests = []
+
+    def put_object(self, Bucket, Key, Body):
+        if isinstance(Body, str):
+            Body = Body.encode("utf-8")
+        etag = f'"{hashlib.md5(Body).hexdigest()}"'
+        self.objects[(Bucket, Key)] = (Body, etag)
+        return {"ETag": etag}
+
+    def head_object(self, Bucket, Key):
+        self.requests.append(("HEAD", Key, None))
+        if (Bucket, Key) not in self.objects:
+            raise no_such_key_error("HeadObject")
+        return {"ETag": self.objects[(Bucket, Key)][1]}
+
+    def get_object(self, Bucket, Key, Range=None):
+        self.requests.append(("GET", Key, Range))
+        if (Bucket, Key) not in self.objects:
+            raise no_such_key_error()
+        body = self.objects[(Bucket, Key)][0]
+        if Range:
+            start, end = map(int, re.fullmatch(r"bytes=(\d+)-(\d+)", Range).groups())
+            body = body[start : end + 1]
+        return {"Body": io.BytesIO(body)}
+
+    def put_brq(self, brq_object):
+        response = self.put_object(BUCKET, JSON_KEY, json.dumps(brq_object))
+        save_brq_sidecar(BUCKET, JSON_KEY, brq_object, response["ETag"], self)
+
+
+class TestBRQSidecar:
+
+    @classmethod
+    def setup_class(cls):
+        cls.ebooking_object = parse_brq(
+            _read_brq_file_content("sales_area_test.brq"),
+            EBOOKING_DIALECT,
+            removed_before=date(2024, 1, 10),
+        )
+        cls.large_object = parse_brq(
+            _read_brq_file_content(
+                "BrJohnson@Seven.com.au_SEVNET-2024-Request-00030290-STARCO.brq"
+            ),
+            EBOOKING_DIALECT,
+        )
+        cls.parser_object = parse_brq(
+            _read_brq_file_content("booking_modify_test.brq"), PARSER_DIALECT
+        )
+
+    def _as_json(self, brq_object):
+        return {
+            key: value.to_records() if isinstance(value, BRQDetails) else value
+            for key, value in brq_object.items()
+        }
+
+    def test_round_trip(self):
+        for brq_object in [self.ebooking_object, self.parser_object]:
+            content = encode_brq_sidecar(brq_object, '"etag"')
+            assert content[:4] == b"BRQC"
+            assert struct.unpack_from("<H", content, 4) == (SIDECAR_VERSION,)
+            assert self._as_json(decode_brq_sidecar(content)) == brq_object
+
+    def test_smaller_than_json(self):
+        content = encode_brq_sidecar(self.large_object, '"etag"')
+        assert len(content) < len(json.dumps(self.large_object)) / 5
+
+    def test_selected_columns(self):
+        content = encode_brq_sidecar(self.ebooking_object, '"etag"')
+        brq_object = decode_brq_sidecar(content, DEMO_CODE_FIELDS)
+        assert brq_object["header"] == self.ebooking_object["header"]
+        assert brq_object["details"].fields == DEMO_CODE_FIELDS
+        assert len(brq_object["details"]) == len(self.ebooking_object["details"])
+        assert brq_object["details"].to_records() == [
+            {field: record[field] for field in DEMO_CODE_FIELDS}
+            for record in self.ebooking_object["details"]
+        ]
+
+    def test_mixed_columns(self):
+        records = [
+            {"ClientId": "1", "ProposedSize": 15, "Other": 1, "Modifiers": ["TP"]},
+            {"ClientId": "", "ProposedSize": "x", "Other": 1.0, "Modifiers": ""},
+            {"ClientId": "1", "ProposedSize": "", "Other": None, "Modifiers": ["TP"]},
+        ]
+        brq_object = {"header": {}, "details": records}
+        content = encode_brq_sidecar(brq_object, '"etag"')
+        assert decode_brq_sidecar(content)["details"].to_records() == records
+
+    def test_load_from_sidecar(self):
+        s3_client = MemoryS3Client()
+        s3_client.put_brq(self.ebooking_object)
+
+        brq_object = load_brq_object(BUCKET, JSON_KEY, ["WCDate"], s3_client)
+
+        assert brq_object["header"] == self.ebooking_object["header"]
+        assert brq_object["details"].column("WCDate") == [
+            record["WCDate"] for record in self.ebooking_object["details"]
+        ]
+        assert brq_object["removedDetails"].fields == ["WCDate"]
+        # the JSON itself is never downloaded
+        assert ("GET", JSON_KEY, None) not in s3_client.requests
+
+    def test_load_reads_only_the_selected_blocks(self):
+        s3_client = MemoryS3Client()
+        s3_client.put_brq(self.large_object)
+        sidecar_size = len(s3_client.objects[(BUCKET, sidecar_key(JSON_KEY))][0])
+
+        with mock.patch.object(brq_sidecar, "_FIRST_READ_SIZE", 1024):
+            with mock.patch.object(brq_sidecar, "_MAX_RANGE_GAP", 0):
+                brq_object = load_brq_object(BUCKET, JSON_KEY, ["WCDate"], s3_client)
+
+        ranges = [
+            re.fullmatch(r"bytes=(\d+)-(\d+)", request[2]).groups()
+            for request in s3_client.requests
+            if request[0] == "GET"
+        ]
+        read_size = sum(int(end) - int(start) + 1 for start, end in ranges)
+        assert read_size < sidecar_size / 2
+        assert self._as_json(brq_object)["details"] == [
+            {"WCDate": record["WCDate"]} for record in self.large_object["details"]
+        ]
+
+    def test_fallback_without_sidecar(self):
+        s3_client = MemoryS3Client()
+        s3_client.put_object(BUCKET, JSON_KEY, json.dumps(self.ebooking_object))
+
+        brq_object = load_brq_object(BUCKET, JSON_KEY, ["WCDate"], s3_client)
+
+        assert self._as_json(brq_object) == self.ebooking_object
+
+    def test_fallback_with_outdated_sidecar(self):
+        s3_client = MemoryS3Client()
+        s3_client.put_brq(self.ebooking_object)
+        # the JSON is written again without its sidecar
+        s3_client.put_object(BUCKET, JSON_KEY, json.dumps(self.parser_object))
+
+        brq_object = load_brq_object(BUCKET, JSON_KEY, None, s3_client)
+
+        assert self._as_json(brq_object) == self.parser_object
+
+    def test_fallback_with_other_version(self):
+        s3_client = MemoryS3Client()
+        s3_client.put_brq(self.ebooking_object)
+        content, etag = s3_client.objects[(BUCKET, sidecar_key(JSON_KEY))]
+        content = content[:4] + struct.pack("<H", SIDECAR_VERSION + 1) + content[6:]
+        s3_client.objects[(BUCKET, sidecar_key(JSON_KEY))] = (content, etag)
+
+        brq_object = load_brq_object(BUCKET, JSON_KEY, None, s3_client)
+
+        assert self._as_json(brq_object) == self.ebooking_object
+        assert ("GET", JSON_KEY, None) in s3_client.requests
+
+    def test_fallback_with_corrupt_sidecar(self):
+        s3_client = MemoryS3Client()
+        s3_client.put_brq(self.ebooking_object)
+        content, etag = s3_client.objects[(BUCKET, sidecar_key(JSON_KEY))]
+        directory_length = struct.unpack_from("<I", content, 6)[0]
+        blocks_start = 10 + directory_length
+        for corrupt in [
+            # truncated in the directory
+            content[: 10 + directory_length // 2],
+            # blocks that don't decompress
+            content[:blocks_start] + b"\xff" * (len(content) - blocks_start),
+        ]:
+            s3_client.objects[(BUCKET, sidecar_key(JSON_KEY))] = (corrupt, etag)
+
+            brq_object = load_brq_object(BUCKET, JSON_KEY, ["WCDate"], s3_client)
+
+            assert self._as_json(brq_object) == self.ebooking_object
+
+    def test_no_sidecar_without_etag(self):
+        s3_client = MemoryS3Client()
+        assert (
+            save_brq_sidecar(BUCKET, JSON_KEY, self.ebooking_object, None, s3_client)
+            is None
+        )
+        assert s3_client.objects == {}
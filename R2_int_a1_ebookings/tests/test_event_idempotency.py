@@ -0,0 +1,109 @@
+import io
+import json
+
+import pytest
+from botocore.exceptions import ClientError
+
+from functions.ebooking_event_receiver.event_idempotency import (
+    EventIdempotency,
+    LocalFileStore,
+    MemoryStore,
+    S3Store,
+    event_key,
+    store_from_path,
+)
+from tests.mock_boto import FakeClock, no_such_key_error
+
+
+def new_record(etag="e1", sequencer="0055AED6DCD90281E5"):
+    return {
+        "s3": {
+            "bucket": {"name": "file-in"},
+            "object": {"key": "brq1.zip", "eTag": etag, "sequencer": sequencer},
+        }
+    }
+
+
+class ConditionalS3Client:
+    def __init__(self):
+        self.objects = {}
+        self.versions = 0
+
+    def put_object(
+        self, Bucket, Key, Body, ContentType, IfNoneMatch=None, IfMatch=None
+    ):
+        existing = self.objects.get((Bucket, Key))
+        if (IfNoneMatch == "*" and existing is not None) or (
+            IfMatch is not None and (existing is None or existing[1] != IfMatch)
+        ):
+            raise ClientError(
+                {"Error": {"Code": "PreconditionFailed", "Message": ""}}, "PutObject"
+            )
+        self.versions += 1
+        self.objects[(Bucket, Key)] = (Body, f'"v{self.versions}"')
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise no_such_key_error()
+        body, etag = self.objects[(Bucket, Key)]
+        return {"Body": io.BytesIO(body), "ETag": etag}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+
+class TestEventIdempotency:
+
+    def setup_method(self):
+        self.clock = FakeClock()
+
+    def idempotency(self, store):
+        return EventIdempotency(store, ttl_seconds=60, clock=self.clock)
+
+    def test_key_of_the_object_version(self):
+        assert event_key(new_record()) == event_key(new_record())
+        assert event_key(new_record()) != event_key(new_record(etag="e2"))
+        assert event_key(new_record()) != event_key(new_record(sequencer="0055AED6"))
+
+    @pytest.mark.parametrize("store_type", ["memory", "file", "s3"])
+    def test_duplicate_dropped_until_the_claim_expires(self, store_type, tmp_path):
+        store = {
+            "memory": MemoryStore,
+            "file": lambda: LocalFileStore(str(tmp_path)),
+            "s3": lambda: S3Store("temp-bucket", "idempotency", ConditionalS3Client()),
+        }[store_type]()
+        idempotency = self.idempotency(store)
+
+        key = idempotency.claim(new_record())
+
+        assert key == event_key(new_record())
+        assert idempotency.claim(new_record()) is None
+        assert idempotency.claim(new_record(etag="e2")) is not None
+        self.clock.now += 60
+        assert idempotency.claim(new_record()) == key
+        assert idempotency.claim(new_record()) is None
+
+    def test_released_claim_processed_again(self):
+        s3_client = ConditionalS3Client()
+        idempotency = self.idempotency(S3Store("temp-bucket", "idempotency", s3_client))
+
+        key = idempotency.claim(new_record())
+        idempotency.release(key)
+
+        assert idempotency.claim(new_record()) == key
+        body, _ = s3_client.objects[("temp-bucket", f"idempotency/{key}.json")]
+        assert json.loads(body) == {"expiresAt": self.clock.now + 60}
+
+    def test_event_processed_when_the_store_fails(self):
+        class FailingStore(MemoryStore):
+            def claim(self, key, now, expires_at):
+                raise ClientError({"Error": {"Code": "AccessDenied"}}, "PutObject")
+
+        assert self.idempotency(FailingStore()).claim(new_record()) is not None
+
+    def test_store_from_path(self, tmp_path):
+        store = store_from_path("s3://temp-bucket/idempotency")
+        assert isinstance(store, S3Store)
+        assert (store.bucket, store.prefix) == ("temp-bucket", "idempotency")
+        assert isinstance(store_from_path(str(tmp_path)), LocalFileStore)
+        assert isinstance(store_from_path(None), MemoryStore)
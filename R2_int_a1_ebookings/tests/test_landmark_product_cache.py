@@ -0,0 +1,61 @@
+from functions.landmark_product_cache import LandmarkProductCache
+
+PRODUCT = {"productCode": "P1", "productName": "Product 1", "payerName": "Payer"}
+
+
+class TestLandmarkProductCache:
+
+    def setup_method(self):
+        self.now = 0.0
+        self.cache = LandmarkProductCache(
+            ttl_seconds=900,
+            negative_ttl_seconds=300,
+            max_products=2,
+            clock=lambda: self.now,
+        )
+
+    def test_products_answer_the_ranges_inside_their_window(self):
+        self.cache.store("EXT1", "2024-03-01", "2024-03-31", [PRODUCT])
+
+        assert self.cache.lookup("EXT1", "2024-03-04", "2024-03-10") == [PRODUCT]
+        assert self.cache.lookup("EXT1", "2024-02-25", "2024-03-10") is None
+        assert self.cache.lookup("EXT2", "2024-03-04", "2024-03-10") is None
+        assert self.cache.stats()["hits"] == 1
+        assert self.cache.stats()["misses"] == 2
+
+    def test_window_widened_to_the_product_validity(self):
+        product = dict(PRODUCT, startDate="2024-01-01T00:00:00", endDate="2024-12-31")
+        self.cache.store("EXT1", "2024-03-01", "2024-03-31", [product])
+
+        assert self.cache.lookup("EXT1", "2024-06-01", "2024-07-31") == [product]
+        assert self.cache.lookup("EXT1", "2024-12-01", "2025-01-10") is None
+
+    def test_no_product_answers_the_ranges_containing_it(self):
+        self.cache.store("EXT1", "2024-03-01", "2024-03-31", [])
+
+        assert self.cache.lookup("EXT1", "2024-02-01", "2024-04-30") == []
+        assert self.cache.lookup("EXT1", "2024-03-04", "2024-03-10") is None
+        assert self.cache.stats()["negativeHits"] == 1
+
+        self.cache.store("EXT1", "2024-03-04", "2024-03-10", [PRODUCT])
+        assert self.cache.lookup("EXT1", "2024-03-01", "2024-03-31") is None
+
+    def test_entries_expire(self):
+        self.cache.store("EXT1", "2024-03-01", "2024-03-31", [PRODUCT])
+        self.cache.store("EXT2", "2024-03-01", "2024-03-31", [])
+
+        self.now = 301
+        assert self.cache.lookup("EXT1", "2024-03-01", "2024-03-31") == [PRODUCT]
+        assert self.cache.lookup("EXT2", "2024-03-01", "2024-03-31") is None
+
+        self.now = 901
+        assert self.cache.lookup("EXT1", "2024-03-01", "2024-03-31") is None
+
+    def test_least_recently_used_products_evicted(self):
+        self.cache.store("EXT1", "2024-03-01", "2024-03-31", [PRODUCT])
+        self.cache.store("EXT2", "2024-03-01", "2024-03-31", [PRODUCT])
+        self.cache.lookup("EXT1", "2024-03-01", "2024-03-31")
+        self.cache.store("EXT3", "2024-03-01", "2024-03-31", [PRODUCT])
+
+        assert self.cache.lookup("EXT1", "2024-03-01", "2024-03-31") == [PRODUCT]
+        assert self.cache.lookup("EXT2", "2024-03-01", "2024-03-31") is None
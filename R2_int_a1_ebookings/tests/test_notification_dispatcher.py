@@ -0,0 +1,60 @@
+import json
+from unittest import mock
+
+from functions.notification_dispatcher import (
+    NOTIFICATION_SNAPSHOT_PREFIX,
+    NotificationDispatcher,
+    snapshot_attachments,
+)
+
+
+def new_payload():
+    return {"id": "1", "body": {"type": "email", "subject": "BRQ is corrupt"}}
+
+
+class TestNotificationDispatcher:
+
+    def setup_method(self):
+        self.s3_client = mock.MagicMock()
+        self.step_function = mock.MagicMock()
+        self.step_function.start_execution.return_value = {
+            "executionArn": "arn:execution"
+        }
+        self.dispatcher = NotificationDispatcher(
+            "arn:cee", "temp-bucket", self.step_function, self.s3_client
+        )
+
+    def test_attachments_copied_to_one_snapshot(self):
+        copies = snapshot_attachments(
+            "temp-bucket", ["brq1/a.brq", "brq1/a.eml"], self.s3_client
+        )
+
+        assert list(copies) == ["brq1/a.brq", "brq1/a.eml"]
+        snapshot = {copy_key.rsplit("/", 1)[0] for copy_key in copies.values()}
+        assert len(snapshot) == 1
+        assert snapshot.pop().startswith(f"{NOTIFICATION_SNAPSHOT_PREFIX}/")
+        self.s3_client.copy_object.assert_any_call(
+            Bucket="temp-bucket",
+            Key=copies["brq1/a.eml"],
+            CopySource={"Bucket": "temp-bucket", "Key": "brq1/a.eml"},
+        )
+        assert snapshot_attachments("temp-bucket", [], self.s3_client) == {}
+        assert self.s3_client.copy_object.call_count == 2
+
+    def test_email_sent_with_the_snapshot(self):
+        response = self.dispatcher.send_email(new_payload(), ["brq1/a.eml"])
+
+        assert response == {"executionArn": "arn:execution"}
+        copy_key = self.s3_client.copy_object.call_args.kwargs["Key"]
+        kwargs = self.step_function.start_execution.call_args.kwargs
+        assert kwargs["stateMachineArn"] == "arn:cee"
+        assert json.loads(kwargs["input"])["body"]["files"] == [
+            {"path": f"s3://temp-bucket/{copy_key}"}
+        ]
+
+    def test_email_without_attachments(self):
+        self.dispatcher.send_email(new_payload())
+
+        self.s3_client.copy_object.assert_not_called()
+        kwargs = self.step_function.start_execution.call_args.kwargs
+        assert "files" not in json.loads(kwargs["input"])["body"]
@@ -0,0 +1,73 @@
+import pytest
+from botocore.exceptions import ClientError
+
+from functions.parameter_store import MAX_BATCH_SIZE, ParameterStore
+from tests.mock_boto import FakeClock, MockSSMClient
+
+
+class RecordingSSMClient(MockSSMClient):
+    def __init__(self, parameters):
+        self.parameters = parameters
+        self.requests = []
+
+    def get_parameter(self, Name, WithDecryption=True):
+        return {"Parameter": {"Name": Name, "Value": self.parameters[Name]}}
+
+    def get_parameters(self, Names, WithDecryption=True):
+        self.requests.append(list(Names))
+        return super().get_parameters(Names, WithDecryption)
+
+
+class TestParameterStore:
+
+    def setup_method(self):
+        self.clock = FakeClock()
+        self.store = ParameterStore(ttl_seconds=60, clock=self.clock)
+        self.ssm_client = RecordingSSMClient(
+            {f"/dev/a1/param{index}": str(index) for index in range(25)}
+        )
+
+    def test_declared_parameters_are_fetched_in_batches(self):
+        self.store.declare(*self.ssm_client.parameters, None, "")
+
+        assert self.store.get("/dev/a1/param3", self.ssm_client) == "3"
+        assert [len(names) for names in self.ssm_client.requests] == [
+            MAX_BATCH_SIZE,
+            MAX_BATCH_SIZE,
+            5,
+        ]
+        assert self.ssm_client.requests[0][0] == "/dev/a1/param3"
+
+        for name, value in self.ssm_client.parameters.items():
+            assert self.store.get(name, self.ssm_client) == value
+        assert len(self.ssm_client.requests) == 3
+
+    def test_expired_parameters_are_fetched_again(self):
+        self.store.declare("/dev/a1/param1", "/dev/a1/param2")
+        self.store.get("/dev/a1/param1", self.ssm_client)
+        self.ssm_client.parameters["/dev/a1/param1"] = "changed"
+
+        self.clock.now += 59
+        assert self.store.get("/dev/a1/param1", self.ssm_client) == "1"
+        self.clock.now += 1
+        assert self.store.get("/dev/a1/param1", self.ssm_client) == "changed"
+        assert self.ssm_client.requests == [
+            ["/dev/a1/param1", "/dev/a1/param2"],
+            ["/dev/a1/param1", "/dev/a1/param2"],
+        ]
+
+    def test_prefetch(self):
+        self.store.declare("/dev/a1/param1", "/dev/a1/param2")
+        self.store.prefetch(self.ssm_client)
+        self.store.prefetch(self.ssm_client)
+        assert self.store.get("/dev/a1/param2", self.ssm_client) == "2"
+        assert self.ssm_client.requests == [["/dev/a1/param1", "/dev/a1/param2"]]
+
+    def test_parameter_not_found(self):
+        self.store.declare("/dev/a1/missing")
+        assert self.store.get("/dev/a1/param1", self.ssm_client) == "1"
+        with pytest.raises(ClientError) as error:
+            self.store.get("/dev/a1/missing", self.ssm_client)
+        assert error.value.response["Error"]["Code"] == "ParameterNotFound"
+        # the missing parameter is asked again, it isn't cached
+        assert self.ssm_client.requests[-1] == ["/dev/a1/missing"]
@@ -0,0 +1,99 @@
+import csv
+import hashlib
+import io
+
+import pytest
+from botocore.exceptions import ClientError
+
+from functions.reference_data_cache import ReferenceDataCache
+from tests.mock_boto import FakeClock, no_such_key_error, not_modified_error
+
+BUCKET = "seil-config-bucket"
+KEY = "demo_mapping.csv"
+
+
+class ConditionalS3Client:
+    """
+    get_object with If-None-Match, the requests are recorded
+    """
+
+    def __init__(self):
+        self.objects = {}
+        self.requests = []
+
+    def put(self, key, content: bytes):
+        self.objects[key] = (content, f'"{hashlib.md5(content).hexdigest()}"')
+
+    def get_object(self, Bucket, Key, IfNoneMatch=None):
+        self.requests.append((Key, IfNoneMatch))
+        if Key not in self.objects:
+            raise no_such_key_error()
+        content, etag = self.objects[Key]
+        if IfNoneMatch == etag:
+            raise not_modified_error()
+        return {"Body": io.BytesIO(content), "ETag": etag}
+
+
+class TestReferenceDataCache:
+
+    def setup_method(self):
+        self.clock = FakeClock()
+        self.cache = ReferenceDataCache(revalidate_seconds=60, clock=self.clock)
+        self.s3_client = ConditionalS3Client()
+        self.s3_client.put(KEY, "﻿SMD Code,Trading Demo\nP25-54,P 25-54\n".encode())
+        self.parse_count = 0
+
+    def parse(self, content):
+        self.parse_count += 1
+        return list(csv.DictReader(content.decode("utf-8-sig").splitlines()))
+
+    def get(self):
+        return self.cache.get(BUCKET, KEY, self.parse, self.s3_client)
+
+    def test_hit_within_revalidate_seconds(self):
+        first = self.get()
+        self.clock.now += 59
+        assert self.get() is first
+        assert len(self.s3_client.requests) == 1
+        assert self.parse_count == 1
+        assert self.cache.stats() == {"hits": 1, "notModified": 0, "misses": 1}
+
+    def test_revalidate_not_modified(self):
+        first = self.get()
+        etag = self.s3_client.objects[KEY][1]
+        self.clock.now += 60
+        assert self.get() is first
+        self.clock.now += 30
+        assert self.get() is first
+        assert self.s3_client.requests == [(KEY, None), (KEY, etag)]
+        assert self.parse_count == 1
+        assert self.cache.stats() == {"hits": 1, "notModified": 1, "misses": 1}
+
+    def test_revalidate_changed(self):
+        self.get()
+        self.s3_client.put(KEY, b"SMD Code,Trading Demo\nM18+,M 18+\n")
+        self.clock.now += 60
+        assert self.get() == [{"SMD Code": "M18+", "Trading Demo": "M 18+"}]
+        assert self.parse_count == 2
+        assert self.cache.stats() == {"hits": 0, "notModified": 0, "misses": 2}
+
+    def test_parsers_are_cached_apart(self):
+        self.get()
+        assert self.cache.get(BUCKET, KEY, len, self.s3_client) == len(
+            self.s3_client.objects[KEY][0]
+        )
+        assert self.cache.stats()["misses"] == 2
+
+    def test_errors_are_raised(self):
+        self.get()
+        del self.s3_client.objects[KEY]
+        self.clock.now += 60
+        with pytest.raises(ClientError):
+            self.get()
+
+    def test_clear(self):
+        self.get()
+        self.cache.clear()
+        self.get()
+        assert self.parse_count == 2
+        assert self.cache.stats() == {"hits": 0, "notModified": 0, "misses": 1}
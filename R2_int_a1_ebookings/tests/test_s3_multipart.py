@@ -0,0 +1,78 @@
+import pytest
+
+from functions.s3_multipart import MIN_PART_SIZE, S3MultipartWriter
+
+
+class MockS3Client:
+    def __init__(self):
+        self.objects = {}
+        self.uploads = {}
+        self.aborted = []
+
+    def put_object(self, Body, Bucket, Key):
+        self.objects[(Bucket, Key)] = Body
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = f"upload{len(self.uploads) + 1}"
+        self.uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Body, Bucket, Key, PartNumber, UploadId):
+        self.uploads[UploadId][PartNumber] = Body
+        return {"ETag": f"etag{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        self.objects[(Bucket, Key)] = b"".join(
+            parts[part["PartNumber"]] for part in MultipartUpload["Parts"]
+        )
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId)
+        self.aborted.append(UploadId)
+
+
+class TestS3MultipartWriter:
+
+    def setup_method(self):
+        self.s3_client = MockS3Client()
+
+    def test_small_object_put_once(self):
+        with S3MultipartWriter("bucket", "key", s3_client=self.s3_client) as writer:
+            writer.write(b"header\r\n")
+            writer.write(b"row\r\n")
+
+        assert self.s3_client.objects == {("bucket", "key"): b"header\r\nrow\r\n"}
+        assert writer.upload_id is None
+        assert writer.uri == "s3://bucket/key"
+
+    def test_large_object_uploaded_in_parts(self):
+        chunk = b"x" * (MIN_PART_SIZE // 2 + 1)
+        with S3MultipartWriter(
+            "bucket", "key", part_size=MIN_PART_SIZE, s3_client=self.s3_client
+        ) as writer:
+            for _ in range(5):
+                writer.write(chunk)
+            # only the part being filled is held
+            assert len(writer._buffer) < MIN_PART_SIZE
+
+        assert self.s3_client.objects[("bucket", "key")] == chunk * 5
+        assert [part["PartNumber"] for part in writer.parts] == [1, 2, 3]
+        assert self.s3_client.uploads == {}
+
+    def test_upload_aborted_on_exception(self):
+        with pytest.raises(RuntimeError):
+            with S3MultipartWriter(
+                "bucket", "key", part_size=MIN_PART_SIZE, s3_client=self.s3_client
+            ) as writer:
+                writer.write(b"x" * MIN_PART_SIZE)
+                raise RuntimeError("failed")
+
+        assert self.s3_client.objects == {}
+        assert self.s3_client.aborted == ["upload1"]
+        with pytest.raises(ValueError):
+            writer.write(b"x")
+
+    def test_part_size_below_the_s3_minimum(self):
+        with pytest.raises(ValueError):
+            S3MultipartWriter("bucket", "key", part_size=1024, s3_client=self.s3_client)
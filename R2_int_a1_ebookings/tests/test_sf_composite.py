@@ -0,0 +1,180 @@
+import io
+import json
+from unittest import mock
+
+import pytest
+
+from functions.a1_2.create_update_integration_job import create_update_integration_job
+from functions.adaptor_client import adaptor_client
+from functions.sf_composite import MAX_SUBREQUESTS, CompositeBatcher
+from tests.mock_boto import mock_client_generator
+
+
+class CompositeAdaptor:
+    """
+    The Salesforce adaptor answering the COMPOSITE invocations, a POST creates a record
+    """
+
+    def __init__(self, *args):
+        self.requests = []
+
+    def invoke(self, FunctionName, InvocationType="", Payload=None):
+        payload = json.loads(Payload)
+        assert payload["invocationType"] == "COMPOSITE"
+        self.requests.append(payload["payload"])
+        response = {
+            "compositeResponse": [
+                {
+                    "body": (
+                        {"id": f"ID-{sub_request['referenceId']}", "success": True}
+                        if sub_request["method"] == "POST"
+                        else None
+                    ),
+                    "httpHeaders": {},
+                    "httpStatusCode": 201 if sub_request["method"] == "POST" else 204,
+                    "referenceId": sub_request["referenceId"],
+                }
+                for sub_request in payload["payload"]["compositeRequest"]
+            ]
+        }
+        return {"Payload": io.BytesIO(json.dumps(response).encode("utf-8"))}
+
+
+class TestCompositeBatcher:
+
+    def setup_method(self):
+        adaptor_client.clear()
+        self.adaptor = CompositeAdaptor()
+
+    def test_writes_are_sent_in_composite_requests_of_25(self):
+        batcher = CompositeBatcher(self.adaptor, "sf-adaptor")
+        tasks = [
+            batcher.create("Task", {"Subject": f"Call {index}"}) for index in range(30)
+        ]
+        update = batcher.update("Opportunity", "006OPP", {"StageName": "Closed"})
+
+        assert self.adaptor.requests == []
+        assert len(batcher.flush()) == 2
+        assert [
+            len(request["compositeRequest"]) for request in self.adaptor.requests
+        ] == [
+            MAX_SUBREQUESTS,
+            31 - MAX_SUBREQUESTS,
+        ]
+        assert all(request["allOrNone"] is True for request in self.adaptor.requests)
+        assert tasks[0].ok and tasks[0].id == f"ID-{tasks[0].reference_id}"
+        assert tasks[29].id == f"ID-{tasks[29].reference_id}"
+        assert update.status_code == 204 and update.id is None
+        assert self.adaptor.requests[1]["compositeRequest"][-1] == {
+            "method": "PATCH",
+            "url": "/services/data/v58.0/sobjects/Opportunity/006OPP",
+            "referenceId": update.reference_id,
+            "body": {"StageName": "Closed"},
+        }
+        assert len(batcher) == 0
+        assert batcher.flush() == []
+
+    def test_writes_of_a_failed_request_stay_queued(self):
+        batcher = CompositeBatcher(self.adaptor, "sf-adaptor")
+        tasks = [
+            batcher.create("Task", {"Subject": f"Call {index}"}) for index in range(30)
+        ]
+        invoke = self.adaptor.invoke
+        answers = [invoke, mock.Mock(side_effect=RuntimeError("adaptor failed"))]
+        with mock.patch.object(
+            self.adaptor,
+            "invoke",
+            side_effect=lambda *args, **kwargs: answers.pop(0)(*args, **kwargs),
+        ):
+            with pytest.raises(RuntimeError):
+                batcher.flush()
+
+        assert tasks[0].ok and tasks[29].response is None
+        assert len(batcher) == 30 - MAX_SUBREQUESTS
+        update = batcher.update("Opportunity", "006OPP", {"StageName": "Closed"})
+
+        assert len(batcher.flush()) == 1
+        assert [
+            sub_request["referenceId"]
+            for sub_request in self.adaptor.requests[-1]["compositeRequest"]
+        ] == [task.reference_id for task in tasks[MAX_SUBREQUESTS:]] + [
+            update.reference_id
+        ]
+        assert tasks[29].ok and update.status_code == 204
+        assert len(batcher) == 0
+
+    def test_context_manager_flushes_on_exit(self):
+        with CompositeBatcher(self.adaptor, "sf-adaptor") as batcher:
+            task = batcher.create("Task", {"Subject": "Call"}, reference_id="refTask")
+            batcher.update("Opportunity", "006OPP", {"Description": "@{refTask.id}"})
+            assert task.response is None
+        assert len(self.adaptor.requests) == 1
+        assert task.id == "ID-refTask"
+
+        with pytest.raises(RuntimeError):
+            with CompositeBatcher(self.adaptor, "sf-adaptor") as batcher:
+                batcher.create("Task", {"Subject": "Call"})
+                raise RuntimeError("not flushed")
+        assert len(self.adaptor.requests) == 1
+
+    def test_reference_ids(self):
+        batcher = CompositeBatcher(self.adaptor, "sf-adaptor")
+        batcher.create("Task", {}, reference_id="ref2")
+        assert batcher.create("Task", {}).reference_id == "ref2_"
+        with pytest.raises(ValueError):
+            batcher.create("Task", {}, reference_id="ref2")
+
+    def test_references_across_requests_are_rejected(self):
+        batcher = CompositeBatcher(self.adaptor, "sf-adaptor")
+        batcher.create("Task", {}, reference_id="refTask")
+        for _ in range(MAX_SUBREQUESTS):
+            batcher.update("Task", "@{refTask.id}", {"Status": "Completed"})
+
+        with pytest.raises(ValueError):
+            batcher.flush()
+        assert self.adaptor.requests == []
+
+    def test_integration_job_upsert_is_queued_or_sent(self):
+        batcher = CompositeBatcher(self.adaptor, "sf-adaptor")
+        result = create_update_integration_job(
+            "update",
+            "006OPP",
+            "Ebooking_Spots_Loading_to_Landmark",
+            "Success",
+            "10 of 10 spots have been processed.",
+            "Ebooking Spots Loading to Landmark",
+            batcher,
+        )
+        assert self.adaptor.requests == []
+        batcher.flush()
+        assert result.status_code == 204
+
+        with mock.patch.dict(
+            "os.environ", {"SALESFORCE_ADAPTOR": "sf-adaptor"}
+        ), mock.patch(
+            "boto3.client", mock_client_generator({"lambda": lambda *_: self.adaptor})
+        ):
+            response = create_update_integration_job(
+                "update",
+                "006OPP",
+                "Ebooking_Spots_Loading_to_Landmark",
+                "Failed",
+                "ERR-B3-002 Invalid Spot Length",
+                "Ebooking Spots Loading to Landmark",
+            )
+        assert response["compositeResponse"][0]["referenceId"] == "IntegrationJobUpdate"
+        assert self.adaptor.requests[1]["compositeRequest"] == [
+            {
+                "method": "PATCH",
+                "url": "/services/data/v58.0/sobjects/Integration_Job__c/IntegrationJob_ExId__c/"
+                "Ebooking_Spots_Loading_to_Landmark+006OPP",
+                "referenceId": "IntegrationJobUpdate",
+                "body": {
+                    "Status__c": "Failed",
+                    "Job_Message__c": "ERR-B3-002 Invalid Spot Length",
+                    "Platform__c": "LandMark",
+                    "Job_Type__c": "Ebooking Spots Loading to Landmark",
+                    "Opportunity__c": "006OPP",
+                },
+            }
+        ]
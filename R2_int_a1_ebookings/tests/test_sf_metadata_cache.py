@@ -0,0 +1,138 @@
+import io
+import json
+
+from functions.sf_metadata_cache import (
+    LocalFileBacking,
+    S3Backing,
+    SalesforceMetadataCache,
+    backing_from_path,
+    query_salesforce_metadata,
+    sf_metadata_cache,
+)
+from tests.mock_boto import FakeClock, no_such_key_error
+
+RECORD_TYPE_QUERY = "SELECT+Id+from+RecordType+WHERE+DeveloperName+='EBooking'+AND+SobjectType+='Case'+LIMIT+1"
+
+
+class CountingAdaptor:
+    def __init__(self, records=None):
+        self.records = [{"Id": "012CASE"}] if records is None else records
+        self.queries = []
+
+    def __call__(self, query):
+        self.queries.append(query)
+        return {"totalSize": len(self.records), "records": self.records}
+
+
+class StubS3Client:
+    def __init__(self):
+        self.objects = {}
+
+    def get_object(self, Bucket, Key):
+        if (Bucket, Key) not in self.objects:
+            raise no_such_key_error()
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def put_object(self, Bucket, Key, Body, ContentType=None):
+        self.objects[(Bucket, Key)] = Body
+
+
+class TestSalesforceMetadataCache:
+
+    def setup_method(self):
+        self.clock = FakeClock()
+        self.adaptor = CountingAdaptor()
+
+    def test_responses_are_cached_for_the_ttl(self):
+        cache = SalesforceMetadataCache(ttl_seconds=60, clock=self.clock)
+
+        for _ in range(3):
+            response = cache.query(RECORD_TYPE_QUERY, self.adaptor)
+            assert response["records"][0]["Id"] == "012CASE"
+        assert len(self.adaptor.queries) == 1
+        assert cache.stats() == {
+            "hits": 2,
+            "backingHits": 0,
+            "misses": 1,
+            "hitRate": 0.6667,
+        }
+
+        self.clock.now += 60
+        cache.query(RECORD_TYPE_QUERY, self.adaptor)
+        assert len(self.adaptor.queries) == 2
+
+    def test_empty_responses_are_not_cached(self):
+        cache = SalesforceMetadataCache(clock=self.clock)
+        adaptor = CountingAdaptor(records=[])
+
+        cache.query(RECORD_TYPE_QUERY, adaptor)
+        cache.query(RECORD_TYPE_QUERY, adaptor)
+        assert len(adaptor.queries) == 2
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = SalesforceMetadataCache(max_entries=2, clock=self.clock)
+
+        cache.query("query1", self.adaptor)
+        cache.query("query2", self.adaptor)
+        cache.query("query1", self.adaptor)
+        cache.query("query3", self.adaptor)
+        cache.query("query1", self.adaptor)
+        assert self.adaptor.queries == ["query1", "query2", "query3"]
+
+        cache.query("query2", self.adaptor)
+        assert self.adaptor.queries == ["query1", "query2", "query3", "query2"]
+
+    def test_local_file_backing_is_shared_by_the_containers(self, tmp_path):
+        backing = LocalFileBacking(str(tmp_path / "sf-metadata"))
+        warm = SalesforceMetadataCache(
+            ttl_seconds=60, backing=backing, clock=self.clock
+        )
+        cold = SalesforceMetadataCache(
+            ttl_seconds=60, backing=backing, clock=self.clock
+        )
+
+        warm.query(RECORD_TYPE_QUERY, self.adaptor)
+        assert cold.query(RECORD_TYPE_QUERY, self.adaptor)["records"] == [
+            {"Id": "012CASE"}
+        ]
+        assert len(self.adaptor.queries) == 1
+        assert cold.stats()["backingHits"] == 1
+
+        self.clock.now += 60
+        SalesforceMetadataCache(
+            ttl_seconds=60, backing=backing, clock=self.clock
+        ).query(RECORD_TYPE_QUERY, self.adaptor)
+        assert len(self.adaptor.queries) == 2
+
+    def test_s3_backing(self):
+        s3_client = StubS3Client()
+        backing = backing_from_path("s3://seil-dev-config/sf-metadata/")
+        assert isinstance(backing, S3Backing)
+        backing._s3_client = s3_client
+
+        assert backing.load("missing") is None
+        backing.store("entry", {"storedAt": 1.0, "response": {"records": []}})
+        assert list(s3_client.objects) == [
+            ("seil-dev-config", "sf-metadata/entry.json")
+        ]
+        assert backing.load("entry") == {"storedAt": 1.0, "response": {"records": []}}
+        assert backing_from_path("") is None
+        assert isinstance(backing_from_path("/tmp/sf-metadata"), LocalFileBacking)
+
+    def test_query_salesforce_metadata_invokes_the_adaptor_once(self):
+        sf_metadata_cache.clear()
+        invocations = []
+
+        class LambdaClient:
+            def invoke(self, FunctionName, InvocationType="", Payload=None):
+                invocations.append((FunctionName, json.loads(Payload)))
+                response = {"totalSize": 1, "records": [{"Id": "005OWNER"}]}
+                return {"Payload": io.BytesIO(json.dumps(response).encode("utf-8"))}
+
+        for _ in range(2):
+            response = query_salesforce_metadata(LambdaClient(), "sf-adaptor", "query")
+            assert response["records"][0]["Id"] == "005OWNER"
+        assert invocations == [
+            ("sf-adaptor", {"invocationType": "QUERY", "query": "query"})
+        ]
+        sf_metadata_cache.clear()
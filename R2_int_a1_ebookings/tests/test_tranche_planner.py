@@ -0,0 +1,77 @@
+from functions.sf_metadata_cache import LocalFileBacking
+from functions.tranche_planner import (
+    TranchePlanner,
+    TrancheStatsStore,
+    tranche_spot_counts,
+)
+
+# 2024-01-01 13:00 UTC
+ONE_PM = 1704114000.0
+FIVE_AM = ONE_PM - 8 * 3600
+
+
+def observations(spots_per_second: float, count: int = 3, status="answered"):
+    return [
+        {"spots": 1000, "seconds": 1000 / spots_per_second, "status": status}
+        for _ in range(count)
+    ]
+
+
+class TestTranchePlanner:
+
+    def setup_method(self):
+        self.now = ONE_PM
+        self.store = TrancheStatsStore(clock=lambda: self.now)
+        self.planner = TranchePlanner(
+            self.store, target_seconds=60, min_size=200, clock=lambda: self.now
+        )
+
+    def test_static_size_without_enough_observations(self):
+        self.store.record(observations(100, count=2))
+
+        plan = self.planner.plan(5000)
+
+        assert plan["size"] == 5000
+        assert plan["source"] == "static"
+        assert plan["observations"] == 2
+
+    def test_size_hits_the_target_latency_of_the_hour(self):
+        self.store.record(observations(50))
+        self.now = FIVE_AM
+        self.store.record(observations(10))
+
+        assert self.planner.plan(5000)["size"] == 600
+        self.now = ONE_PM
+        plan = self.planner.plan(5000)
+        assert plan["size"] == 3000
+        assert plan["source"] == "hour"
+        assert plan["spotsPerSecond"] == 50
+
+        # a quiet hour uses the observations of the whole day
+        self.now = ONE_PM + 3600
+        assert self.planner.plan(5000)["source"] == "day"
+
+    def test_size_is_bounded_and_503_are_left_out(self):
+        self.store.record(observations(1000))
+        self.store.record(observations(1, count=3, status="QueueMessage"))
+
+        plan = self.planner.plan(5000)
+        assert plan["size"] == 5000
+        assert plan["unavailableRate"] == 0.5
+
+        self.store.clear()
+        self.store.record(observations(1))
+        assert self.planner.plan(5000)["size"] == 200
+        assert self.planner.plan(100)["size"] == 100
+
+    def test_stats_are_shared_through_the_backing(self, tmp_path):
+        store = TrancheStatsStore(LocalFileBacking(str(tmp_path)), clock=lambda: ONE_PM)
+        store.record(observations(20))
+
+        other = TrancheStatsStore(LocalFileBacking(str(tmp_path)), clock=lambda: ONE_PM)
+        planner = TranchePlanner(other, 60, 200, clock=lambda: ONE_PM)
+        assert planner.plan(5000)["size"] == 1200
+
+    def test_tranche_spot_counts(self):
+        assert tranche_spot_counts(2500, 1000, 3) == [1000, 1000, 500]
+        assert tranche_spot_counts(800, 1000, 1) == [800]
@@ -0,0 +1,158 @@
+import json
+from unittest import mock
+
+import pytest
+
+from functions.validation_completion import (
+    LocalCompletion,
+    PollingCompletion,
+    SyncExpressCompletion,
+    validation_completion,
+)
+
+EVENT = {"brqId": "BRQ1", "validationResult": {"result": "", "details": []}}
+
+
+class MockStepFunctions:
+    def __init__(self, statuses=("SUCCEEDED",), start_errors=()):
+        self.statuses = list(statuses)
+        self.start_errors = list(start_errors)
+        self.describes = 0
+        self.inputs = []
+
+    def __start(self, stateMachineArn, input):
+        if self.start_errors:
+            raise self.start_errors.pop(0)
+        self.inputs.append(json.loads(input))
+
+    def start_sync_execution(self, stateMachineArn, input):
+        self.__start(stateMachineArn, input)
+        return self.__response(self.statuses[-1])
+
+    def start_execution(self, stateMachineArn, input):
+        self.__start(stateMachineArn, input)
+        return {"executionArn": "arn:execution"}
+
+    def describe_execution(self, executionArn):
+        status = self.statuses[min(self.describes, len(self.statuses) - 1)]
+        self.describes += 1
+        return self.__response(status)
+
+    def __response(self, status):
+        response = {"executionArn": "arn:execution", "status": status}
+        if status == "SUCCEEDED":
+            response["output"] = json.dumps(self.inputs[-1])
+        else:
+            response.update(error="States.TaskFailed", cause="rule failed")
+        return response
+
+
+class TestValidationCompletion:
+
+    def setup_method(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+    def polling(self, step_function, timeout_seconds=840):
+        return PollingCompletion(
+            "arn:engine",
+            step_function,
+            timeout_seconds=timeout_seconds,
+            max_interval_seconds=8,
+            sleep=self.sleep,
+            clock=lambda: self.now,
+        )
+
+    def test_sync_express_returns_the_output(self):
+        step_function = MockStepFunctions()
+
+        response = SyncExpressCompletion("arn:express", step_function).run(EVENT)
+
+        assert json.loads(response["output"]) == EVENT
+
+    def test_failed_execution_raises(self):
+        with pytest.raises(RuntimeError, match="FAILED: States.TaskFailed"):
+            SyncExpressCompletion("arn:express", MockStepFunctions(["FAILED"])).run(
+                EVENT
+            )
+        with pytest.raises(RuntimeError, match="TIMED_OUT"):
+            self.polling(MockStepFunctions(["RUNNING", "TIMED_OUT"])).run(EVENT)
+
+    def test_polling_backs_off_until_the_output(self):
+        step_function = MockStepFunctions(["RUNNING"] * 6 + ["SUCCEEDED"])
+
+        response = self.polling(step_function).run(EVENT)
+
+        assert json.loads(response["output"]) == EVENT
+        assert self.sleeps == [1, 2, 4, 8, 8, 8]
+
+    def test_polling_gives_up_after_the_timeout(self):
+        with pytest.raises(RuntimeError, match="still running"):
+            self.polling(MockStepFunctions(["RUNNING"]), timeout_seconds=10).run(EVENT)
+
+        assert sum(self.sleeps) == 10
+
+    def test_start_retried_while_the_engine_is_not_ready(self):
+        step_function = MockStepFunctions(
+            start_errors=[Exception("CodeArtifactUserPendingException")]
+        )
+
+        with mock.patch("functions.validation_completion.time.sleep"):
+            response = SyncExpressCompletion("arn:express", step_function).run(EVENT)
+
+        assert response["status"] == "SUCCEEDED"
+        with pytest.raises(ValueError):
+            SyncExpressCompletion(
+                "arn:express", MockStepFunctions(start_errors=[ValueError("denied")])
+            ).run(EVENT)
+
+    def test_local_stand_in(self):
+        def handler(event, context):
+            event["validationResult"]["result"] = "SUCCESS"
+            return event
+
+        response = LocalCompletion(handler).run(EVENT)
+
+        assert json.loads(response["output"])["validationResult"]["result"] == "SUCCESS"
+        assert EVENT["validationResult"]["result"] == ""
+        with pytest.raises(RuntimeError):
+            LocalCompletion(lambda event, context: event["missing"]).run(EVENT)
+
+    def test_mode_from_the_environment(self):
+        with mock.patch.dict(
+            "os.environ",
+            {
+                "VALIDATION_COMPLETION": "sync-express",
+                "ARN_VALIDATION_ENGINE_EXPRESS_SERVICE": "arn:express",
+            },
+        ):
+            step_function = MockStepFunctions()
+            completion = validation_completion("arn:engine", step_function)
+        assert isinstance(completion, SyncExpressCompletion)
+        assert completion.state_machine_arn == "arn:express"
+        assert completion.step_function is not step_function
+
+        with mock.patch.dict("os.environ", {"VALIDATION_COMPLETION": "poll"}):
+            completion = validation_completion("arn:engine", MockStepFunctions())
+        assert isinstance(completion, PollingCompletion)
+        assert completion.state_machine_arn == "arn:engine"
+
+    def test_sync_call_waits_for_the_execution_without_retries(self):
+        with mock.patch.dict(
+            "os.environ",
+            {
+                "VALIDATION_COMPLETION": "sync-express",
+                "ARN_VALIDATION_ENGINE_EXPRESS_SERVICE": "arn:express",
+            },
+        ):
+            for completion in (
+                SyncExpressCompletion("arn:express"),
+                validation_completion("arn:engine", MockStepFunctions()),
+            ):
+                config = completion.step_function.meta.config
+                assert config.read_timeout >= 300
+                assert config.retries["total_max_attempts"] == 1
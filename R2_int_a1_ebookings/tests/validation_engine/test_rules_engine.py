@@ -0,0 +1,294 @@
+import json
+import os
+import threading
+from unittest import mock
+
+import pytest
+
+from functions.common_utils import _effect
+from functions.validation_engine.rules_engine import (
+    VALIDATION_RULES,
+    Choice,
+    NoChoiceMatched,
+    Rule,
+    RulesEngine,
+    flatten,
+    plan,
+)
+
+STATE_MACHINE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(__file__))),
+    "statemachine",
+    "a1_ebooking_validation_engine.asl.json",
+)
+
+
+def new_event(sf_account_type="Agency Client"):
+    return {
+        "sfAccountType": sf_account_type,
+        "validationMessages": [],
+        "validationResult": {"continueValidation": True, "details": []},
+    }
+
+
+class FakeRule(Rule):
+    def __init__(
+        self, state_name, calls, always=False, stop=False, action=None, **fields
+    ):
+        super().__init__(state_name, "unused", always, **fields)
+        self.calls = calls
+        self.stop = stop
+        self.action = action
+
+    @property
+    def handler(self):
+        def lambda_handler(event, context):
+            self.calls.append(self.state_name)
+            if self.action is not None:
+                self.action(event)
+            event["validationResult"]["details"].append({"ruleName": self.state_name})
+            if self.stop:
+                event["validationResult"]["continueValidation"] = False
+            return event
+
+        return lambda_handler
+
+
+class Notifier:
+    def __init__(self):
+        self.sent = []
+
+    @_effect()
+    def send(self, subject):
+        self.sent.append(subject)
+
+    @_effect(deferrable=False)
+    def create_case(self, subject):
+        self.sent.append(subject)
+        return {"success": True}
+
+
+def rule_names(event):
+    return [detail["ruleName"] for detail in event["validationResult"]["details"]]
+
+
+class TestRulesEngine:
+
+    def setup_method(self):
+        self.calls = []
+
+    def test_rules_run_in_order_with_the_account_type_branch(self):
+        rules = [
+            FakeRule("first", self.calls),
+            Choice(
+                "choice",
+                "sfAccountType",
+                {
+                    "Agency Client": [FakeRule("agency", self.calls)],
+                    "Direct Client": [FakeRule("direct", self.calls)],
+                },
+            ),
+            FakeRule("last", self.calls),
+        ]
+
+        RulesEngine(rules, max_workers=1).run(new_event("Direct Client"))
+
+        assert self.calls == ["first", "direct", "last"]
+
+    def test_rules_skipped_once_validation_stops(self):
+        rules = [
+            FakeRule("format", self.calls, always=True),
+            FakeRule("network", self.calls, stop=True),
+            FakeRule("demo", self.calls),
+            FakeRule("split", self.calls, always=True),
+        ]
+        engine = RulesEngine(rules, max_workers=1)
+
+        event = engine.run(new_event())
+
+        assert self.calls == ["format", "network", "split"]
+        assert event["validationResult"]["continueValidation"] is False
+        assert engine.timings[2] == {"rule": "demo", "skipped": True}
+
+    def test_unknown_account_type_fails(self):
+        rules = [
+            FakeRule("first", self.calls, stop=True),
+            Choice("choice", "sfAccountType", {"Agency Client": []}),
+        ]
+
+        with pytest.raises(NoChoiceMatched):
+            RulesEngine(rules).run(new_event("Unknown"))
+
+    def test_brq_object_shared_by_the_rules(self):
+        with mock.patch(
+            "functions.validation_engine.rules_engine.brq_object_scope"
+        ) as scope:
+            RulesEngine([FakeRule("first", self.calls)]).run(new_event())
+
+        scope.assert_called_once_with()
+
+    def test_rules_are_the_state_machine_tasks(self):
+        with open(STATE_MACHINE) as f:
+            states = json.load(f)["States"]
+        tasks = [
+            name
+            for name, state in states.items()
+            if state["Type"] == "Task" and name != "Run validation rules engine"
+        ]
+
+        def state_names(steps):
+            for step in steps:
+                if isinstance(step, Choice):
+                    for branch in step.branches.values():
+                        yield from state_names(branch)
+                else:
+                    yield step.state_name
+
+        assert sorted(state_names(VALIDATION_RULES)) == sorted(tasks)
+        for choice in (step for step in VALIDATION_RULES if isinstance(step, Choice)):
+            assert choice.state_name in states
+
+
+class TestConcurrentRules:
+
+    def setup_method(self):
+        self.calls = []
+        self.notifier = Notifier()
+
+    def test_plan_of_the_validation_rules(self):
+        def levels(sf_account_type):
+            rules, _ = flatten(VALIDATION_RULES, new_event(sf_account_type))
+            return [
+                [rule.module.split(".")[-1] for rule in level] for level in plan(rules)
+            ]
+
+        assert levels("Agency Client") == [
+            ["validate_file_format"],
+            [
+                "validate_network_id",
+                "validate_demo_tolerance",
+                "validate_brq_wcdates",
+                "validate_brq_request_id",
+            ],
+            ["validate_sf_agency_ad_client"],
+            ["validate_sf_agency_client", "validate_product_date_range"],
+            [
+                "validate_sf_b2b_client",
+                "validate_product_advertiser",
+                "validate_product_agency_client",
+            ],
+            ["validate_brq_split"],
+        ]
+        assert levels("Direct Client")[3:5] == [
+            ["validate_sf_direct_client", "validate_product_date_range"],
+            ["validate_product_advertiser", "validate_product_direct_client"],
+        ]
+
+    def test_independent_rules_run_concurrently(self):
+        # each rule waits for the other one to start
+        barrier = threading.Barrier(2, timeout=5)
+        rules = [
+            FakeRule("network", self.calls, action=lambda event: barrier.wait()),
+            FakeRule("demo", self.calls, action=lambda event: barrier.wait()),
+        ]
+
+        event = RulesEngine(rules, max_workers=2).run(new_event())
+
+        assert rule_names(event) == ["network", "demo"]
+
+    def test_changes_merged_in_the_rule_order(self):
+        second_done = threading.Event()
+
+        def first(event):
+            second_done.wait(5)
+            event["brqClientId"] = "C1"
+            event["validationMessages"].append("first")
+
+        def second(event):
+            event["validationMessages"].append("second")
+            second_done.set()
+
+        def third(event):
+            event["validationMessages"].append(f"third {event['brqClientId']}")
+
+        rules = [
+            FakeRule(
+                "first",
+                self.calls,
+                action=first,
+                writes=("brqClientId",),
+                appends=("validationMessages",),
+            ),
+            FakeRule(
+                "second", self.calls, action=second, appends=("validationMessages",)
+            ),
+            FakeRule(
+                "third",
+                self.calls,
+                action=third,
+                reads=("brqClientId",),
+                appends=("validationMessages",),
+            ),
+        ]
+
+        event = RulesEngine(rules, max_workers=3).run(new_event())
+
+        assert self.calls.index("second") < self.calls.index("third")
+        assert rule_names(event) == ["first", "second", "third"]
+        assert event["validationMessages"] == ["first", "second", "third C1"]
+        assert event["brqClientId"] == "C1"
+
+    def test_effects_made_when_merged_and_dropped_after_a_stop(self):
+        second_done = threading.Event()
+        rules = [
+            FakeRule(
+                "first",
+                self.calls,
+                stop=True,
+                action=lambda event: second_done.wait(5),
+            ),
+            FakeRule(
+                "second",
+                self.calls,
+                action=lambda event: (
+                    self.notifier.send("second"),
+                    second_done.set(),
+                ),
+            ),
+        ]
+
+        event = RulesEngine(rules, max_workers=2).run(new_event())
+
+        assert sorted(self.calls) == ["first", "second"]
+        assert self.notifier.sent == []
+        assert rule_names(event) == ["first"]
+
+        self.calls.clear()
+        second_done.clear()
+        rules[0].stop = False
+        event = RulesEngine(rules, max_workers=2).run(new_event())
+
+        assert self.notifier.sent == ["second"]
+        assert rule_names(event) == ["first", "second"]
+
+    def test_rule_needing_an_effect_result_run_again_in_its_turn(self):
+        second_started = threading.Event()
+
+        def second(event):
+            second_started.set()
+            if self.notifier.create_case("case")["success"]:
+                event["validationMessages"].append("case raised")
+
+        rules = [
+            FakeRule("first", self.calls, action=lambda event: second_started.wait(5)),
+            FakeRule(
+                "second", self.calls, action=second, appends=("validationMessages",)
+            ),
+        ]
+
+        event = RulesEngine(rules, max_workers=2).run(new_event())
+
+        assert self.calls.count("second") == 2
+        assert self.notifier.sent == ["case"]
+        assert event["validationMessages"] == ["case raised"]
+        assert rule_names(event) == ["first", "second"]
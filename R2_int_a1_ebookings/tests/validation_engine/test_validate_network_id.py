@@ -9,6 +9,9 @@ sys.path.append(
     os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 )  # project root folder
 
+from functions.brq_sidecar import SIDECAR_SUFFIX
+from tests.mock_boto import no_such_key_error
+
 MOCK_ENV = {
     "SEIL_AWS_REGION": "TEST_VAL",
     "EBOOKINGS_S3_FILEIN_BUCKET": "FILE_in_Bucket",
@@ -20,36 +23,18 @@ MOCK_ENV = {
 @mock.patch.dict("os.environ", MOCK_ENV, clear=True)
 class TestValidateNetworkId:
     def test_lambda_handler(self):
-        class MockS3Resource:
-            def Object(mock_self, bucket, key):
-                if key == "error.json":
-                    mock_object = mock.MagicMock()
-                    mock_object.get.return_value = {
-                        "Body": io.BytesIO(
-                            json.dumps(
-                                {
-                                    "header": {
-                                        "NetworkId": "INVALID",
-                                    }
-                                }
-                            ).encode("utf-8")
-                        )
-                    }
-                    return mock_object
-                else:
-                    mock_object = mock.MagicMock()
-                    mock_object.get.return_value = {
-                        "Body": io.BytesIO(
-                            json.dumps(
-                                {
-                                    "header": {
-                                        "NetworkId": "SEVNET",
-                                    }
-                                }
-                            ).encode("utf-8")
+        class MockS3Client:
+            def get_object(mock_self, Bucket, Key, Range=None):
+                if Key.endswith(SIDECAR_SUFFIX):
+                    raise no_such_key_error()
+                network_id = "INVALID" if Key == "error.json" else "SEVNET"
+                return {
+                    "Body": io.BytesIO(
+                        json.dumps({"header": {"NetworkId": network_id}}).encode(
+                            "utf-8"
                         )
-                    }
-                    return mock_object
+                    )
+                }
 
         class MockCommonUtils:
             def __init__(mock_self, event):
@@ -61,12 +46,12 @@ class TestValidateNetworkId:
             def send_email_notification(mock_self, k1, k2, k3, k4, k5):
                 pass
 
-        def mock_resource(name):
-            return MockS3Resource()
+        def mock_client(name, *args, **kwargs):
+            return MockS3Client()
 
         with mock.patch(
             "functions.common_utils.CommonUtils", MockCommonUtils
-        ), mock.patch("boto3.resource", mock_resource):
+        ), mock.patch("boto3.client", mock_client):
             from functions.validation_engine.validate_network_id import lambda_handler
 
             event = {